@@ -0,0 +1,109 @@
+"""Add the fingerprint of the application policies
+
+Equivalent policies are merged into the oldest one, and the
+accountings are moved to it.
+
+Revision ID: 3c5e0a9b1f42
+Revises: 7f6d715988ce
+Create Date: 2026-10-18 14:21:09.530417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from remoteappmanager.db.orm import POLICY_FIELDS, policy_fingerprint
+
+
+# revision identifiers, used by Alembic.
+revision = '3c5e0a9b1f42'
+down_revision = '7f6d715988ce'
+branch_labels = None
+depends_on = None
+
+
+policy_table = sa.table(
+    'application_policy',
+    sa.column('id', sa.Integer),
+    sa.column('fingerprint', sa.String),
+    *[sa.column(name) for name in POLICY_FIELDS])
+
+accounting_table = sa.table(
+    'accounting',
+    sa.column('id', sa.String),
+    sa.column('user_id', sa.Integer),
+    sa.column('application_id', sa.Integer),
+    sa.column('application_policy_id', sa.Integer))
+
+revision_table = sa.table(
+    'revision',
+    sa.column('value', sa.Integer))
+
+
+def upgrade():
+    op.add_column('application_policy',
+                  sa.Column('fingerprint', sa.String(64), nullable=True))
+
+    connection = op.get_bind()
+
+    # fingerprint -> id of the oldest policy with it
+    canonical = {}
+    # id of a duplicate policy -> id of the oldest equivalent policy
+    duplicates = {}
+    rows = connection.execute(
+        sa.select([policy_table.c.id] +
+                  [policy_table.c[name] for name in POLICY_FIELDS])
+        .order_by(policy_table.c.id))
+    for row in rows.fetchall():
+        fingerprint = policy_fingerprint(
+            **{name: row[name] for name in POLICY_FIELDS})
+        if fingerprint in canonical:
+            duplicates[row['id']] = canonical[fingerprint]
+        else:
+            canonical[fingerprint] = row['id']
+
+    if duplicates:
+        existing = {
+            tuple(row) for row in connection.execute(
+                sa.select([accounting_table.c.user_id,
+                           accounting_table.c.application_id,
+                           accounting_table.c.application_policy_id]))}
+
+        accountings = connection.execute(
+            sa.select([accounting_table]).where(
+                accounting_table.c.application_policy_id.in_(
+                    list(duplicates)))).fetchall()
+        for accounting in accountings:
+            key = (accounting['user_id'],
+                   accounting['application_id'],
+                   duplicates[accounting['application_policy_id']])
+            if key in existing:
+                # Already granted with the equivalent policy
+                connection.execute(accounting_table.delete().where(
+                    accounting_table.c.id == accounting['id']))
+            else:
+                existing.add(key)
+                connection.execute(accounting_table.update().where(
+                    accounting_table.c.id == accounting['id']
+                ).values(application_policy_id=key[2]))
+
+        connection.execute(policy_table.delete().where(
+            policy_table.c.id.in_(list(duplicates))))
+
+    for fingerprint, id in canonical.items():
+        connection.execute(policy_table.update().where(
+            policy_table.c.id == id).values(fingerprint=fingerprint))
+
+    op.create_index('ix_application_policy_fingerprint',
+                    'application_policy',
+                    ['fingerprint'],
+                    unique=True)
+
+    # The processes caching the content must reload it.
+    connection.execute(revision_table.update().values(
+        value=revision_table.c.value + 1))
+
+
+def downgrade():
+    with op.batch_alter_table('application_policy') as batch_op:
+        batch_op.drop_index('ix_application_policy_fingerprint')
+        batch_op.drop_column('fingerprint')
@@ -0,0 +1,42 @@
+"""Add the resource limits of the application policies
+
+The existing policies have no limits, so their fingerprints do not
+change.
+
+Revision ID: 5e8d2c7a4b19
+Revises: 3c5e0a9b1f42
+Create Date: 2026-10-18 17:02:44.918305
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8d2c7a4b19'
+down_revision = '3c5e0a9b1f42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('application_policy') as batch_op:
+        batch_op.add_column(
+            sa.Column('mem_limit', sa.BigInteger, nullable=True))
+        batch_op.add_column(
+            sa.Column('cpu_shares', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('cpu_quota', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('pids_limit', sa.Integer, nullable=True))
+        batch_op.add_column(
+            sa.Column('shm_size', sa.BigInteger, nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('application_policy') as batch_op:
+        batch_op.drop_column('shm_size')
+        batch_op.drop_column('pids_limit')
+        batch_op.drop_column('cpu_quota')
+        batch_op.drop_column('cpu_shares')
+        batch_op.drop_column('mem_limit')
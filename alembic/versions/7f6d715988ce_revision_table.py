@@ -0,0 +1,30 @@
+"""Add the revision table
+
+Revision ID: 7f6d715988ce
+Revises: d8924b745599
+Create Date: 2026-10-18 11:02:47.118230
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7f6d715988ce'
+down_revision = 'd8924b745599'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    revision_table = op.create_table(
+        'revision',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.bulk_insert(revision_table, [{'id': 1, 'value': 0}])
+
+
+def downgrade():
+    op.drop_table('revision')
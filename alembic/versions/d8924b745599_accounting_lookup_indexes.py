@@ -0,0 +1,30 @@
+"""Add the accounting lookup indexes
+
+Revision ID: d8924b745599
+Revises:
+Create Date: 2026-10-18 10:12:31.402761
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8924b745599'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_accounting_user_lookup',
+                    'accounting',
+                    ['user_id', 'application_id', 'application_policy_id',
+                     'id'])
+    op.create_index('ix_accounting_application_policy',
+                    'accounting',
+                    ['application_id', 'application_policy_id'])
+
+
+def downgrade():
+    op.drop_index('ix_accounting_application_policy', 'accounting')
+    op.drop_index('ix_accounting_user_lookup', 'accounting')
@@ -0,0 +1,106 @@
+"""Benchmarks the lookup of the accounting of a user in ORMDatabase.
+
+The database is filled with --users users, each granted --grants
+applications, and the accounting of random users is retrieved with the
+light row query (ORMDatabase.get_accounting_for_user) and with the
+orm entity query (orm.accounting_for_user).
+
+Usage:
+
+    python benchmarks/accounting_lookup.py --users 10000 --grants 50
+"""
+import argparse
+import contextlib
+import os
+import random
+import tempfile
+import time
+import uuid
+
+from remoteappmanager.db import orm
+
+
+def fill(db, num_users, num_grants, num_policies=4):
+    """Fills the database with bulk inserts"""
+    engine = db.engine
+    with engine.begin() as connection:
+        connection.execute(
+            orm.User.__table__.insert(),
+            [{"id": i, "name": "user{}".format(i)}
+             for i in range(1, num_users + 1)])
+        connection.execute(
+            orm.Application.__table__.insert(),
+            [{"id": i, "image": "image{}".format(i)}
+             for i in range(1, num_grants + 1)])
+        policies = [
+            {"id": i, "app_license": "license{}".format(i),
+             "allow_home": bool(i % 2), "allow_common": False,
+             "allow_view": bool(i % 3), "allow_startup_data": False}
+            for i in range(1, num_policies + 1)]
+        for policy in policies:
+            policy["fingerprint"] = orm.policy_fingerprint(**{
+                key: value for key, value in policy.items() if key != "id"})
+        connection.execute(
+            orm.ApplicationPolicy.__table__.insert(), policies)
+
+        for user_id in range(1, num_users + 1):
+            connection.execute(
+                orm.Accounting.__table__.insert(),
+                [{"id": uuid.uuid4().hex,
+                  "user_id": user_id,
+                  "application_id": app_id,
+                  "application_policy_id": 1 + app_id % num_policies}
+                 for app_id in range(1, num_grants + 1)])
+
+
+def measure(label, func, users, repeat):
+    start = time.perf_counter()
+    for user in users:
+        result = func(user)
+    elapsed = time.perf_counter() - start
+    print("{:<28} {:8.3f} ms/lookup ({} rows)".format(
+        label, 1000 * elapsed / repeat, len(result)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--grants", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=500)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        url = "sqlite:///" + os.path.join(tempdir, "benchmark.db")
+        orm.Database(url).reset()
+        database = orm.ORMDatabase(url)
+
+        start = time.perf_counter()
+        fill(database.db, args.users, args.grants)
+        print("Filled {} users x {} grants in {:.1f} s".format(
+            args.users, args.grants, time.perf_counter() - start))
+
+        names = ["user{}".format(random.randint(1, args.users))
+                 for _ in range(args.repeat)]
+        users = [database.get_user(user_name=name) for name in names]
+
+        measure("light rows, by user id",
+                database.get_accounting_for_user, users, args.repeat)
+
+        measure("light rows, by user name",
+                database.get_accounting_for_user,
+                [orm.User(name=name) for name in names], args.repeat)
+
+        def orm_entities(user):
+            session = database.db.create_session()
+            with contextlib.closing(session):
+                result = orm.accounting_for_user(session, user)
+                session.expunge_all()
+            return result
+
+        measure("orm entities, by user name",
+                orm_entities,
+                [orm.User(name=name) for name in names], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Benchmarks the loading of a large CSV accounting file in CSVDatabase.
+
+A file with --rows rows is generated, --grants per user, and the time
+and the memory (traced by tracemalloc) of the load are reported, with
+the time of a reload after a single row has changed and of the lookup
+of the accounting of random users.
+
+Usage:
+
+    python benchmarks/csv_load.py --rows 1000000 --grants 10
+"""
+import argparse
+import csv
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from remoteappmanager.db.csv_db import CSVDatabase, _HEADERS
+
+
+def write(path, num_rows, num_grants, num_apps, changed_user=None):
+    with open(path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(_HEADERS)
+        for row in range(num_rows):
+            user = row // num_grants
+            app = (user + row) % num_apps
+            writer.writerow((
+                "user{}".format(user),
+                "image{}".format(app),
+                "",
+                str(row % 2),
+                "1",
+                "0",
+                "", "", "",
+                "1" if user == changed_user else "0"))
+
+
+def timed(label, func):
+    start = time.perf_counter()
+    result = func()
+    print("{:<28} {:8.3f} s".format(label, time.perf_counter() - start))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--grants", type=int, default=10)
+    parser.add_argument("--apps", type=int, default=100)
+    parser.add_argument("--lookups", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tempdir:
+        path = os.path.join(tempdir, "benchmark.csv")
+        write(path, args.rows, args.grants, args.apps)
+        print("{} rows, {:.1f} MiB".format(
+            args.rows, os.path.getsize(path) / 2**20))
+
+        database = timed("load", lambda: CSVDatabase(path))
+        del database
+        gc.collect()
+
+        tracemalloc.start()
+        database = CSVDatabase(path, reload_interval=None)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("{:<28} {:8.1f} MiB (peak {:.1f} MiB)".format(
+            "memory", current / 2**20, peak / 2**20))
+
+        users = database.list_users()
+        sample = [random.choice(users) for _ in range(args.lookups)]
+        timed("{} lookups".format(args.lookups),
+              lambda: [database.get_accounting_for_user(user)
+                       for user in sample])
+
+        timed("reload, unchanged", database.reload)
+        write(path, args.rows, args.grants, args.apps,
+              changed_user=len(users) // 2)
+        diff = timed("reload, one user changed", database.reload)
+        print("changed users: {}".format(sorted(diff["changed"])))
+
+
+if __name__ == "__main__":
+    main()
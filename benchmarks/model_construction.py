@@ -0,0 +1,81 @@
+"""Benchmarks the construction of Container and Image objects from the
+dicts returned by docker.
+
+--items docker dicts are built, like those returned by the listing of
+containers and the inspection of images, and converted with
+from_docker_dict, --repeat times. The best run is reported.
+
+Usage:
+
+    python benchmarks/model_construction.py --items 10000
+"""
+import argparse
+import time
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.docker_labels import (
+    SIMPHONY_NS, SIMPHONY_NS_ENV, SIMPHONY_NS_RUNINFO)
+from remoteappmanager.docker.image import Image
+
+
+def container_dict(index):
+    url_id = "{:032x}".format(index)
+    return {
+        'Id': "{:064x}".format(index),
+        'Image': 'simphonyproject/simphony-mayavi:0.6.0',
+        'ImageID': 'sha256:{:064x}'.format(index % 10),
+        'Labels': {
+            SIMPHONY_NS.ui_name: 'Mayavi',
+            SIMPHONY_NS_RUNINFO.user: 'user{}'.format(index),
+            SIMPHONY_NS_RUNINFO.url_id: url_id,
+            SIMPHONY_NS_RUNINFO.realm: "myrealm",
+            SIMPHONY_NS_RUNINFO.mapping_id: "{:032x}".format(index // 2),
+            SIMPHONY_NS_RUNINFO.urlpath:
+                "/user/user{}/containers/{}".format(index, url_id)},
+        'Names': ['/myrealm-user{}-mayavi'.format(index)],
+        'Ports': [{'IP': '0.0.0.0', 'PrivatePort': 8888,
+                   'PublicPort': 30000 + index % 30000, 'Type': 'tcp'}],
+        'State': 'running'}
+
+
+def image_dict(index):
+    return {
+        'Id': 'sha256:{:064x}'.format(index),
+        'RepoTags': ['simphonyproject/image{}:latest'.format(index)],
+        'Config': {'Labels': {
+            SIMPHONY_NS.ui_name: 'Image {}'.format(index),
+            SIMPHONY_NS.description: 'Ubuntu machine',
+            SIMPHONY_NS.type: 'vncapp',
+            SIMPHONY_NS_ENV["x11-width"]: '',
+            SIMPHONY_NS_ENV["x11-height"]: '',
+            SIMPHONY_NS_ENV["x11-depth"]: '',
+        }}}
+
+
+def measure(label, cls, dicts, repeat):
+    best = min(timeit(cls, dicts) for _ in range(repeat))
+    print("{:<10} {:8.3f} s {:8.2f} us/item".format(
+        label, best, best / len(dicts) * 1e6))
+
+
+def timeit(cls, dicts):
+    start = time.perf_counter()
+    for docker_dict in dicts:
+        cls.from_docker_dict(docker_dict)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    measure("Container", Container,
+            [container_dict(i) for i in range(args.items)], args.repeat)
+    measure("Image", Image,
+            [image_dict(i) for i in range(args.items)], args.repeat)
+
+
+if __name__ == "__main__":
+    main()
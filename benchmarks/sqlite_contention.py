@@ -0,0 +1,113 @@
+"""Benchmarks many processes sharing the same sqlite accounting database.
+
+Each process behaves like a remoteappmanager starting up and serving
+requests: it creates its user, grants it the demo applications and reads
+the accounting, --rounds times. The processes start at the same time.
+The run is performed with the legacy connection setup (a new connection
+per session, no pragmas other than foreign_keys) and with the default
+one (pooled connections, orm.SQLITE_PRAGMAS).
+
+Usage:
+
+    python benchmarks/sqlite_contention.py --processes 32 --rounds 20
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.pool import NullPool
+
+from remoteappmanager.db import orm
+
+PROFILES = {
+    "legacy": {"sqlite_pragmas": {}, "poolclass": NullPool},
+    "default": {},
+}
+
+
+def grant(database, app, user_name):
+    database.grant_access("image{}".format(app), user_name,
+                          "", False, True, None, False)
+
+
+def worker(url, kwargs, index, rounds, num_apps, start, results):
+    database = orm.ORMDatabase(url, **kwargs)
+    start.wait()
+
+    completed = locked = 0
+    begin = time.perf_counter()
+    try:
+        for round in range(rounds):
+            user_name = "user{}-{}".format(index, round)
+            try:
+                if database.get_user(user_name=user_name) is None:
+                    database.create_user(user_name)
+                for app in range(num_apps):
+                    grant(database, app, user_name)
+                user = database.get_user(user_name=user_name)
+                database.get_accounting_for_user(user)
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                locked += 1
+            else:
+                completed += 1
+    finally:
+        results.put((completed, locked, time.perf_counter() - begin))
+
+
+def run(profile, args):
+    with tempfile.TemporaryDirectory() as tempdir:
+        url = "sqlite:///" + os.path.join(tempdir, "benchmark.db")
+        orm.Database(url).reset()
+        database = orm.ORMDatabase(url)
+        for app in range(args.apps):
+            database.create_application("image{}".format(app))
+
+        start = multiprocessing.Event()
+        results = multiprocessing.Queue()
+        processes = [
+            multiprocessing.Process(
+                target=worker,
+                args=(url, PROFILES[profile], index, args.rounds,
+                      args.apps, start, results))
+            for index in range(args.processes)]
+
+        for process in processes:
+            process.start()
+
+        begin = time.perf_counter()
+        start.set()
+        outcomes = [results.get() for _ in processes]
+        elapsed = time.perf_counter() - begin
+
+        for process in processes:
+            process.join()
+
+    completed = sum(outcome[0] for outcome in outcomes)
+    locked = sum(outcome[1] for outcome in outcomes)
+    slowest = max(outcome[2] for outcome in outcomes)
+    print("{:<8} {:6d} rounds {:6d} locked {:8.2f} s total "
+          "{:8.2f} s slowest process {:8.1f} rounds/s".format(
+              profile, completed, locked, elapsed, slowest,
+              completed / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--processes", type=int, default=32)
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--apps", type=int, default=3)
+    parser.add_argument("--profile", choices=sorted(PROFILES),
+                        action="append")
+    args = parser.parse_args()
+
+    for profile in args.profile or ["legacy", "default"]:
+        run(profile, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
+var $ = require("jquery");
 var ApplicationListModel = require("user/ApplicationListModel");
+var resources = require("user-resources");
 
 QUnit.module("user.ApplicationListModel");
 QUnit.test("instantiation", function (assert) {
@@ -15,3 +17,34 @@ QUnit.test("instantiation", function (assert) {
     assert.equal(model.appList[0].configurables[0].configDict.resolution, "Window");
   });
 });
+
+QUnit.test("queued start", function (assert) {
+  var done = assert.async();
+  var model = new ApplicationListModel();
+  model.queuedRetryDelay = 0;
+  model.updateIdx = function() {
+    return $.Deferred().resolve();
+  };
+
+  var create = resources.Container.create;
+  var positions = [];
+  var replies = [2, 1];
+  resources.Container.create = function() {
+    if (replies.length) {
+      positions.push(model.appList[0].queuePosition);
+      return $.Deferred().reject(
+        {code: 503, queue_position: replies.shift()});
+    }
+    return $.Deferred().resolve("id", "location");
+  };
+
+  model.update().done(function() {
+    model.startApplication(0).always(function() {
+      resources.Container.create = create;
+
+      assert.deepEqual(positions, [null, 2]);
+      assert.equal(model.appList[0].queuePosition, null);
+      done();
+    });
+  });
+});
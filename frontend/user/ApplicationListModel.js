@@ -46,6 +46,10 @@ class ApplicationListModel {
     this.selectedIndex = null;
 
     this.loading = true;
+
+    // Time (milliseconds) between two start requests, while the start is
+    // queued by the server admission control.
+    this.queuedRetryDelay = 1000;
   }
 
   update() {
@@ -76,6 +80,8 @@ class ApplicationListModel {
           status: Status.STOPPED,
           // If true the user will see the loading spinner (when starting the application)
           delayed: true,
+          // Place in the server start queue, while the start is queued
+          queuePosition: null,
           configurables: [],
           isRunning: function() {return this.status === Status.RUNNING;},
           isStopped: function() {return this.status === Status.STOPPED;},
@@ -152,22 +158,34 @@ class ApplicationListModel {
 
     let startPromise = $.Deferred();
 
-    resources.Container.create({
-      mapping_id: appStarting.appData.mapping_id,
-      configurables: configurablesData
-    })
-    .done(() => {
-      this.updateIdx(index)
-      .done(startPromise.resolve)
+    let requestStart = () => {
+      resources.Container.create({
+        mapping_id: appStarting.appData.mapping_id,
+        configurables: configurablesData
+      })
+      .done(() => {
+        appStarting.queuePosition = null;
+        this.updateIdx(index)
+        .done(startPromise.resolve)
+        .fail((error) => {
+          appStarting.status = Status.STOPPED;
+          startPromise.reject(error);
+        });
+      })
       .fail((error) => {
+        if (error.code === 503 && error.queue_position !== undefined) {
+          // The server keeps our place in the queue. Ask again.
+          appStarting.queuePosition = error.queue_position;
+          setTimeout(requestStart, this.queuedRetryDelay);
+          return;
+        }
+        appStarting.queuePosition = null;
         appStarting.status = Status.STOPPED;
         startPromise.reject(error);
       });
-    })
-    .fail((error) => {
-      appStarting.status = Status.STOPPED;
-      startPromise.reject(error);
-    });
+    };
+
+    requestStart();
 
     return startPromise;
   }
@@ -12,6 +12,14 @@
 #
 # docker_host = "tcp://192.168.99.100:2376"
 
+# # The containers can be spread over more docker machines. They use the
+# # same TLS configuration as docker_host. Each new container is started on
+# # the machine with the fewest running containers per CPU (then the most
+# # memory per container) among those that have the application image.
+#
+# docker_additional_hosts = ["tcp://192.168.99.101:2376",
+#                            "tcp://192.168.99.102:2376"]
+
 # # Docker realm is used to identify the containers that are managed by this
 # # particular instance of simphony-remote. It will be the first entry in
 # # the container name, and will also be added as part of a run-time container
@@ -41,6 +49,129 @@
 # tls_cert = "/path/to/cert.pem"
 # tls_key = "/path/to/key.pem"
 #
+# # Docker client
+# # -------------
+# #
+# # Set this to True to talk to docker with the native asynchronous client,
+# # which keeps a pool of persistent connections instead of using threads.
+#
+# docker_native_client = True
+#
+# # The maximum number of simultaneous connections to docker, when using
+# # the native client.
+#
+# docker_max_connections = 10
+#
+# # Set this to True to keep an in-memory view of the running containers,
+# # updated by the docker events, instead of querying docker at every
+# # container lookup. The view is fully reloaded every
+# # docker_container_cache_resync seconds.
+#
+# docker_container_cache = True
+# docker_container_cache_resync = 60
+#
+# # The number of inspected images kept in memory, and for how long
+# # (seconds). The cached images are also discarded when images are
+# # pulled, tagged or deleted. Set the size to 0 to disable the cache.
+#
+# docker_image_cache_size = 128
+# docker_image_cache_ttl = 300
+#
+# # A started container is ready when it responds over HTTP, unless its
+# # image says otherwise with the eu.simphony-project.docker.readiness label
+# # ("http", "tcp" or "healthcheck"). Set this to False to probe over HTTP
+# # also the containers that have a docker HEALTHCHECK.
+#
+# docker_honour_healthcheck = True
+#
+# # Warm pool
+# # ---------
+# #
+# # Keep up to docker_warm_pool_size idle, pre-started containers for the
+# # applications each user starts the most, so that the next start does
+# # not wait for docker. Only the listed images are pre-started, and only
+# # for the applications that mount no volumes (no home directory and no
+# # volume in the policy). A pre-started container is created for one
+# # application, and serves its next start with the same settings. The
+# # pool is filled after a start, not when an application is stopped.
+#
+# docker_warm_pool_size = 2
+# docker_warm_pool_images = ["simphonyproject/simphony-mayavi:0.6.0"]
+#
+# # Default resource limits of the containers. The application policies
+# # (see remoteappdb app grant --mem-limit etc.) override them. Sizes are in
+# # bytes, or with a k, m or g suffix. The cpu quota is the CPU time, in
+# # microseconds, a container can use every 100 milliseconds. 0 or empty
+# # means no limit.
+#
+# docker_mem_limit = "2g"
+# docker_cpu_shares = 1024
+# docker_cpu_quota = 100000
+# docker_pids_limit = 256
+# docker_shm_size = "256m"
+#
+# # Reaper
+# # ------
+# #
+# # Every reaper_interval seconds, the admin application stops the containers
+# # of the realm that have had no proxy route or no matching accounting for
+# # reaper_orphan_grace seconds, and those without traffic through the proxy
+# # for reaper_idle_timeout seconds (0 disables this check). The pre-started
+# # containers of the warm pools have no route until they are claimed: they
+# # are stopped after reaper_warm_grace seconds without route, e.g. when the
+# # process that started them is gone, and like any other container when
+# # their accounting is removed. A pool replaces the idle containers
+# # stopped this way at its next request. With reaper_dry_run, the
+# # containers are only logged.
+#
+# reaper_interval = 300.0
+# reaper_idle_timeout = 14400.0
+# reaper_orphan_grace = 600.0
+# reaper_warm_grace = 3600.0
+# reaper_concurrency = 4
+# reaper_dry_run = False
+#
+# # ---------
+# # Admission
+# # ---------
+# #
+# # At most admission_max_starts containers are started at the same time on
+# # the host, by all the remoteappmanager processes sharing
+# # admission_directory (0 disables the limit). The other starts are queued
+# # in order of arrival: a start request waits up to admission_wait seconds,
+# # then the user is told the position in the queue, and the request is
+# # repeated. admission_directory is required: create it beforehand, owned
+# # by a group of all the users, with the setgid bit and no access for the
+# # other users, e.g.
+# #     install -d -g remoteapps -m 2770 /srv/jupyterhub/admission
+#
+# admission_max_starts = 8
+# admission_directory = "/srv/jupyterhub/admission"
+# admission_wait = 10.0
+#
+# # --------------
+# # Authentication
+# # --------------
+# #
+# # The users identified by JupyterHub are remembered for hub_auth_cache_ttl
+# # seconds, and the tokens it rejected for hub_auth_cache_negative_ttl
+# # seconds, per token and JupyterHub session. Logging out, here or from
+# # JupyterHub, forgets the user immediately.
+#
+# hub_auth_cache_ttl = 60
+# hub_auth_cache_negative_ttl = 5
+#
+# # -------
+# # Metrics
+# # -------
+# #
+# # The prometheus metrics of the application are served at
+# # {base_urlpath}/metrics. Unless metrics_authenticate is False, the
+# # scraper must authenticate as the user, e.g. with a JupyterHub API token
+# # in the Authorization header.
+#
+# metrics_authenticate = True
+#
 # # ----------
 # # Accounting
 # # ----------
@@ -58,12 +189,42 @@
 # database_kwargs = {
 #     "csv_file_path": os.path.abspath("./remoteappmanager.csv")}
 #
+# # The CSV file is loaded again when it is modified. "reload_interval" is
+# # the minimum time (seconds) between two checks of the file, None disables
+# # the reload.
+#
 # # Sqlite database support
 #
 # database_class = "remoteappmanager.db.orm.ORMDatabase"
 # database_kwargs = {
 #     "url": "sqlite:///"+os.path.abspath('./remoteappmanager.db')}
 #
+# # The sqlite connections wait up to 10 seconds for a lock held by another
+# # process (see orm.SQLITE_PRAGMAS). The pragmas can be changed with
+# # "sqlite_pragmas", e.g.
+# #     "sqlite_pragmas": {"busy_timeout": 30000}
+# # "sqlite_wal": True switches the database to the write-ahead log, so that
+# # the readers do not wait for the writers. The mode is kept in the file
+# # and applies to all the processes using it: each of them, also those
+# # that only read, needs write access to the directory of the database
+# # for the -wal and -shm files.
+# # Other keys are passed to sqlalchemy.create_engine, e.g. to configure the
+# # connection pool of a database server:
+# #     "pool_size": 5, "pool_recycle": 3600, "pool_pre_ping": True
+#
+# # Cache the users and their accountings for database_cache_ttl seconds.
+# # Changes made by other processes (e.g. remoteappdb) are detected within
+# # database_revision_interval seconds with the sqlite database, and when
+# # the cache expires with the CSV database.
+#
+# database_cache_ttl = 60
+# database_revision_interval = 1.0
+#
+# # The database requests of the web handlers are performed by a pool of
+# # threads, so that a slow database does not stall the server.
+#
+# database_executor_workers = 2
+#
 # # User accounting
 #
 # auto_user_creation = True
@@ -1,15 +1,38 @@
 from tornado import web
+from traitlets import default
 
 from remoteappmanager.base_application import BaseApplication
 from remoteappmanager.handlers.api import (
     AdminHomeHandler,
+    AccountingBatchHandler,
 )
+from remoteappmanager.reaper import Reaper
+from remoteappmanager.utils import url_path_join
 from remoteappmanager.webapi import admin
 
 
 class AdminApplication(BaseApplication):
     """Tornado main application"""
 
+    @default("reaper")
+    def _reaper_default(self):
+        """The reaper is realm-wide, so only the admin application
+        runs it."""
+        if self.file_config.reaper_interval <= 0:
+            return None
+
+        return Reaper(
+            container_manager=self.container_manager,
+            reverse_proxy=self.reverse_proxy,
+            async_db=self.async_db,
+            interval=self.file_config.reaper_interval,
+            idle_timeout=self.file_config.reaper_idle_timeout,
+            orphan_grace=self.file_config.reaper_orphan_grace,
+            warm_grace=self.file_config.reaper_warm_grace,
+            concurrency=self.file_config.reaper_concurrency,
+            dry_run=self.file_config.reaper_dry_run,
+        )
+
     def _webapi_resources(self):
         return [admin.ContainerHandler,
                 admin.ApplicationHandler,
@@ -20,6 +43,8 @@ class AdminApplication(BaseApplication):
     def _web_handlers(self):
         base_urlpath = self.command_line_config.base_urlpath
         return [
+            (url_path_join(base_urlpath, "api", "v1", "accounting", "batch/"),
+             AccountingBatchHandler),
             (base_urlpath, AdminHomeHandler),
             (base_urlpath.rstrip('/'),
              web.RedirectHandler, {"url": base_urlpath}),
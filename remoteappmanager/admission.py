@@ -0,0 +1,419 @@
+import errno
+import fcntl
+import os
+import stat
+import time
+from datetime import timedelta
+
+from tornado import gen
+from tornado.concurrent import Future
+from traitlets import Dict, Float, Int, Unicode
+
+from remoteappmanager import metrics
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+
+
+class Queued(Exception):
+    """The start has not been admitted yet.
+
+    Attributes
+    ----------
+    position: int
+        The number of starts queued ahead of it, on the whole host.
+    """
+    def __init__(self, position):
+        super().__init__("Queued behind {} starts".format(position))
+        self.position = position
+
+
+class Ticket:
+    """The place of a start in the admission queue."""
+
+    def __init__(self, key, number, queue_fd):
+        #: What is being started, e.g. the mapping id
+        self.key = key
+
+        #: The number of the ticket. Lower numbers are admitted first.
+        self.number = number
+
+        #: The number of starts queued ahead, when last checked.
+        self.position = None
+
+        #: Resolved when a start slot is acquired.
+        self.admitted = Future()
+
+        #: True once a caller of AdmissionController.admit() owns it
+        self.claimed = False
+
+        #: The requests waiting for the ticket
+        self.waiters = 0
+
+        #: The monotonic time a request last waited for the ticket
+        self.last_seen = time.monotonic()
+
+        #: The monotonic time the ticket was issued
+        self.issued = self.last_seen
+
+        # The file descriptor of the locked queue file, while queued,
+        # and of the locked slot file, once admitted.
+        self._queue_fd = queue_fd
+        self._slot_fd = None
+
+
+class AdmissionController(LoggingMixin):
+    """Limits the containers being started at the same time on the host,
+    across all the remoteappmanager processes that share the same
+    directory.
+
+    The state is kept in the directory, with file locks (flock), so that
+    a process that dies releases its places:
+
+    - counter: the number of the next ticket.
+    - queue/<ticket number>: one per queued start, locked by its process.
+      The files that are not locked belong to dead processes.
+    - slots/<index>: max_starts files. A start holds the lock of one of
+      them from its admission until it is released.
+
+    The queued starts are admitted in the order of their tickets: only
+    the first max_starts of the queue try to acquire a slot.
+
+    Whoever can write in the directory can stall the starts, so it must
+    not be writable by all users. The processes of different users
+    share it through a group: the directory belongs to that group and
+    has the setgid bit, so that the files created in it do too.
+    """
+
+    #: The directory shared by the processes. It is created, if missing,
+    #: private to the group of the process.
+    directory = Unicode()
+
+    #: The maximum number of starts admitted at the same time
+    max_starts = Int(4)
+
+    #: The interval (seconds) between two checks of the queue
+    poll_interval = Float(0.25)
+
+    #: The time (seconds) a ticket is kept when no request waits for it,
+    #: e.g. because the user went away.
+    ticket_ttl = Float(30.0)
+
+    #: key -> Ticket, for the tickets of this process not yet claimed
+    _tickets = Dict()
+
+    #: The counters reported by stats()
+    _counters = Dict()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counters = {
+            "admitted": 0,
+            "expired": 0,
+            "max_wait": 0.0,
+        }
+        self._polling = False
+
+        if not self.directory:
+            raise ValueError("The admission directory is not configured")
+
+        for path in (self.directory,
+                     os.path.join(self.directory, "queue"),
+                     os.path.join(self.directory, "slots")):
+            _makedirs_shared(path)
+
+    @gen.coroutine
+    def admit(self, key, timeout):
+        """Waits for the start identified by key to be admitted.
+
+        If it is not admitted within timeout seconds, it keeps its place
+        in the queue for ticket_ttl seconds, so that the request can be
+        repeated.
+
+        Parameters
+        ----------
+        key: str
+            Identifies the start, e.g. the mapping id.
+        timeout: float
+            The time (seconds) to wait.
+
+        Returns
+        -------
+        The admitted Ticket. It must be released with release().
+
+        Raises
+        ------
+        Queued:
+            If the start is not admitted within timeout
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            ticket = self._tickets.get(key)
+            if ticket is None:
+                ticket = self._enqueue(key)
+
+            ticket.waiters += 1
+            try:
+                yield gen.with_timeout(
+                    timedelta(seconds=max(0, deadline - time.monotonic())),
+                    ticket.admitted)
+            except gen.TimeoutError:
+                raise Queued(ticket.position)
+            finally:
+                ticket.waiters -= 1
+                ticket.last_seen = time.monotonic()
+
+            # Two requests for the same start (e.g. a double click) may
+            # wake up on the same ticket. The second one queues again.
+            if not ticket.claimed:
+                ticket.claimed = True
+                self._tickets.pop(key, None)
+                return ticket
+
+    def release(self, ticket):
+        """Releases the slot of an admitted ticket. Idempotent."""
+        if ticket._slot_fd is not None:
+            os.close(ticket._slot_fd)
+            ticket._slot_fd = None
+
+    def stats(self):
+        """Returns the state of the admission control in this process.
+
+        Returns
+        -------
+        dict
+            queued: the starts of this process in the queue
+            admitted: the starts admitted so far
+            expired: the tickets dropped because nobody waited for them
+            max_wait: the longest time (seconds) a start was queued
+        """
+        stats = dict(self._counters)
+        stats["queued"] = sum(1 for ticket in self._tickets.values()
+                              if not ticket.admitted.done())
+        return stats
+
+    # Private
+
+    def _enqueue(self, key):
+        """Issues a new ticket, and tries to admit it right away"""
+        with _locked_file(os.path.join(self.directory, "counter"),
+                          fcntl.LOCK_EX) as fd:
+            content = os.read(fd, 32)
+            try:
+                number = int(content)
+            except ValueError:
+                number = 0
+            os.lseek(fd, 0, os.SEEK_SET)
+            os.ftruncate(fd, 0)
+            os.write(fd, str(number + 1).encode("ascii"))
+
+        # The queue file is locked before it appears in the queue, so
+        # that the other processes never find it unlocked.
+        path = self._queue_path(number)
+        fd = _open_shared(path + ".new")
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        os.rename(path + ".new", path)
+
+        ticket = Ticket(key, number, fd)
+        self._tickets[key] = ticket
+
+        self._poll_once()
+        if not self._polling:
+            self._polling = True
+            self._poll()
+
+        return ticket
+
+    @gen.coroutine
+    def _poll(self):
+        """Checks the queue periodically, while there are tickets"""
+        try:
+            while self._tickets:
+                yield gen.sleep(self.poll_interval)
+                try:
+                    self._poll_once()
+                except Exception:
+                    self.log.exception("Admission queue check failed")
+        finally:
+            self._polling = False
+
+    def _poll_once(self):
+        """Updates the positions of the tickets of this process, admits
+        those that can acquire a slot, and drops the expired ones."""
+        now = time.monotonic()
+        for key, ticket in list(self._tickets.items()):
+            if (ticket.waiters == 0 and
+                    now - ticket.last_seen > self.ticket_ttl):
+                self.log.info("Dropping the admission ticket of {}: "
+                              "nobody is waiting for it".format(key))
+                self._drop(ticket)
+                del self._tickets[key]
+                self._counters["expired"] += 1
+
+        queued = [ticket for ticket in self._tickets.values()
+                  if not ticket.admitted.done()]
+        if not queued:
+            return
+
+        ahead = self._live_queue()
+        for ticket in sorted(queued, key=lambda ticket: ticket.number):
+            ticket.position = sum(1 for number in ahead
+                                  if number < ticket.number)
+            if ticket.position >= self.max_starts:
+                continue
+
+            slot_fd = self._acquire_slot()
+            if slot_fd is None:
+                continue
+
+            self._dequeue(ticket)
+            ticket._slot_fd = slot_fd
+            ticket.position = 0
+            ticket.admitted.set_result(ticket)
+
+            wait = now - ticket.issued
+            self._counters["admitted"] += 1
+            self._counters["max_wait"] = max(self._counters["max_wait"],
+                                             wait)
+            metrics.ADMISSION_WAIT_SECONDS.observe(wait)
+
+    def _live_queue(self):
+        """Returns the ticket numbers of the queued starts whose process
+        is alive, and removes the files of the dead ones."""
+        queue_dir = os.path.join(self.directory, "queue")
+        own = {ticket.number for ticket in self._tickets.values()
+               if ticket._queue_fd is not None}
+
+        numbers = []
+        for name in os.listdir(queue_dir):
+            try:
+                number = int(name)
+            except ValueError:
+                continue
+
+            if number in own:
+                numbers.append(number)
+                continue
+
+            try:
+                fd = os.open(os.path.join(queue_dir, name),
+                             os.O_RDONLY | os.O_NOFOLLOW)
+            except FileNotFoundError:
+                continue
+
+            try:
+                fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+            except OSError as e:
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+                numbers.append(number)
+            else:
+                _unlink_noexcept(os.path.join(queue_dir, name))
+            finally:
+                os.close(fd)
+
+        return numbers
+
+    def _acquire_slot(self):
+        """Returns the locked file descriptor of a free slot, or None"""
+        for index in range(self.max_starts):
+            fd = _open_shared(os.path.join(self.directory,
+                                           "slots",
+                                           str(index)))
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError as e:
+                os.close(fd)
+                if e.errno not in (errno.EAGAIN, errno.EACCES):
+                    raise
+            else:
+                return fd
+
+        return None
+
+    def _dequeue(self, ticket):
+        """Removes the ticket from the queue"""
+        if ticket._queue_fd is not None:
+            _unlink_noexcept(self._queue_path(ticket.number))
+            os.close(ticket._queue_fd)
+            ticket._queue_fd = None
+
+    def _drop(self, ticket):
+        """Gives up the place of the ticket, and its slot if admitted"""
+        self._dequeue(ticket)
+        self.release(ticket)
+
+    def _queue_path(self, number):
+        return os.path.join(self.directory, "queue", "{:012d}".format(number))
+
+
+class _locked_file:
+    """Context manager. Opens a shared file and holds its lock."""
+    def __init__(self, path, operation):
+        self._path = path
+        self._operation = operation
+        self._fd = None
+
+    def __enter__(self):
+        self._fd = _open_shared(self._path, os.O_RDWR)
+        fcntl.flock(self._fd, self._operation)
+        return self._fd
+
+    def __exit__(self, *args):
+        os.close(self._fd)
+
+
+def _open_shared(path, flags=os.O_RDONLY):
+    """Opens the file, creating it if needed, without following
+    symbolic links. The files created are readable and writable by the
+    group of the directory, so that the processes of the other users
+    can lock them too."""
+    flags |= os.O_NOFOLLOW
+    try:
+        fd = os.open(path, flags | os.O_CREAT | os.O_EXCL, 0o660)
+    except FileExistsError:
+        return os.open(path, flags)
+
+    # The umask may have removed the group permissions
+    os.fchmod(fd, 0o660)
+    return fd
+
+
+def _makedirs_shared(path):
+    """Creates the directory, if needed, accessible to its group only,
+    and checks that the other users cannot modify it."""
+    try:
+        os.mkdir(path, 0o2770)
+    except FileExistsError:
+        pass
+    else:
+        # The umask may have removed the group permissions
+        os.chmod(path, 0o2770)
+
+    _check_directory(path)
+
+
+def _check_directory(path):
+    """Raises PermissionError if the directory is a symbolic link, or
+    can be modified by users that are not its owner or in its group, or
+    belongs to a user and a group the process does not trust."""
+    info = os.lstat(path)
+    if not stat.S_ISDIR(info.st_mode):
+        raise PermissionError(
+            "The admission directory {} is not a directory".format(path))
+
+    if info.st_mode & stat.S_IWOTH:
+        raise PermissionError(
+            "The admission directory {} is writable by all the "
+            "users".format(path))
+
+    groups = set(os.getgroups()) | {os.getegid()}
+    if info.st_uid not in (0, os.geteuid()) and info.st_gid not in groups:
+        raise PermissionError(
+            "The admission directory {} belongs to another user and "
+            "group".format(path))
+
+
+def _unlink_noexcept(path):
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
@@ -1,5 +1,7 @@
 from tornado import web
+from traitlets import default
 
+from remoteappmanager.admission import AdmissionController
 from remoteappmanager.base_application import BaseApplication
 from remoteappmanager.handlers.api import (
     UserHomeHandler, RegisterContainerHandler)
@@ -10,6 +12,22 @@ from remoteappmanager import webapi
 class Application(BaseApplication):
     """Tornado main application"""
 
+    @default("admission")
+    def _admission_default(self):
+        """The users start their containers from this application"""
+        if self.file_config.admission_max_starts <= 0:
+            return None
+
+        return AdmissionController(
+            directory=self.file_config.admission_directory,
+            max_starts=self.file_config.admission_max_starts)
+
+    def _reconcile_filters(self):
+        """Each user application only registers the routes of the
+        containers of its user. The admin application covers the
+        realm."""
+        return {"user_name": self.user.name}
+
     def _webapi_resources(self):
         return [webapi.ApplicationHandler,
                 webapi.ContainerHandler]
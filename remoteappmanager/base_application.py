@@ -10,12 +10,20 @@ from tornado.httpclient import AsyncHTTPClient
 from tornadowebapi.registry import Registry
 from tornado.web import RequestHandler
 
+from remoteappmanager import metrics
+from remoteappmanager.admission import AdmissionController
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.db.cached_db import CachedDatabase
 from remoteappmanager.db.interfaces import ABCDatabase
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.reaper import Reaper
 from remoteappmanager.handlers.handler_authenticator import HubAuthenticator
+from remoteappmanager.handlers.logout_handler import LogoutHandler
+from remoteappmanager.handlers.metrics_handler import MetricsHandler
 from remoteappmanager.user import User
 from remoteappmanager.traitlets import as_dict
+from remoteappmanager.utils import url_path_join
 from remoteappmanager.services.hub import Hub
 from remoteappmanager.services.reverse_proxy import ReverseProxy
 
@@ -46,6 +54,10 @@ class BaseApplication(web.Application, LoggingMixin):
     #: they can run etc.
     db = Instance(ABCDatabase, allow_none=True)
 
+    #: Asynchronous access to db, from a pool of threads. To be used by
+    #: the request handlers, so that the queries do not block the ioloop.
+    async_db = Instance(AsyncDatabase)
+
     #: API access to the configurable-http-proxy
     reverse_proxy = Instance(ReverseProxy)
 
@@ -55,6 +67,12 @@ class BaseApplication(web.Application, LoggingMixin):
     #: Manages the docker interface
     container_manager = Instance(ContainerManager)
 
+    #: Stops the unused containers of the realm, if enabled.
+    reaper = Instance(Reaper, allow_none=True)
+
+    #: Limits the container starts on the host, if enabled.
+    admission = Instance(AdmissionController, allow_none=True)
+
     #: The WebAPI registry for resources.
     registry = Instance(Registry)
 
@@ -84,6 +102,10 @@ class BaseApplication(web.Application, LoggingMixin):
         self._file_config = file_config
         self._environment_config = environment_config
 
+        #: The AsyncDatabase created by the async_db default, if any.
+        #: It is created lazily, and shut down when the application stops.
+        self._default_async_db = None
+
         # Observe that settings and config are different things.
         # Config is the external configuration we can change.
         # settings is what we pass as a dictionary to tornado.
@@ -111,14 +133,25 @@ class BaseApplication(web.Application, LoggingMixin):
         """Initializes the docker container manager."""
         return ContainerManager(
             realm=self.file_config.docker_realm,
-            docker_config=self.file_config.docker_config()
+            docker_config=self.file_config.docker_config(),
+            additional_docker_configs=(
+                self.file_config.additional_docker_configs()),
+            docker_executor_workers=self.file_config.docker_executor_workers,
+            docker_native_client=self.file_config.docker_native_client,
+            docker_max_connections=self.file_config.docker_max_connections,
+            container_cache_enabled=self.file_config.docker_container_cache,
+            container_cache_resync_interval=(
+                self.file_config.docker_container_cache_resync),
+            image_cache_size=self.file_config.docker_image_cache_size,
+            image_cache_ttl=self.file_config.docker_image_cache_ttl,
+            honour_healthcheck=self.file_config.docker_honour_healthcheck,
+            warm_pool_size=self.file_config.docker_warm_pool_size,
+            warm_pool_images=self.file_config.docker_warm_pool_images,
         )
 
     @default("reverse_proxy")
     def _reverse_proxy_default(self):
         """Initializes the reverse proxy connection object."""
-        # Note, we use jupyterhub orm Proxy, but not for database access,
-        # just for interface convenience.
         return ReverseProxy(
             endpoint_url=self.command_line_config.proxy_api_url,
             api_token=self.environment_config.proxy_api_token,
@@ -134,6 +167,9 @@ class BaseApplication(web.Application, LoggingMixin):
             api_token=self.environment_config.jpy_api_token,
             base_url=self.command_line_config.base_urlpath,
             hub_prefix=self.command_line_config.hub_prefix,
+            auth_cache_ttl=self.file_config.hub_auth_cache_ttl,
+            auth_cache_negative_ttl=(
+                self.file_config.hub_auth_cache_negative_ttl),
         )
 
     @default("db")
@@ -143,12 +179,29 @@ class BaseApplication(web.Application, LoggingMixin):
         module_path, _, cls_name = class_path.rpartition('.')
         cls = getattr(importlib.import_module(module_path), cls_name)
         try:
-            return cls(**self.file_config.database_kwargs)
+            db = cls(**self.file_config.database_kwargs)
         except Exception:
             reason = 'The database is not initialised properly.'
             self.log.exception(reason)
             raise web.HTTPError(reason=reason)
 
+        if self.file_config.database_cache_ttl > 0:
+            db = CachedDatabase(
+                db,
+                ttl=self.file_config.database_cache_ttl,
+                revision_interval=(
+                    self.file_config.database_revision_interval))
+
+        return db
+
+    @default("async_db")
+    def _async_db_default(self):
+        """Initializes the asynchronous access to the database."""
+        self._default_async_db = AsyncDatabase(
+            self.db,
+            max_workers=self.file_config.database_executor_workers)
+        return self._default_async_db
+
     @default("user")
     def _user_default(self):
         """Initializes the user at the database level."""
@@ -207,7 +260,52 @@ class BaseApplication(web.Application, LoggingMixin):
         self.listen(self.command_line_config.port)
 
         tornado.ioloop.IOLoop.current().run_sync(self.check_hub_version)
-        tornado.ioloop.IOLoop.current().start()
+        tornado.ioloop.IOLoop.current().run_sync(
+            self.container_manager.start_container_cache)
+        self.container_manager.start_image_cache()
+        tornado.ioloop.IOLoop.current().spawn_callback(
+            self.reconcile_reverse_proxy)
+        if self.reaper is not None:
+            self.reaper.start()
+        try:
+            tornado.ioloop.IOLoop.current().start()
+        finally:
+            if self.reaper is not None:
+                self.reaper.stop()
+            tornado.ioloop.IOLoop.current().run_sync(
+                self.container_manager.drain_warm_pool)
+            self.reverse_proxy.close()
+            # Accessing async_db here would create the executor, and the
+            # database, only to shut them down.
+            if self._default_async_db is not None:
+                self._default_async_db.shutdown(wait=False)
+
+    @gen.coroutine
+    def reconcile_reverse_proxy(self):
+        """Registers the routes of the running containers the application
+        is responsible for (see _reconcile_filters) in the reverse proxy,
+        in one pass. Needed at startup and whenever the proxy lost its
+        routing table, e.g. after a restart. Failures are logged.
+        """
+        try:
+            containers = yield self.container_manager.find_containers(
+                **self._reconcile_filters())
+            yield self.reverse_proxy.reconcile(
+                {container.urlpath: container.host_url
+                 for container in containers})
+        except Exception:
+            self.log.exception("Could not reconcile the reverse proxy")
+
+    def log_request(self, handler):
+        """Logs the request, and records its duration in the metrics"""
+        super().log_request(handler)
+
+        metrics.REQUEST_DURATION_SECONDS.labels(
+            handler=type(handler).__name__,
+            resource=self._webapi_resource_name(handler.request.path),
+            method=handler.request.method,
+            code=handler.get_status(),
+        ).observe(handler.request.request_time())
 
     @gen.coroutine
     def check_hub_version(self):
@@ -283,11 +381,35 @@ class BaseApplication(web.Application, LoggingMixin):
         Reimplement this in subclasses to export the specified endpoints"""
         return []
 
+    def _reconcile_filters(self):
+        """Return the arguments of ContainerManager.find_containers that
+        select the containers whose routes reconcile_reverse_proxy
+        registers. By default, all the containers of the realm.
+        Reimplement this in subclasses to restrict them"""
+        return {}
+
+    def _webapi_resource_name(self, path):
+        """Returns the name of the registered web API resource collection
+        the urlpath refers to, or an empty string for the other urls.
+        Unknown names are not returned, to keep the metric labels bounded."""
+        api_path = url_path_join(
+            self.command_line_config.base_urlpath, "api", "v1/")
+        if not path.startswith(api_path):
+            return ""
+
+        name = path[len(api_path):].split("/", 1)[0]
+        return name if name in self.registry else ""
+
     def _get_handlers(self):
         """Returns the registered handlers"""
         base_urlpath = self.command_line_config.base_urlpath
         # Must include callback handlers to complete OAuth flow
-        web_auth = self.hub.callback_handlers()
+        web_auth = self.hub.callback_handlers() + [
+            (url_path_join(base_urlpath, "logout"), LogoutHandler),
+            (url_path_join(base_urlpath, "metrics"), MetricsHandler)]
         web_api = self.registry.api_handlers(base_urlpath)
         web_handlers = self._web_handlers()
-        return web_auth+web_api+web_handlers
+        # The web handlers come first, so that they can add endpoints
+        # below the web api path (e.g. accounting/batch/), which would
+        # otherwise be taken as a resource identifier.
+        return web_auth+web_handlers+web_api
@@ -0,0 +1,172 @@
+import time
+from collections import OrderedDict
+
+from tornado import gen
+from tornado.concurrent import Future, chain_future
+
+
+class TTLCache:
+    """A bounded mapping whose entries expire after a given time.
+
+    When the cache is full, the least recently used entry is evicted to
+    make room for the new one. Expired entries are removed lazily, when
+    they are looked up.
+    """
+
+    def __init__(self, maxsize=128, ttl=60.0, timer=time.monotonic):
+        """Initializes the cache.
+
+        Parameters
+        ----------
+        maxsize: int
+            The maximum number of entries. If zero, nothing is stored.
+        ttl: float
+            The time (seconds) an entry is valid after being stored.
+        timer: callable
+            Returns the current time, in seconds.
+        """
+        if maxsize < 0:
+            raise ValueError("maxsize must be non-negative")
+
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+
+        #: key -> (expiry time, value), in least recently used order.
+        self._entries = OrderedDict()
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        entry = self._entries.get(key)
+        return entry is not None and entry[0] > self._timer()
+
+    def get(self, key, default=None):
+        """Returns the value associated to the key, or default if the
+        key is not present or expired."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expiry, value = entry
+            if expiry > self._timer():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+
+            del self._entries[key]
+            self.expirations += 1
+
+        self.misses += 1
+        return default
+
+    def put(self, key, value):
+        """Stores the value under the given key, replacing the current
+        one, if any."""
+        if self.maxsize == 0:
+            return
+
+        self._entries.pop(key, None)
+        while len(self._entries) >= self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+        self._entries[key] = (self._timer() + self.ttl, value)
+
+    def pop(self, key, default=None):
+        """Removes the key and returns its value, or default if the
+        key is not present. Expiration is not checked."""
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return default
+        return entry[1]
+
+    def clear(self):
+        """Removes all the entries"""
+        self._entries.clear()
+
+    def items(self):
+        """Returns the (key, value) pairs of the valid entries, without
+        affecting their recency and the counters."""
+        now = self._timer()
+        return [(key, value)
+                for key, (expiry, value) in self._entries.items()
+                if expiry > now]
+
+    def stats(self):
+        """Returns the cache counters.
+
+        Returns
+        -------
+        dict
+            size: number of entries, including the expired ones not yet
+                  removed
+            maxsize: the maximum number of entries
+            hits: lookups that found a valid entry
+            misses: lookups that did not
+            evictions: entries removed to make room for new ones
+            expirations: entries found expired
+        """
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class SingleFlight:
+    """Coalesces concurrent invocations of the same operation.
+
+    While a coroutine is running for a given key, further calls for the
+    same key do not start a new one: they get the result (or exception)
+    of the one in flight.
+    """
+
+    def __init__(self):
+        #: key -> Future of the operation in flight
+        self._in_flight = {}
+
+        #: The number of calls that joined an operation in flight.
+        self.shared = 0
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    def call(self, key, func, *args, **kwargs):
+        """Invokes the coroutine function func(*args, **kwargs), unless an
+        invocation for the same key is already in progress.
+
+        Returns
+        -------
+        A Future resolved with the result of the invocation.
+        """
+        future = Future()
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self.shared += 1
+            chain_future(in_flight, future)
+            return future
+
+        in_flight = gen.convert_yielded(func(*args, **kwargs))
+        if in_flight.done():
+            # Completed synchronously. Nothing to share.
+            chain_future(in_flight, future)
+            return future
+
+        self._in_flight[key] = in_flight
+
+        def done(_):
+            self._in_flight.pop(key, None)
+
+        in_flight.add_done_callback(done)
+        chain_future(in_flight, future)
+        return future
@@ -1,5 +1,6 @@
 #!/usr/bin/env python
 """Script to perform operations on the database of our application."""
+import csv
 import os
 import sys
 import uuid
@@ -10,7 +11,9 @@ import sqlalchemy.orm.exc
 import click
 import tabulate
 
-from remoteappmanager.db import orm
+from remoteappmanager.db import exceptions, orm
+from remoteappmanager.db.interfaces import (
+    RESOURCE_LIMITS, parse_resource_limits)
 from remoteappmanager.utils import parse_volume_string
 
 
@@ -114,6 +117,106 @@ def sqlitedb_present(db_url):
     return os.path.exists(path)
 
 
+def parse_bool(value):
+    """Converts a yes/no string from a CSV file to bool"""
+    value = value.strip().lower()
+    if value in ("1", "true", "yes", "y"):
+        return True
+    elif value in ("0", "false", "no", "n"):
+        return False
+    raise ValueError("Invalid boolean value {}".format(value))
+
+
+def resource_limit_options(func):
+    """Adds the options of the resource limits of the policy to a
+    command. They are passed as keywords named as in RESOURCE_LIMITS."""
+    options = [
+        click.option("--mem-limit", type=click.STRING,
+                     help="Memory limit of the containers, in bytes or "
+                          "with a k, m or g suffix."),
+        click.option("--cpu-shares", type=click.INT,
+                     help="CPU shares (relative weight) of the "
+                          "containers."),
+        click.option("--cpu-quota", type=click.INT,
+                     help="CPU time (microseconds) the containers can use "
+                          "every 100 milliseconds."),
+        click.option("--pids-limit", type=click.INT,
+                     help="Maximum number of processes in the "
+                          "containers."),
+        click.option("--shm-size", type=click.STRING,
+                     help="Size of /dev/shm of the containers, in bytes "
+                          "or with a k, m or g suffix."),
+    ]
+    for option in reversed(options):
+        func = option(func)
+    return func
+
+
+def format_limits(policy):
+    """Returns the resource limits of an orm.ApplicationPolicy that are
+    set, for the listings"""
+    return ",".join("{}={}".format(name, getattr(policy, name))
+                    for name in RESOURCE_LIMITS
+                    if getattr(policy, name) is not None)
+
+
+def read_grants_csv(csv_file, **defaults):
+    """Reads the accesses to grant or revoke from a CSV file, as
+    accepted by orm.grant_access_bulk.
+
+    Parameters
+    ----------
+    csv_file: file
+        A CSV file with a header. The image and user columns are
+        required. The optional app_license, allow_home, allow_view,
+        volume and allow_startup_data columns, and the columns of the
+        resource limits (see RESOURCE_LIMITS), if not empty, override
+        the defaults.
+    **defaults:
+        The policy of the rows that do not specify it.
+
+    Returns
+    -------
+    list of dict
+    """
+    reader = csv.DictReader(csv_file)
+    missing = {"image", "user"} - set(reader.fieldnames or [])
+    if missing:
+        raise click.BadParameter(
+            "Missing columns: {}".format(", ".join(sorted(missing))),
+            param_hint="--from-csv")
+
+    grants = []
+    for line, row in enumerate(reader, start=2):
+        grant = dict(defaults,
+                     app_name=row["image"].strip(),
+                     user_name=row["user"].strip())
+        try:
+            for key in ("app_license", "volume"):
+                if row.get(key):
+                    grant[key] = row[key].strip()
+
+            for key in ("allow_home", "allow_view", "allow_startup_data"):
+                if row.get(key):
+                    grant[key] = parse_bool(row[key])
+
+            if grant.get("volume") is not None:
+                parse_volume_string(grant["volume"])
+
+            limits = dict(grant.get("limits") or {})
+            for key in RESOURCE_LIMITS:
+                if row.get(key):
+                    limits[key] = row[key].strip()
+            grant["limits"] = parse_resource_limits(limits)
+        except ValueError as e:
+            raise click.BadParameter("line {}: {}".format(line, e),
+                                     param_hint="--from-csv")
+
+        grants.append(grant)
+
+    return grants
+
+
 class RemoteAppDBContext(object):
     def __init__(self, db_url):
         db_url = normalise_to_url(db_url)
@@ -224,7 +327,7 @@ def list(ctx, no_decoration, show_apps):  # noqa: F811
         if show_apps:
             headers += ["App", "License", "Home", "View", "Common",
                         "Vol. Source", "Vol. Target", "Vol. Mode",
-                        "Allow Startup Data"]
+                        "Allow Startup Data", "Limits"]
 
     session = ctx.obj.session
 
@@ -242,11 +345,12 @@ def list(ctx, no_decoration, show_apps):  # noqa: F811
                          entry.application_policy.volume_source,
                          entry.application_policy.volume_target,
                          entry.application_policy.volume_mode,
-                         entry.application_policy.allow_startup_data]
+                         entry.application_policy.allow_startup_data,
+                         format_limits(entry.application_policy)]
                         for entry in orm.accounting_for_user(session, user)]
 
                 if len(apps) == 0:
-                    apps = [['']*8]
+                    apps = [['']*10]
 
                 cur.extend(apps[0])
                 for app in apps[1:]:
@@ -341,8 +445,8 @@ def list(ctx, no_decoration):  # noqa: F811
 
 
 @app.command()
-@click.argument("image")
-@click.argument("user")
+@click.argument("image", required=False)
+@click.argument("user", required=False)
 @click.option("--app_license", type=click.STRING,
               help="Application license (if required)")
 @click.option("--allow-home",
@@ -358,20 +462,46 @@ def list(ctx, no_decoration):  # noqa: F811
               is_flag=True,
               help="Allow user to provide a file for the container to load"
                    "at startup.")
+@click.option("--from-csv", type=click.File("r"),
+              help="Grant the accesses listed in a CSV file with image "
+                   "and user columns, in one transaction, instead of "
+                   "IMAGE to USER. The app_license, allow_home, "
+                   "allow_view, volume, allow_startup_data and resource "
+                   "limit (e.g. mem_limit) columns override the options.")
+@resource_limit_options
 @click.pass_context
 def grant(ctx, image, user, app_license, allow_home, allow_view, volume,
-          allow_startup_data):
+          allow_startup_data, from_csv, **limits):
     """Grants access to application identified by IMAGE to a specific
     user USER and specified access policy."""
-    allow_common = False
-    source = target = mode = None
-
-    if volume is not None:
-        allow_common = True
+    if from_csv is not None:
+        grants = read_grants_csv(
+            from_csv,
+            app_license=app_license, allow_home=allow_home,
+            allow_view=allow_view, volume=volume,
+            allow_startup_data=allow_startup_data, limits=limits)
+        session = ctx.obj.session
         try:
-            source, target, mode = parse_volume_string(volume)
-        except ValueError as e:
-            raise click.BadOptionUsage("volume", str(e))
+            with orm.transaction(session):
+                orm.grant_access_bulk(session, grants)
+        except exceptions.NotFound as e:
+            raise click.ClickException(str(e))
+        return
+
+    if image is None or user is None:
+        raise click.UsageError("IMAGE and USER are required, "
+                               "unless --from-csv is given")
+
+    try:
+        limits = parse_resource_limits(limits)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    try:
+        fields = orm.policy_fields(app_license, allow_home, allow_view,
+                                   volume, allow_startup_data, limits)
+    except ValueError as e:
+        raise click.BadOptionUsage("volume", str(e))
 
     session = ctx.obj.session
     with orm.transaction(session):
@@ -389,28 +519,10 @@ def grant(ctx, image, user, app_license, allow_home, allow_view, volume,
             raise click.BadParameter("Unknown user {}".format(user),
                                      param_hint="user")
 
-        orm_policy = session.query(orm.ApplicationPolicy).filter(
-            orm.ApplicationPolicy.app_license == app_license,
-            orm.ApplicationPolicy.allow_home == allow_home,
-            orm.ApplicationPolicy.allow_common == allow_common,
-            orm.ApplicationPolicy.allow_view == allow_view,
-            orm.ApplicationPolicy.volume_source == source,
-            orm.ApplicationPolicy.volume_target == target,
-            orm.ApplicationPolicy.volume_mode == mode,
-            orm.ApplicationPolicy.allow_startup_data == allow_startup_data
-        ).one_or_none()
+        orm_policy = orm.find_policy(session, fields)
 
         if orm_policy is None:
-            orm_policy = orm.ApplicationPolicy(
-                app_license=app_license,
-                allow_home=allow_home,
-                allow_common=allow_common,
-                allow_view=allow_view,
-                volume_source=source,
-                volume_target=target,
-                volume_mode=mode,
-                allow_startup_data=allow_startup_data,
-            )
+            orm_policy = orm.ApplicationPolicy(**fields)
             session.add(orm_policy)
 
         # Check if we already have the entry
@@ -432,8 +544,8 @@ def grant(ctx, image, user, app_license, allow_home, allow_view, volume,
 
 
 @app.command()
-@click.argument("image")
-@click.argument("user")
+@click.argument("image", required=False)
+@click.argument("user", required=False)
 @click.option("--revoke-all",
               is_flag=True,
               help="revoke all grants for that specific user and application, "
@@ -454,21 +566,49 @@ def grant(ctx, image, user, app_license, allow_home, allow_view, volume,
               is_flag=True,
               help="Allow user to provide a file for the container to load"
                    "at startup.")
+@click.option("--from-csv", type=click.File("r"),
+              help="Revoke the accesses listed in a CSV file, in one "
+                   "transaction, instead of IMAGE to USER. Same format "
+                   "as for grant.")
+@resource_limit_options
 @click.pass_context
 def revoke(
         ctx, image, user, revoke_all, app_license,
-        allow_home, allow_view, volume, allow_startup_data):
+        allow_home, allow_view, volume, allow_startup_data, from_csv,
+        **limits):
     """Revokes access to application identified by IMAGE to a specific
     user USER and specified parameters."""
-    allow_common = False
-    source = target = mode = None
-
-    if volume is not None:
-        allow_common = True
+    if from_csv is not None:
+        if revoke_all:
+            raise click.UsageError("--revoke-all cannot be used "
+                                   "with --from-csv")
+        grants = read_grants_csv(
+            from_csv,
+            app_license=app_license, allow_home=allow_home,
+            allow_view=allow_view, volume=volume,
+            allow_startup_data=allow_startup_data, limits=limits)
+        session = ctx.obj.session
         try:
-            source, target, mode = parse_volume_string(volume)
-        except ValueError as e:
-            raise click.BadOptionUsage("volume", str(e))
+            with orm.transaction(session):
+                orm.revoke_access_bulk(session, grants)
+        except exceptions.NotFound as e:
+            raise click.ClickException(str(e))
+        return
+
+    if image is None or user is None:
+        raise click.UsageError("IMAGE and USER are required, "
+                               "unless --from-csv is given")
+
+    try:
+        limits = parse_resource_limits(limits)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+    try:
+        fields = orm.policy_fields(app_license, allow_home, allow_view,
+                                   volume, allow_startup_data, limits)
+    except ValueError as e:
+        raise click.BadOptionUsage("volume", str(e))
 
     session = ctx.obj.session
     with orm.transaction(session):
@@ -485,16 +625,10 @@ def revoke(
                 ).delete()
 
         else:
-            orm_policy = session.query(orm.ApplicationPolicy).filter(
-                orm.ApplicationPolicy.app_license == app_license,
-                orm.ApplicationPolicy.allow_home == allow_home,
-                orm.ApplicationPolicy.allow_common == allow_common,
-                orm.ApplicationPolicy.allow_view == allow_view,
-                orm.ApplicationPolicy.volume_source == source,
-                orm.ApplicationPolicy.volume_target == target,
-                orm.ApplicationPolicy.volume_mode == mode,
-                orm.ApplicationPolicy.allow_startup_data == allow_startup_data
-            ).one()
+            orm_policy = orm.find_policy(session, fields)
+
+            if orm_policy is None:
+                raise click.BadParameter("No grant with the given policy")
 
             session.query(orm.Accounting).filter(
                 orm.Accounting.application == orm_app,
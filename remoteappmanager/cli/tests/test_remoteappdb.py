@@ -111,6 +111,40 @@ class TestRemoteAppDbCLI(TempMixin, TestCase):
         self.assertIn(" ro", out)
         self.assertIn("1\n", out)
 
+    def test_app_grant_revoke_resource_limits(self):
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("user create user")
+
+        exit_code, _ = self._remoteappdb("app grant myapp user "
+                                         "--mem-limit=512m "
+                                         "--pids-limit=100")
+        self.assertEqual(exit_code, 0)
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertIn("mem_limit=536870912,pids_limit=100", out)
+
+        exit_code, _ = self._remoteappdb("app grant myapp user "
+                                         "--mem-limit=lots")
+        self.assertNotEqual(exit_code, 0)
+
+        self._remoteappdb("app grant myapp user")
+        self._remoteappdb("app revoke myapp user "
+                          "--mem-limit=536870912 "
+                          "--pids-limit=100")
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertEqual(len(out.split('\n')), 2)
+        self.assertNotIn("mem_limit", out)
+
+        csv_path = os.path.join(self.tempdir, "grants.csv")
+        with open(csv_path, "w") as f:
+            f.write("image,user,shm_size\n"
+                    "myapp,user,1g\n")
+
+        exit_code, _ = self._remoteappdb(
+            "app grant --cpu-shares=512 --from-csv " + csv_path)
+        self.assertEqual(exit_code, 0)
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertIn("cpu_shares=512,shm_size=1073741824", out)
+
     def test_app_revoke(self):
         self._remoteappdb("app create myapp --no-verify")
         self._remoteappdb("user create user")
@@ -143,6 +177,73 @@ class TestRemoteAppDbCLI(TempMixin, TestCase):
         self.assertIn("frobniz", out)
         self.assertIn("froble", out)
 
+    def test_app_grant_revoke_from_csv(self):
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("app create otherapp --no-verify")
+        self._remoteappdb("user create user1")
+        self._remoteappdb("user create user2")
+
+        csv_path = os.path.join(self.tempdir, "grants.csv")
+        with open(csv_path, "w") as f:
+            f.write("image,user,allow_home,volume\n"
+                    "myapp,user1,,\n"
+                    "myapp,user2,yes,frobniz:froble:ro\n"
+                    "otherapp,user2,,\n")
+
+        exit_code, _ = self._remoteappdb(
+            "app grant --allow-view --from-csv " + csv_path)
+        self.assertEqual(exit_code, 0)
+
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertEqual(len(out.split('\n')), 4)
+        self.assertIn("otherapp", out)
+        self.assertIn("frobniz", out)
+
+        with open(csv_path, "w") as f:
+            f.write("image,user\n"
+                    "myapp,user1\n"
+                    "otherapp,user2\n")
+
+        exit_code, _ = self._remoteappdb(
+            "app revoke --allow-view --from-csv " + csv_path)
+        self.assertEqual(exit_code, 0)
+
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertEqual(len(out.split('\n')), 3)
+        self.assertNotIn("otherapp", out)
+        self.assertIn("frobniz", out)
+
+    def test_app_grant_from_csv_errors(self):
+        self._remoteappdb("app create myapp --no-verify")
+        self._remoteappdb("user create user1")
+
+        csv_path = os.path.join(self.tempdir, "grants.csv")
+        with open(csv_path, "w") as f:
+            f.write("image,user\n"
+                    "myapp,user1\n"
+                    "myapp,unknown\n")
+
+        exit_code, out = self._remoteappdb(
+            "app grant --from-csv " + csv_path)
+        self.assertNotEqual(exit_code, 0)
+        self.assertIn("unknown", out)
+
+        # Nothing was granted
+        _, out = self._remoteappdb("user list --show-apps --no-decoration")
+        self.assertNotIn("myapp", out)
+
+        with open(csv_path, "w") as f:
+            f.write("image,user,allow_home\n"
+                    "myapp,user1,maybe\n")
+
+        exit_code, out = self._remoteappdb(
+            "app grant --from-csv " + csv_path)
+        self.assertNotEqual(exit_code, 0)
+        self.assertIn("line 2", out)
+
+        exit_code, _ = self._remoteappdb("app grant myapp")
+        self.assertNotEqual(exit_code, 0)
+
     def test_delete_user_cascade(self):
         """ Test if deleting user cascade to deleting accounting rows
         """
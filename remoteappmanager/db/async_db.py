@@ -0,0 +1,93 @@
+import functools
+import time
+
+from remoteappmanager import metrics
+from remoteappmanager.db.interfaces import ABCDatabase
+from remoteappmanager.executor import InstrumentedExecutor
+
+#: The methods of the database interface that are exported.
+DATABASE_METHODS = frozenset(
+    name for name in dir(ABCDatabase)
+    if not name.startswith("_") and callable(getattr(ABCDatabase, name)))
+
+
+class AsyncDatabase:
+    """Provides an asynchronous interface to an ABCDatabase.
+
+    All the ABCDatabase methods are available as methods returning a
+    future instead of the actual result. They are executed by a bounded
+    pool of threads, so that a slow database (e.g. a locked sqlite file
+    or a remote server) does not stall the event loop. The resulting
+    future can be yielded.
+    """
+
+    def __init__(self, database, max_workers=1):
+        """Initialises the async database.
+
+        Parameters
+        ----------
+        database: ABCDatabase
+            The wrapped database. It must be usable from the worker
+            threads.
+        max_workers: int
+            The number of threads of the executor.
+        """
+        #: The wrapped database. It can be replaced at any time, and
+        #: the following requests will be routed to the new database.
+        self.database = database
+
+        self._executor = InstrumentedExecutor(max_workers, name="db")
+
+    def __getattr__(self, attr):
+        """Returns the database method, wrapped in an async execution
+        environment. The returned method must be used in conjunction with
+        the yield keyword."""
+        if attr in DATABASE_METHODS:
+            return functools.partial(self._submit_to_executor, attr)
+        else:
+            raise AttributeError(
+                "'{}' object has no attribute '{}'".format(
+                    type(self).__name__,
+                    attr))
+
+    def executor_stats(self):
+        """Returns the queue statistics of the executor, as returned by
+        InstrumentedExecutor.stats()"""
+        return self._executor.stats()
+
+    def shutdown(self, wait=True):
+        """Shuts down the executor. The requests already submitted are
+        completed."""
+        self._executor.shutdown(wait=wait)
+
+    # Private
+
+    def _submit_to_executor(self, method, *args, **kwargs):
+        """Call a synchronous database method in a worker thread.
+
+        Parameters
+        ----------
+
+        method : string
+            The name of the database method
+        *args, *kwargs:
+            Arguments to the invoked method
+
+        Return
+        ------
+
+        A future from the executor.
+        """
+        return self._executor.submit(self._invoke, method, *args, **kwargs)
+
+    def _invoke(self, method, *args, **kwargs):
+        """wrapper for calling database methods to be passed to
+        the executor.
+        """
+        m = getattr(self.database, method)
+        start = time.monotonic()
+        try:
+            return m(*args, **kwargs)
+        finally:
+            metrics.DATABASE_QUERY_DURATION_SECONDS.labels(
+                method=method).observe(time.monotonic() - start)
@@ -0,0 +1,259 @@
+import threading
+import time
+
+from remoteappmanager.cache import TTLCache
+from remoteappmanager.db.interfaces import ABCDatabase
+from remoteappmanager.utils import mergedocs, one
+
+#: Stands for a cached None result
+_NONE = object()
+
+
+@mergedocs(ABCDatabase)
+class CachedDatabase(ABCDatabase):
+    """Read-through cache around another database.
+
+    The users, the accountings of each user, and the lists of users and
+    applications are kept in memory for a limited time. The writes
+    performed through this object invalidate the affected entries.
+    Changes performed by other processes are detected with the revision
+    of the wrapped database, checked at most every revision_interval
+    seconds. If the wrapped database has no revision, changes performed
+    by other processes are seen only when the entries expire.
+
+    It is safe to use from multiple threads.
+    """
+
+    def __init__(self, database, ttl=60.0, revision_interval=1.0,
+                 maxsize=1024, timer=time.monotonic):
+        """Initializes the cache.
+
+        Parameters
+        ----------
+        database : ABCDatabase
+            The wrapped database
+        ttl : float
+            The time (seconds) an entry is kept.
+        revision_interval : float
+            The minimum time (seconds) between two checks of the revision
+            of the wrapped database.
+        maxsize : int
+            The maximum number of users, and of accountings, kept.
+        timer : callable
+            Returns the current time, in seconds.
+        """
+        self.database = database
+        self.revision_interval = revision_interval
+        self._timer = timer
+
+        self._lock = threading.RLock()
+
+        #: ("name", user_name) or ("id", id) -> user
+        self._users = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+
+        #: user name -> list of accountings
+        self._accountings = TTLCache(maxsize=maxsize, ttl=ttl, timer=timer)
+
+        #: "users" or "applications" -> list
+        self._lists = TTLCache(maxsize=2, ttl=ttl, timer=timer)
+
+        #: Incremented at every invalidation. A result read from the
+        #: wrapped database is stored only if no invalidation happened
+        #: in the meantime, as it may be stale.
+        self._generation = 0
+
+        self._revision = None
+        self._revision_checked = None
+
+    def get_user(self, *, user_name=None, id=None):
+        if not one([user_name, id]):
+            raise ValueError("Strictly one argument allowed")
+
+        key = ("name", user_name) if user_name is not None else ("id", id)
+
+        return self._read_through(
+            self._users, key,
+            lambda: self.database.get_user(user_name=user_name, id=id))
+
+    def get_accounting_for_user(self, user):
+        if user is None:
+            return []
+
+        return list(self._read_through(
+            self._accountings, user.name,
+            lambda: self.database.get_accounting_for_user(user)))
+
+    def create_user(self, user_name):
+        try:
+            return self.database.create_user(user_name)
+        finally:
+            self._invalidate_users()
+
+    def remove_user(self, *, user_name=None, id=None):
+        try:
+            self.database.remove_user(user_name=user_name, id=id)
+        finally:
+            with self._lock:
+                if user_name is not None:
+                    self._accountings.pop(user_name)
+                else:
+                    self._accountings.clear()
+                self._invalidate_users()
+
+    def list_users(self):
+        return list(self._read_through(
+            self._lists, "users", self.database.list_users))
+
+    def create_application(self, app_name):
+        try:
+            return self.database.create_application(app_name)
+        finally:
+            self._invalidate(self._lists, "applications")
+
+    def remove_application(self, *, app_name=None, id=None):
+        try:
+            self.database.remove_application(app_name=app_name, id=id)
+        finally:
+            # The accountings of the application are removed as well.
+            with self._lock:
+                self._lists.pop("applications")
+                self._accountings.clear()
+                self._generation += 1
+
+    def list_applications(self):
+        return list(self._read_through(
+            self._lists, "applications", self.database.list_applications))
+
+    def grant_access(self, app_name, user_name, app_license,
+                     allow_home, allow_view, volume, allow_startup_data,
+                     limits=None):
+        try:
+            return self.database.grant_access(
+                app_name, user_name, app_license,
+                allow_home, allow_view, volume, allow_startup_data,
+                limits)
+        finally:
+            self._invalidate(self._accountings, user_name)
+
+    def revoke_access(self, app_name, user_name, app_license,
+                      allow_home, allow_view, volume, allow_startup_data,
+                      limits=None):
+        try:
+            self.database.revoke_access(
+                app_name, user_name, app_license,
+                allow_home, allow_view, volume, allow_startup_data,
+                limits)
+        finally:
+            self._invalidate(self._accountings, user_name)
+
+    def revoke_access_by_id(self, mapping_id):
+        try:
+            self.database.revoke_access_by_id(mapping_id)
+        finally:
+            with self._lock:
+                # Only the users whose cached accountings have the
+                # mapping are affected.
+                for user_name, accountings in self._accountings.items():
+                    if any(acc.id == mapping_id for acc in accountings):
+                        self._accountings.pop(user_name)
+                self._generation += 1
+
+    def grant_access_bulk(self, grants):
+        grants = list(grants)
+        try:
+            return self.database.grant_access_bulk(grants)
+        finally:
+            self._invalidate_accountings(grants)
+
+    def revoke_access_bulk(self, grants):
+        grants = list(grants)
+        try:
+            self.database.revoke_access_bulk(grants)
+        finally:
+            self._invalidate_accountings(grants)
+
+    def get_revision(self):
+        return self.database.get_revision()
+
+    def clear(self):
+        """Removes all the cached entries"""
+        with self._lock:
+            self._users.clear()
+            self._accountings.clear()
+            self._lists.clear()
+            self._generation += 1
+
+    def stats(self):
+        """Returns the cache counters.
+
+        Returns
+        -------
+        dict
+            users, accountings, lists: the counters of each cache
+            revision: the last revision seen
+        """
+        with self._lock:
+            return {
+                "users": self._users.stats(),
+                "accountings": self._accountings.stats(),
+                "lists": self._lists.stats(),
+                "revision": self._revision,
+            }
+
+    # Private
+
+    def _read_through(self, cache, key, read):
+        """Returns the cached value for key, or reads it from the
+        wrapped database with read() and caches it."""
+        self._check_revision()
+
+        with self._lock:
+            value = cache.get(key)
+            generation = self._generation
+
+        if value is None:
+            value = read()
+            with self._lock:
+                if generation == self._generation:
+                    cache.put(key, _NONE if value is None else value)
+        elif value is _NONE:
+            value = None
+
+        return value
+
+    def _check_revision(self):
+        """Clears the cache if the wrapped database changed since the
+        last check. Checks at most every revision_interval seconds."""
+        now = self._timer()
+        with self._lock:
+            if (self._revision_checked is not None and
+                    now - self._revision_checked < self.revision_interval):
+                return
+            self._revision_checked = now
+
+        revision = self.database.get_revision()
+
+        with self._lock:
+            if revision != self._revision:
+                self._revision = revision
+                self._users.clear()
+                self._accountings.clear()
+                self._lists.clear()
+                self._generation += 1
+
+    def _invalidate(self, cache, key):
+        with self._lock:
+            cache.pop(key)
+            self._generation += 1
+
+    def _invalidate_accountings(self, grants):
+        with self._lock:
+            for user_name in {grant["user_name"] for grant in grants}:
+                self._accountings.pop(user_name)
+            self._generation += 1
+
+    def _invalidate_users(self):
+        with self._lock:
+            self._users.clear()
+            self._lists.pop("users")
+            self._generation += 1
@@ -36,6 +36,24 @@ policy.volume_mode (str)
    Mode for read/write access ('ro' - read-only, 'rw' - read-write).
    If undefined, common data volume is not available
 
+These headers are optional. They limit the resources of the containers.
+If missing or empty, the defaults of the configuration apply.
+
+policy.mem_limit (str)
+    Memory limit, in bytes or with a k, m or g suffix (e.g. 512m).
+
+policy.cpu_shares (int)
+    CPU shares, relative to the other containers (docker default 1024).
+
+policy.cpu_quota (int)
+    CPU time (microseconds) per 100 ms period (e.g. 50000 for half a CPU).
+
+policy.pids_limit (int)
+    Maximum number of processes.
+
+policy.shm_size (str)
+    Size of /dev/shm, in bytes or with a k, m or g suffix.
+
 Note
 ----
 
@@ -43,14 +61,22 @@ Note
 - This reader does not try to eliminate duplicated application and policy
   record for a given user.  It faithfully reads the CSV file and returns
   what it says.
+- The accounting ids are derived from the content of the rows. They do not
+  change when the file is loaded again, as long as the row is unchanged.
 
 """
 
+import array
 import csv
+import json
+import os
+import threading
+import time
 import uuid
 
 from remoteappmanager.db.interfaces import (
-    ABCDatabase, ABCApplication, ABCApplicationPolicy, ABCAccounting)
+    ABCDatabase, ABCApplication, ABCApplicationPolicy, ABCAccounting,
+    RESOURCE_LIMITS, parse_resource_limits)
 from remoteappmanager.db.exceptions import UnsupportedOperation
 from remoteappmanager.utils import mergedocs, one
 
@@ -88,14 +114,77 @@ _HEADERS = ('user.name',
             'policy.volume_mode',
             'policy.allow_startup_data')
 
+# Optional headers of the CSV files, in the order of RESOURCE_LIMITS
+_LIMIT_HEADERS = tuple('policy.' + name for name in RESOURCE_LIMITS)
+
+#: Namespace of the accounting ids
+_ACCOUNTING_NAMESPACE = uuid.UUID("5b0e7c3c-62a4-4b2b-9a55-0c6f1e9d3a10")
+
+
+def accounting_id(user_name, image, policy_key, occurrence=0):
+    """Returns the id of an accounting of the CSV file.
+
+    The id is derived from the content of the row, so it does not change
+    when the file is loaded again, or when other rows are added or
+    removed.
+
+    Parameters
+    ----------
+    user_name : str
+        The user name
+    image : str
+        The image of the application
+    policy_key : tuple
+        The values of the policy, in the order of the policy headers
+    occurrence : int
+        The number of identical rows of the same user above this one.
+
+    Returns
+    -------
+    str
+        32 hexadecimal digits, like the ids of the other databases.
+    """
+    content = json.dumps([user_name, image, list(policy_key), occurrence])
+    return uuid.uuid5(_ACCOUNTING_NAMESPACE, content).hex
+
+
+class _Index:
+    """The content of a CSV file, in compact form.
+
+    The applications and the policies are stored once, and the rows of
+    each user are an array of (application id, policy position) pairs.
+    The accounting objects of a user are created at the first request.
+    """
+
+    def __init__(self):
+        #: user name -> CSVUser
+        self.users = {}
+
+        #: user id -> CSVUser
+        self.users_by_id = {}
+
+        #: image -> CSVApplication, only those present in the file
+        self.applications = {}
+
+        #: user name -> array of application id, policy position pairs
+        self.rows = {}
+
+        #: user name -> list of CSVAccounting, filled on request
+        self.accountings = {}
+
 
 @mergedocs(ABCDatabase)
 class CSVDatabase(ABCDatabase):
     """ Database class that reads a CSV file and is used by the
     remoteappmanager.  Currently only accepts one csv file.
+
+    The file is loaded again when it is modified, checked at most every
+    reload_interval seconds. The users whose rows did not change keep
+    their accounting objects. If the modified file cannot be read, the
+    previous content is kept.
     """
 
-    def __init__(self, csv_file_path, **kwargs):
+    def __init__(self, csv_file_path, reload_interval=1.0, **kwargs):
         """ Initialiser
 
         Parameters
@@ -103,112 +192,76 @@ class CSVDatabase(ABCDatabase):
         csv_file_path : str
             File path for the CSV file
 
+        reload_interval : float or None
+            The minimum time (seconds) between two checks for changes of
+            the file. None disables the reload.
+
         **kwargs
             optional keyword arguments for open(csv_file_path)
         """
         self.csv_file_path = csv_file_path
-
-        # Let's keep everything in memory for now
-        self.all_records = {}
-        self.users = {}
-        self.users_by_id = {}
-        self.applications = {}
-        self.application_policies = {}
-
-        with open(self.csv_file_path, **kwargs) as csv_file:
-            reader = csv.reader(csv_file)
-
-            # Validate the headers
-            headers = next(reader)
-            missing_headers = set(_HEADERS) - set(headers)
-            if missing_headers:
-                msg = ("Expect the first row to contain headers. "
-                       "Missing headers: {}")
-                raise ValueError(msg.format(", ".join(missing_headers)))
-
-            # Map indices for the columns
-            indices = dict(zip(_HEADERS,
-                               (headers.index(header) for header in _HEADERS)))
-
-            for count, record in enumerate(reader):
-                user_name = record[indices['user.name']]
-                user = self.users.get(user_name)
-
-                if user is None:
-                    id = len(self.users)
-                    user = CSVUser(id=id, name=user_name)
-                    self.users[user_name] = user
-                    self.users_by_id[id] = user
-
-                image = record[indices['application.image']]
-                application = self.applications.setdefault(
-                    image,
-                    CSVApplication(
-                        id=len(self.applications),
-                        image=image
-                    )
-                )
-                app_license = (
-                    record[indices['policy.app_license']] or None)
-                allow_home = record[indices['policy.allow_home']] == '1'
-                allow_view = record[indices['policy.allow_view']] == '1'
-                allow_common = record[indices['policy.allow_common']] == '1'
-                volume_source = (record[indices['policy.volume_source']] or
-                                 None)
-                volume_target = (record[indices['policy.volume_target']] or
-                                 None)
-                volume_mode = (record[indices['policy.volume_mode']] or
-                               None)
-                allow_startup_data = record[
-                                         indices['policy.allow_startup_data']
-                                     ] == '1'
-
-                application_policy = self.application_policies.setdefault(
-                    (app_license,
-                     allow_home,
-                     allow_view,
-                     allow_common,
-                     volume_source,
-                     volume_target,
-                     volume_mode,
-                     allow_startup_data),
-                    CSVApplicationPolicy(
-                        app_license=app_license,
-                        allow_home=allow_home,
-                        allow_view=allow_view,
-                        allow_common=allow_common,
-                        volume_source=volume_source,
-                        volume_target=volume_target,
-                        volume_mode=volume_mode,
-                        allow_startup_data=allow_startup_data))
-
-                # Save the configuration
-                # Note that we don't filter existing duplicate entry
-                self.all_records.setdefault(user.name, []).append(
-                    CSVAccounting(
-                        id=uuid.uuid4().hex,
-                        user=user,
-                        application=application,
-                        application_policy=application_policy)
-                )
+        self.reload_interval = reload_interval
+        self._open_kwargs = kwargs
+
+        self._lock = threading.Lock()
+
+        # The ids are kept across the reloads. The applications and the
+        # policies of a reload are mostly the ones already known, so
+        # they are never removed from these registries.
+        self._next_user_id = 0
+        self._applications_by_id = {}
+        self._policies = []
+        self._policy_positions = {}
+
+        self._revision = 0
+        self._checked = None
+        self._stat = self._file_stat()
+        self._index = self._load(_Index())
+
+    @property
+    def users(self):
+        """Dictionary of user name -> CSVUser"""
+        return self._index.users
+
+    @property
+    def users_by_id(self):
+        """Dictionary of user id -> CSVUser"""
+        return self._index.users_by_id
+
+    @property
+    def applications(self):
+        """Dictionary of image -> CSVApplication"""
+        return self._index.applications
 
     def get_user(self, *, user_name=None, id=None):
         if not one([user_name, id]):
             raise ValueError("Strictly one argument allowed")
 
+        index = self._current_index()
         if user_name is not None:
-            return self.users.get(user_name)
+            return index.users.get(user_name)
         elif id is not None:
-            return self.users_by_id.get(id)
+            return index.users_by_id.get(id)
         else:
             raise RuntimeError("Impossible condition")  # pragma: no cover
 
     def get_accounting_for_user(self, user):
-        if user is not None:
-            return self.all_records.get(user.name, [])
-        else:
+        if user is None:
             return []
 
+        index = self._current_index()
+        accountings = index.accountings.get(user.name)
+        if accountings is None:
+            # A reload reads the cached entries, and the registries,
+            # under the lock.
+            with self._lock:
+                accountings = index.accountings.get(user.name)
+                if accountings is None:
+                    accountings = self._make_accountings(index, user.name)
+                    index.accountings[user.name] = accountings
+
+        return list(accountings)
+
     def create_user(self, user_name):
         raise UnsupportedOperation()
 
@@ -216,7 +269,7 @@ class CSVDatabase(ABCDatabase):
         raise UnsupportedOperation()
 
     def list_users(self):
-        return list(self.users.values())
+        return list(self._current_index().users.values())
 
     def create_application(self, app_name):
         raise UnsupportedOperation()
@@ -225,15 +278,244 @@ class CSVDatabase(ABCDatabase):
         raise UnsupportedOperation()
 
     def list_applications(self):
-        return list(self.applications.values())
+        return list(self._current_index().applications.values())
 
     def grant_access(self, app_name, user_name, app_license,
-                     allow_home, allow_view, volume, allow_startup_data):
+                     allow_home, allow_view, volume, allow_startup_data,
+                     limits=None):
         raise UnsupportedOperation()
 
     def revoke_access(self, app_name, user_name, app_license,
-                      allow_home, allow_view, volume, allow_startup_data):
+                      allow_home, allow_view, volume, allow_startup_data,
+                      limits=None):
         raise UnsupportedOperation()
 
     def revoke_access_by_id(self, mapping_id):
         raise UnsupportedOperation()
+
+    def get_revision(self):
+        self._current_index()
+        return self._revision
+
+    def reload(self):
+        """Loads the file again, and replaces the current content.
+
+        Returns
+        -------
+        dict
+            "added", "removed", "changed": the sets of the names of the
+            users added, removed, or whose rows changed.
+
+        Raises
+        ------
+        ValueError
+            If the file has not the required headers, or a row is
+            incomplete. The current content is kept.
+        OSError
+            If the file cannot be read. The current content is kept.
+        """
+        with self._lock:
+            self._checked = time.monotonic()
+            return self._reload()
+
+    # Private
+
+    def _current_index(self):
+        """Returns the current content, loading the file again if it
+        changed since the last check."""
+        if self.reload_interval is None:
+            return self._index
+
+        now = time.monotonic()
+        if (self._checked is not None and
+                now - self._checked < self.reload_interval):
+            return self._index
+
+        with self._lock:
+            if (self._checked is None or
+                    now - self._checked >= self.reload_interval):
+                self._checked = now
+                try:
+                    if self._file_stat() != self._stat:
+                        self._reload()
+                except (OSError, ValueError, csv.Error):
+                    # Likely in the middle of a rewrite. We keep what we
+                    # have and try again at the next modification.
+                    pass
+
+        return self._index
+
+    def _reload(self):
+        """Loads the file, and replaces the current index if the content
+        changed. Returns the differences, see reload()"""
+        self._stat = self._file_stat()
+        old = self._index
+        new = self._load(old)
+
+        added = new.rows.keys() - old.rows.keys()
+        removed = old.rows.keys() - new.rows.keys()
+        changed = set()
+        for user_name, rows in new.rows.items():
+            old_rows = old.rows.get(user_name)
+            if old_rows is None:
+                continue
+            if old_rows != rows:
+                changed.add(user_name)
+            elif user_name in old.accountings:
+                new.accountings[user_name] = old.accountings[user_name]
+
+        if (added or removed or changed or
+                new.applications.keys() != old.applications.keys()):
+            self._index = new
+            self._revision += 1
+
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def _file_stat(self):
+        stat = os.stat(self.csv_file_path)
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _load(self, previous):
+        """Reads the file into a new _Index, one row at a time.
+
+        The users of the previous index keep their ids."""
+        index = _Index()
+        users = index.users
+        rows = index.rows
+
+        applications = {}
+        for application in previous.applications.values():
+            applications[application.image] = application
+        applications_by_id = dict(self._applications_by_id)
+        policies = list(self._policies)
+        policy_positions = dict(self._policy_positions)
+        next_user_id = self._next_user_id
+
+        with open(self.csv_file_path, **self._open_kwargs) as csv_file:
+            reader = csv.reader(csv_file)
+
+            # Validate the headers
+            headers = next(reader, [])
+            missing_headers = set(_HEADERS) - set(headers)
+            if missing_headers:
+                msg = ("Expect the first row to contain headers. "
+                       "Missing headers: {}")
+                raise ValueError(msg.format(", ".join(missing_headers)))
+
+            # Map indices for the columns
+            (user_col, image_col, license_col, home_col, view_col,
+             common_col, source_col, target_col, mode_col,
+             startup_col) = (headers.index(header) for header in _HEADERS)
+            limit_cols = {name: headers.index(header)
+                          for name, header in zip(RESOURCE_LIMITS,
+                                                  _LIMIT_HEADERS)
+                          if header in headers}
+            min_length = max([user_col, image_col, license_col, home_col,
+                              view_col, common_col, source_col, target_col,
+                              mode_col, startup_col] +
+                             list(limit_cols.values())) + 1
+
+            for record in reader:
+                if len(record) < min_length:
+                    # E.g. the last row of a file being written
+                    msg = "Row {} has {} columns, expected at least {}"
+                    raise ValueError(msg.format(
+                        reader.line_num, len(record), min_length))
+
+                user_name = record[user_col]
+                user_rows = rows.get(user_name)
+                if user_rows is None:
+                    user = previous.users.get(user_name)
+                    if user is None:
+                        user = CSVUser(id=next_user_id, name=user_name)
+                        next_user_id += 1
+                    users[user_name] = user
+                    index.users_by_id[user.id] = user
+                    user_rows = rows[user_name] = array.array("I")
+
+                image = record[image_col]
+                application = index.applications.get(image)
+                if application is None:
+                    application = applications.get(image)
+                    if application is None:
+                        application = CSVApplication(
+                            id=len(applications_by_id), image=image)
+                        applications[image] = application
+                        applications_by_id[application.id] = application
+                    index.applications[image] = application
+
+                policy_key = (record[license_col] or None,
+                              record[home_col] == '1',
+                              record[view_col] == '1',
+                              record[common_col] == '1',
+                              record[source_col] or None,
+                              record[target_col] or None,
+                              record[mode_col] or None,
+                              record[startup_col] == '1')
+                if limit_cols:
+                    limits = parse_resource_limits(
+                        {name: record[col]
+                         for name, col in limit_cols.items()})
+                    policy_key += tuple(limits[name]
+                                        for name in RESOURCE_LIMITS)
+                position = policy_positions.get(policy_key)
+                if position is None:
+                    position = policy_positions[policy_key] = len(policies)
+                    policies.append(CSVApplicationPolicy(*policy_key))
+
+                # Note that we don't filter existing duplicate entry
+                user_rows.append(application.id)
+                user_rows.append(position)
+
+        # Only now that the file has been read completely.
+        self._next_user_id = next_user_id
+        self._applications_by_id = applications_by_id
+        self._policies = policies
+        self._policy_positions = policy_positions
+
+        return index
+
+    def _make_accountings(self, index, user_name):
+        """Creates the accounting objects of a user from the compact
+        rows of the index"""
+        user = index.users.get(user_name)
+        rows = index.rows.get(user_name)
+        if user is None or rows is None:
+            return []
+
+        accountings = []
+        occurrences = {}
+        for app_id, position in zip(rows[::2], rows[1::2]):
+            occurrence = occurrences.get((app_id, position), 0)
+            occurrences[(app_id, position)] = occurrence + 1
+
+            application = self._applications_by_id[app_id]
+            policy = self._policies[position]
+            policy_key = self._policy_key(policy)
+            accountings.append(CSVAccounting(
+                id=accounting_id(user_name, application.image, policy_key,
+                                 occurrence),
+                user=user,
+                application=application,
+                application_policy=policy))
+
+        return accountings
+
+    @staticmethod
+    def _policy_key(policy):
+        key = (policy.app_license,
+               policy.allow_home,
+               policy.allow_view,
+               policy.allow_common,
+               policy.volume_source,
+               policy.volume_target,
+               policy.volume_mode,
+               policy.allow_startup_data)
+
+        # The rows without limits keep the ids they had before the
+        # limits were introduced.
+        limits = policy.resource_limits()
+        if limits:
+            key += tuple(limits.get(name) for name in RESOURCE_LIMITS)
+
+        return key
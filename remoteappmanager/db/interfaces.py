@@ -1,6 +1,8 @@
 from abc import ABCMeta, abstractmethod
 import inspect as _inspect
 
+from remoteappmanager.utils import parse_size_string
+
 
 class ABCApplication(metaclass=ABCMeta):
     """ Description of an application """
@@ -21,13 +23,64 @@ class ABCApplication(metaclass=ABCMeta):
                            for arg in args))
 
 
+#: The names of the resource limits of the containers of an application.
+#: See ABCApplicationPolicy.
+RESOURCE_LIMITS = (
+    "mem_limit",
+    "cpu_shares",
+    "cpu_quota",
+    "pids_limit",
+    "shm_size",
+)
+
+
+def parse_resource_limits(limits):
+    """Returns the normalized values of the limits argument of
+    ABCDatabase.grant_access, as a dict with all the RESOURCE_LIMITS.
+    The sizes are in bytes. Empty and zero limits are None (no limit).
+
+    Raises
+    ------
+    ValueError:
+        if a limit is unknown or invalid.
+    """
+    limits = dict(limits or {})
+    unknown = set(limits) - set(RESOURCE_LIMITS)
+    if unknown:
+        raise ValueError("Unknown resource limits: {}".format(
+            ", ".join(sorted(unknown))))
+
+    result = {}
+    for name in RESOURCE_LIMITS:
+        value = limits.get(name)
+        if value is None or value == "":
+            result[name] = None
+            continue
+
+        if name in ("mem_limit", "shm_size"):
+            value = parse_size_string(value)
+        else:
+            try:
+                value = int(value)
+            except (TypeError, ValueError):
+                raise ValueError("{} must be an integer".format(name))
+            if value < 0:
+                raise ValueError("{} must not be negative".format(name))
+
+        result[name] = value or None
+
+    return result
+
+
 class ABCApplicationPolicy(metaclass=ABCMeta):
     """ Policy for an application
     """
 
     def __init__(self, app_license=None, allow_home=False, allow_view=False,
                  allow_common=False, volume_source=None, volume_target=None,
-                 volume_mode=None, allow_startup_data=False):
+                 volume_mode=None, allow_startup_data=False,
+                 mem_limit=None, cpu_shares=None, cpu_quota=None,
+                 pids_limit=None, shm_size=None):
 
         #: Application License (if specified)
         self.app_license = app_license
@@ -53,6 +106,33 @@ class ABCApplicationPolicy(metaclass=ABCMeta):
         #: Allow user to provide a file for the container to load at startup
         self.allow_startup_data = allow_startup_data
 
+        # The resource limits of the containers. None leaves them to the
+        # defaults of the configuration.
+
+        #: Memory limit (bytes)
+        self.mem_limit = mem_limit
+
+        #: CPU shares, the weight relative to the other containers
+        #: (docker default 1024)
+        self.cpu_shares = cpu_shares
+
+        #: CPU time (microseconds) per 100 ms period, e.g. 50000 for
+        #: half a CPU
+        self.cpu_quota = cpu_quota
+
+        #: Maximum number of processes
+        self.pids_limit = pids_limit
+
+        #: Size of /dev/shm (bytes)
+        self.shm_size = shm_size
+
+    def resource_limits(self):
+        """Returns the resource limits that are set, as a dict
+        name -> value"""
+        return {name: getattr(self, name)
+                for name in RESOURCE_LIMITS
+                if getattr(self, name) is not None}
+
     def __repr__(self):
         args = _inspect.getargs(
             ABCApplicationPolicy.__init__.__code__).args[1:]
@@ -63,6 +143,18 @@ class ABCApplicationPolicy(metaclass=ABCMeta):
                            for arg in args))
 
 
+#: The values of the optional keys of a grant, as accepted by
+#: ABCDatabase.grant_access_bulk and ABCDatabase.revoke_access_bulk.
+GRANT_DEFAULTS = {
+    "app_license": None,
+    "allow_home": False,
+    "allow_view": False,
+    "volume": None,
+    "allow_startup_data": False,
+    "limits": None,
+}
+
+
 class ABCAccounting(metaclass=ABCMeta):
     def __init__(self, id, user, application, application_policy):
         self.id = id
@@ -206,7 +298,8 @@ class ABCDatabase(metaclass=ABCMeta):
 
     @abstractmethod
     def grant_access(self, app_name, user_name, app_license,
-                     allow_home, allow_view, volume, allow_startup_data):
+                     allow_home, allow_view, volume, allow_startup_data,
+                     limits=None):
         """Grant access for user to application.
 
         Parameters
@@ -234,12 +327,18 @@ class ABCDatabase(metaclass=ABCMeta):
         allow_startup_data : bool
             If the user can provide a file for the container to load at startup
 
+        limits: dict or None
+            The resource limits of the containers, by name (see
+            RESOURCE_LIMITS). mem_limit and shm_size accept a size
+            string (e.g. "512m"). The missing limits are left to the
+            defaults of the configuration.
+
         Raises
         ------
         exception.NotFound:
             if the app or user are not found.
         ValueError:
-            if the volume string is invalid.
+            if the volume string or a limit is invalid.
 
         Returns
         -------
@@ -249,7 +348,8 @@ class ABCDatabase(metaclass=ABCMeta):
 
     @abstractmethod
     def revoke_access(self, app_name, user_name, app_license,
-                      allow_home, allow_view, volume, allow_startup_data):
+                      allow_home, allow_view, volume, allow_startup_data,
+                      limits=None):
         """Revoke access for user to application.
 
         Parameters
@@ -277,14 +377,81 @@ class ABCDatabase(metaclass=ABCMeta):
         allow_startup_data : bool
             If the user can provide a file for the container to load at startup
 
+        limits: dict or None
+            The resource limits of the containers, by name (see
+            RESOURCE_LIMITS). mem_limit and shm_size accept a size
+            string (e.g. "512m"). The missing limits are left to the
+            defaults of the configuration.
+
         Raises
         ------
         exception.NotFound:
             if the app or user are not found.
         ValueError:
-            if the volume string is invalid.
+            if the volume string or a limit is invalid.
         """
 
     @abstractmethod
     def revoke_access_by_id(self, mapping_id):
         """Like revoke_access, but uses the mapping id instead."""
+
+    def grant_access_bulk(self, grants):
+        """Grants many accesses at once.
+
+        The default implementation calls grant_access for each grant.
+        Backends should reimplement it to perform all the grants in
+        one transaction.
+
+        Parameters
+        ----------
+        grants: iterable of dict
+            The keyword arguments of grant_access for each access.
+            app_name and user_name are required, the other keys default
+            to GRANT_DEFAULTS.
+
+        Raises
+        ------
+        exception.NotFound:
+            if an app or user is not found.
+        ValueError:
+            if a volume string or a limit is invalid.
+
+        Returns
+        -------
+        ids : list
+            The mapping ids, in the order of the grants.
+        """
+        return [self.grant_access(**dict(GRANT_DEFAULTS, **grant))
+                for grant in grants]
+
+    def revoke_access_bulk(self, grants):
+        """Revokes many accesses at once, like grant_access_bulk.
+
+        Parameters
+        ----------
+        grants: iterable of dict
+            The keyword arguments of revoke_access for each access.
+            app_name and user_name are required, the other keys default
+            to GRANT_DEFAULTS.
+
+        Raises
+        ------
+        exception.NotFound:
+            if an app, user or policy is not found.
+        ValueError:
+            if a volume string or a limit is invalid.
+        """
+        for grant in grants:
+            self.revoke_access(**dict(GRANT_DEFAULTS, **grant))
+
+    def get_revision(self):
+        """Returns a stamp that changes whenever the content of the
+        database changes, also when it is changed by another process.
+        Used to tell when cached content is stale.
+
+        Returns
+        -------
+        revision : hashable or None
+            The current revision, or None if the backend can't tell.
+        """
+        return None
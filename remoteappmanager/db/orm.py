@@ -1,18 +1,29 @@
 import contextlib
+import functools
+import hashlib
+import itertools
+import json
 import uuid
 import os
+import weakref
+from collections import OrderedDict
 
 from sqlalchemy import (
-    Column, Integer, Boolean, String, Unicode, ForeignKey, UniqueConstraint,
-    create_engine, Enum, event)
+    Column, Integer, BigInteger, Boolean, String, Unicode, ForeignKey,
+    UniqueConstraint, Index, create_engine, Enum, event, bindparam, select,
+    inspect)
 from sqlalchemy.engine import Engine
 from sqlalchemy.exc import OperationalError, IntegrityError
+from sqlalchemy.ext import baked
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship, joinedload
-from sqlalchemy.orm.exc import DetachedInstanceError, NoResultFound
+from sqlalchemy.orm.exc import DetachedInstanceError
+from sqlalchemy.pool import QueuePool
 
 from remoteappmanager.logging.logging_mixin import LoggingMixin
-from remoteappmanager.db.interfaces import ABCDatabase
+from remoteappmanager.db.interfaces import (
+    ABCDatabase, ABCApplication, ABCApplicationPolicy, ABCAccounting,
+    GRANT_DEFAULTS, RESOURCE_LIMITS, parse_resource_limits)
 from remoteappmanager.db import exceptions
 from remoteappmanager.utils import parse_volume_string, mergedocs, one
 
@@ -79,6 +90,133 @@ class ApplicationPolicy(IdMixin, Base):
     #: If the user can open a file at startup
     allow_startup_data = Column(Boolean)
 
+    #: Memory limit of the container (bytes)
+    mem_limit = Column(BigInteger, nullable=True)
+
+    #: CPU shares of the container, relative to the others
+    cpu_shares = Column(Integer, nullable=True)
+
+    #: CPU time (microseconds) of the container per 100 ms period
+    cpu_quota = Column(Integer, nullable=True)
+
+    #: Maximum number of processes in the container
+    pids_limit = Column(Integer, nullable=True)
+
+    #: Size of /dev/shm in the container (bytes)
+    shm_size = Column(BigInteger, nullable=True)
+
+    #: Identifies the policy by the value of the other columns. It is
+    #: set when the policy is stored. See policy_fingerprint.
+    fingerprint = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index('ix_application_policy_fingerprint', 'fingerprint',
+              unique=True),
+    )
+
+    def compute_fingerprint(self):
+        """Returns the fingerprint of the current values"""
+        return policy_fingerprint(**{
+            name: getattr(self, name)
+            for name in POLICY_FIELDS + RESOURCE_LIMITS})
+
+
+#: The columns of ApplicationPolicy that define what it allows. The
+#: columns of the resource limits are RESOURCE_LIMITS.
+POLICY_FIELDS = (
+    "app_license",
+    "allow_home",
+    "allow_common",
+    "allow_view",
+    "volume_source",
+    "volume_target",
+    "volume_mode",
+    "allow_startup_data",
+)
+
+
+def policy_fingerprint(app_license=None, allow_home=False,
+                       allow_common=False, allow_view=False,
+                       volume_source=None, volume_target=None,
+                       volume_mode=None, allow_startup_data=False,
+                       mem_limit=None, cpu_shares=None, cpu_quota=None,
+                       pids_limit=None, shm_size=None):
+    """Returns a hash of the normalized policy values. Empty strings
+    and NULLs are the same, as are false and NULL booleans, and zero and
+    NULL limits, so that equivalent policies have the same fingerprint.
+    The policies without limits keep the fingerprint they had before
+    the limits were introduced.
+
+    Returns
+    -------
+    str
+        64 hexadecimal characters
+    """
+    values = [app_license or None,
+              bool(allow_home),
+              bool(allow_common),
+              bool(allow_view),
+              volume_source or None,
+              volume_target or None,
+              volume_mode or None,
+              bool(allow_startup_data)]
+
+    limits = [mem_limit or None,
+              cpu_shares or None,
+              cpu_quota or None,
+              pids_limit or None,
+              shm_size or None]
+    if any(limit is not None for limit in limits):
+        values.append(limits)
+
+    return hashlib.sha256(
+        json.dumps(values).encode("utf-8")).hexdigest()
+
+
+def policy_fields(app_license, allow_home, allow_view, volume,
+                  allow_startup_data, limits=None):
+    """Returns the values of the ApplicationPolicy columns for the
+    arguments of ABCDatabase.grant_access, as a dict.
+
+    Raises
+    ------
+    ValueError:
+        if the volume string or a limit is invalid.
+    """
+    allow_common = False
+    source = target = mode = None
+    if volume is not None:
+        allow_common = True
+        source, target, mode = parse_volume_string(volume)
+
+    fields = {
+        "app_license": app_license or None,
+        "allow_home": bool(allow_home),
+        "allow_common": allow_common,
+        "allow_view": bool(allow_view),
+        "volume_source": source,
+        "volume_target": target,
+        "volume_mode": mode,
+        "allow_startup_data": bool(allow_startup_data),
+    }
+    fields.update(parse_resource_limits(limits))
+    return fields
+
+
+def find_policy(session, fields):
+    """Returns the ApplicationPolicy with the given column values
+    (as returned by policy_fields), or None. Uses the fingerprint
+    index."""
+    return session.query(ApplicationPolicy).filter(
+        ApplicationPolicy.fingerprint == policy_fingerprint(**fields)
+    ).one_or_none()
+
+
+@event.listens_for(ApplicationPolicy, "before_insert")
+@event.listens_for(ApplicationPolicy, "before_update")
+def _set_policy_fingerprint(mapper, connection, target):
+    target.fingerprint = target.compute_fingerprint()
+
 
 class Accounting(Base):
     """Holds the information about who is allowed to run what."""
@@ -108,9 +246,83 @@ class Accounting(Base):
 
     __table_args__ = (
         UniqueConstraint('user_id', 'application_id', 'application_policy_id'),
+        # Covers the lookup of the accountings of a user, mapping id
+        # included, without reading the table.
+        Index('ix_accounting_user_lookup',
+              'user_id', 'application_id', 'application_policy_id', 'id'),
+        # Used by the cascades when applications and policies are removed.
+        Index('ix_accounting_application_policy',
+              'application_id', 'application_policy_id'),
     )
 
 
+class Revision(Base):
+    """Counts the changes to the content of the database, so that
+    the processes caching it can tell when it is stale. It has a single
+    row, updated in the same transaction as the changes."""
+    __tablename__ = "revision"
+
+    id = Column(Integer, primary_key=True)
+
+    value = Column(Integer, nullable=False, default=0)
+
+
+#: The entities whose changes bump the revision
+_REVISED_ENTITIES = (User, Application, ApplicationPolicy, Accounting)
+
+#: engine -> True if the database has the revision table
+_has_revision_table = weakref.WeakKeyDictionary()
+
+
+def _bump_revision_after_flush(session, flush_context):
+    """Bumps the revision when entities are added, changed or removed.
+    Listens to the sessions of Database."""
+    changed = itertools.chain(
+        session.new,
+        (obj for obj in session.dirty if session.is_modified(obj)),
+        session.deleted)
+    if any(isinstance(obj, _REVISED_ENTITIES) for obj in changed):
+        _bump_revision(session)
+
+
+def _bump_revision_after_bulk_delete(delete_context):
+    """Bumps the revision when entities are removed by a query.
+    Listens to the sessions of Database."""
+    if (delete_context.rowcount and
+            issubclass(delete_context.mapper.class_, _REVISED_ENTITIES)):
+        _bump_revision(delete_context.session)
+
+
+def _bump_revision(session):
+    engine = session.get_bind()
+    has_table = _has_revision_table.get(engine)
+    if has_table is None:
+        # Databases older than the revision table still work, without it.
+        has_table = _has_revision_table[engine] = (
+            Revision.__tablename__ in inspect(engine).get_table_names())
+
+    if not has_table:
+        return
+
+    table = Revision.__table__
+    result = session.execute(
+        table.update().values(value=table.c.value + 1))
+    if result.rowcount == 0:
+        session.execute(table.insert().values(id=1, value=1))
+
+
+class ApplicationRow(ABCApplication):
+    """Detached, read-only copy of an Application row"""
+
+
+class ApplicationPolicyRow(ABCApplicationPolicy):
+    """Detached, read-only copy of an ApplicationPolicy row"""
+
+
+class AccountingRow(ABCAccounting):
+    """Detached, read-only copy of an Accounting row"""
+
+
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     """ Set pragma for sqlite3 when the engine connects
@@ -129,24 +341,85 @@ def _set_sqlite_pragma(dbapi_connection, connection_record):
                 cursor.execute("PRAGMA foreign_keys=ON")
 
 
+#: The pragmas set on each connection to a sqlite database file, unless
+#: others are given to Database. Many remoteappmanager processes share
+#: the same file: a writer waits up to busy_timeout milliseconds for the
+#: lock instead of failing with "database is locked".
+SQLITE_PRAGMAS = OrderedDict([
+    ("busy_timeout", 10000),
+    ("mmap_size", 64 * 1024 * 1024),
+])
+
+#: The pragmas added with sqlite_wal. With the write-ahead log the
+#: readers do not wait for the writers. It needs write access to the
+#: directory of the database, where the -wal and -shm files are kept,
+#: also for the processes that only read.
+SQLITE_WAL_PRAGMAS = OrderedDict([
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+])
+
+
+def _set_sqlite_pragmas(pragmas, dbapi_connection, connection_record):
+    """Sets the given pragmas when a connection to a sqlite
+    database is opened."""
+    with contextlib.closing(dbapi_connection.cursor()) as cursor:
+        for name, value in pragmas.items():
+            cursor.execute("PRAGMA {}={}".format(name, value))
+
+
+def is_sqlite_file_url(url):
+    """True if the url refers to a sqlite database file, rather than
+    to an in-memory database"""
+    return url.startswith("sqlite:///") and ":memory:" not in url
+
+
 class Database(LoggingMixin):
-    def __init__(self, url, **kwargs):
+    def __init__(self, url, sqlite_pragmas=None, sqlite_wal=False,
+                 **kwargs):
         """Initialises a database connection to a given database url.
 
         Parameters
         ----------
         url : url
             A sqlalchemy url to connect to a specified database.
+        sqlite_pragmas : dict or None
+            The pragmas set on each connection to a sqlite database
+            file. If None, SQLITE_PRAGMAS. Ignored for other databases.
+        sqlite_wal : bool
+            If True, a sqlite database file is switched to the
+            write-ahead log (SQLITE_WAL_PRAGMAS). The mode is kept in the
+            file, so it applies to all the processes using it, and all
+            of them need write access to its directory.
         kwargs : dict
-            Additional keys will be passed at create_engine.
+            Additional keys will be passed at create_engine, e.g.
+            pool_size, pool_recycle or pool_pre_ping.
         """
         super().__init__()
 
         self.url = url
 
+        if is_sqlite_file_url(url):
+            # The connections are kept in a pool, rather than reopened
+            # (and their pragmas set) for each session. A connection
+            # is used by one thread at a time, but not always the same.
+            kwargs.setdefault("poolclass", QueuePool)
+            connect_args = dict(kwargs.get("connect_args", {}))
+            connect_args.setdefault("check_same_thread", False)
+            kwargs["connect_args"] = connect_args
+
         self.log.info("Creating session to db: {}".format(self.url))
         self.engine = create_engine(self.url, **kwargs)
 
+        if is_sqlite_file_url(url):
+            pragmas = OrderedDict()
+            if sqlite_wal:
+                pragmas.update(SQLITE_WAL_PRAGMAS)
+            pragmas.update(SQLITE_PRAGMAS if sqlite_pragmas is None
+                           else sqlite_pragmas)
+            event.listen(self.engine, "connect",
+                         functools.partial(_set_sqlite_pragmas, pragmas))
+
         try:
             self.session_class = sessionmaker(bind=self.engine)
         except OperationalError:
@@ -155,6 +428,12 @@ class Database(LoggingMixin):
             )
             raise
 
+        # Only the sessions of the database count its changes
+        event.listen(self.session_class, "after_flush",
+                     _bump_revision_after_flush)
+        event.listen(self.session_class, "after_bulk_delete",
+                     _bump_revision_after_bulk_delete)
+
     def create_session(self):
         """Create a new session class at the database url with the current
         engine.
@@ -168,6 +447,8 @@ class Database(LoggingMixin):
         """
         Base.metadata.drop_all(self.engine)
         Base.metadata.create_all(self.engine)
+        self.engine.execute(Revision.__table__.insert().values(id=1, value=0))
+        _has_revision_table.pop(self.engine, None)
 
 
 @mergedocs(ABCDatabase)
@@ -192,6 +473,16 @@ class ORMDatabase(ABCDatabase):
         self.db = Database(url, **kwargs)
         self.check_database_readable()
 
+    def get_revision(self):
+        try:
+            with self.db.engine.connect() as connection:
+                return connection.execute(
+                    select([Revision.value]).where(Revision.id == 1)
+                ).scalar()
+        except OperationalError:
+            # No revision table
+            return None
+
     def check_database_readable(self):
         ''' Raise IOError if the database url points to a sqlite database
         that is not readable
@@ -235,14 +526,10 @@ class ORMDatabase(ABCDatabase):
 
     def get_accounting_for_user(self, user):
         # We create a session here to make sure it is only
-        # used in one thread
+        # used in one thread. The rows are plain objects, not bound
+        # to the session, so they can be reused in a different thread.
         with contextlib.closing(self.db.create_session()) as session:
-            result = accounting_for_user(session, user)
-
-            # Removing internal references to the session is
-            # required such that the objects can be reused
-            # in a different thread
-            session.expunge_all()
+            result = accounting_rows_for_user(session, user)
 
         return result
 
@@ -311,118 +598,54 @@ class ORMDatabase(ABCDatabase):
         return applications
 
     def grant_access(self, app_name, user_name, app_license,
-                     allow_home, allow_view, volume, allow_startup_data):
-        allow_common = False
-        source = target = mode = None
-
-        app_license = app_license if app_license else None
-
-        if volume is not None:
-            allow_common = True
-            source, target, mode = parse_volume_string(volume)
-
-        with detached_session(self.db) as session:
-            with transaction(session):
-                try:
-                    orm_app = session.query(Application).filter(
-                        Application.image == app_name).one()
-
-                    orm_user = session.query(User).filter(
-                        User.name == user_name).one()
-                except NoResultFound:
-                    raise exceptions.NotFound()
-
-                orm_policy = session.query(ApplicationPolicy).filter(
-                    ApplicationPolicy.app_license == app_license,
-                    ApplicationPolicy.allow_home == allow_home,
-                    ApplicationPolicy.allow_common == allow_common,
-                    ApplicationPolicy.allow_view == allow_view,
-                    ApplicationPolicy.volume_source == source,
-                    ApplicationPolicy.volume_target == target,
-                    ApplicationPolicy.volume_mode == mode,
-                    ApplicationPolicy.allow_startup_data == allow_startup_data
-                ).one_or_none()
-
-                if orm_policy is None:
-                    orm_policy = ApplicationPolicy(
-                        app_license=app_license,
-                        allow_home=allow_home,
-                        allow_common=allow_common,
-                        allow_view=allow_view,
-                        volume_source=source,
-                        volume_target=target,
-                        volume_mode=mode,
-                        allow_startup_data=allow_startup_data,
-                    )
-                    session.add(orm_policy)
-
-                # Check if we already have the entry
-                acc = session.query(Accounting).filter(
-                    Accounting.user == orm_user,
-                    Accounting.application == orm_app,
-                    Accounting.application_policy == orm_policy
-                ).one_or_none()
-
-                if acc is None:
-                    id = uuid.uuid4().hex
-
-                    accounting = Accounting(
-                        id=id,
-                        user=orm_user,
-                        application=orm_app,
-                        application_policy=orm_policy,
-                    )
-                    session.add(accounting)
-
-                else:
-                    id = acc.id
-
-                return id
+                     allow_home, allow_view, volume, allow_startup_data,
+                     limits=None):
+        return self.grant_access_bulk([{
+            "app_name": app_name,
+            "user_name": user_name,
+            "app_license": app_license,
+            "allow_home": allow_home,
+            "allow_view": allow_view,
+            "volume": volume,
+            "allow_startup_data": allow_startup_data,
+            "limits": limits}])[0]
 
     def revoke_access(self, app_name, user_name, app_license,
-                      allow_home, allow_view, volume, allow_startup_data):
-        allow_common = False
-        source = target = mode = None
-
-        app_license = app_license if app_license else None
-
-        if volume is not None:
-            allow_common = True
-            source, target, mode = parse_volume_string(volume)
+                      allow_home, allow_view, volume, allow_startup_data,
+                      limits=None):
+        self.revoke_access_bulk([{
+            "app_name": app_name,
+            "user_name": user_name,
+            "app_license": app_license,
+            "allow_home": allow_home,
+            "allow_view": allow_view,
+            "volume": volume,
+            "allow_startup_data": allow_startup_data,
+            "limits": limits}])
 
+    def revoke_access_by_id(self, mapping_id):
         with detached_session(self.db) as session, \
                 transaction(session):
-            try:
-                orm_app = session.query(Application).filter(
-                    Application.image == app_name).one()
-
-                orm_user = session.query(User).filter(
-                    User.name == user_name).one()
-
-                orm_policy = session.query(ApplicationPolicy).filter(
-                    ApplicationPolicy.app_license == app_license,
-                    ApplicationPolicy.allow_home == allow_home,
-                    ApplicationPolicy.allow_common == allow_common,
-                    ApplicationPolicy.allow_view == allow_view,
-                    ApplicationPolicy.volume_source == source,
-                    ApplicationPolicy.volume_target == target,
-                    ApplicationPolicy.volume_mode == mode,
-                    ApplicationPolicy.allow_startup_data == allow_startup_data
-                ).one()
-            except NoResultFound:
-                raise exceptions.NotFound()
-
             session.query(Accounting).filter(
-                Accounting.application == orm_app,
-                Accounting.user == orm_user,
-                Accounting.application_policy == orm_policy,
-                ).delete()
+                Accounting.id == mapping_id).delete()
 
-    def revoke_access_by_id(self, mapping_id):
+    def grant_access_bulk(self, grants):
+        grants = [dict(grant) for grant in grants]
+        try:
+            with detached_session(self.db) as session, \
+                    transaction(session):
+                return grant_access_bulk(session, grants)
+        except IntegrityError:
+            # Another process added the same policy or accounting in the
+            # meantime. Now they are found.
+            with detached_session(self.db) as session, \
+                    transaction(session):
+                return grant_access_bulk(session, grants)
+
+    def revoke_access_bulk(self, grants):
         with detached_session(self.db) as session, \
                 transaction(session):
-            session.query(Accounting).filter(
-                Accounting.id == mapping_id).delete()
+            revoke_access_bulk(session, grants)
 
 
 @contextlib.contextmanager
@@ -494,3 +717,328 @@ def accounting_for_user(session, user):
         .filter_by(name=user_name).all()
 
     return res
+
+
+#: Caches the compiled form of the accounting queries
+_bakery = baked.bakery()
+
+#: The columns of the accounting rows, in the order of the result tuples
+_ACCOUNTING_ROW_COLUMNS = (
+    Accounting.id,
+    Application.id,
+    Application.image,
+    ApplicationPolicy.app_license,
+    ApplicationPolicy.allow_home,
+    ApplicationPolicy.allow_view,
+    ApplicationPolicy.allow_common,
+    ApplicationPolicy.volume_source,
+    ApplicationPolicy.volume_target,
+    ApplicationPolicy.volume_mode,
+    ApplicationPolicy.allow_startup_data,
+    ApplicationPolicy.mem_limit,
+    ApplicationPolicy.cpu_shares,
+    ApplicationPolicy.cpu_quota,
+    ApplicationPolicy.pids_limit,
+    ApplicationPolicy.shm_size,
+)
+
+
+def _accounting_rows_query(session):
+    return session.query(*_ACCOUNTING_ROW_COLUMNS) \
+        .join(Application, Accounting.application_id == Application.id) \
+        .join(ApplicationPolicy,
+              Accounting.application_policy_id == ApplicationPolicy.id)
+
+
+def accounting_rows_for_user(session, user):
+    """Returns the accounting of the specified orm user, as a list of
+    AccountingRow. Same as accounting_for_user, but only the needed
+    columns are retrieved, with a precompiled query keyed by the user id,
+    and no orm object is loaded in the session.
+
+    Parameters
+    ----------
+    session : Session
+        The current session
+    user : User or None
+        the orm User, or None. A user without id (e.g. an orm User never
+        added to a session, or the remoteappmanager.user.User of the
+        handlers) is looked up by name.
+
+    Returns
+    -------
+    A list of AccountingRow objects
+    """
+    if user is None:
+        return []
+
+    try:
+        user_id = getattr(user, "id", None)
+    except DetachedInstanceError:
+        # Expired attributes of a detached user can only be
+        # reloaded in a session.
+        session.add(user)
+        user_id = user.id
+
+    query = _bakery(_accounting_rows_query)
+    if user_id is not None:
+        query += lambda q: q.filter(
+            Accounting.user_id == bindparam("user_id"))
+        rows = query(session).params(user_id=user_id).all()
+    else:
+        query += lambda q: q.join(User, Accounting.user_id == User.id) \
+            .filter(User.name == bindparam("user_name"))
+        rows = query(session).params(user_name=user.name).all()
+
+    applications = {}
+    policies = {}
+    result = []
+    for row in rows:
+        (mapping_id, app_id, image,
+         app_license, allow_home, allow_view, allow_common,
+         volume_source, volume_target, volume_mode,
+         allow_startup_data, mem_limit, cpu_shares, cpu_quota,
+         pids_limit, shm_size) = row
+
+        application = applications.get(app_id)
+        if application is None:
+            application = applications[app_id] = ApplicationRow(
+                id=app_id, image=image)
+
+        policy_key = row[3:]
+        policy = policies.get(policy_key)
+        if policy is None:
+            policy = policies[policy_key] = ApplicationPolicyRow(
+                app_license=app_license,
+                allow_home=allow_home,
+                allow_view=allow_view,
+                allow_common=allow_common,
+                volume_source=volume_source,
+                volume_target=volume_target,
+                volume_mode=volume_mode,
+                allow_startup_data=allow_startup_data,
+                mem_limit=mem_limit,
+                cpu_shares=cpu_shares,
+                cpu_quota=cpu_quota,
+                pids_limit=pids_limit,
+                shm_size=shm_size)
+
+        result.append(AccountingRow(id=mapping_id,
+                                    user=user,
+                                    application=application,
+                                    application_policy=policy))
+
+    return result
+
+
+#: The maximum number of values in an IN clause. Older sqlite versions
+#: do not accept more than 999 parameters in a statement.
+_IN_CLAUSE_SIZE = 500
+
+
+def _grant_entry(grant):
+    """Returns (app_name, user_name, policy fields) for a grant, as
+    accepted by grant_access_bulk"""
+    grant = dict(GRANT_DEFAULTS, **grant)
+
+    fields = policy_fields(grant["app_license"],
+                           grant["allow_home"],
+                           grant["allow_view"],
+                           grant["volume"],
+                           grant["allow_startup_data"],
+                           grant["limits"])
+
+    return grant["app_name"], grant["user_name"], fields
+
+
+def _chunks(values, size=None):
+    """Splits the values in lists of at most size (by default
+    _IN_CLAUSE_SIZE) values"""
+    size = size or _IN_CLAUSE_SIZE
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _ids_by_name(session, name_column, id_column, names, kind):
+    """Returns name -> id for all the names, with one query every
+    _IN_CLAUSE_SIZE names. Raises NotFound if a name does not exist."""
+    result = {}
+    for chunk in _chunks(names):
+        result.update(session.query(name_column, id_column).filter(
+            name_column.in_(chunk)))
+
+    missing = set(names) - set(result)
+    if missing:
+        raise exceptions.NotFound("Unknown {}: {}".format(
+            kind, ", ".join(sorted(missing))))
+
+    return result
+
+
+def _policy_ids(session, fingerprints):
+    """Returns fingerprint -> policy id for the existing policies with
+    the given fingerprints"""
+    result = {}
+    for chunk in _chunks(fingerprints):
+        result.update(session.query(ApplicationPolicy.fingerprint,
+                                    ApplicationPolicy.id).filter(
+            ApplicationPolicy.fingerprint.in_(chunk)))
+    return result
+
+
+def _accounting_ids(session, user_ids, app_ids):
+    """Returns (user id, app id, policy id) -> mapping id for the
+    accountings of the given users and applications. Both sides are
+    chunked so that a query never has more than _IN_CLAUSE_SIZE
+    parameters."""
+    size = max(1, _IN_CLAUSE_SIZE // 2)
+    app_chunks = list(_chunks(app_ids, size))
+    result = {}
+    for user_chunk in _chunks(user_ids, size):
+        for app_chunk in app_chunks:
+            rows = session.query(Accounting.user_id,
+                                 Accounting.application_id,
+                                 Accounting.application_policy_id,
+                                 Accounting.id).filter(
+                Accounting.user_id.in_(user_chunk),
+                Accounting.application_id.in_(app_chunk))
+            for row in rows:
+                result[tuple(row[:3])] = row[3]
+    return result
+
+
+def _resolve_grants(session, grants):
+    """Returns the (user id, app id, policy fields) of each grant, and
+    the ids of the users and applications involved."""
+    entries = [_grant_entry(grant) for grant in grants]
+
+    app_ids = _ids_by_name(session, Application.image, Application.id,
+                           {entry[0] for entry in entries}, "applications")
+    user_ids = _ids_by_name(session, User.name, User.id,
+                            {entry[1] for entry in entries}, "users")
+
+    resolved = [(user_ids[user_name], app_ids[app_name], fields)
+                for app_name, user_name, fields in entries]
+
+    return resolved, set(user_ids.values()), set(app_ids.values())
+
+
+def grant_access_bulk(session, grants):
+    """Grants the accesses, like ORMDatabase.grant_access for each
+    grant, with a fixed number of queries: users, applications and
+    policies are resolved with one query each (every _IN_CLAUSE_SIZE
+    names), and the new accountings are inserted with a single
+    statement. The caller is responsible for the transaction.
+
+    Parameters
+    ----------
+    session : Session
+        The current session
+    grants : iterable of dict
+        The keyword arguments of grant_access for each access.
+        app_name and user_name are required, the other keys default
+        to GRANT_DEFAULTS.
+
+    Raises
+    ------
+    exceptions.NotFound:
+        if an application or user is not found. Nothing is granted.
+    ValueError:
+        if a volume string or a limit is invalid. Nothing is granted.
+
+    Returns
+    -------
+    A list of mapping ids, in the order of the grants
+    """
+    resolved, user_ids, app_ids = _resolve_grants(session, grants)
+    if not resolved:
+        return []
+
+    fingerprints = [policy_fingerprint(**fields)
+                    for _, _, fields in resolved]
+
+    policy_ids = _policy_ids(session, set(fingerprints))
+    new_policies = {}
+    for (_, _, fields), fingerprint in zip(resolved, fingerprints):
+        if fingerprint not in policy_ids and fingerprint not in new_policies:
+            new_policies[fingerprint] = ApplicationPolicy(**fields)
+
+    if new_policies:
+        session.add_all(new_policies.values())
+        session.flush()
+        policy_ids.update({fingerprint: policy.id
+                           for fingerprint, policy in new_policies.items()})
+
+    accounting_ids = _accounting_ids(session, user_ids, app_ids)
+
+    result = []
+    new_accountings = []
+    for (user_id, app_id, _), fingerprint in zip(resolved, fingerprints):
+        key = (user_id, app_id, policy_ids[fingerprint])
+        mapping_id = accounting_ids.get(key)
+        if mapping_id is None:
+            mapping_id = accounting_ids[key] = uuid.uuid4().hex
+            new_accountings.append({
+                "id": mapping_id,
+                "user_id": user_id,
+                "application_id": app_id,
+                "application_policy_id": key[2],
+            })
+        result.append(mapping_id)
+
+    if new_accountings:
+        session.execute(Accounting.__table__.insert(), new_accountings)
+        _bump_revision(session)
+
+    return result
+
+
+def revoke_access_bulk(session, grants):
+    """Revokes the accesses, like ORMDatabase.revoke_access for each
+    grant, with a fixed number of queries. The caller is responsible
+    for the transaction.
+
+    Parameters
+    ----------
+    session : Session
+        The current session
+    grants : iterable of dict
+        As in grant_access_bulk
+
+    Raises
+    ------
+    exceptions.NotFound:
+        if an application, user or policy is not found. Nothing is
+        revoked.
+    ValueError:
+        if a volume string or a limit is invalid. Nothing is revoked.
+
+    Returns
+    -------
+    The number of accountings removed
+    """
+    resolved, user_ids, app_ids = _resolve_grants(session, grants)
+    if not resolved:
+        return 0
+
+    fingerprints = [policy_fingerprint(**fields)
+                    for _, _, fields in resolved]
+
+    policy_ids = _policy_ids(session, set(fingerprints))
+    if any(fingerprint not in policy_ids for fingerprint in fingerprints):
+        raise exceptions.NotFound("Unknown policy")
+
+    accounting_ids = _accounting_ids(session, user_ids, app_ids)
+    mapping_ids = {
+        accounting_ids[key]
+        for key in ((user_id, app_id, policy_ids[fingerprint])
+                    for (user_id, app_id, _), fingerprint
+                    in zip(resolved, fingerprints))
+        if key in accounting_ids}
+
+    for chunk in _chunks(mapping_ids):
+        session.query(Accounting).filter(
+            Accounting.id.in_(chunk)).delete(synchronize_session=False)
+
+    return len(mapping_ids)
@@ -43,7 +43,8 @@ class ABCTestDatabaseInterface(metaclass=ABCMeta):
         """ Test ABCDatabase.get_user """
 
     def test_get_accounting_for_user(self):
-        """ Test get_accounting_for_user returns an iterable of ApplicationConfig
+        """ Test get_accounting_for_user returns an iterable of
+        ApplicationConfig
         """
         database = self.create_database()
 
@@ -149,3 +150,7 @@ class ABCTestDatabaseInterface(metaclass=ABCMeta):
 
         with self.assertRaises(exceptions.UnsupportedOperation):
             db.revoke_access_by_id(12345)
+
+        for method in [db.grant_access_bulk, db.revoke_access_bulk]:
+            with self.assertRaises(exceptions.UnsupportedOperation):
+                method([{"app_name": "bonkers", "user_name": "uuu"}])
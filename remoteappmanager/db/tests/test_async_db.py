@@ -0,0 +1,84 @@
+import os
+import threading
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.db import exceptions
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.db.orm import ORMDatabase
+from remoteappmanager.db.tests import test_orm
+from remoteappmanager.tests import utils
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class TestAsyncDatabase(TempMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
+        utils.init_sqlite_db(sqlite_file_path)
+        self.database = ORMDatabase("sqlite:///" + sqlite_file_path)
+        test_orm.fill_db(self.database.db.create_session())
+
+        self.async_db = AsyncDatabase(self.database, max_workers=1)
+
+    def tearDown(self):
+        self.async_db.shutdown()
+        super().tearDown()
+
+    @gen_test
+    def test_methods(self):
+        user = yield self.async_db.get_user(user_name="user1")
+        self.assertEqual(user.name, "user1")
+
+        accountings = yield self.async_db.get_accounting_for_user(user)
+        self.assertEqual(len(accountings), 2)
+
+        id = yield self.async_db.create_user("foo")
+        users = yield self.async_db.list_users()
+        self.assertIn(id, [u.id for u in users])
+
+        self.assertEqual(self.async_db.executor_stats()["completed"], 4)
+
+    @gen_test
+    def test_exceptions(self):
+        with self.assertRaises(exceptions.Exists):
+            yield self.async_db.create_user("user1")
+
+        with self.assertRaises(ValueError):
+            yield self.async_db.get_user()
+
+    def test_unknown_attribute(self):
+        with self.assertRaises(AttributeError):
+            self.async_db.check_database_readable
+
+        with self.assertRaises(AttributeError):
+            self.async_db.foo
+
+    @gen_test
+    def test_does_not_block_the_ioloop(self):
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_list_users():
+            started.set()
+            release.wait(5)
+            return []
+
+        with mock.patch.object(self.database, "list_users",
+                               side_effect=slow_list_users):
+            future = self.async_db.list_users()
+            started.wait(5)
+            queued = self.async_db.get_user(user_name="user1")
+
+            # The loop keeps running while the query is in progress.
+            self.assertFalse(future.done())
+            self.assertEqual(self.async_db.executor_stats()["queued"], 1)
+
+            release.set()
+            users = yield future
+            user = yield queued
+
+        self.assertEqual(users, [])
+        self.assertEqual(user.name, "user1")
+        self.assertEqual(self.async_db.executor_stats()["queued"], 0)
@@ -0,0 +1,177 @@
+import os
+from unittest import TestCase, mock
+
+from remoteappmanager.db.cached_db import CachedDatabase
+from remoteappmanager.db.orm import ORMDatabase
+from remoteappmanager.db.tests import test_orm
+from remoteappmanager.tests import utils
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachedDatabaseInterface(test_orm.TestOrmDatabase):
+    """Runs the ORMDatabase tests through the cache"""
+    def create_database(self):
+        return CachedDatabase(super().create_database())
+
+
+class TestCachedDatabase(TempMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
+        utils.init_sqlite_db(self.sqlite_file_path)
+        url = "sqlite:///" + self.sqlite_file_path
+
+        self.backend = ORMDatabase(url)
+        test_orm.fill_db(self.backend.db.create_session())
+
+        self.timer = FakeTimer()
+        self.database = CachedDatabase(self.backend, ttl=60,
+                                       revision_interval=1,
+                                       timer=self.timer)
+
+        # Another process sharing the same database
+        self.other = ORMDatabase(url)
+
+    def count_calls(self, name):
+        return mock.patch.object(self.backend, name,
+                                 wraps=getattr(self.backend, name))
+
+    def test_reads_are_cached(self):
+        with self.count_calls("get_accounting_for_user") as get_acc, \
+                self.count_calls("get_user") as get_user, \
+                self.count_calls("list_applications") as list_apps:
+            for _ in range(3):
+                user = self.database.get_user(user_name="user1")
+                self.assertEqual(
+                    len(self.database.get_accounting_for_user(user)), 2)
+                self.assertEqual(len(self.database.list_applications()), 3)
+                self.assertIsNone(self.database.get_user(user_name="foo"))
+
+            self.assertEqual(get_acc.call_count, 1)
+            self.assertEqual(get_user.call_count, 2)
+            self.assertEqual(list_apps.call_count, 1)
+
+        stats = self.database.stats()
+        self.assertEqual(stats["accountings"]["hits"], 2)
+
+    def test_returned_lists_are_copies(self):
+        user = self.database.get_user(user_name="user1")
+        self.database.get_accounting_for_user(user).clear()
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user)), 2)
+
+    def test_expiration(self):
+        with self.count_calls("list_users") as list_users:
+            self.database.list_users()
+            self.timer.now = 61
+            self.database.list_users()
+
+            self.assertEqual(list_users.call_count, 2)
+
+    def test_grant_and_revoke_invalidate_the_user(self):
+        user1 = self.database.get_user(user_name="user1")
+        user0 = self.database.get_user(user_name="user0")
+        self.database.get_accounting_for_user(user0)
+
+        self.database.grant_access("docker/image1", "user1", None,
+                                   True, False, None, False)
+        accountings = self.database.get_accounting_for_user(user1)
+        self.assertEqual(len(accountings), 3)
+
+        with self.count_calls("get_accounting_for_user") as get_acc:
+            self.database.get_accounting_for_user(user0)
+            self.assertEqual(get_acc.call_count, 0)
+
+        self.database.revoke_access("docker/image1", "user1", None,
+                                    True, False, None, False)
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 2)
+
+        self.database.revoke_access_by_id(accountings[0].id)
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 1)
+
+    def test_user_and_application_changes(self):
+        self.assertEqual(len(self.database.list_users()), 5)
+        self.assertIsNone(self.database.get_user(user_name="foo"))
+
+        self.database.create_user("foo")
+        self.assertEqual(len(self.database.list_users()), 6)
+        self.assertIsNotNone(self.database.get_user(user_name="foo"))
+
+        self.database.remove_user(user_name="foo")
+        self.assertEqual(len(self.database.list_users()), 5)
+        self.assertIsNone(self.database.get_user(user_name="foo"))
+
+        self.assertEqual(len(self.database.list_applications()), 3)
+        self.database.create_application("docker/image3")
+        self.assertEqual(len(self.database.list_applications()), 4)
+
+        user1 = self.database.get_user(user_name="user1")
+        self.database.get_accounting_for_user(user1)
+        self.database.remove_application(app_name="docker/image0")
+        self.assertEqual(len(self.database.list_applications()), 3)
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 1)
+
+    def test_changes_from_other_processes(self):
+        user1 = self.database.get_user(user_name="user1")
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 2)
+
+        self.other.grant_access("docker/image1", "user1", None,
+                                True, False, None, False)
+
+        # Not checked yet
+        self.timer.now = 0.5
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 2)
+
+        self.timer.now = 1
+        self.assertEqual(
+            len(self.database.get_accounting_for_user(user1)), 3)
+        self.assertEqual(self.database.stats()["revision"],
+                         self.backend.get_revision())
+
+    def test_no_revision(self):
+        with mock.patch.object(self.backend, "get_revision",
+                               return_value=None):
+            self.database.list_users()
+            self.other.create_user("foo")
+
+            self.timer.now = 30
+            self.assertEqual(len(self.database.list_users()), 5)
+
+            self.timer.now = 61
+            self.assertEqual(len(self.database.list_users()), 6)
+
+    def test_stale_reads_are_not_cached(self):
+        original = self.backend.list_users
+
+        def list_users():
+            result = original()
+            # A write completes while the read is in progress
+            self.database.create_user("foo")
+            return result
+
+        with mock.patch.object(self.backend, "list_users",
+                               side_effect=list_users):
+            self.assertEqual(len(self.database.list_users()), 5)
+
+        self.assertEqual(len(self.database.list_users()), 6)
+
+    def test_clear(self):
+        with self.count_calls("list_users") as list_users:
+            self.database.list_users()
+            self.database.clear()
+            self.database.list_users()
+
+            self.assertEqual(list_users.call_count, 2)
@@ -142,3 +142,142 @@ class TestCSVDatabase(TempMixin, ABCTestDatabaseInterface,
                        GoodTableWithDifferentHeaders.headers,
                        GoodTableWithDifferentHeaders.records)
         self.create_database()
+
+    def test_accounting_ids_are_deterministic(self):
+        database = self.create_database()
+        user = database.get_user(user_name='markdoe')
+        ids = [acc.id for acc in database.get_accounting_for_user(user)]
+
+        self.assertEqual(len(set(ids)), 2)
+        self.assertTrue(all(len(id) == 32 for id in ids))
+
+        # Another row above does not change them
+        write_csv_file(self.csv_file, GoodTable.headers,
+                       GoodTable.records[::-1] + [GoodTable.records[0]])
+        database = self.create_database()
+        user = database.get_user(user_name='markdoe')
+        new_ids = [acc.id for acc in database.get_accounting_for_user(user)]
+
+        self.assertEqual(new_ids[:2], ids[::-1])
+
+        # The duplicated row has its own id
+        self.assertEqual(len(set(new_ids)), 3)
+
+    def test_resource_limits(self):
+        database = self.create_database()
+        user = database.get_user(user_name='markdoe')
+        ids = [acc.id for acc in database.get_accounting_for_user(user)]
+
+        headers = GoodTable.headers + ('policy.mem_limit',
+                                       'policy.pids_limit')
+        write_csv_file(self.csv_file, headers,
+                       [GoodTable.records[0] + ('', ''),
+                        GoodTable.records[1] + ('512m', '100')])
+        database = self.create_database()
+        accountings = database.get_accounting_for_user(user)
+
+        self.assertEqual(
+            [acc.application_policy.resource_limits()
+             for acc in accountings],
+            [{}, {'mem_limit': 512 * 1024 ** 2, 'pids_limit': 100}])
+
+        # The rows without limits keep their ids
+        self.assertEqual(accountings[0].id, ids[0])
+        self.assertNotEqual(accountings[1].id, ids[1])
+
+        write_csv_file(self.csv_file, headers,
+                       [GoodTable.records[0] + ('lots', '')])
+        with self.assertRaises(ValueError):
+            self.create_database()
+
+    def test_reload(self):
+        database = CSVDatabase(self.csv_file, reload_interval=0)
+        markdoe = database.get_user(user_name='markdoe')
+        johndoe = database.get_user(user_name='johndoe')
+        accountings = database.get_accounting_for_user(markdoe)
+        johndoe_accountings = database.get_accounting_for_user(johndoe)
+        revision = database.get_revision()
+
+        # Nothing changed
+        self.assertEqual(database.reload(),
+                         {"added": set(), "removed": set(),
+                          "changed": set()})
+        self.assertEqual(database.get_revision(), revision)
+
+        write_csv_file(self.csv_file, GoodTable.headers,
+                       GoodTable.records[1:] + [
+                           ('janedoe', 'simphonyproject/new-image', '',
+                            '1', '1', '0', '', '', '', '0')])
+        self.assertEqual(database.reload(),
+                         {"added": {"janedoe"}, "removed": set(),
+                          "changed": {"markdoe"}})
+        self.assertNotEqual(database.get_revision(), revision)
+
+        # The ids are kept
+        self.assertIs(database.get_user(id=0), markdoe)
+        self.assertEqual(database.get_user(user_name='janedoe').id, 2)
+        self.assertEqual(
+            [app.id for app in database.list_applications()], [1, 0, 2])
+
+        new_accountings = database.get_accounting_for_user(markdoe)
+        self.assertEqual(len(new_accountings), 1)
+        self.assertEqual(new_accountings[0].id, accountings[1].id)
+
+        # The unchanged user keeps the same objects
+        self.assertIs(database.get_accounting_for_user(johndoe)[0],
+                      johndoe_accountings[0])
+
+        write_csv_file(self.csv_file, GoodTable.headers,
+                       GoodTable.records[2:])
+        self.assertEqual(database.reload()["removed"],
+                         {"markdoe", "janedoe"})
+        self.assertIsNone(database.get_user(user_name='markdoe'))
+        self.assertEqual(database.get_accounting_for_user(markdoe), [])
+
+    def test_hot_reload(self):
+        database = CSVDatabase(self.csv_file, reload_interval=0)
+        stat = os.stat(self.csv_file)
+
+        write_csv_file(self.csv_file, GoodTable.headers,
+                       GoodTable.records[2:])
+        os.utime(self.csv_file, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10**9))
+        self.assertIsNone(database.get_user(user_name='markdoe'))
+
+        # A broken file is ignored
+        write_csv_file(self.csv_file, BadTableMissingHeaders.headers,
+                       BadTableMissingHeaders.records)
+        os.utime(self.csv_file, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 2 * 10**9))
+        self.assertEqual(len(database.list_users()), 1)
+        with self.assertRaisesRegex(ValueError, "Missing headers"):
+            database.reload()
+
+    def test_hot_reload_truncated_row(self):
+        database = CSVDatabase(self.csv_file, reload_interval=0)
+        stat = os.stat(self.csv_file)
+        johndoe = database.get_user(user_name='johndoe')
+        accountings = database.get_accounting_for_user(johndoe)
+
+        # A file in the middle of a rewrite
+        with open(self.csv_file, 'a') as csv_file:
+            csv_file.write('u2,im')
+        os.utime(self.csv_file, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10**9))
+
+        self.assertIs(database.get_user(user_name='johndoe'), johndoe)
+        self.assertIsNone(database.get_user(user_name='u2'))
+        self.assertEqual(database.get_accounting_for_user(johndoe),
+                         accountings)
+        with self.assertRaisesRegex(ValueError, "Row 5 has 2 columns"):
+            database.reload()
+
+    def test_hot_reload_disabled(self):
+        database = CSVDatabase(self.csv_file, reload_interval=None)
+        stat = os.stat(self.csv_file)
+
+        write_csv_file(self.csv_file, GoodTable.headers,
+                       GoodTable.records[2:])
+        os.utime(self.csv_file, ns=(stat.st_atime_ns,
+                                    stat.st_mtime_ns + 10**9))
+        self.assertIsNotNone(database.get_user(user_name='markdoe'))
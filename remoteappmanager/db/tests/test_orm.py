@@ -1,7 +1,12 @@
 import contextlib
 import uuid
 import os
-from unittest import TestCase
+from unittest import TestCase, mock
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
 
 from remoteappmanager.db import orm
 from remoteappmanager.db import exceptions
@@ -10,6 +15,7 @@ from remoteappmanager.db.orm import (Database, transaction, Accounting,
 from remoteappmanager.db.tests.abc_test_interfaces import (
     ABCTestDatabaseInterface)
 from remoteappmanager.tests import utils
+from remoteappmanager.user import User
 from remoteappmanager.tests.temp_mixin import TempMixin
 
 
@@ -137,6 +143,198 @@ class TestOrm(TempMixin, TestCase):
             res = orm.accounting_for_user(session, None)
             self.assertEqual(len(res), 0)
 
+    def test_accounting_rows_for_user(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        session = db.create_session()
+        fill_db(session)
+
+        users = session.query(orm.User).all()
+        expected = {acc.id: acc for acc in
+                    orm.accounting_for_user(session, users[1])}
+        session.expunge_all()
+
+        # By id, with a detached user, and by name, with a new one.
+        for user in [users[1], orm.User(name="user1")]:
+            res = orm.accounting_rows_for_user(session, user)
+            self.assertEqual(len(res), 2)
+            for row in res:
+                self.assertIsInstance(row, orm.AccountingRow)
+                self.assertIs(row.user, user)
+                acc = expected[row.id]
+                self.assertEqual(row.application.id, acc.application.id)
+                self.assertEqual(row.application.image,
+                                 acc.application.image)
+                self.assertEqual(row.application_policy.allow_home,
+                                 acc.application_policy.allow_home)
+
+            # The policy is shared by the rows
+            self.assertIs(res[0].application_policy,
+                          res[1].application_policy)
+
+            # Nothing is loaded in the session
+            self.assertEqual(len(session.identity_map), 0)
+
+        self.assertEqual(orm.accounting_rows_for_user(session, None), [])
+        self.assertEqual(
+            orm.accounting_rows_for_user(session, orm.User(name="foo")), [])
+        session.close()
+
+    def test_accounting_indexes(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        indexes = {index["name"]: index["column_names"]
+                   for index in sa_inspect(db.engine).get_indexes(
+                       "accounting")}
+
+        self.assertEqual(indexes["ix_accounting_user_lookup"],
+                         ["user_id", "application_id",
+                          "application_policy_id", "id"])
+        self.assertEqual(indexes["ix_accounting_application_policy"],
+                         ["application_id", "application_policy_id"])
+
+    def test_revision(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        self.assertEqual(database.get_revision(), 0)
+
+        session = db.create_session()
+        fill_db(session)
+        revision = database.get_revision()
+        self.assertGreater(revision, 0)
+
+        # Reads don't change the revision
+        with transaction(session):
+            session.query(orm.User).all()
+        self.assertEqual(database.get_revision(), revision)
+
+        # Query deletes do
+        with transaction(session):
+            session.query(orm.Accounting).delete()
+        self.assertGreater(database.get_revision(), revision)
+        session.close()
+
+    def test_revision_of_unchanged_rows(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        session = db.create_session()
+        with contextlib.closing(session):
+            with transaction(session):
+                user = orm.User(name="foo")
+                session.add(user)
+            revision = database.get_revision()
+
+            # Assigned, but not changed
+            with transaction(session):
+                self.assertEqual(user.name, "foo")
+                user.name = "foo"
+                self.assertIn(user, session.dirty)
+            self.assertEqual(database.get_revision(), revision)
+
+            with transaction(session):
+                user.name = "bar"
+            self.assertGreater(database.get_revision(), revision)
+
+    def test_revision_of_other_sessions(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+        revision = database.get_revision()
+
+        # A session that is not of a Database is not revised
+        session = Session(bind=db.engine)
+        with contextlib.closing(session):
+            with transaction(session):
+                session.add(orm.User(name="foo"))
+        self.assertEqual(database.get_revision(), revision)
+
+    def test_revision_without_table(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        orm.Revision.__table__.drop(db.engine)
+        database = ORMDatabase(url="sqlite:///"+self.sqlite_file_path)
+
+        self.assertIsNone(database.get_revision())
+        database.create_user("foo")
+        self.assertIsNotNone(database.get_user(user_name="foo"))
+
+    def test_policy_fingerprint(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        session = db.create_session()
+        with contextlib.closing(session):
+            with transaction(session):
+                policy = orm.ApplicationPolicy(
+                    **orm.policy_fields("", True, False, "/a:/b:ro", False))
+                session.add(policy)
+
+            self.assertEqual(len(policy.fingerprint), 64)
+            self.assertEqual(policy.fingerprint,
+                             policy.compute_fingerprint())
+
+            # NULLs and empty strings, NULLs and false are the same
+            self.assertEqual(policy.fingerprint, orm.policy_fingerprint(
+                app_license=None, allow_home=1, allow_common=True,
+                allow_view=None, volume_source="/a", volume_target="/b",
+                volume_mode="ro"))
+            self.assertNotEqual(policy.fingerprint, orm.policy_fingerprint(
+                allow_home=True, allow_common=True,
+                volume_source="/a", volume_target="/b", volume_mode="rw"))
+
+            self.assertIs(
+                orm.find_policy(session, orm.policy_fields(
+                    None, True, False, "/a:/b:ro", False)),
+                policy)
+            self.assertIsNone(orm.find_policy(session, orm.policy_fields(
+                None, False, False, "/a:/b:ro", False)))
+
+            # The policies without resource limits keep the fingerprint
+            # they had before the limits were introduced
+            self.assertEqual(
+                policy.fingerprint,
+                "63873c86bfc0c9c74308072214b444bc"
+                "c4635ce5aa2cd64c854f20a0545e61fa")
+            self.assertNotEqual(
+                policy.fingerprint,
+                orm.policy_fingerprint(**orm.policy_fields(
+                    None, True, False, "/a:/b:ro", False,
+                    {"mem_limit": "1g"})))
+
+            # Equivalent policies can't be stored twice
+            with self.assertRaises(IntegrityError):
+                with transaction(session):
+                    session.add(orm.ApplicationPolicy(
+                        **orm.policy_fields(None, True, False,
+                                            "/a:/b:ro", False)))
+
+    def pragma(self, db, name):
+        with db.engine.connect() as connection:
+            return connection.execute("PRAGMA {}".format(name)).scalar()
+
+    def test_sqlite_pragmas(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path)
+        self.assertEqual(self.pragma(db, "journal_mode"), "delete")
+        self.assertEqual(self.pragma(db, "busy_timeout"), 10000)
+        self.assertEqual(self.pragma(db, "foreign_keys"), 1)
+
+        db = Database(url="sqlite:///"+self.sqlite_file_path,
+                      sqlite_pragmas={"busy_timeout": 100})
+        self.assertEqual(self.pragma(db, "busy_timeout"), 100)
+        self.assertEqual(self.pragma(db, "foreign_keys"), 1)
+
+    def test_sqlite_wal(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path,
+                      sqlite_wal=True)
+        self.assertEqual(self.pragma(db, "journal_mode"), "wal")
+        self.assertEqual(self.pragma(db, "synchronous"), 1)
+        self.assertEqual(self.pragma(db, "busy_timeout"), 10000)
+
+    def test_connection_pool(self):
+        db = Database(url="sqlite:///"+self.sqlite_file_path,
+                      pool_size=2, pool_recycle=3600, pool_pre_ping=True)
+        self.assertEqual(db.engine.pool.size(), 2)
+
+        # The connections are reused
+        with db.engine.connect() as connection:
+            first = connection.connection.connection
+        with db.engine.connect() as connection:
+            self.assertIs(connection.connection.connection, first)
+
 
 class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
                       TestCase):
@@ -148,19 +346,22 @@ class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
         self.sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
         utils.init_sqlite_db(self.sqlite_file_path)
 
-        self.addTypeEqualityFunc(orm.Application, self.assertApplicationEqual)
-        self.addTypeEqualityFunc(orm.ApplicationPolicy,
+        self.addTypeEqualityFunc(orm.ApplicationRow,
+                                 self.assertApplicationEqual)
+        self.addTypeEqualityFunc(orm.ApplicationPolicyRow,
                                  self.assertApplicationPolicyEqual)
 
     def create_expected_users(self):
         return tuple(orm.User(name='user'+str(i)) for i in range(5))
 
     def create_expected_configs(self, user):
-        apps = [orm.Application(image="docker/image"+str(i))
+        apps = [orm.ApplicationRow(id=None, image="docker/image"+str(i))
                 for i in range(3)]
-        policy = orm.ApplicationPolicy(allow_home=False,
-                                       allow_common=False,
-                                       allow_view=False)
+        # allow_startup_data is not set by fill_db
+        policy = orm.ApplicationPolicyRow(allow_home=False,
+                                          allow_common=False,
+                                          allow_view=False,
+                                          allow_startup_data=None)
         mappings = {
             'user0': ((apps[1], policy),),
             'user1': ((apps[0], policy),
@@ -213,6 +414,23 @@ class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
         self.assertEqual(accounting.application, expected_config[0][0])
         self.assertEqual(accounting.application_policy, expected_config[0][1])
 
+    def test_get_accounting_for_application_user(self):
+        database = self.create_database()
+
+        # The handlers pass the user of the application, which has a
+        # name but no id.
+        user = User(name='user1')
+        accountings = database.get_accounting_for_user(user)
+
+        expected_config = self.create_expected_configs(orm.User(name='user1'))
+        self.assertEqual(len(accountings), len(expected_config))
+        self.assertEqual(
+            sorted(accounting.application.image for accounting in accountings),
+            sorted(app.image for app, _ in expected_config))
+
+        self.assertEqual(
+            database.get_accounting_for_user(User(name='foo')), [])
+
     def test_no_file_creation_if_sqlite_database_not_exist(self):
         temp_file_path = os.path.join(self.tempdir, 'some.db')
 
@@ -368,6 +586,128 @@ class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
                 "simphonyremote/amazing", "hello", 'some_key',
                 True, False, "/foo:/bar:ro", False)
 
+    def test_grant_revoke_access_bulk(self):
+        database = self.create_database()
+        for user_name in ["user_a", "user_b"]:
+            database.create_user(user_name)
+        for app_name in ["app1", "app2"]:
+            database.create_application(app_name)
+
+        grants = [
+            {"app_name": "app1", "user_name": "user_a"},
+            {"app_name": "app2", "user_name": "user_a",
+             "allow_home": True, "volume": "/foo:/bar:ro"},
+            {"app_name": "app1", "user_name": "user_b"},
+            # Duplicate of the first one
+            {"app_name": "app1", "user_name": "user_a"},
+        ]
+
+        ids = database.grant_access_bulk(grants)
+        self.assertEqual(len(ids), 4)
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual(ids[0], ids[3])
+
+        user_a = database.get_user(user_name="user_a")
+        accountings = {acc.id: acc
+                       for acc in database.get_accounting_for_user(user_a)}
+        self.assertEqual(set(accountings), set(ids[:2]))
+        policy = accountings[ids[1]].application_policy
+        self.assertEqual(accountings[ids[1]].application.image, "app2")
+        self.assertTrue(policy.allow_home)
+        self.assertTrue(policy.allow_common)
+        self.assertEqual(policy.volume_source, "/foo")
+
+        # Same results as the single grant. An empty license is
+        # the same as no license.
+        self.assertEqual(
+            database.grant_access("app1", "user_b", "", False, False,
+                                  None, False),
+            ids[2])
+        self.assertEqual(database.grant_access_bulk(grants), ids)
+
+        # Nothing is granted if something is not found
+        with self.assertRaises(exceptions.NotFound):
+            database.grant_access_bulk([
+                {"app_name": "app2", "user_name": "user_b"},
+                {"app_name": "app1", "user_name": "user_c"}])
+        user_b = database.get_user(user_name="user_b")
+        self.assertEqual(len(database.get_accounting_for_user(user_b)), 1)
+
+        with self.assertRaises(ValueError):
+            database.grant_access_bulk([
+                {"app_name": "app1", "user_name": "user_a",
+                 "volume": "/foo"}])
+
+        database.revoke_access_bulk(grants[:2])
+        self.assertEqual(database.get_accounting_for_user(user_a), [])
+        self.assertEqual(len(database.get_accounting_for_user(user_b)), 1)
+
+        with self.assertRaises(exceptions.NotFound):
+            database.revoke_access_bulk([
+                {"app_name": "app1", "user_name": "user_b",
+                 "app_license": "unknown"}])
+        self.assertEqual(len(database.get_accounting_for_user(user_b)), 1)
+
+        self.assertEqual(database.grant_access_bulk([]), [])
+        database.revoke_access_bulk([])
+
+    def test_grant_access_bulk_queries(self):
+        database = self.create_database()
+        user_names = ["bulk{}".format(i) for i in range(100)]
+        for user_name in user_names:
+            database.create_user(user_name)
+        database.create_application("app1")
+
+        statements = []
+
+        def count(*args):
+            statements.append(args[2])
+
+        event.listen(Engine, "before_cursor_execute", count)
+        try:
+            ids = database.grant_access_bulk(
+                [{"app_name": "app1", "user_name": user_name,
+                  "allow_home": True}
+                 for user_name in user_names])
+        finally:
+            event.remove(Engine, "before_cursor_execute", count)
+
+        self.assertEqual(len(set(ids)), 100)
+        inserts = [statement for statement in statements
+                   if statement.startswith("INSERT INTO accounting")]
+        self.assertEqual(len(inserts), 1)
+        self.assertLess(len(statements), 12)
+
+    def test_grant_access_bulk_chunks(self):
+        database = self.create_database()
+        user_names = ["chunk{}".format(i) for i in range(3)]
+        app_names = ["app{}".format(i) for i in range(5)]
+        for user_name in user_names:
+            database.create_user(user_name)
+        for app_name in app_names:
+            database.create_application(app_name)
+        grants = [{"app_name": app_name, "user_name": user_name}
+                  for user_name in user_names
+                  for app_name in app_names]
+
+        parameters = []
+
+        def count(*args):
+            parameters.append(len(args[3]))
+
+        event.listen(Engine, "before_cursor_execute", count)
+        try:
+            with mock.patch.object(orm, "_IN_CLAUSE_SIZE", 4):
+                ids = database.grant_access_bulk(grants)
+                # Granting again finds all the existing accountings
+                self.assertEqual(database.grant_access_bulk(grants), ids)
+        finally:
+            event.remove(Engine, "before_cursor_execute", count)
+
+        self.assertEqual(len(set(ids)), 15)
+        # Only the single INSERT of the accountings is not chunked
+        self.assertEqual(len([n for n in parameters if n > 4]), 1)
+
     def test_grant_revoke_access_volume(self):
         database = self.create_database()
 
@@ -440,6 +780,40 @@ class TestOrmDatabase(TempMixin, ABCTestDatabaseInterface,
         self.assertEqual(acc[0].application_policy.volume_mode, "ro")
         self.assertEqual(acc[0].application_policy.allow_startup_data, True)
 
+    def test_resource_limits(self):
+        database = self.create_database()
+
+        database.create_user("ciccio")
+        database.create_application("simphonyremote/amazing")
+        database.grant_access(
+            "simphonyremote/amazing", "ciccio", None,
+            False, False, None, False)
+        database.grant_access(
+            "simphonyremote/amazing", "ciccio", None,
+            False, False, None, False,
+            {"mem_limit": "512m", "cpu_quota": 50000, "pids_limit": 0})
+
+        user = database.get_user(user_name="ciccio")
+        acc = database.get_accounting_for_user(user)
+        self.assertEqual(
+            sorted((a.application_policy.resource_limits() for a in acc),
+                   key=len),
+            [{}, {"mem_limit": 512 * 1024 ** 2, "cpu_quota": 50000}])
+
+        with self.assertRaises(ValueError):
+            database.grant_access(
+                "simphonyremote/amazing", "ciccio", None,
+                False, False, None, False, {"mem_limit": "lots"})
+
+        database.revoke_access(
+            "simphonyremote/amazing", "ciccio", None,
+            False, False, None, False,
+            {"mem_limit": 512 * 1024 ** 2, "cpu_quota": "50000"})
+
+        acc = database.get_accounting_for_user(user)
+        self.assertEqual([a.application_policy.resource_limits()
+                          for a in acc], [{}])
+
     def test_unsupported_ops(self):
         """Override to silence the base class assumption that most of
         our backends are unable to create."""
@@ -1,11 +1,36 @@
-from concurrent.futures import ThreadPoolExecutor
-
 import docker
 import functools
-
-# Common threaded executor for asynchronous jobs.
-# Required for the AsyncDockerClient to operate.
-_executor = ThreadPoolExecutor(1)
+import threading
+import time
+
+from tornado import ioloop
+from tornado.concurrent import Future
+
+from remoteappmanager import metrics
+from remoteappmanager.executor import InstrumentedExecutor
+
+#: Docker client methods that change the lifecycle of a container or
+#: image. Some of them can take a long time to complete (e.g. stop waits
+#: up to 10 seconds for the container to terminate), so they are submitted
+#: to a separate executor, to prevent them from starving the quick
+#: queries (inspect_image, containers, port...).
+LIFECYCLE_METHODS = frozenset([
+    "create_container",
+    "start",
+    "stop",
+    "restart",
+    "kill",
+    "wait",
+    "remove_container",
+    "pull",
+    "remove_image",
+])
+
+#: Docker client methods that only compute their result locally. They are
+#: invoked right away, without going through an executor.
+LOCAL_METHODS = frozenset([
+    "create_host_config",
+])
 
 
 class AsyncDockerClient:
@@ -13,24 +38,34 @@ class AsyncDockerClient:
     All Client interface is available as methods returning a future
     instead of the actual result. The resulting future can be yielded.
 
-    This class is thread safe. Note that all instances use the same
-    executor.
+    This class is thread safe. Each instance has two executors: one
+    for the lifecycle operations, and one for everything else.
     """
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, max_workers=1, **kwargs):
         """Initialises the docker async client.
 
-        The client uses a single, module level executor to submit
-        requests and obtain futures. The futures must be yielded
-        according to the tornado asynchronous interface.
+        The client submits requests to one of its executors and obtains
+        futures. The futures must be yielded according to the tornado
+        asynchronous interface.
 
         The exported methods are the same as from the docker-py
         synchronous client, with the exception of their async nature.
 
-        Note that the executor is a ThreadPoolExecutor with a single thread.
+        Parameters
+        ----------
+        max_workers: int
+            The number of threads of each executor.
+        *args, **kwargs:
+            Arguments passed to the docker-py APIClient.
         """
         self._sync_client = docker.APIClient(*args, **kwargs)
 
+        self._executors = {
+            "lifecycle": InstrumentedExecutor(max_workers, name="lifecycle"),
+            "query": InstrumentedExecutor(max_workers, name="query"),
+        }
+
     def __getattr__(self, attr):
         """Returns the docker client method, wrapped in an async execution
         environment. The returned method must be used in conjunction with
@@ -45,11 +80,82 @@ class AsyncDockerClient:
                 )
             )
 
+    def watch_events(self, callback, filters=None, cancel=None):
+        """Streams the docker events. callback is invoked on the ioloop
+        with each event dictionary as it arrives.
+
+        The dockerpy event generator blocks, so it is consumed by a
+        dedicated daemon thread rather than by the executors.
+
+        Parameters
+        ----------
+        callback: callable
+            Invoked with each event.
+        filters: dict or None
+            The filters of the events, as in dockerpy events.
+        cancel: Future or None
+            A future that stops the stream when it is resolved.
+            Note that the thread can only notice the cancellation when
+            the next event arrives.
+
+        Returns
+        -------
+        A future that resolves when the stream terminates.
+        """
+        loop = ioloop.IOLoop.current()
+        result = Future()
+        cancelled = threading.Event()
+
+        def resolve(exception=None):
+            if result.done():
+                return
+            if exception is None:
+                result.set_result(None)
+            else:
+                result.set_exception(exception)
+
+        def on_cancel(future):
+            cancelled.set()
+            resolve()
+
+        if cancel is not None:
+            loop.add_future(cancel, on_cancel)
+
+        def consume():
+            try:
+                events = self._sync_client.events(filters=filters,
+                                                  decode=True)
+                for event in events:
+                    if cancelled.is_set():
+                        break
+                    loop.add_callback(callback, event)
+            except Exception as e:
+                loop.add_callback(resolve, e)
+            else:
+                loop.add_callback(resolve)
+
+        thread = threading.Thread(target=consume,
+                                  name="docker-events",
+                                  daemon=True)
+        thread.start()
+        return result
+
+    def executor_stats(self):
+        """Returns the queue statistics of the executors.
+
+        Returns
+        -------
+        A dictionary with the executor name ("lifecycle" or "query") as key
+        and the result of InstrumentedExecutor.stats() as value.
+        """
+        return {name: executor.stats()
+                for name, executor in self._executors.items()}
+
     # Private
 
     def _submit_to_executor(self, method, *args, **kwargs):
         """Call a synchronous docker client method in a background thread,
-        using the module level executor.
+        using the executor appropriate for the method.
 
         Parameters
         ----------
@@ -62,13 +168,32 @@ class AsyncDockerClient:
         Return
         ------
 
-        A future from the ThreadPoolExecutor.
+        A future from the executor, or an already resolved future for the
+        LOCAL_METHODS.
         """
-        return _executor.submit(self._invoke, method, *args, **kwargs)
+        if method in LOCAL_METHODS:
+            future = Future()
+            try:
+                future.set_result(self._invoke(method, *args, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+
+        if method in LIFECYCLE_METHODS:
+            executor = self._executors["lifecycle"]
+        else:
+            executor = self._executors["query"]
+
+        return executor.submit(self._invoke, method, *args, **kwargs)
 
     def _invoke(self, method, *args, **kwargs):
         """wrapper for calling docker methods to be passed to
-        ThreadPoolExecutor.
+        the executor.
         """
         m = getattr(self._sync_client, method)
-        return m(*args, **kwargs)
+        start = time.monotonic()
+        try:
+            return m(*args, **kwargs)
+        finally:
+            metrics.DOCKER_REQUEST_DURATION_SECONDS.labels(
+                method=method).observe(time.monotonic() - start)
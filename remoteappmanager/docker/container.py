@@ -1,58 +1,89 @@
 from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
-from traitlets import Unicode, HasTraits, Int, validate, TraitError
 
 
-class Container(HasTraits):
+class Container:
     """Class representing a container.
     Note that its existence just describes a container.
     It does not imply that the associated container is still
-    running, registered, or anything"""
+    running, registered, or anything
 
-    #: The docker id of the container
-    docker_id = Unicode()
+    Containers are built for every item of every listing, so this is a
+    plain value type with __slots__ rather than a HasTraits object.
+    The attributes are not validated, except urlpath.
+    """
 
-    #: The practical name of the container
-    name = Unicode()
+    #: The attributes and their default values
+    _DEFAULTS = (
+        # The docker id of the container
+        ("docker_id", ""),
 
-    #: The image name
-    image_name = Unicode()
+        # The practical name of the container
+        ("name", ""),
 
-    #: And the image docker id
-    image_id = Unicode()
+        # The image name
+        ("image_name", ""),
 
-    #: Mapping identifier
-    mapping_id = Unicode()
+        # And the image docker id
+        ("image_id", ""),
 
-    #: The ip address...
-    ip = Unicode()
+        # Mapping identifier
+        ("mapping_id", ""),
 
-    #: ...and port where the container service will be listening
-    port = Int(80)
+        # The ip address...
+        ("ip", ""),
 
-    #: The id that will go in the URL of the container.
-    #: This is a de-facto replacement for the container docker id. The reason
-    #: why we don't use that instead is because the container id is difficult
-    #: to obtain reliably from inside the container, and because we want more
-    #: flexibility in the form of the user-exposed id.
-    #: Important: must be globally unique, not just per-user unique.
-    url_id = Unicode()
+        # ...and port where the container service will be listening
+        ("port", 80),
 
-    #: The user currently running the container
-    user = Unicode()
+        # The id that will go in the URL of the container.
+        # This is a de-facto replacement for the container docker id. The
+        # reason why we don't use that instead is because the container id
+        # is difficult to obtain reliably from inside the container, and
+        # because we want more flexibility in the form of the user-exposed
+        # id.
+        # Important: must be globally unique, not just per-user unique.
+        ("url_id", ""),
 
-    #: The url path of the container as it is exported to the user.
-    #: e.g. "/home/test/containers/12345"
-    #: Must not have an end slash.
-    urlpath = Unicode()
+        # The user currently running the container
+        ("user", ""),
 
-    # The docker realm under which the container is running.
-    realm = Unicode()
+        # The url path of the container as it is exported to the user.
+        # e.g. "/home/test/containers/12345"
+        # Must not have an end slash.
+        ("urlpath", ""),
 
-    @validate("urlpath")
-    def _urlpath_validate(self, proposal):
-        if proposal['value'].endswith('/'):
-            raise TraitError("urlpath cannot end with a /")
-        return proposal['value']
+        # The docker realm under which the container is running.
+        ("realm", ""),
+
+        # True if the container was pre-started for a warm pool
+        ("warm", False),
+    )
+
+    __slots__ = tuple(
+        name if name != "urlpath" else "_urlpath" for name, _ in _DEFAULTS)
+
+    def __init__(self, **kwargs):
+        for name, default in self._DEFAULTS:
+            setattr(self, name, kwargs.pop(name, default))
+
+        if kwargs:
+            raise TypeError("Unexpected arguments: {}".format(
+                ", ".join(sorted(kwargs))))
+
+    @property
+    def urlpath(self):
+        return self._urlpath
+
+    @urlpath.setter
+    def urlpath(self, value):
+        if value.endswith('/'):
+            raise ValueError("urlpath cannot end with a /")
+        self._urlpath = value
+
+    @classmethod
+    def field_names(cls):
+        """Returns the names of the attributes describing the container"""
+        return [name for name, _ in cls._DEFAULTS]
 
     @property
     def host_url(self):
@@ -68,7 +99,7 @@ class Container(HasTraits):
             '<Container(' +
             ", ".join(
                 "{}={}".format(name, getattr(self, name))
-                for name in self.trait_names()
+                for name in self.field_names()
                 ) +
             ")>")
 
@@ -105,8 +136,8 @@ class Container(HasTraits):
 
         kwargs = dict(
             docker_id=docker_dict.get('Id') or '',
-            ip=cls.ip.default_value,
-            port=cls.port.default_value,
+            ip="",
+            port=80,
         )
 
         if is_inspect_container_output:
@@ -137,7 +168,7 @@ class Container(HasTraits):
             config = docker_dict.get("Config", {})
             labels = config.get("Labels")
 
-            kwargs["image_name"] = config.get("Image")
+            kwargs["image_name"] = config.get("Image") or ''
             kwargs["image_id"] = docker_dict["Image"]
             kwargs["name"] = docker_dict["Name"]
         else:
@@ -167,10 +198,6 @@ class Container(HasTraits):
         kwargs["user"] = labels.get(SIMPHONY_NS_RUNINFO.user) or ""
         kwargs["urlpath"] = labels.get(SIMPHONY_NS_RUNINFO.urlpath) or ""
         kwargs["realm"] = labels.get(SIMPHONY_NS_RUNINFO.realm) or ""
+        kwargs["warm"] = labels.get(SIMPHONY_NS_RUNINFO.warm) == "1"
 
-        try:
-            return cls(**kwargs)
-        except TraitError as e:
-            raise ValueError(
-                "Data does not satisfy trait constraints. "
-                "{}.".format(e))
+        return cls(**kwargs)
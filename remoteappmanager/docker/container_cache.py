@@ -0,0 +1,240 @@
+import time
+
+
+class ContainerCache:
+    """An in-memory view of the containers of a realm, indexed by
+    docker id, url id, user and (user, mapping id).
+
+    The cache does not talk to docker. It is filled by its owner (the
+    ContainerManager) with a full snapshot (replace), and kept current
+    with the individual changes (put, discard).
+
+    A snapshot is taken over some time, during which the individual
+    changes keep coming. The owner obtains a sequence number with
+    begin_snapshot() before taking it: the containers changed after that
+    are more recent than the snapshot, which does not override them.
+    """
+
+    def __init__(self):
+        #: docker_id -> Container
+        self._containers = {}
+
+        #: url_id -> set of docker ids
+        self._by_url_id = {}
+
+        #: user -> set of docker ids
+        self._by_user = {}
+
+        #: (user, mapping_id) -> set of docker ids
+        self._by_user_mapping = {}
+
+        #: The number of individual changes applied so far
+        self._sequence = 0
+
+        #: docker_id -> sequence number of its last individual change,
+        #: while a snapshot that began before it is being taken.
+        self._changed = {}
+
+        #: The sequence numbers of the snapshots being taken
+        self._snapshots = []
+
+        #: True when the cache has been filled with a snapshot, and can
+        #: be used to answer queries.
+        self.seeded = False
+
+        #: The time (time.monotonic) of the last snapshot
+        self.last_sync = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.events = 0
+        self.resyncs = 0
+        self.stale_entries = 0
+
+    def __len__(self):
+        return len(self._containers)
+
+    def begin_snapshot(self):
+        """Records that a snapshot is about to be taken. Returns its
+        sequence number, to pass to replace() and end_snapshot()."""
+        self._snapshots.append(self._sequence)
+        return self._sequence
+
+    def end_snapshot(self, since):
+        """Records that the snapshot begun with the given sequence number
+        is over, whether it was used to replace the cache or not."""
+        self._snapshots.remove(since)
+        oldest = min(self._snapshots, default=self._sequence)
+        self._changed = {docker_id: sequence
+                         for docker_id, sequence in self._changed.items()
+                         if sequence > oldest}
+
+    def replace(self, containers, since=None):
+        """Replaces the content of the cache with a fresh snapshot.
+
+        Parameters
+        ----------
+        containers: list
+            The Container objects currently present.
+        since: int or None
+            The sequence number returned by begin_snapshot() before the
+            snapshot was taken. The containers put or discarded after it
+            are kept as they are. If None, the snapshot replaces all.
+
+        Returns
+        -------
+        The number of cached entries that were stale, i.e. missing, no
+        longer present or different from the snapshot.
+        """
+        new = {container.docker_id: container for container in containers}
+
+        if since is not None:
+            # More recent than the snapshot
+            for docker_id, sequence in self._changed.items():
+                if sequence <= since:
+                    continue
+
+                new.pop(docker_id, None)
+                container = self._containers.get(docker_id)
+                if container is not None:
+                    new[docker_id] = container
+
+        stale = 0
+        for docker_id in self._containers.keys() | new.keys():
+            old_container = self._containers.get(docker_id)
+            new_container = new.get(docker_id)
+            if (old_container is None or new_container is None or
+                    _signature(old_container) != _signature(new_container)):
+                stale += 1
+
+        self._containers = {}
+        self._by_url_id = {}
+        self._by_user = {}
+        self._by_user_mapping = {}
+
+        for container in new.values():
+            self._index(container)
+
+        if self.seeded:
+            # The difference against the initial seed is not staleness.
+            self.stale_entries += stale
+
+        self.seeded = True
+        self.last_sync = time.monotonic()
+        self.resyncs += 1
+
+        return stale
+
+    def put(self, container):
+        """Adds or updates a container"""
+        self.discard(container.docker_id)
+        self._index(container)
+
+    def discard(self, docker_id):
+        """Removes the container with the given docker id, if present"""
+        self._sequence += 1
+        if self._snapshots:
+            self._changed[docker_id] = self._sequence
+
+        container = self._containers.pop(docker_id, None)
+        if container is None:
+            return
+
+        _remove_from_index(self._by_url_id, container.url_id, docker_id)
+        _remove_from_index(self._by_user, container.user, docker_id)
+        _remove_from_index(self._by_user_mapping,
+                           (container.user, container.mapping_id),
+                           docker_id)
+
+    def get(self, docker_id):
+        """Returns the container with the given docker id, or None"""
+        return self._containers.get(docker_id)
+
+    def find(self, *, url_id=None, mapping_id=None, user_name=None):
+        """Returns the cached containers matching all the specified
+        arguments, like ContainerManager.find_containers."""
+        if url_id is not None:
+            candidates = self._by_url_id.get(url_id, ())
+        elif user_name is not None and mapping_id is not None:
+            candidates = self._by_user_mapping.get(
+                (user_name, mapping_id), ())
+        elif user_name is not None:
+            candidates = self._by_user.get(user_name, ())
+        else:
+            candidates = self._containers.keys()
+
+        result = []
+        for docker_id in candidates:
+            container = self._containers[docker_id]
+            if url_id is not None and container.url_id != url_id:
+                continue
+            if mapping_id is not None and container.mapping_id != mapping_id:
+                continue
+            if user_name is not None and container.user != user_name:
+                continue
+            result.append(container)
+
+        return result
+
+    def clear(self):
+        """Empties the cache. It will have to be seeded again before
+        it can be used."""
+        self._containers = {}
+        self._by_url_id = {}
+        self._by_user = {}
+        self._by_user_mapping = {}
+        self.seeded = False
+
+    def stats(self):
+        """Returns the cache counters.
+
+        Returns
+        -------
+        dict
+            size: number of cached containers
+            seeded: if the cache is answering queries
+            hits: queries answered by the cache
+            misses: queries that had to go to docker
+            events: docker events applied to the cache
+            resyncs: full snapshots loaded
+            stale_entries: entries found out of date by the resyncs
+            age: seconds since the last snapshot, or None
+        """
+        return {
+            "size": len(self._containers),
+            "seeded": self.seeded,
+            "hits": self.hits,
+            "misses": self.misses,
+            "events": self.events,
+            "resyncs": self.resyncs,
+            "stale_entries": self.stale_entries,
+            "age": (None if self.last_sync is None
+                    else time.monotonic() - self.last_sync),
+        }
+
+    # Private
+
+    def _index(self, container):
+        docker_id = container.docker_id
+        self._containers[docker_id] = container
+        self._by_url_id.setdefault(container.url_id, set()).add(docker_id)
+        self._by_user.setdefault(container.user, set()).add(docker_id)
+        self._by_user_mapping.setdefault(
+            (container.user, container.mapping_id), set()).add(docker_id)
+
+
+def _remove_from_index(index, key, docker_id):
+    docker_ids = index.get(key)
+    if docker_ids is None:
+        return
+
+    docker_ids.discard(docker_id)
+    if not docker_ids:
+        del index[key]
+
+
+def _signature(container):
+    """The information of a container that matters to the cache"""
+    return tuple(getattr(container, name)
+                 for name in sorted(container.field_names()))
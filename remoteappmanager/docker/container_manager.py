@@ -1,29 +1,47 @@
+import functools
 import os
 import string
-from urllib.parse import urlparse
 import uuid
 import random
 
 from docker.errors import APIError, NotFound
 from escapism import escape
+from remoteappmanager.cache import SingleFlight, TTLCache
 from remoteappmanager.docker.async_docker_client import AsyncDockerClient
+from remoteappmanager.docker.container_cache import ContainerCache
+from remoteappmanager.docker.native_docker_client import NativeDockerClient
 from remoteappmanager.docker.container import Container
-from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
+from remoteappmanager.docker.docker_host import (
+    DockerHost,
+    host_load,
+    placement_key)
+from remoteappmanager.docker.docker_labels import (
+    SIMPHONY_NS,
+    SIMPHONY_NS_RUNINFO)
 
 from remoteappmanager.docker.image import Image
+from remoteappmanager.docker.warm_pool import WarmKey, WarmPool
 from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.netutils import backoff_delays
+from remoteappmanager.start_trace import StartTrace
 from remoteappmanager.utils import (
     url_path_join,
     without_end_slash)
 
 
-from tornado import gen
+from tornado import gen, ioloop
+from tornado.concurrent import Future
 from traitlets import (
+    Any,
+    Bool,
+    Float,
     Int,
     Dict,
     Set,
     Instance,
+    List,
     Unicode,
+    Union,
     default)
 
 
@@ -32,6 +50,10 @@ from traitlets import (
 _CONTAINER_SAFE_CHARS = set(string.ascii_letters + string.digits + '-.')
 _CONTAINER_ESCAPE_CHAR = '_'
 
+#: The ways the readiness of a container can be established.
+#: See SIMPHONY_NS.readiness
+READINESS_CHECKS = ("http", "tcp", "healthcheck")
+
 
 class OperationInProgress(Exception):
     """Exception raised when the operation for the requested image or
@@ -54,18 +76,105 @@ class ContainerManager(LoggingMixin):
     #: The docker client configuration
     docker_config = Dict()
 
+    #: The docker client configurations of the other docker hosts, if any.
+    #: The containers of all the hosts are managed together, and the new
+    #: ones are placed on the least loaded host that has the image.
+    additional_docker_configs = List(Dict())
+
     # Docker realm this container manager handles. Useful to have
     # different instances of simphony-remote access the same docker.
     realm = Unicode("remoteexec")
 
+    #: The number of threads of each executor of the docker client.
+    docker_executor_workers = Int(4)
+
+    #: If True, talk to the docker engine with the NativeDockerClient
+    #: instead of the thread based AsyncDockerClient.
+    docker_native_client = Bool(False)
+
+    #: The maximum number of simultaneous connections to the docker engine
+    #: when using the native client.
+    docker_max_connections = Int(10)
+
+    #: If True, keep an in-memory view of the realm containers, fed by
+    #: the docker events, and use it to answer the find queries.
+    #: The cache is activated by start_container_cache().
+    container_cache_enabled = Bool(False)
+
+    #: The interval (seconds) between the full resyncs of the container
+    #: cache, to recover from missed events.
+    container_cache_resync_interval = Float(60.0)
+
+    #: The maximum number of entries of the image cache. An image is
+    #: cached both by the name it was requested with and by its id.
+    #: Zero disables the cache.
+    image_cache_size = Int(128)
+
+    #: The time (seconds) an image is kept in the cache. The cache is
+    #: also invalidated by the docker image events, once
+    #: start_image_cache() is called and an image is looked up.
+    image_cache_ttl = Float(300.0)
+
+    #: If True, the containers with a docker HEALTHCHECK and no readiness
+    #: label are ready when docker reports them healthy.
+    honour_healthcheck = Bool(True)
+
+    #: The maximum number of idle, pre-started containers, kept for the
+    #: applications requested the most. Zero disables the pool.
+    warm_pool_size = Int(0)
+
+    #: The images whose containers can be pre-started. Only the requests
+    #: that mount no volumes can be served by a pre-started container.
+    warm_pool_images = List(Unicode())
+
     #: Tracks if a given mapping id is starting up.
     _start_pending = Set()
 
     #: Tracks if a given container id is stopping down.
     _stop_pending = Set()
 
-    #: The asynchronous docker client.
-    _docker_client = Instance(AsyncDockerClient)
+    #: The view of the realm containers.
+    _container_cache = Instance(ContainerCache, args=())
+
+    #: Resolved to stop watching the docker events.
+    _cache_stop = Instance(Future, allow_none=True)
+
+    #: The periodic resync of the container cache.
+    _cache_resync_callback = Any()
+
+    #: The parsed Image objects, by name and id.
+    _image_cache = Instance(TTLCache)
+
+    #: Shares the image inspections in progress among the requests.
+    _image_requests = Instance(SingleFlight, args=())
+
+    #: Resolved to stop watching the docker image events.
+    _image_cache_stop = Instance(Future, allow_none=True)
+
+    #: True if start_image_cache() asked to follow the image events.
+    _image_cache_events = Bool(False)
+
+    #: Incremented at every invalidation of the image cache. An image
+    #: inspected from docker is stored only if no invalidation happened
+    #: in the meantime, as it may be stale.
+    _image_generation = Int(0)
+
+    #: The pre-started containers.
+    _warm_pool = Instance(WarmPool)
+
+    #: The futures of the warm pool fills in progress.
+    _warm_fills = Set()
+
+    #: The asynchronous docker client of the first docker host.
+    _docker_client = Union([Instance(AsyncDockerClient),
+                            Instance(NativeDockerClient)])
+
+    #: The docker hosts. The first one is the host of docker_config.
+    _hosts = List(Instance(DockerHost))
+
+    #: docker id -> DockerHost of the containers, when there are
+    #: multiple hosts.
+    _container_hosts = Dict()
 
     def __init__(self, docker_config, *args, **kwargs):
         """Initializes the Container manager.
@@ -88,7 +197,9 @@ class ContainerManager(LoggingMixin):
                         mapping_id,
                         base_urlpath,
                         volumes,
-                        environment=None):
+                        environment=None,
+                        trace=None,
+                        resource_limits=None):
         """
         Starts a container using the given image name.
 
@@ -111,6 +222,14 @@ class ContainerManager(LoggingMixin):
         environment: dict or None
             Contains additional keyvalue pairs that will be exported
             as environment variables inside the container.
+        trace: StartTrace or None
+            If given, the prepare, create and start phases are marked
+            on it, or the claim phase if a pre-started container is used.
+            The inspect, lookup and evict phases are overlapped.
+        resource_limits: dict or None
+            The resource limits of the container, as keyword arguments
+            of create_host_config (mem_limit, cpu_shares, cpu_quota,
+            pids_limit, shm_size).
 
         Return
         ------
@@ -129,19 +248,125 @@ class ContainerManager(LoggingMixin):
         if environment is None:
             environment = {}
 
+        if resource_limits is None:
+            resource_limits = {}
+
+        if trace is None:
+            trace = StartTrace()
+
+        warm_key = self._warm_key(user_name,
+                                  image_name,
+                                  mapping_id,
+                                  base_urlpath,
+                                  volumes,
+                                  environment,
+                                  resource_limits)
+
         try:
             self._start_pending.add(mapping_id)
-            result = yield self._start_container(user_name,
-                                                 image_name,
-                                                 mapping_id,
-                                                 base_urlpath,
-                                                 volumes,
-                                                 environment)
+
+            result = None
+            if warm_key is not None:
+                self._warm_pool.record_demand(warm_key)
+                self._warm_pool.start_request(warm_key)
+                result = yield self._claim_warm_container(warm_key, trace)
+                if result is not None:
+                    trace.mark("claim")
+
+            if result is None:
+                result = yield self._start_container(user_name,
+                                                     image_name,
+                                                     mapping_id,
+                                                     base_urlpath,
+                                                     volumes,
+                                                     environment,
+                                                     resource_limits,
+                                                     trace)
+                if warm_key is not None:
+                    self._warm_pool.track(warm_key, result.docker_id)
         finally:
             self._start_pending.remove(mapping_id)
+            if warm_key is not None:
+                self._warm_pool.end_request(warm_key)
+
+        if warm_key is not None:
+            # The demand changed, and a pre-started container may have
+            # been consumed.
+            ioloop.IOLoop.current().spawn_callback(self.fill_warm_pool)
 
         return result
 
+    @gen.coroutine
+    def container_readiness(self, container_id):
+        """Returns how the readiness of a started container must be
+        established, one of READINESS_CHECKS.
+
+        The image can declare it with the readiness label. Otherwise, it
+        is "healthcheck" for the containers with a docker HEALTHCHECK
+        (if honour_healthcheck is set), and "http" for all the others.
+        """
+        try:
+            host = yield self._host_of(container_id)
+            info = yield host.client.inspect_container(container_id)
+        except Exception as e:
+            self.log.warning("Could not inspect container {} ({}). "
+                             "Assuming http readiness.".format(container_id,
+                                                               e))
+            return "http"
+
+        labels = (info.get("Config") or {}).get("Labels") or {}
+        readiness = labels.get(SIMPHONY_NS.readiness)
+        if readiness in READINESS_CHECKS:
+            return readiness
+
+        if readiness is not None:
+            self.log.warning("Unknown readiness '{}' for container {}. "
+                             "Ignoring.".format(readiness, container_id))
+
+        state = info.get("State")
+        if (self.honour_healthcheck and
+                isinstance(state, dict) and
+                state.get("Health") is not None):
+            return "healthcheck"
+
+        return "http"
+
+    @gen.coroutine
+    def wait_for_healthy(self, container_id, timeout):
+        """Waits for docker to report the container healthy.
+        Returns right away if the container has no HEALTHCHECK.
+
+        Raises
+        ------
+        RuntimeError:
+            If the container is reported unhealthy
+        TimeoutError:
+            If the container is not healthy within timeout seconds
+        """
+        loop = ioloop.IOLoop.current()
+        deadline = loop.time() + timeout
+        delays = backoff_delays(initial=0.1, maximum=2.0)
+
+        host = yield self._host_of(container_id)
+        while True:
+            info = yield host.client.inspect_container(container_id)
+            state = info.get("State")
+            health = state.get("Health") if isinstance(state, dict) else None
+            if health is None or health.get("Status") == "healthy":
+                return
+
+            if health.get("Status") == "unhealthy":
+                raise RuntimeError(
+                    "Container {} is unhealthy".format(container_id))
+
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise TimeoutError(
+                    "Container {} not healthy in {} seconds".format(
+                        container_id, timeout))
+
+            yield gen.sleep(min(next(delays), remaining))
+
     @gen.coroutine
     def stop_and_remove_container(self, container_id):
         """Idempotent removal of a container by id.
@@ -168,6 +393,184 @@ class ContainerManager(LoggingMixin):
         finally:
             self._stop_pending.remove(container_id)
 
+    @gen.coroutine
+    def fill_warm_pool(self):
+        """Pre-starts containers for the most requested applications that
+        are not running, until the pool holds warm_pool_size containers.
+
+        It is invoked after the start requests that the pool could serve.
+        Stopping a container does not fill the pool: the resources are
+        given back until the next request. Returns once the containers
+        of this fill, and of those already in progress, are started.
+        """
+        if self.warm_pool_size == 0:
+            return
+
+        # What the pool lacks when the fill is requested. A container
+        # stopped meanwhile must not be replaced, and a concurrent fill
+        # must not start the same keys.
+        wanted = self._warm_pool.wanted()
+        for warm_key in wanted:
+            self._warm_pool.start_pending(warm_key)
+
+        fill = self._fill_warm_pool(wanted)
+        self._warm_fills.add(fill)
+        try:
+            yield list(self._warm_fills)
+        finally:
+            self._warm_fills.discard(fill)
+
+    @gen.coroutine
+    def _fill_warm_pool(self, wanted):
+        """Pre-starts a container for each of the wanted keys, which
+        must be pending. Never raises: the failures are logged."""
+        # Somebody else (e.g. the reaper) may have removed some of the
+        # containers the pool knows.
+        try:
+            containers = yield self._containers_on_hosts(
+                self._hosts,
+                {"label": "{}={}".format(SIMPHONY_NS_RUNINFO.realm,
+                                         self.realm)})
+        except Exception:
+            self.log.exception("Could not list the containers to fill "
+                               "the warm pool")
+            for warm_key in wanted:
+                self._warm_pool.end_pending(warm_key)
+            return
+
+        self._warm_pool.retain(
+            container.docker_id for container in containers)
+
+        yield [self._prestart_container(warm_key) for warm_key in wanted]
+
+    @gen.coroutine
+    def drain_warm_pool(self):
+        """Stops and removes the idle pre-started containers. The pool
+        is not filled again."""
+        self._warm_pool.close()
+        for container in self._warm_pool.idle_containers():
+            self._warm_pool.discard(container.docker_id)
+            yield self.stop_and_remove_container(container.docker_id)
+
+    def warm_pool_stats(self):
+        """Returns the warm pool counters. See WarmPool.stats()"""
+        return self._warm_pool.stats()
+
+    @gen.coroutine
+    def start_container_cache(self):
+        """Seeds the container cache and keeps it current with the docker
+        events and periodic resyncs. Does nothing if the cache is not
+        enabled or already started.
+
+        Failing to seed is not fatal: until a resync succeeds the queries
+        keep going to docker.
+        """
+        if not self.container_cache_enabled or self._cache_stop is not None:
+            return
+
+        self._cache_stop = Future()
+
+        # Start watching before seeding, so that no change between the two
+        # can go unnoticed.
+        for host in self._hosts:
+            ioloop.IOLoop.current().spawn_callback(
+                self._watch_docker_events,
+                host,
+                self._cache_stop,
+                {
+                    "type": "container",
+                    "label": ["{}={}".format(SIMPHONY_NS_RUNINFO.realm,
+                                             self.realm)]
+                },
+                functools.partial(self._on_docker_event, host=host),
+                self.resync_container_cache)
+
+        yield self.resync_container_cache()
+
+        self._cache_resync_callback = ioloop.PeriodicCallback(
+            self.resync_container_cache,
+            self.container_cache_resync_interval * 1000)
+        self._cache_resync_callback.start()
+
+    def stop_container_cache(self):
+        """Stops updating the container cache and empties it.
+        Following queries will go to docker."""
+        if self._cache_stop is None:
+            return
+
+        self._cache_stop.set_result(None)
+        self._cache_stop = None
+
+        if self._cache_resync_callback is not None:
+            self._cache_resync_callback.stop()
+            self._cache_resync_callback = None
+
+        self._container_cache.clear()
+
+    @gen.coroutine
+    def resync_container_cache(self):
+        """Reloads the container cache with the current containers of the
+        realm. Logs the number of entries that were found stale.
+
+        The events that arrive while the containers are listed are more
+        recent than the listing, which does not override them."""
+        cache = self._container_cache
+        since = cache.begin_snapshot()
+        try:
+            containers = yield self._find_containers_from_docker()
+        except Exception:
+            self.log.exception("Unable to resync the container cache")
+            return
+        else:
+            if self._cache_stop is None:
+                # The cache has been stopped in the meantime.
+                return
+
+            stale = cache.replace(containers, since)
+        finally:
+            cache.end_snapshot(since)
+
+        if stale and cache.resyncs > 1:
+            self.log.warning(
+                "Container cache resync corrected {} stale "
+                "entries".format(stale))
+
+    def container_cache_stats(self):
+        """Returns the container cache counters.
+        See ContainerCache.stats()"""
+        return self._container_cache.stats()
+
+    def start_image_cache(self):
+        """Follows the docker image events, so that the cached images
+        are invalidated as soon as they are pulled, tagged or deleted.
+        Without it, the entries are only bound by their time to live.
+        Does nothing if the cache is disabled.
+
+        The events are followed from the first image lookup, so that
+        the docker clients are not created before they are needed."""
+        if self.image_cache_size == 0:
+            return
+
+        self._image_cache_events = True
+
+    def stop_image_cache(self):
+        """Stops following the docker image events and empties the
+        image cache."""
+        self._image_cache_events = False
+        if self._image_cache_stop is not None:
+            self._image_cache_stop.set_result(None)
+            self._image_cache_stop = None
+
+        self._clear_image_cache()
+
+    def image_cache_stats(self):
+        """Returns the image cache counters. See TTLCache.stats().
+        shared reports the requests that joined an inspection already
+        in progress."""
+        stats = self._image_cache.stats()
+        stats["shared"] = self._image_requests.shared
+        return stats
+
     @gen.coroutine
     def containers_with_labels(self, labels):
         filters = {
@@ -178,7 +581,9 @@ class ContainerManager(LoggingMixin):
 
     @gen.coroutine
     def containers_from_filters(self, filters):
-        """Returns the currently running containers for a given filter
+        """Returns the currently running containers for a given filter,
+        on all the docker hosts. The hosts are queried concurrently.
+        Those that fail are logged and left out, unless they all fail.
 
         Parameters
         ----------
@@ -189,31 +594,7 @@ class ContainerManager(LoggingMixin):
         ------
         A list of Container objects, or an empty list if nothing is found.
         """
-        containers = []
-        infos = yield self._docker_client.containers(filters=filters)
-        for info in infos:
-            try:
-                container = Container.from_docker_dict(info)
-            except ValueError:
-                self.log.exception("Unable to parse container info.")
-                continue
-
-            # override the ip and port obtained by the docker info with the
-            # appropriate ip and port, considering that we might be using a
-            # separate docker machine
-            try:
-                ip, port = yield from self._get_ip_and_port(
-                    container.docker_id)
-            except RuntimeError:
-                self.log.exception(
-                    "Unable to retrieve ip/port "
-                    "for container {}".format(container.docker_id))
-                continue
-
-            container.ip = ip
-            container.port = port
-            containers.append(container)
-
+        containers = yield self._containers_on_hosts(self._hosts, filters)
         return containers
 
     @gen.coroutine
@@ -224,22 +605,24 @@ class ContainerManager(LoggingMixin):
                         user_name=None):
         """Finds and returns containers matching all the specified arguments.
         """
-        labels = {
-            SIMPHONY_NS_RUNINFO.realm: self.realm
-        }
-
-        if url_id is not None:
-            labels[SIMPHONY_NS_RUNINFO.url_id] = url_id
-
-        if mapping_id is not None:
-            labels[SIMPHONY_NS_RUNINFO.mapping_id] = mapping_id
-
-        if user_name is not None:
-            labels[SIMPHONY_NS_RUNINFO.user] = user_name
+        cache = self._container_cache
+        if cache.seeded:
+            cache.hits += 1
+            containers = cache.find(url_id=url_id,
+                                    mapping_id=mapping_id,
+                                    user_name=user_name)
+        else:
+            if self.container_cache_enabled:
+                cache.misses += 1
 
-        containers = yield self.containers_with_labels(labels)
+            containers = yield self._find_containers_from_docker(
+                url_id=url_id,
+                mapping_id=mapping_id,
+                user_name=user_name)
 
-        return containers
+        # The pre-started containers exist only for the pool, until claimed.
+        return [container for container in containers
+                if not self._warm_pool.is_hidden(container.docker_id)]
 
     @gen.coroutine
     def find_container(self,
@@ -271,17 +654,363 @@ class ContainerManager(LoggingMixin):
 
     @gen.coroutine
     def image(self, image_id_or_name):
-        """Returns the Image object associated to a given id
+        """Returns the Image object associated to a given id or name,
+        or None if it does not exist.
+
+        The returned object may be shared with other callers, and
+        must not be modified.
         """
+        image = self._image_cache.get(image_id_or_name)
+        if image is not None:
+            return image
+
+        self._watch_image_events()
+
+        # The requests after an invalidation do not join an inspection
+        # started before it.
+        image = yield self._image_requests.call(
+            (image_id_or_name, self._image_generation),
+            self._inspect_image, image_id_or_name)
+        return image
+
+    # Private
+
+    def _watch_image_events(self):
+        """Starts following the docker image events, if requested with
+        start_image_cache() and not done yet."""
+        if not self._image_cache_events or self._image_cache_stop is not None:
+            return
+
+        self._image_cache_stop = Future()
+        for host in self._hosts:
+            ioloop.IOLoop.current().spawn_callback(
+                self._watch_docker_events,
+                host,
+                self._image_cache_stop,
+                {"type": "image"},
+                self._on_docker_image_event,
+                self._clear_image_cache)
+
+    def _clear_image_cache(self):
+        """Empties the image cache, and prevents the inspections in
+        progress from filling it with what they found."""
+        self._image_cache.clear()
+        self._image_generation += 1
+
+    @gen.coroutine
+    def _inspect_image(self, image_id_or_name):
+        """Retrieves the image from docker and caches it. With multiple
+        docker hosts, it is the image of the first host that has it."""
+        generation = self._image_generation
+        results = yield self._on_hosts(
+            self._hosts,
+            lambda host: self._inspect_image_on_host(host, image_id_or_name))
+
+        image_dict = next((image_dict for _, image_dict in results
+                           if image_dict is not None), None)
+        if image_dict is None:
+            return None
+
+        image = Image.from_docker_dict(image_dict)
+        if generation == self._image_generation:
+            self._image_cache.put(image_id_or_name, image)
+            self._image_cache.put(image.docker_id, image)
+        return image
+
+    @gen.coroutine
+    def _inspect_image_on_host(self, host, image_id_or_name):
+        """Returns the docker dict of the image on the host, or None if
+        the host does not have it"""
         try:
-            image_dict = yield self._docker_client.inspect_image(
-                image_id_or_name)
+            image_dict = yield host.client.inspect_image(image_id_or_name)
         except NotFound:
             return None
 
-        return Image.from_docker_dict(image_dict)
+        return image_dict
 
-    # Private
+    @gen.coroutine
+    def _containers_on_hosts(self, hosts, filters):
+        """Returns the containers matching the filters on the hosts.
+        See containers_from_filters."""
+        results = yield self._on_hosts(
+            hosts, lambda host: self._containers_on_host(host, filters))
+
+        return [container
+                for _, containers in results
+                for container in containers]
+
+    @gen.coroutine
+    def _containers_on_host(self, host, filters):
+        """Returns the containers matching the filters on the host"""
+        containers = []
+        infos = yield host.client.containers(filters=filters)
+        for info in infos:
+            try:
+                container = Container.from_docker_dict(info)
+            except ValueError:
+                self.log.exception("Unable to parse container info.")
+                continue
+
+            self._remember_host(container.docker_id, host)
+
+            # override the ip and port obtained by the docker info with the
+            # appropriate ip and port, considering that we might be using a
+            # separate docker machine. The port binding is generally already
+            # in the listing, so we ask docker only if it is not.
+            port = self._get_port_from_ports_info(info.get("Ports"))
+            if port is not None:
+                ip = host.ip
+            else:
+                try:
+                    ip, port = yield from self._get_ip_and_port(
+                        container.docker_id)
+                except RuntimeError:
+                    self.log.exception(
+                        "Unable to retrieve ip/port "
+                        "for container {}".format(container.docker_id))
+                    continue
+
+            container.ip = ip
+            container.port = port
+            containers.append(container)
+
+        return containers
+
+    @gen.coroutine
+    def _on_hosts(self, hosts, func):
+        """Invokes the coroutine func(host) for each of the hosts,
+        concurrently.
+
+        Returns
+        -------
+        A list of (host, result) of the invocations that succeeded, in the
+        order of the hosts. The failures are logged. If all of them fail,
+        the exception of the first one is raised.
+        """
+        if len(hosts) == 1:
+            result = yield func(hosts[0])
+            return [(hosts[0], result)]
+
+        futures = [func(host) for host in hosts]
+        results = []
+        error = None
+        for host, future in zip(hosts, futures):
+            try:
+                results.append((host, (yield future)))
+            except Exception as e:
+                self.log.exception(
+                    "Docker host {} failed".format(host.name))
+                if error is None:
+                    error = e
+
+        if not results and error is not None:
+            raise error
+
+        return results
+
+    @gen.coroutine
+    def _host_of(self, container_id):
+        """Returns the DockerHost of the container. If no host has it,
+        returns the first one, so that the caller gets the docker error
+        about the missing container."""
+        if len(self._hosts) == 1:
+            return self._hosts[0]
+
+        host = self._container_hosts.get(container_id)
+        if host is not None:
+            return host
+
+        results = yield self._on_hosts(
+            self._hosts,
+            lambda host: self._has_container(host, container_id))
+        for host, found in results:
+            if found:
+                self._remember_host(container_id, host)
+                return host
+
+        return self._hosts[0]
+
+    @gen.coroutine
+    def _has_container(self, host, container_id):
+        """Returns True if the container is on the host"""
+        try:
+            yield host.client.inspect_container(container_id)
+        except NotFound:
+            return False
+
+        return True
+
+    def _remember_host(self, container_id, host):
+        """Records the host of the container, when there are multiple
+        hosts"""
+        if len(self._hosts) > 1:
+            self._container_hosts[container_id] = host
+
+    @gen.coroutine
+    def _place_container(self, image_name):
+        """Returns the DockerHost where a new container of the image is
+        created: among the hosts that have the image, the least loaded
+        one according to docker info (see placement_key). Images are
+        not pulled.
+
+        Raises
+        ------
+        NotFound:
+            If no host has the image
+        """
+        if len(self._hosts) == 1:
+            return self._hosts[0]
+
+        results = yield self._on_hosts(
+            self._hosts,
+            lambda host: self._host_load(host, image_name))
+
+        candidates = [(placement_key(load), index, host)
+                      for index, (host, load) in enumerate(results)
+                      if load is not None]
+        if not candidates:
+            raise NotFound(
+                'No docker host has image {}'.format(image_name))
+
+        _, _, host = min(candidates)
+        self.log.info("Placing container of image {} on {}".format(
+            image_name, host.name))
+        return host
+
+    @gen.coroutine
+    def _host_load(self, host, image_name):
+        """Returns the HostLoad of the host, or None if it does not have
+        the image."""
+        info, image_dict = yield [
+            host.client.info(),
+            self._inspect_image_on_host(host, image_name)]
+
+        if image_dict is None:
+            return None
+
+        return host_load(info)
+
+    @gen.coroutine
+    def _find_containers_from_docker(self,
+                                     *,
+                                     url_id=None,
+                                     mapping_id=None,
+                                     user_name=None):
+        """Queries docker for the containers of the realm matching all
+        the specified arguments."""
+        labels = {
+            SIMPHONY_NS_RUNINFO.realm: self.realm
+        }
+
+        if url_id is not None:
+            labels[SIMPHONY_NS_RUNINFO.url_id] = url_id
+
+        if mapping_id is not None:
+            labels[SIMPHONY_NS_RUNINFO.mapping_id] = mapping_id
+
+        if user_name is not None:
+            labels[SIMPHONY_NS_RUNINFO.user] = user_name
+
+        containers = yield self.containers_with_labels(labels)
+
+        return containers
+
+    @gen.coroutine
+    def _watch_docker_events(self, host, stop, filters, callback,
+                             on_reconnect):
+        """Passes the docker events of the host matching the filters to
+        callback, until stop is resolved. If the stream breaks, it is opened
+        again, and on_reconnect is invoked to recover from the lost
+        events."""
+        delay = 1
+
+        while not stop.done():
+            try:
+                yield host.client.watch_events(
+                    callback, filters=filters, cancel=stop)
+            except Exception:
+                self.log.exception(
+                    "Docker events stream of {} failed".format(host.name))
+            else:
+                delay = 1
+
+            if stop.done():
+                break
+
+            self.log.warning("Docker events stream interrupted. "
+                             "Reconnecting in {} seconds".format(delay))
+            try:
+                # Wait, unless we are stopped in the meantime.
+                yield gen.with_timeout(
+                    ioloop.IOLoop.current().time() + delay, stop)
+            except gen.TimeoutError:
+                pass
+            delay = min(delay * 2, 30)
+
+            if not stop.done():
+                ioloop.IOLoop.current().spawn_callback(on_reconnect)
+
+    def _on_docker_event(self, event, host=None):
+        """Updates the cache according to a docker container event
+        of the host"""
+        if self._cache_stop is None:
+            return
+
+        action = event.get("Action") or event.get("status")
+        docker_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not docker_id:
+            return
+
+        self._container_cache.events += 1
+
+        if action in ("die", "destroy"):
+            self._container_cache.discard(docker_id)
+        elif action in ("start", "unpause"):
+            if host is not None:
+                self._remember_host(docker_id, host)
+            ioloop.IOLoop.current().spawn_callback(
+                self._refresh_cached_container, docker_id)
+
+    def _on_docker_image_event(self, event):
+        """Invalidates the image cache on the image changes"""
+        if event.get("Action") in ("pull", "tag", "untag", "delete",
+                                   "import", "load"):
+            # Tags can move from one image to another, and the event
+            # does not say where from. Image events are rare enough that
+            # starting over is cheaper than tracking them.
+            self._clear_image_cache()
+
+    @gen.coroutine
+    def _refresh_cached_container(self, docker_id):
+        """Reloads the information of a single container in the cache.
+        """
+        if self._cache_stop is None:
+            return
+
+        host = self._container_hosts.get(docker_id)
+        try:
+            containers = yield self._containers_on_hosts(
+                self._hosts if host is None else [host],
+                {
+                    "id": [docker_id],
+                    "label": ["{}={}".format(SIMPHONY_NS_RUNINFO.realm,
+                                             self.realm)]
+                })
+        except Exception:
+            self.log.exception(
+                "Unable to refresh container {} in the cache".format(
+                    docker_id))
+            return
+
+        if self._cache_stop is None:
+            return
+
+        containers = [container for container in containers
+                      if container.docker_id == docker_id]
+        if containers:
+            self._container_cache.put(containers[0])
+        else:
+            self._container_cache.discard(docker_id)
 
     @gen.coroutine
     def _start_container(self,
@@ -290,39 +1019,165 @@ class ContainerManager(LoggingMixin):
                          mapping_id,
                          base_urlpath,
                          volumes,
-                         environment):
+                         environment,
+                         resource_limits,
+                         trace,
+                         warm=False):
         """Helper method that performs the physical operation of starting
         the container.
 
+        If warm is True, the container is started for the warm pool:
+        it is hidden, and the containers already present for the mapping
+        are left alone. Otherwise, the idle pre-started containers of the
+        mapping are evicted with them.
+
         If successful, returns a Container object.
         If any exception occurs, it logs it and re-raises an exception.
-        """
 
+        The phases that do not depend on each other run concurrently:
+
+            inspect --+
+                      +--> prepare --+
+            lookup ---+              +--> create -> start
+                      +--> evict ----+
+
+        The containers already present for the mapping, if any, are
+        evicted (stopped and removed) while the new one is prepared.
+        The new container is created only once they are gone: it has the
+        same labels, and a lookup of the mapping must not find both. As
+        before, nothing is evicted if the image does not exist, and the
+        eviction is over when the method returns, also on failure. The
+        overlapped phases inspect, lookup and evict are recorded in the
+        trace with StartTrace.overlap.
+        """
+        stale_future = None
+        if not warm:
+            stale_future = self._find_stale_containers(
+                user_name, mapping_id, trace)
+
+        image = yield self._start_image(image_name, trace)
+        stale = []
+        if not warm:
+            stale = yield stale_future
+            # Pre-started with other settings, e.g. another environment
+            stale.extend(self._warm_pool.remove_idle(user_name, mapping_id))
+
+        eviction = self._evict_containers(stale, trace)
         try:
-            image_info = yield self._docker_client.inspect_image(image_name)
-            image_id = image_info["Id"]
-        except NotFound as e:
+            container = yield self._create_and_start_container(
+                user_name,
+                image_name,
+                image.docker_id,
+                mapping_id,
+                base_urlpath,
+                volumes,
+                environment,
+                resource_limits,
+                trace,
+                warm,
+                eviction)
+        finally:
+            yield eviction
+
+        # Don't wait for the docker event to update the cache: the caller
+        # may look the container up right away.
+        yield self._refresh_cached_container(container.docker_id)
+
+        return container
+
+    @gen.coroutine
+    def _start_image(self, image_name, trace):
+        """Returns the Image to start, possibly from the image cache.
+
+        Raises
+        ------
+        NotFound:
+            If the image does not exist
+        """
+        with trace.overlap("inspect"):
+            try:
+                image = yield self.image(image_name)
+            except Exception:
+                self.log.exception("Could not inspect image {}".format(
+                    image_name
+                ))
+                raise
+
+        if image is None:
             self.log.error('Could not find requested image {}'.format(
                 image_name))
-            raise e
-        except Exception as e:
-            self.log.exception("Could not inspect image {}".format(
-                image_name
-            ))
-            raise e
+            raise NotFound('Could not find requested image {}'.format(
+                image_name))
 
         self.log.info('Got container image: {}'.format(image_name))
+        return image
 
-        # Check if the container is present.
-        container = yield self.find_container(
-            user_name=user_name, mapping_id=mapping_id)
+    @gen.coroutine
+    def _find_stale_containers(self, user_name, mapping_id, trace):
+        """Returns the containers already present for the mapping.
+        They are stopped and removed, to guarantee a fresh start every
+        time. Never raises: the failures are logged.
+        """
+        with trace.overlap("lookup"):
+            try:
+                containers = yield self.find_containers(
+                    user_name=user_name, mapping_id=mapping_id)
+            except Exception:
+                self.log.exception("Could not look up the containers "
+                                   "of mapping {}".format(mapping_id))
+                return []
+
+        for container in containers:
+            self.log.info('Container {} for mapping {} '
+                          'already present. Stopping.'.format(
+                              container.docker_id, mapping_id))
+        return containers
 
-        if container is not None:
-            # Make sure we stop and remove it if by any chance is already
-            # there. This will guarantee a fresh start every time.
-            self.log.info('Container for image {} '
-                          'already present. Stopping.'.format(image_name))
-            yield self.stop_and_remove_container(container.docker_id)
+    @gen.coroutine
+    def _evict_containers(self, containers, trace):
+        """Stops and removes the stale containers, concurrently.
+        Never raises: the failures are logged.
+        """
+        if not containers:
+            return
+
+        with trace.overlap("evict"):
+            yield [
+                self._evict_container(container.docker_id)
+                for container in containers]
+
+    @gen.coroutine
+    def _evict_container(self, container_id):
+        """Stops and removes a stale container. Never raises."""
+        try:
+            yield self.stop_and_remove_container(container_id)
+        except OperationInProgress:
+            # Somebody else is already stopping it.
+            pass
+        except Exception:
+            self.log.exception(
+                "Could not evict container {}".format(container_id))
+
+    @gen.coroutine
+    def _create_and_start_container(self,
+                                    user_name,
+                                    image_name,
+                                    image_id,
+                                    mapping_id,
+                                    base_urlpath,
+                                    volumes,
+                                    environment,
+                                    resource_limits,
+                                    trace,
+                                    warm,
+                                    eviction):
+        """Creates and starts the container from the image. If the
+        container can not be started, it is removed.
+
+        The container is created once the eviction future is done.
+
+        Returns the Container.
+        """
 
         # Data volume binding to be used with Docker Client
         # volumes = {volume_source: {'bind': volume_target,
@@ -369,35 +1224,44 @@ class ContainerManager(LoggingMixin):
                                          mapping_id,
                                          container_url_id,
                                          container_urlpath,
-                                         self.realm))
+                                         self.realm,
+                                         warm))
 
         # build the dictionary of keyword arguments for host_config
         host_config = dict(
             port_bindings={
                 self.container_port: None
             },
-            binds=filtered_volumes
+            binds=filtered_volumes,
+            **resource_limits
         )
 
+        host = yield self._place_container(image_name)
+
         self.log.debug("Starting host with config: %s", host_config)
-        host_config = yield self._docker_client.create_host_config(
-            **host_config)
+        host_config = yield host.client.create_host_config(**host_config)
 
         # Get the host_config configuration in create_kwargs.
         # If it's not there, create an empty one.
         # Then update it with the current configuration.
         create_kwargs.setdefault('host_config', {}).update(host_config)
 
-        resp = yield self._docker_client.create_container(**create_kwargs)
+        yield eviction
+        trace.mark("prepare")
+        resp = yield host.client.create_container(**create_kwargs)
+        trace.mark("create")
 
         container_id = resp['Id']
+        self._remember_host(container_id, host)
+        if warm:
+            self._warm_pool.hide(container_id)
 
         self.log.info("Created container '%s' (id: %s) from image %s",
                       container_name, container_id, image_name)
 
         # start the container
         try:
-            yield self._docker_client.start(container_id)
+            yield host.client.start(container_id)
         except Exception as e:
             self.log.exception("Could not start container {}".format(
                 container_id))
@@ -413,6 +1277,8 @@ class ContainerManager(LoggingMixin):
             yield self.stop_and_remove_container(container_id)
             raise e
 
+        trace.mark("start")
+
         extended_id = f"{container_url_id}_{port}"
 
         container = Container(
@@ -425,6 +1291,7 @@ class ContainerManager(LoggingMixin):
             port=port,
             url_id=extended_id,
             urlpath=container_urlpath,
+            warm=warm,
         )
 
         self.log.info(
@@ -463,10 +1330,11 @@ class ContainerManager(LoggingMixin):
             If for some reason it cannot retrieve the information
         """
 
+        host = yield self._host_of(container_id)
+
         # retrieve the actual port binding
         try:
-            resp = yield self._docker_client.port(container_id,
-                                                  self.container_port)
+            resp = yield host.client.port(container_id, self.container_port)
         except Exception as e:
             raise RuntimeError("Failed to get port info for {}. "
                                "Exception: {}.".format(container_id,
@@ -476,18 +1344,6 @@ class ContainerManager(LoggingMixin):
             raise RuntimeError("Failed to get port info for {}. "
                                "Port response was None.".format(container_id))
 
-        # We assume we are running on linux without any additional docker
-        # machine. The container will therefore be reachable at 127.0.0.1.
-        # If we instead have a docker machine configuration, we use the
-        # docker url to extract the ip.
-        ip = '127.0.0.1'
-
-        base_url = self.docker_config.get("base_url")
-        if base_url:
-            url = urlparse(base_url)
-            if url.scheme != 'unix':
-                ip = url.hostname
-
         try:
             port = int(resp[0]['HostPort'])
         except (KeyError, IndexError, ValueError, TypeError) as e:
@@ -495,7 +1351,38 @@ class ContainerManager(LoggingMixin):
                                "Exception: {}.".format(container_id,
                                                        str(e)))
 
-        return ip, port
+        return host.ip, port
+
+    def _get_port_from_ports_info(self, ports_info):
+        """Extracts the host port bound to the container port from the
+        Ports entry of a docker containers() item.
+
+        Parameters
+        ----------
+        ports_info: list or None
+            The Ports entry, e.g.
+            [{"IP": "0.0.0.0", "PrivatePort": 8888, "PublicPort": 32768,
+              "Type": "tcp"}]
+
+        Return
+        ------
+        The host port as an int, or None if the binding is not there.
+        """
+        bindings = [binding for binding in ports_info or []
+                    if binding.get("PrivatePort") == self.container_port and
+                    binding.get("Type", "tcp") == "tcp" and
+                    binding.get("PublicPort")]
+
+        if not bindings:
+            return None
+
+        # Prefer the IPv4 binding, if the port is bound on both.
+        bindings.sort(key=lambda binding: binding.get("IP") == "::")
+
+        try:
+            return int(bindings[0]["PublicPort"])
+        except (ValueError, TypeError):
+            return None
 
     @gen.coroutine
     def _get_container_info(self, container_id):
@@ -515,8 +1402,9 @@ class ContainerManager(LoggingMixin):
 
         self.log.debug("Getting container '%s'", container_id)
 
+        host = yield self._host_of(container_id)
         try:
-            container_info = yield self._docker_client.inspect_container(
+            container_info = yield host.client.inspect_container(
                 container_id
             )
         except APIError as e:
@@ -564,9 +1452,11 @@ class ContainerManager(LoggingMixin):
         # impossible to solve, and would only affect us if the container
         # id is identical.
 
+        host = yield self._host_of(container_id)
+
         # Stop the container
         try:
-            yield self._docker_client.stop(container_id)
+            yield host.client.stop(container_id)
         except APIError:
             self.log.exception(
                 "Container '{}' could not be stopped.".format(
@@ -578,7 +1468,7 @@ class ContainerManager(LoggingMixin):
 
         # Remove the container from docker
         try:
-            yield self._docker_client.remove_container(container_id)
+            yield host.client.remove_container(container_id)
         except NotFound:
             self.log.error('Could not find requested container {} '
                            'during removal'.format(container_id))
@@ -589,9 +1479,120 @@ class ContainerManager(LoggingMixin):
         else:
             self.log.info("Container '{}' is removed.".format(container_id))
 
+        self._container_cache.discard(container_id)
+        self._container_hosts.pop(container_id, None)
+        self._warm_pool.discard(container_id)
+
+    def _warm_key(self,
+                  user_name,
+                  image_name,
+                  mapping_id,
+                  base_urlpath,
+                  volumes,
+                  environment,
+                  resource_limits):
+        """Returns the WarmKey of a start request, or None if the request
+        cannot be served by the warm pool."""
+        if (self.warm_pool_size == 0 or
+                image_name not in self.warm_pool_images or
+                volumes):
+            return None
+
+        return WarmKey(user_name,
+                       image_name,
+                       mapping_id,
+                       base_urlpath,
+                       tuple(sorted(environment.items())),
+                       tuple(sorted(resource_limits.items())))
+
+    @gen.coroutine
+    def _claim_warm_container(self, warm_key, trace):
+        """Returns an idle pre-started container for the key, if there is
+        one still running, or None. The container has the labels of the
+        mapping since its creation: once claimed, it is no different from
+        a container started for the request.
+
+        As for a cold start, the containers already present for the
+        mapping are evicted first.
+        """
+        if self._warm_pool.has_idle(warm_key):
+            stale = yield self._find_stale_containers(
+                warm_key.user_name, warm_key.mapping_id, trace)
+            yield self._evict_containers(stale, trace)
+
+        while True:
+            container = self._warm_pool.claim(warm_key)
+            if container is None:
+                return None
+
+            info = yield self._get_container_info(container.docker_id)
+            if info is not None and (info.get("State") or {}).get("Running"):
+                self.log.info("Claimed pre-started container {} for "
+                              "mapping {}".format(container.docker_id,
+                                                  warm_key.mapping_id))
+                return container
+
+            self.log.warning("Pre-started container {} is gone".format(
+                container.docker_id))
+            self._warm_pool.discard(container.docker_id)
+            if info is not None:
+                ioloop.IOLoop.current().spawn_callback(
+                    self.stop_and_remove_container, container.docker_id)
+
+    @gen.coroutine
+    def _prestart_container(self, warm_key):
+        """Starts a container for the pool. The key must be pending."""
+        try:
+            container = yield self._start_container(
+                warm_key.user_name,
+                warm_key.image_name,
+                warm_key.mapping_id,
+                warm_key.base_urlpath,
+                {},
+                dict(warm_key.environment),
+                dict(warm_key.resource_limits),
+                StartTrace(),
+                warm=True)
+        except Exception:
+            self.log.exception("Could not pre-start a container for "
+                               "{}".format(warm_key.image_name))
+            return
+        finally:
+            self._warm_pool.end_pending(warm_key)
+
+        if not self._warm_pool.put(warm_key, container):
+            # The mapping was started meanwhile: a second container with
+            # its labels would be found by the lookups of the mapping.
+            yield self._evict_container(container.docker_id)
+
+    @default("_warm_pool")
+    def _warm_pool_default(self):
+        return WarmPool(size=self.warm_pool_size)
+
+    @default("_image_cache")
+    def _image_cache_default(self):
+        return TTLCache(maxsize=self.image_cache_size,
+                        ttl=self.image_cache_ttl)
+
     @default("_docker_client")
     def _docker_client_default(self):
-        return AsyncDockerClient(**self.docker_config)
+        return self._new_docker_client(self.docker_config)
+
+    @default("_hosts")
+    def _hosts_default(self):
+        return [DockerHost(self.docker_config, self._docker_client)] + [
+            DockerHost(docker_config, self._new_docker_client(docker_config))
+            for docker_config in self.additional_docker_configs]
+
+    def _new_docker_client(self, docker_config):
+        """Returns a client for the given docker configuration"""
+        if self.docker_native_client:
+            return NativeDockerClient(
+                max_connections=self.docker_max_connections,
+                **docker_config)
+
+        return AsyncDockerClient(max_workers=self.docker_executor_workers,
+                                 **docker_config)
 
 
 def _get_container_env(user_name, url_id, environment, base_urlpath):
@@ -637,18 +1638,22 @@ def _get_container_env(user_name, url_id, environment, base_urlpath):
     return result
 
 
-def _get_container_labels(user_name, mapping_id, url_id, urlpath, realm):
+def _get_container_labels(user_name, mapping_id, url_id, urlpath, realm,
+                          warm=False):
     """Returns a dictionary that will become container run-time labels.
     Each of these labels must be namespaced in reverse DNS style, in agreement
     to docker guidelines."""
 
-    return {
+    labels = {
         SIMPHONY_NS_RUNINFO.user: user_name,
         SIMPHONY_NS_RUNINFO.mapping_id: mapping_id,
         SIMPHONY_NS_RUNINFO.url_id: url_id,
         SIMPHONY_NS_RUNINFO.urlpath: urlpath,
         SIMPHONY_NS_RUNINFO.realm: realm
     }
+    if warm:
+        labels[SIMPHONY_NS_RUNINFO.warm] = "1"
+    return labels
 
 
 def _generate_container_name(realm, user_name, mapping_id):
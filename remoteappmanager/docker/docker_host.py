@@ -0,0 +1,67 @@
+from collections import namedtuple
+from urllib.parse import urlparse
+
+#: The load of a docker host, from its docker info.
+#: running: the running containers
+#: cpus: the number of CPUs
+#: memory: the total memory (bytes)
+HostLoad = namedtuple("HostLoad", ["running", "cpus", "memory"])
+
+
+class DockerHost:
+    """A docker engine where the containers of the realm are started,
+    and the client to talk to it."""
+
+    def __init__(self, docker_config, client):
+        """Initializes the host.
+
+        Parameters
+        ----------
+        docker_config: dict
+            The docker client configuration, as passed to the client.
+        client: AsyncDockerClient or NativeDockerClient
+            The client connected to the host.
+        """
+        self.docker_config = docker_config
+        self.client = client
+
+    @property
+    def name(self):
+        """The name of the host, for the logs"""
+        return self.docker_config.get("base_url") or "default"
+
+    @property
+    def ip(self):
+        """The ip where the exported ports of the containers can be
+        reached."""
+        # We assume we are running on linux without any additional docker
+        # machine. The container will therefore be reachable at 127.0.0.1.
+        # If we instead have a docker machine configuration, we use the
+        # docker url to extract the ip.
+        ip = '127.0.0.1'
+
+        base_url = self.docker_config.get("base_url")
+        if base_url:
+            url = urlparse(base_url)
+            if url.scheme not in ('unix', 'http+unix'):
+                ip = url.hostname
+
+        return ip
+
+    def __repr__(self):
+        return "<DockerHost {}>".format(self.name)
+
+
+def host_load(info):
+    """Returns the HostLoad from the result of docker info"""
+    return HostLoad(running=info.get("ContainersRunning") or 0,
+                    cpus=info.get("NCPU") or 1,
+                    memory=info.get("MemTotal") or 0)
+
+
+def placement_key(load):
+    """The sort key of the hosts where a new container can be placed:
+    the fewest running containers per CPU first, then the most memory
+    per container."""
+    running = load.running + 1
+    return (running / load.cpus, -load.memory / running)
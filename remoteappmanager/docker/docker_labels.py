@@ -37,6 +37,11 @@ SIMPHONY_NS = DockerLabelNamespace(
         # "vncapp", "webapp" or not present (for legacy apps). This will
         # affect the configurability of the image at startup.
         "type",
+        # How to establish that a started container is ready to be used:
+        # "http" (the server responds with a 2xx, the default), "tcp"
+        # (the port accepts connections) or "healthcheck" (docker
+        # reports the container healthy).
+        "readiness",
     ])
 
 # environment variables that the container accepts.
@@ -73,6 +78,9 @@ SIMPHONY_NS_RUNINFO = DockerLabelNamespace(
         # Useful to differentiate docker containers that belong to other
         # instances of simphony-remote, or simply containers that do not
         # belong to an instance at all
-        "realm"
+        "realm",
+        # Set on the containers pre-started for the warm pool. They have
+        # no route in the reverse proxy until they are claimed.
+        "warm",
     ],
 )
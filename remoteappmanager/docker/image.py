@@ -1,5 +1,4 @@
 import string
-from traitlets import Unicode, HasTraits, Dict, List
 
 from remoteappmanager.docker.docker_labels import SIMPHONY_NS, SIMPHONY_NS_ENV
 from remoteappmanager.docker import configurables
@@ -8,38 +7,60 @@ from remoteappmanager.docker import configurables
 _ALLOWED_ENVCHARS = set(string.ascii_lowercase + string.digits + "-")
 
 
-class Image(HasTraits):
+class Image:
     """Wrap class for the docker client images dict result.
     Extracts the relevant information in a convenient interface
+
+    Like Container, it is a plain value type with __slots__.
     """
-    #: The docker id of the image
-    docker_id = Unicode()
 
-    #: The name of the image.
-    name = Unicode()
+    __slots__ = ("docker_id", "name", "ui_name", "icon_128", "description",
+                 "type", "env", "configurables")
+
+    def __init__(self, docker_id="", name="", ui_name="", icon_128="",
+                 description="", type="", env=None, configurables=None):
+        #: The docker id of the image
+        self.docker_id = docker_id
+
+        #: The name of the image.
+        self.name = name
 
-    #: The user interface (web) name of the image.
-    ui_name = Unicode()
+        #: The user interface (web) name of the image.
+        self.ui_name = ui_name
 
-    #: A visual icon to associate to the image.
-    icon_128 = Unicode()
+        #: A visual icon to associate to the image.
+        self.icon_128 = icon_128
 
-    #: A long description of the image.
-    description = Unicode()
+        #: A long description of the image.
+        self.description = description
 
-    #: The type of the image.
-    type = Unicode()
+        #: The type of the image.
+        self.type = type
 
-    # A dictionary of supported environment variables that the
-    # container can accept as parameters. Note that the labels
-    # use a different notation, so a conversion takes place:
-    # dashes are converted to underscores, and letters are capitalized.
-    # e.g. x11-width -> X11_WIDTH
-    # Only keys are used at the moment.
-    env = Dict()
+        # A dictionary of supported environment variables that the
+        # container can accept as parameters. Note that the labels
+        # use a different notation, so a conversion takes place:
+        # dashes are converted to underscores, and letters are capitalized.
+        # e.g. x11-width -> X11_WIDTH
+        # Only keys are used at the moment.
+        self.env = {} if env is None else env
 
-    # A list of configurables that the image supports.
-    configurables = List()
+        # A list of configurables that the image supports.
+        self.configurables = [] if configurables is None else configurables
+
+    @classmethod
+    def field_names(cls):
+        """Returns the names of the attributes describing the image"""
+        return list(cls.__slots__)
+
+    def __repr__(self):
+        return (
+            '<Image(' +
+            ", ".join(
+                "{}={!r}".format(name, getattr(self, name))
+                for name in self.field_names()
+                ) +
+            ")>")
 
     @classmethod
     def from_docker_dict(cls, docker_dict):
@@ -0,0 +1,441 @@
+import codecs
+import json
+import ssl
+from urllib.parse import quote_plus
+
+import requests
+from docker import constants, errors
+from docker.types import ContainerConfig, HostConfig
+from docker.utils import parse_host, convert_filters
+from tornado import gen
+from tornado.iostream import StreamClosedError
+from tornado.log import app_log
+
+from remoteappmanager import metrics
+from remoteappmanager.http_connection_pool import HTTPConnectionPool
+
+
+def _timed(method):
+    """Observes the duration of the decorated client method"""
+    return metrics.timed(metrics.DOCKER_REQUEST_DURATION_SECONDS,
+                         method=method)
+
+
+class NativeDockerClient:
+    """An asynchronous docker client that talks directly to the docker
+    engine HTTP API through the tornado event loop, instead of running the
+    dockerpy synchronous client in background threads.
+
+    It provides the subset of the dockerpy APIClient interface that is
+    used by the ContainerManager. Every method is a coroutine, and returns
+    the same data and raises the same exceptions as its dockerpy
+    counterpart. Connections to the engine are kept alive and pooled, and
+    multiple requests can be in flight at the same time.
+    """
+
+    def __init__(self, base_url=None, version=None,
+                 timeout=constants.DEFAULT_TIMEOUT_SECONDS, tls=False,
+                 max_connections=10):
+        """Initializes the client.
+
+        Parameters
+        ----------
+        base_url: str or None
+            The url of the docker engine, as in dockerpy.
+            Defaults to the local unix socket.
+        version: str or None
+            The API version to use. "auto" retrieves it from the engine
+            at the first request. Defaults to the dockerpy default version.
+        timeout: int
+            The default timeout (seconds) of the requests.
+        tls: bool or docker.tls.TLSConfig
+            The TLS configuration, as in dockerpy.
+        max_connections: int
+            The maximum number of simultaneous connections to the engine.
+        """
+        self.base_url = parse_host(base_url,
+                                   constants.IS_WINDOWS_PLATFORM,
+                                   tls=bool(tls))
+        self.timeout = timeout
+
+        self._pool = HTTPConnectionPool(
+            self.base_url,
+            max_connections=max_connections,
+            ssl_options=_ssl_context_from_tls(tls),
+            request_timeout=timeout)
+
+        if version is None:
+            self._version = constants.DEFAULT_DOCKER_API_VERSION
+        elif version == "auto":
+            self._version = None
+        else:
+            self._version = version
+
+        #: The pending request for the engine API version, if any.
+        self._version_future = None
+
+    @_timed(method="version")
+    @gen.coroutine
+    def version(self, api_version=True):
+        """Returns version information from the engine."""
+        response = yield self._request(
+            "GET", "/version", versioned_api=api_version)
+        return _result(response)
+
+    @_timed(method="info")
+    @gen.coroutine
+    def info(self):
+        """Returns system-wide information from the engine."""
+        response = yield self._request("GET", "/info")
+        return _result(response)
+
+    @_timed(method="containers")
+    @gen.coroutine
+    def containers(self, quiet=False, all=False, trunc=False, latest=False,
+                   since=None, before=None, limit=-1, size=False,
+                   filters=None):
+        """Lists the containers. Same as dockerpy containers."""
+        params = {
+            'limit': 1 if latest else limit,
+            'all': 1 if all else 0,
+            'size': 1 if size else 0,
+            'trunc_cmd': 1 if trunc else 0,
+            'since': since,
+            'before': before
+        }
+        if filters:
+            params['filters'] = convert_filters(filters)
+
+        response = yield self._request(
+            "GET", "/containers/json", params=params)
+        result = _result(response)
+
+        if quiet:
+            return [{'Id': x['Id']} for x in result]
+        if trunc:
+            for x in result:
+                x['Id'] = x['Id'][:12]
+        return result
+
+    @_timed(method="inspect_image")
+    @gen.coroutine
+    def inspect_image(self, image):
+        """Returns the details of an image. Same as dockerpy inspect_image.
+        """
+        response = yield self._request(
+            "GET", "/images/{0}/json", _resource_id(image))
+        return _result(response)
+
+    @_timed(method="inspect_container")
+    @gen.coroutine
+    def inspect_container(self, container):
+        """Returns the details of a container.
+        Same as dockerpy inspect_container."""
+        response = yield self._request(
+            "GET", "/containers/{0}/json", _resource_id(container))
+        return _result(response)
+
+    @_timed(method="create_host_config")
+    @gen.coroutine
+    def create_host_config(self, *args, **kwargs):
+        """Creates the host_config dictionary for create_container.
+        Same as dockerpy create_host_config."""
+        if 'version' in kwargs:
+            raise TypeError(
+                "create_host_config() got an unexpected "
+                "keyword argument 'version'")
+        kwargs['version'] = yield self._api_version()
+        return HostConfig(*args, **kwargs)
+
+    @_timed(method="create_container")
+    @gen.coroutine
+    def create_container(self, image, command=None, name=None, **kwargs):
+        """Creates a container. Same as dockerpy create_container."""
+        version = yield self._api_version()
+        config = ContainerConfig(version, image, command, **kwargs)
+        response = yield self._request(
+            "POST", "/containers/create",
+            params={'name': name},
+            data=config)
+        return _result(response)
+
+    @_timed(method="start")
+    @gen.coroutine
+    def start(self, container):
+        """Starts a container. Same as dockerpy start."""
+        response = yield self._request(
+            "POST", "/containers/{0}/start", _resource_id(container))
+        _raise_for_status(response)
+
+    @_timed(method="stop")
+    @gen.coroutine
+    def stop(self, container, timeout=10):
+        """Stops a container. Same as dockerpy stop."""
+        response = yield self._request(
+            "POST", "/containers/{0}/stop", _resource_id(container),
+            params={'t': timeout},
+            timeout=timeout + (self.timeout or 0))
+        _raise_for_status(response)
+
+    @_timed(method="remove_container")
+    @gen.coroutine
+    def remove_container(self, container, v=False, link=False, force=False):
+        """Removes a container. Same as dockerpy remove_container."""
+        response = yield self._request(
+            "DELETE", "/containers/{0}", _resource_id(container),
+            params={'v': int(v), 'link': int(link), 'force': int(force)})
+        _raise_for_status(response)
+
+    @_timed(method="port")
+    @gen.coroutine
+    def port(self, container, private_port):
+        """Returns the host bindings of a container port.
+        Same as dockerpy port."""
+        info = yield self.inspect_container(container)
+        private_port = str(private_port)
+
+        # Port settings is None when the container is running with
+        # network_mode=host.
+        port_settings = info.get('NetworkSettings', {}).get('Ports')
+        if port_settings is None:
+            return None
+
+        if '/' in private_port:
+            return port_settings.get(private_port)
+
+        h_ports = port_settings.get(private_port + '/tcp')
+        if h_ports is None:
+            h_ports = port_settings.get(private_port + '/udp')
+
+        return h_ports
+
+    @gen.coroutine
+    def watch_events(self, callback, filters=None, cancel=None):
+        """Streams the engine events, like dockerpy events with decode=True.
+        Unlike dockerpy, the events are not returned as a generator:
+        callback is invoked with each event dictionary as it arrives.
+
+        Parameters
+        ----------
+        callback: callable
+            Invoked with each event.
+        filters: dict or None
+            The filters of the events, as in dockerpy events.
+        cancel: Future or None
+            A future that stops the stream when it is resolved.
+
+        Returns when the stream terminates, either because it was
+        cancelled, or because the engine ended it.
+        """
+        version = yield self._api_version()
+        params = {}
+        if filters:
+            params['filters'] = convert_filters(filters)
+
+        decoder = _JSONStreamDecoder(callback)
+        try:
+            response = yield self._pool.stream(
+                "GET", "/v{0}/events".format(version),
+                decoder.feed,
+                params=params,
+                cancel=cancel)
+        except (StreamClosedError, OSError) as e:
+            raise errors.DockerException(
+                "Error while communicating with the docker engine "
+                "at {0}: {1}".format(self.base_url, str(e) or repr(e)))
+
+        _raise_for_status(response)
+
+    def connection_stats(self):
+        """Returns the statistics of the connection pool"""
+        return self._pool.stats()
+
+    def close(self):
+        """Closes the idle connections to the engine."""
+        self._pool.close()
+
+    # Private
+
+    @gen.coroutine
+    def _api_version(self):
+        """Returns the API version, retrieving it from the engine
+        if requested. Concurrent callers share the same request."""
+        if self._version is not None:
+            return self._version
+
+        if self._version_future is None:
+            self._version_future = self._retrieve_server_version()
+
+        try:
+            version = yield self._version_future
+        except Exception:
+            self._version_future = None
+            raise
+
+        self._version = version
+        return version
+
+    @gen.coroutine
+    def _retrieve_server_version(self):
+        result = yield self.version(api_version=False)
+        try:
+            return result["ApiVersion"]
+        except KeyError:
+            raise errors.DockerException(
+                'Invalid response from docker daemon: key "ApiVersion"'
+                ' is missing.'
+            )
+
+    @gen.coroutine
+    def _request(self, method, pathfmt, *args,
+                 params=None, data=None, timeout=None, versioned_api=True):
+        """Performs a request to the engine.
+
+        Parameters
+        ----------
+        method: str
+            The HTTP method
+        pathfmt: str
+            The path of the resource, with {} placeholders for args.
+            The arguments are quoted.
+        params: dict or None
+            The query parameters
+        data: dict or None
+            The json body
+        timeout: float or None
+            The request timeout. Defaults to the client timeout.
+        versioned_api: bool
+            If True, the path is prefixed with the API version.
+
+        Returns
+        -------
+        The Response from the connection pool.
+
+        Raises
+        ------
+        docker.errors.DockerException:
+            If the communication with the engine failed.
+        """
+        path = pathfmt.format(*(quote_plus(arg, safe="/:") for arg in args))
+        if versioned_api:
+            version = yield self._api_version()
+            path = "/v{0}{1}".format(version, path)
+
+        body = None
+        headers = None
+        if data is not None:
+            body = json.dumps(data).encode("utf-8")
+            headers = {"Content-Type": "application/json"}
+
+        try:
+            response = yield self._pool.fetch(
+                method, path,
+                params=params,
+                body=body,
+                headers=headers,
+                timeout=timeout)
+        except (StreamClosedError, OSError, gen.TimeoutError) as e:
+            raise errors.DockerException(
+                "Error while communicating with the docker engine "
+                "at {0}: {1}".format(self.base_url, str(e) or repr(e)))
+
+        return response
+
+
+class _JSONStreamDecoder:
+    """Decodes a stream of concatenated json documents, as sent by the
+    docker events endpoint, and passes each document to a callback.
+    Documents can be split across chunks."""
+
+    def __init__(self, callback):
+        self._callback = callback
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+
+    def feed(self, chunk):
+        self._buffer += self._utf8.decode(chunk)
+
+        while True:
+            self._buffer = self._buffer.lstrip()
+            if not self._buffer:
+                return
+
+            try:
+                document, end = self._decoder.raw_decode(self._buffer)
+            except ValueError:
+                # Incomplete document. Wait for more data.
+                return
+
+            self._buffer = self._buffer[end:]
+            try:
+                self._callback(document)
+            except Exception:
+                app_log.exception("Exception in docker events callback")
+
+
+def _resource_id(resource):
+    """Accepts either an id/name or a dictionary containing the Id,
+    like dockerpy does."""
+    if isinstance(resource, dict):
+        resource = resource.get('Id', resource.get('ID'))
+    if not resource:
+        raise errors.NullResource(
+            'Resource ID was not provided')
+    return resource
+
+
+def _raise_for_status(response):
+    """Raises the dockerpy exception appropriate for the response code.
+    """
+    if response.code < 400:
+        return
+
+    # Use a requests response, so that the exception is the same
+    # that dockerpy would raise.
+    res = requests.Response()
+    res.status_code = response.code
+    res.reason = response.reason
+    res.url = response.url
+    res._content = response.body
+    res.headers = requests.structures.CaseInsensitiveDict(
+        dict(response.headers.get_all()) if response.headers else {})
+
+    try:
+        res.raise_for_status()
+    except requests.exceptions.HTTPError as e:
+        errors.create_api_error_from_http_exception(e)
+
+
+def _result(response):
+    """Checks the response and returns its decoded json content"""
+    _raise_for_status(response)
+    return response.json()
+
+
+def _ssl_context_from_tls(tls):
+    """Converts the dockerpy tls configuration to an ssl context.
+    Returns None if tls is not enabled."""
+    if not tls:
+        return None
+
+    if tls is True:
+        return ssl.create_default_context()
+
+    verify = tls.verify
+    ca_cert = tls.ca_cert
+    if isinstance(verify, str):
+        ca_cert = verify
+
+    if verify:
+        context = ssl.create_default_context(cafile=ca_cert or None)
+        context.check_hostname = tls.assert_hostname is not False
+    else:
+        context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+
+    if tls.cert:
+        context.load_cert_chain(*tls.cert)
+
+    return context
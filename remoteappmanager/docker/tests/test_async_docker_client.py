@@ -1,4 +1,7 @@
+import threading
 import warnings
+from unittest import mock
+
 from tornado.testing import AsyncTestCase, gen_test
 from docker.utils import kwargs_from_env
 
@@ -33,6 +36,53 @@ class TestAsyncDockerClient(AsyncTestCase):
         self.assertIsInstance(response, dict)
         self.assertIn("ID", response)
 
+    @gen_test
+    def test_slow_lifecycle_does_not_block_queries(self):
+        client = AsyncDockerClient(max_workers=1)
+        sync_client = VirtualDockerClient.with_containers()
+        client._sync_client = sync_client
+
+        release = threading.Event()
+
+        def slow_stop(*args, **kwargs):
+            release.wait(5)
+
+        with mock.patch.object(sync_client, "stop", side_effect=slow_stop):
+            stop_future = client.stop("container")
+            try:
+                response = yield client.inspect_image(
+                    "simphonyproject/simphony-mayavi:0.6.0")
+                self.assertIn("Id", response)
+                self.assertFalse(stop_future.done())
+            finally:
+                release.set()
+
+            yield stop_future
+
+        stats = client.executor_stats()
+        self.assertEqual(stats["lifecycle"]["completed"], 1)
+        self.assertEqual(stats["query"]["completed"], 1)
+        self.assertEqual(stats["lifecycle"]["max_workers"], 1)
+
+    @gen_test
+    def test_local_methods(self):
+        client = AsyncDockerClient()
+        sync_client = VirtualDockerClient.with_containers()
+        client._sync_client = sync_client
+
+        future = client.create_host_config(port_bindings={8888: None})
+        self.assertTrue(future.done())
+        self.assertEqual((yield future), {'NetworkMode': 'default'})
+
+        with mock.patch.object(sync_client, "create_host_config",
+                               side_effect=ValueError("Boom!")):
+            with self.assertRaises(ValueError):
+                yield client.create_host_config()
+
+        stats = client.executor_stats()
+        self.assertEqual(stats["lifecycle"]["completed"], 0)
+        self.assertEqual(stats["query"]["completed"], 0)
+
     @gen_test
     def test_real_connection(self):
         client = AsyncDockerClient(**kwargs_from_env())
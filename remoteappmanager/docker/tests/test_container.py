@@ -53,6 +53,23 @@ class TestContainer(TestCase):
 
         self.assertEqual(container.host_url, "http://123.45.67.89:31337")
 
+    def test_defaults(self):
+        container = Container()
+
+        self.assertEqual(container.port, 80)
+        self.assertEqual(container.urlpath, "")
+        self.assertEqual(container.host_url, "http://:80")
+        self.assertIn("urlpath", container.field_names())
+
+        with self.assertRaises(AttributeError):
+            container.foo = "bar"
+
+        with self.assertRaises(TypeError):
+            Container(foo="bar")
+
+        with self.assertRaises(ValueError):
+            container.urlpath = "/user/johndoe/"
+
     def test_from_docker_dict_with_public_port(self):
         """Test convertion from "docker ps" to Container with public port"""
         # With public port
@@ -0,0 +1,121 @@
+from unittest import TestCase
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.container_cache import ContainerCache
+
+
+def make_container(docker_id, user="johndoe", mapping_id="mapping",
+                   url_id=None, port=666):
+    return Container(docker_id=docker_id,
+                     user=user,
+                     mapping_id=mapping_id,
+                     url_id=url_id or "url_" + docker_id,
+                     port=port)
+
+
+class TestContainerCache(TestCase):
+    def setUp(self):
+        self.cache = ContainerCache()
+        self.cache.replace([
+            make_container("1", user="johndoe", mapping_id="a"),
+            make_container("2", user="johndoe", mapping_id="b"),
+            make_container("3", user="janedoe", mapping_id="a"),
+        ])
+
+    def ids(self, containers):
+        return sorted(c.docker_id for c in containers)
+
+    def test_seed(self):
+        cache = ContainerCache()
+        self.assertFalse(cache.seeded)
+        self.assertIsNone(cache.stats()["age"])
+
+        self.assertEqual(len(self.cache), 3)
+        self.assertTrue(self.cache.seeded)
+        stats = self.cache.stats()
+        self.assertEqual(stats["resyncs"], 1)
+        self.assertEqual(stats["stale_entries"], 0)
+        self.assertGreaterEqual(stats["age"], 0)
+
+    def test_find(self):
+        self.assertEqual(self.ids(self.cache.find()), ["1", "2", "3"])
+        self.assertEqual(self.ids(self.cache.find(user_name="johndoe")),
+                         ["1", "2"])
+        self.assertEqual(self.ids(self.cache.find(mapping_id="a")),
+                         ["1", "3"])
+        self.assertEqual(
+            self.ids(self.cache.find(user_name="janedoe", mapping_id="a")),
+            ["3"])
+        self.assertEqual(self.ids(self.cache.find(url_id="url_2")), ["2"])
+        self.assertEqual(
+            self.ids(self.cache.find(url_id="url_2", user_name="janedoe")),
+            [])
+        self.assertEqual(self.cache.find(user_name="nobody"), [])
+
+    def test_put_and_discard(self):
+        self.cache.put(make_container("4", user="janedoe", mapping_id="b"))
+        self.assertEqual(self.ids(self.cache.find(user_name="janedoe")),
+                         ["3", "4"])
+
+        # Updating a container reindexes it.
+        self.cache.put(make_container("4", user="johndoe", mapping_id="b"))
+        self.assertEqual(self.ids(self.cache.find(user_name="janedoe")),
+                         ["3"])
+        self.assertEqual(
+            self.ids(self.cache.find(user_name="johndoe", mapping_id="b")),
+            ["2", "4"])
+
+        self.cache.discard("4")
+        self.cache.discard("4")
+        self.cache.discard("3")
+        self.assertIsNone(self.cache.get("3"))
+        self.assertEqual(self.cache.find(user_name="janedoe"), [])
+        self.assertEqual(self.ids(self.cache.find(mapping_id="a")), ["1"])
+
+    def test_resync_counts_stale_entries(self):
+        stale = self.cache.replace([
+            make_container("1", user="johndoe", mapping_id="a"),
+            make_container("2", user="johndoe", mapping_id="b", port=777),
+            make_container("4", user="janedoe", mapping_id="c"),
+        ])
+
+        # 2 changed, 3 gone, 4 new.
+        self.assertEqual(stale, 3)
+        self.assertEqual(self.cache.stats()["stale_entries"], 3)
+        self.assertEqual(self.cache.stats()["resyncs"], 2)
+        self.assertEqual(self.cache.find(url_id="url_3"), [])
+        self.assertEqual(self.cache.get("2").port, 777)
+
+    def test_changes_during_snapshot(self):
+        since = self.cache.begin_snapshot()
+
+        # While the snapshot is taken, 4 starts, 2 stops and 3 is updated
+        self.cache.put(make_container("4", user="janedoe", mapping_id="c"))
+        self.cache.discard("2")
+        self.cache.put(make_container("3", user="janedoe", mapping_id="a",
+                                      port=777))
+
+        # The snapshot was taken before the changes
+        stale = self.cache.replace([
+            make_container("1", user="johndoe", mapping_id="a"),
+            make_container("2", user="johndoe", mapping_id="b"),
+            make_container("3", user="janedoe", mapping_id="a"),
+        ], since)
+        self.cache.end_snapshot(since)
+
+        self.assertEqual(stale, 0)
+        self.assertEqual(self.ids(self.cache.find()), ["1", "3", "4"])
+        self.assertEqual(self.cache.get("3").port, 777)
+
+        # Once over, the changes are forgotten: the next snapshot
+        # replaces them.
+        since = self.cache.begin_snapshot()
+        self.cache.replace([make_container("1")], since)
+        self.cache.end_snapshot(since)
+        self.assertEqual(self.ids(self.cache.find()), ["1"])
+
+    def test_clear(self):
+        self.cache.clear()
+        self.assertFalse(self.cache.seeded)
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.find(), [])
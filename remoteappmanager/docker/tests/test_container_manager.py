@@ -1,19 +1,39 @@
 import os
+import threading
+import time
+from datetime import timedelta
 from unittest import mock
 
+from docker.errors import NotFound
+from tornado import gen
+from tornado.concurrent import Future
 from tornado.testing import AsyncTestCase, ExpectLog, gen_test
 
 from remoteappmanager.docker.container import Container
-from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
+from remoteappmanager.docker.docker_labels import (
+    SIMPHONY_NS,
+    SIMPHONY_NS_RUNINFO)
 from remoteappmanager.docker.container_manager import ContainerManager, \
     OperationInProgress
 from remoteappmanager.docker.image import Image
+from remoteappmanager.start_trace import StartTrace
 from remoteappmanager.tests import utils
-from remoteappmanager.tests.mocking.dummy import create_container_manager
+from remoteappmanager.tests.mocking.dummy import (
+    create_container_manager,
+    create_multihost_container_manager)
 from remoteappmanager.tests.mocking.virtual.docker_client import (
     VirtualDockerClient)
 
 
+def blocked_until(release, method):
+    """Returns a side effect that waits for the release event in the
+    worker thread, then invokes the method"""
+    def side_effect(*args, **kwargs):
+        release.wait(5)
+        return method(*args, **kwargs)
+    return side_effect
+
+
 class TestContainerManager(AsyncTestCase):
     def setUp(self):
         super().setUp()
@@ -132,13 +152,74 @@ class TestContainerManager(AsyncTestCase):
         result = yield self.manager.find_containers()
         self.assertEqual(len(result), 1)
 
+    @gen_test
+    def test_find_containers_uses_listed_ports(self):
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "port", wraps=mock_client.port):
+            result = yield self.manager.find_containers(user_name="johndoe")
+
+            self.assertEqual(len(result), 1)
+            self.assertEqual(result[0].ip, "127.0.0.1")
+            self.assertEqual(result[0].port, 666)
+            self.assertFalse(mock_client.port.called)
+
+    @gen_test
+    def test_find_containers_port_fallback(self):
+        mock_client = self.mock_docker_client
+        containers = mock_client.containers
+
+        def containers_without_bindings(*args, **kwargs):
+            result = containers(*args, **kwargs)
+            for info in result:
+                info["Ports"] = [{"PrivatePort": 8888, "Type": "tcp"}]
+            return result
+
+        with mock.patch.object(mock_client, "containers",
+                               side_effect=containers_without_bindings), \
+                mock.patch.object(mock_client, "port",
+                                  return_value=[{"HostIp": "0.0.0.0",
+                                                 "HostPort": "4242"}]):
+            result = yield self.manager.find_containers(user_name="johndoe")
+
+            self.assertEqual(len(result), 1)
+            self.assertEqual(result[0].port, 4242)
+            self.assertEqual(mock_client.port.call_count, 1)
+
+    @gen_test
+    def test_find_containers_remote_docker_host(self):
+        manager = create_container_manager(params={
+            "docker_config": {"base_url": "tcp://192.168.99.100:2376"},
+            "realm": "myrealm"})
+
+        result = yield manager.find_containers(user_name="johndoe")
+        self.assertEqual(result[0].ip, "192.168.99.100")
+        self.assertEqual(result[0].port, 666)
+
+    def test_get_port_from_ports_info(self):
+        get_port = self.manager._get_port_from_ports_info
+        self.assertIsNone(get_port(None))
+        self.assertIsNone(get_port([]))
+        self.assertIsNone(get_port([{"PrivatePort": 8888, "Type": "tcp"}]))
+        self.assertIsNone(get_port([{"PrivatePort": 9999,
+                                     "PublicPort": 1234,
+                                     "Type": "tcp"}]))
+        self.assertEqual(
+            get_port([{"IP": "::", "PrivatePort": 8888,
+                       "PublicPort": 1111, "Type": "tcp"},
+                      {"IP": "0.0.0.0", "PrivatePort": 8888,
+                       "PublicPort": 2222, "Type": "tcp"}]),
+            2222)
+
     @gen_test
     def test_race_condition_spawning(self):
-        # Start the operations, and retrieve the future.
-        # they will stop at the first yield and not go further until
-        # we yield them
+        # Start the operations, and retrieve the future. The docker
+        # start is held back until both are issued, as the workers could
+        # otherwise complete the first before the second begins.
+        release = threading.Event()
+        self.addCleanup(release.set)
         with mock.patch.object(self.mock_docker_client, "start",
-                               wraps=self.mock_docker_client.start):
+                               side_effect=blocked_until(
+                                   release, self.mock_docker_client.start)):
             f1 = self.manager.start_container("johndoe",
                                               "simphonyproject/simphony-mayavi:0.6.0",  # noqa
                                               "76cd29a4d61f4ddc95fa633347934807",  # noqa
@@ -153,6 +234,8 @@ class TestContainerManager(AsyncTestCase):
                                               None,
                                               )
 
+            release.set()
+
             # If these yielding raise a KeyError, it is because the second
             # one tries to remove the same key from the list, but it has been
             # already removed by the first one. Race condition.
@@ -166,12 +249,16 @@ class TestContainerManager(AsyncTestCase):
     @gen_test
     def test_race_condition_stopping(self):
         docker_client = self.mock_docker_client
+        release = threading.Event()
+        self.addCleanup(release.set)
 
         with mock.patch.object(docker_client, "stop",
-                               wraps=docker_client.stop):
+                               side_effect=blocked_until(
+                                   release, docker_client.stop)):
 
             f1 = self.manager.stop_and_remove_container("d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
             f2 = self.manager.stop_and_remove_container("d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+            release.set()
 
             yield f1
 
@@ -180,6 +267,28 @@ class TestContainerManager(AsyncTestCase):
 
             self.assertEqual(self.mock_docker_client.stop.call_count, 1)
 
+    @gen_test
+    def test_slow_stop_does_not_block_image(self):
+        docker_client = self.mock_docker_client
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with mock.patch.object(docker_client, "stop",
+                               side_effect=blocked_until(
+                                   release, docker_client.stop)):
+            stopping = self.manager.stop_and_remove_container("d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+
+            # The stop holds a lifecycle worker. The queries go on.
+            image = yield gen.with_timeout(
+                timedelta(seconds=2),
+                self.manager.image('simphonyproject/simphony-mayavi:0.6.0'))
+            self.assertEqual(image.ui_name, "Mayavi 4.4.4")
+            self.assertFalse(stopping.done())
+
+            release.set()
+            yield stopping
+            self.assertEqual(docker_client.stop.call_count, 1)
+
     @gen_test
     def test_start_already_present_container(self):
         mock_client = self.mock_docker_client
@@ -205,6 +314,318 @@ class TestContainerManager(AsyncTestCase):
             self.assertTrue(mock_client.stop.called)
             self.assertTrue(mock_client.remove_container.called)
 
+    @gen_test
+    def test_start_evicts_stale_container_concurrently(self):
+        mock_client = self.mock_docker_client
+        eviction = Future()
+        trace = StartTrace()
+
+        with mock.patch.object(self.manager, "stop_and_remove_container",
+                               return_value=eviction) as stop, \
+            mock.patch.object(mock_client, "create_host_config",
+                              wraps=mock_client.create_host_config
+                              ) as prepare, \
+            mock.patch.object(mock_client, "create_container",
+                              wraps=mock_client.create_container) as create:
+
+            future = self.manager.start_container(
+                "johndoe",
+                "simphonyproject/simphony-mayavi:0.6.0",
+                "5b34ce60d95742fa828cdced12b4c342",
+                "/users/johndoe/containers/random_value",
+                None,
+                None,
+                trace=trace)
+
+            for _ in range(100):
+                if prepare.called and stop.called:
+                    break
+                yield gen.sleep(0.01)
+
+            # The new container is prepared while the stale one is being
+            # evicted, but created only once it is gone.
+            self.assertTrue(prepare.called)
+            stop.assert_called_once_with(
+                "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+            yield gen.sleep(0.05)
+            self.assertFalse(create.called)
+            self.assertFalse(future.done())
+
+            # Meanwhile the mapping has one container
+            container = yield self.manager.find_container(
+                mapping_id="5b34ce60d95742fa828cdced12b4c342")
+            self.assertEqual(
+                container.docker_id,
+                "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30")  # noqa
+
+            eviction.set_result(None)
+            result = yield future
+
+        self.assertTrue(create.called)
+        self.assertIsInstance(result, Container)
+        self.assertEqual(list(trace.phases), ["prepare", "create", "start"])
+        self.assertEqual(set(trace.overlapped),
+                         {"inspect", "lookup", "evict"})
+
+    @gen_test
+    def test_start_missing_image_keeps_stale_container(self):
+        with mock.patch.object(self.manager, "stop_and_remove_container",
+                               wraps=self.manager.stop_and_remove_container
+                               ) as stop, \
+                ExpectLog('tornado.application', ''):
+            with self.assertRaises(Exception):
+                yield self.manager.start_container(
+                    "johndoe",
+                    "missing_image",
+                    "5b34ce60d95742fa828cdced12b4c342",
+                    "/users/johndoe/containers/random_value",
+                    None,
+                    None)
+
+        self.assertFalse(stop.called)
+
+    @gen_test
+    def test_start_failure_waits_for_eviction(self):
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "start",
+                               side_effect=Exception("Boom!")), \
+            mock.patch.object(mock_client, "remove_container",
+                              wraps=mock_client.remove_container), \
+                ExpectLog('tornado.application', ''):
+            with self.assertRaises(Exception):
+                yield self.manager.start_container(
+                    "johndoe",
+                    "simphonyproject/simphony-mayavi:0.6.0",
+                    "5b34ce60d95742fa828cdced12b4c342",
+                    "/users/johndoe/containers/random_value",
+                    None,
+                    None)
+
+            # Both the stale container and the new one are removed.
+            self.assertEqual(mock_client.remove_container.call_count, 2)
+
+        containers = yield self.manager.find_containers(
+            mapping_id="5b34ce60d95742fa828cdced12b4c342")
+        self.assertEqual(containers, [])
+
+    @gen_test
+    def test_start_container_trace(self):
+        trace = StartTrace()
+        yield self.manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "new_mapping_id",
+            "/user/johndoe/",
+            None,
+            trace=trace)
+
+        self.assertEqual(list(trace.phases), ["prepare", "create", "start"])
+
+    @gen_test
+    def test_container_readiness(self):
+        mock_client = self.mock_docker_client
+        image = mock_client._images[0]
+
+        def add_container(id, labels, state):
+            mock_client.add_container_from_raw_info(
+                id, "container_" + id, image, labels, [], state)
+
+        add_container("plain", {}, "running")
+        add_container("labelled", {SIMPHONY_NS.readiness: "tcp"}, "running")
+        add_container("invalid", {SIMPHONY_NS.readiness: "foo"}, "running")
+        add_container("health", {},
+                      {"Status": "running",
+                       "Health": {"Status": "starting"}})
+
+        manager = self.manager
+        self.assertEqual((yield manager.container_readiness("plain")), "http")
+        self.assertEqual((yield manager.container_readiness("labelled")),
+                         "tcp")
+        self.assertEqual((yield manager.container_readiness("health")),
+                         "healthcheck")
+
+        with ExpectLog('tornado.application', ''):
+            self.assertEqual(
+                (yield manager.container_readiness("invalid")), "http")
+            self.assertEqual(
+                (yield manager.container_readiness("whatever")), "http")
+
+        manager.honour_healthcheck = False
+        self.assertEqual((yield manager.container_readiness("health")),
+                         "http")
+
+    @gen_test
+    def test_wait_for_healthy(self):
+        mock_client = self.mock_docker_client
+        mock_client.add_container_from_raw_info(
+            "health", "health", mock_client._images[0], {}, [],
+            {"Status": "running", "Health": {"Status": "starting"}})
+
+        with self.assertRaises(TimeoutError):
+            yield self.manager.wait_for_healthy("health", 0.3)
+
+        def set_health(status):
+            mock_client._set_container_state(
+                "health", {"Status": "running", "Health": {"Status": status}})
+
+        self.io_loop.call_later(0.2, set_health, "healthy")
+        yield self.manager.wait_for_healthy("health", 5)
+
+        set_health("unhealthy")
+        with self.assertRaises(RuntimeError):
+            yield self.manager.wait_for_healthy("health", 5)
+
+        # No healthcheck at all
+        yield self.manager.wait_for_healthy(
+            "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30",
+            5)
+
+    @gen_test
+    def test_warm_pool(self):
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "warm_pool_size": 2,
+            "warm_pool_images": [image_name]})
+
+        # The first start is cold. Nothing is pre-started for a running
+        # application.
+        trace = StartTrace()
+        first = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None,
+            trace=trace)
+        self.assertNotIn("claim", trace.phases)
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+        # Stopping it gives the resources back
+        yield manager.stop_and_remove_container(first.docker_id)
+        yield gen.sleep(0.05)
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+        # The next start fills the pool, for the other application
+        other = yield manager.start_container(
+            "johndoe", image_name, "mapping_b", "/user/johndoe/", None)
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 1)
+        self.assertEqual(manager.warm_pool_stats()["filled"], 1)
+
+        # The pre-started container is not visible, and has the labels of
+        # its mapping
+        warm = manager._warm_pool.idle_containers()[0]
+        self.assertTrue(warm.warm)
+        self.assertEqual(warm.mapping_id, "mapping_a")
+        containers = yield manager.find_containers(user_name="johndoe")
+        self.assertNotIn(warm.docker_id,
+                         [container.docker_id for container in containers])
+
+        # The application is started again, from the pool
+        trace = StartTrace()
+        second = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None,
+            trace=trace)
+        self.assertIn("claim", trace.phases)
+        self.assertEqual(second.docker_id, warm.docker_id)
+
+        found = yield manager.find_container(mapping_id="mapping_a")
+        self.assertEqual(found.docker_id, second.docker_id)
+        self.assertEqual(found.mapping_id, "mapping_a")
+        self.assertEqual(manager.warm_pool_stats()["hits"], 1)
+
+        # Not refilled while both run
+        yield gen.sleep(0.05)
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+        yield manager.stop_and_remove_container(other.docker_id)
+        yield manager.stop_and_remove_container(second.docker_id)
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 2)
+
+        # The idle containers stopped by somebody else are forgotten
+        mock_client = manager._docker_client._sync_client
+        warm = manager._warm_pool.idle_containers()[0]
+        mock_client.stop(warm.docker_id)
+        mock_client.remove_container(warm.docker_id)
+        manager._warm_pool.close()
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 1)
+
+        yield manager.drain_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+    @gen_test
+    def test_warm_pool_one_container_per_mapping(self):
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "warm_pool_size": 2,
+            "warm_pool_images": [image_name]})
+
+        first = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None,
+            environment={"FOO": "1"})
+        yield manager.stop_and_remove_container(first.docker_id)
+        yield manager.fill_warm_pool()
+        warm = manager._warm_pool.idle_containers()[0]
+
+        # Started with another environment: the pre-started container
+        # cannot serve it, and is evicted.
+        container = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None,
+            environment={"FOO": "2"})
+        self.assertNotEqual(container.docker_id, warm.docker_id)
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+        # Nothing is pre-started for the mapping while it runs
+        yield manager.fill_warm_pool()
+        self.assertEqual(manager.warm_pool_stats()["idle"], 0)
+
+        mock_client = manager._docker_client._sync_client
+        self.assertEqual(
+            [c["Id"] for c in mock_client.containers(filters={
+                "label": "{}=mapping_a".format(
+                    SIMPHONY_NS_RUNINFO.mapping_id)})],
+            [container.docker_id])
+
+    @gen_test
+    def test_warm_pool_claim_survives_restart(self):
+        image_name = 'simphonyproject/simphony-mayavi:0.6.0'
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "warm_pool_size": 1,
+            "warm_pool_images": [image_name]})
+        mock_client = manager._docker_client._sync_client
+
+        first = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None)
+        yield manager.stop_and_remove_container(first.docker_id)
+        yield manager.fill_warm_pool()
+        claimed = yield manager.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None)
+        self.assertTrue(claimed.warm)
+
+        # The mapping is in the labels of the container: a new process
+        # finds it, and evicts it on the next start instead of running a
+        # second one.
+        restarted = create_container_manager()
+        restarted._docker_client._sync_client = mock_client
+        found = yield restarted.find_container(mapping_id="mapping_a")
+        self.assertEqual(found.docker_id, claimed.docker_id)
+        self.assertEqual(found.mapping_id, "mapping_a")
+
+        container = yield restarted.start_container(
+            "johndoe", image_name, "mapping_a", "/user/johndoe/", None)
+        containers = yield restarted.find_containers(mapping_id="mapping_a")
+        self.assertEqual([c.docker_id for c in containers],
+                         [container.docker_id])
+        found = yield restarted.find_container(url_id=containers[0].url_id,
+                                               user_name="johndoe")
+        self.assertEqual(found.docker_id, container.docker_id)
+
     @gen_test
     def test_image(self):
         image = yield self.manager.image('simphonyproject/simphony-mayavi:0.6.0')  # noqa
@@ -218,6 +639,108 @@ class TestContainerManager(AsyncTestCase):
         image = yield self.manager.image("whatev")
         self.assertIsNone(image)
 
+    @gen_test
+    def test_image_cache(self):
+        name = 'simphonyproject/simphony-mayavi:0.6.0'
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "inspect_image",
+                               wraps=mock_client.inspect_image):
+            image = yield self.manager.image(name)
+
+            # Cached both by name and id
+            self.assertIs((yield self.manager.image(name)), image)
+            self.assertIs((yield self.manager.image(image.docker_id)), image)
+            self.assertEqual(mock_client.inspect_image.call_count, 1)
+
+            # Non existent images are not cached
+            yield self.manager.image("whatev")
+            yield self.manager.image("whatev")
+            self.assertEqual(mock_client.inspect_image.call_count, 3)
+
+        stats = self.manager.image_cache_stats()
+        self.assertEqual(stats["size"], 2)
+        self.assertEqual(stats["hits"], 2)
+
+    @gen_test
+    def test_image_cache_shares_requests(self):
+        name = 'simphonyproject/simphony-mayavi:0.6.0'
+        mock_client = self.mock_docker_client
+        inspect_image = mock_client.inspect_image
+
+        def slow_inspect_image(*args, **kwargs):
+            time.sleep(0.05)
+            return inspect_image(*args, **kwargs)
+
+        with mock.patch.object(mock_client, "inspect_image",
+                               side_effect=slow_inspect_image):
+            images = yield [self.manager.image(name) for _ in range(5)]
+            self.assertEqual(mock_client.inspect_image.call_count, 1)
+
+        self.assertTrue(all(image is images[0] for image in images))
+        self.assertEqual(self.manager.image_cache_stats()["shared"], 4)
+
+    @gen_test
+    def test_image_cache_disabled(self):
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "image_cache_size": 0})
+        mock_client = manager._docker_client._sync_client
+        with mock.patch.object(mock_client, "inspect_image",
+                               wraps=mock_client.inspect_image):
+            yield manager.image('simphonyproject/simphony-mayavi:0.6.0')
+            yield manager.image('simphonyproject/simphony-mayavi:0.6.0')
+            self.assertEqual(mock_client.inspect_image.call_count, 2)
+
+    @gen_test
+    def test_image_cache_invalidation(self):
+        name = 'simphonyproject/simphony-mayavi:0.6.0'
+        mock_client = self.mock_docker_client
+
+        self.manager.start_image_cache()
+        try:
+            # The events are followed from the first lookup
+            self.assertFalse(mock_client._event_queues)
+            image = yield self.manager.image(name)
+            self.assertEqual(image.ui_name, "Mayavi 4.4.4")
+            yield wait_for(lambda: mock_client._event_queues)
+
+            # The tag now points to a different image
+            mock_client.remove_image(name)
+            mock_client.tag('simphonyproject/simphony-paraview',
+                            'simphonyproject/simphony-mayavi', '0.6.0')
+            yield wait_for(lambda: len(self.manager._image_cache) == 0)
+
+            image = yield self.manager.image(name)
+            self.assertNotEqual(image.ui_name, "Mayavi 4.4.4")
+        finally:
+            self.manager.stop_image_cache()
+            mock_client.stop_events()
+
+    @gen_test
+    def test_image_cache_invalidated_during_inspection(self):
+        name = 'simphonyproject/simphony-mayavi:0.6.0'
+        mock_client = self.mock_docker_client
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        with mock.patch.object(mock_client, "inspect_image",
+                               side_effect=blocked_until(
+                                   release, mock_client.inspect_image)):
+            inspection = self.manager.image(name)
+
+            # The image changes while it is being inspected
+            self.manager._on_docker_image_event({"Action": "tag"})
+            release.set()
+
+            image = yield inspection
+            self.assertEqual(image.ui_name, "Mayavi 4.4.4")
+            self.assertEqual(len(self.manager._image_cache), 0)
+
+            yield self.manager.image(name)
+            self.assertEqual(mock_client.inspect_image.call_count, 2)
+            self.assertEqual(len(self.manager._image_cache), 2)
+
     @gen_test
     def test_start_container_with_nonexisting_volume_source(self):
         # These volume sources are invalid
@@ -338,6 +861,25 @@ class TestContainerManager(AsyncTestCase):
                     "environment"]["FOO"],
                 "bar")
 
+    @gen_test
+    def test_start_container_with_resource_limits(self):
+        mock_client = self.mock_docker_client
+        with mock.patch.object(mock_client, "create_host_config",
+                               wraps=mock_client.create_host_config):
+
+            yield self.manager.start_container(
+                "johndoe",
+                "simphonyproject/simphony-mayavi:0.6.0",
+                "4273750ddce3454283a5b1817526260b",
+                "/users/johndoe/containers/3b83f81f2e4544e6aa1493b50202f8eb",
+                None,
+                resource_limits={"mem_limit": 1024 ** 3,
+                                 "pids_limit": 100})
+
+            host_config = mock_client.create_host_config.call_args[1]
+            self.assertEqual(host_config["mem_limit"], 1024 ** 3)
+            self.assertEqual(host_config["pids_limit"], 100)
+
     @gen_test
     def test_different_realm(self):
         manager = ContainerManager(docker_config={},
@@ -364,3 +906,261 @@ class TestContainerManager(AsyncTestCase):
 
         self.assertFalse(self.mock_docker_client.stop.called)
         self.assertFalse(self.mock_docker_client.remove_container.called)
+
+    @gen_test
+    def test_container_cache(self):
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "container_cache_enabled": True})
+        mock_client = manager._docker_client._sync_client
+
+        yield manager.start_container_cache()
+        try:
+            yield self._check_container_cache(manager, mock_client)
+        finally:
+            manager.stop_container_cache()
+            mock_client.stop_events()
+
+        self.assertFalse(manager.container_cache_stats()["seeded"])
+        result = yield manager.find_containers()
+        self.assertEqual(result, [])
+
+    @gen.coroutine
+    def _check_container_cache(self, manager, mock_client):
+        yield wait_for(lambda: mock_client._event_queues)
+
+        with mock.patch.object(mock_client, "containers",
+                               wraps=mock_client.containers):
+            result = yield manager.find_containers(user_name="johndoe")
+            self.assertEqual(len(result), 1)
+
+            result = yield manager.find_container(
+                url_id="20dcb84cdbea4b1899447246789093d0")
+            self.assertEqual(result.port, 666)
+            self.assertFalse(mock_client.containers.called)
+
+        # The containers started by the manager are visible right away.
+        container = yield manager.start_container(
+            "johndoe",
+            'simphonyproject/simphony-mayavi:0.6.0',
+            "new_mapping",
+            "/user/johndoe/",
+            None)
+        result = yield manager.find_container(mapping_id="new_mapping")
+        self.assertEqual(result.docker_id, container.docker_id)
+
+        yield manager.stop_and_remove_container(container.docker_id)
+        result = yield manager.find_container(mapping_id="new_mapping")
+        self.assertIsNone(result)
+
+        # Changes made outside of the manager are followed from the events
+        docker_id = "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30"  # noqa
+        mock_client.remove_container(docker_id)
+        yield wait_for(
+            lambda: manager._container_cache.get(docker_id) is None)
+
+        stats = manager.container_cache_stats()
+        self.assertTrue(stats["seeded"])
+        self.assertEqual(stats["hits"], 5)
+        self.assertEqual(stats["misses"], 0)
+        self.assertGreater(stats["events"], 0)
+
+    @gen_test
+    def test_container_cache_resync(self):
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "container_cache_enabled": True})
+        mock_client = manager._docker_client._sync_client
+
+        # Seeding fails, the queries go to docker.
+        with mock.patch.object(mock_client, "containers",
+                               side_effect=Exception("Boom!")), \
+                ExpectLog('tornado.application', ''):
+            yield manager.start_container_cache()
+
+        # No events for this test.
+        manager.stop_container_cache()
+        mock_client.stop_events()
+        manager._cache_stop = Future()
+
+        result = yield manager.find_containers()
+        self.assertEqual(len(result), 1)
+        self.assertEqual(manager.container_cache_stats()["misses"], 1)
+
+        # A change that went unnoticed is recovered by the resync
+        yield manager.resync_container_cache()
+        mock_client._containers.pop(0)
+        with ExpectLog('tornado.application', ''):
+            yield manager.resync_container_cache()
+
+        stats = manager.container_cache_stats()
+        self.assertEqual(stats["resyncs"], 2)
+        self.assertEqual(stats["stale_entries"], 1)
+        result = yield manager.find_containers()
+        self.assertEqual(result, [])
+
+    @gen_test
+    def test_container_cache_events_during_resync(self):
+        manager = create_container_manager(params={
+            "docker_config": {},
+            "realm": "myrealm",
+            "container_cache_enabled": True})
+        mock_client = manager._docker_client._sync_client
+
+        yield manager.start_container_cache()
+        try:
+            # The listing of the resync is taken before the start, and
+            # applied after it.
+            listed = Future()
+            release = Future()
+            list_containers = manager._find_containers_from_docker
+
+            @gen.coroutine
+            def slow_listing(**kwargs):
+                containers = yield list_containers(**kwargs)
+                listed.set_result(None)
+                yield release
+                return containers
+
+            with mock.patch.object(manager, "_find_containers_from_docker",
+                                   side_effect=slow_listing):
+                resync = manager.resync_container_cache()
+                yield listed
+
+                container = yield manager.start_container(
+                    "johndoe",
+                    'simphonyproject/simphony-mayavi:0.6.0',
+                    "mapping",
+                    "/user/johndoe/",
+                    None)
+                release.set_result(None)
+                yield resync
+
+            found = yield manager.find_container(mapping_id="mapping")
+            self.assertEqual(found.docker_id, container.docker_id)
+            self.assertEqual(manager.container_cache_stats()["misses"], 0)
+        finally:
+            manager.stop_container_cache()
+            mock_client.stop_events()
+
+    @gen_test
+    def test_container_cache_disabled(self):
+        yield self.manager.start_container_cache()
+        self.assertFalse(self.manager.container_cache_stats()["seeded"])
+
+        yield self.manager.find_containers()
+        self.assertEqual(self.manager.container_cache_stats()["misses"], 0)
+
+
+class TestContainerManagerMultipleHosts(AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        # The first host runs a container of johndoe, the second is idle.
+        self.first = VirtualDockerClient.with_containers()
+        self.second = VirtualDockerClient()
+        self.second._images = self.second._available_images[:]
+        self.manager = create_multihost_container_manager(
+            [self.first, self.second])
+
+    @gen.coroutine
+    def start_container(self,
+                        image_name="simphonyproject/ubuntu-image:latest"):
+        container = yield self.manager.start_container(
+            "johndoe",
+            image_name,
+            "f7a1a6f6b8c74b4c9a3f1c0d7b2e5a11",
+            "/user/johndoe",
+            None)
+        return container
+
+    @gen_test
+    def test_placement_and_find(self):
+        container = yield self.start_container()
+
+        self.assertEqual(container.ip, "10.0.0.2")
+        self.assertEqual(len(self.second._containers), 1)
+        self.assertEqual(len(self.first._containers), 3)
+
+        result = yield self.manager.find_containers(user_name="johndoe")
+        self.assertEqual(
+            sorted((c.ip, c.mapping_id) for c in result),
+            [("10.0.0.1", "5b34ce60d95742fa828cdced12b4c342"),
+             ("10.0.0.2", "f7a1a6f6b8c74b4c9a3f1c0d7b2e5a11")])
+
+        yield self.manager.stop_and_remove_container(container.docker_id)
+        self.assertEqual(self.second._containers, [])
+        self.assertEqual(len(self.first._containers), 3)
+
+    @gen_test
+    def test_placement_by_load(self):
+        # One running container on 16 CPUs is less than none on 4.
+        self.first.ncpu = 16
+        container = yield self.start_container()
+        self.assertEqual(container.ip, "10.0.0.1")
+
+        # With the same containers per CPU, the most memory per container
+        # wins: 32 GiB for 3 against 8 GiB for 1.
+        self.first.ncpu = 12
+        self.first.mem_total = self.second.mem_total * 4
+        container = yield self.start_container(
+            "simphonyproject/simphony-paraview")
+        self.assertEqual(container.ip, "10.0.0.1")
+
+    @gen_test
+    def test_image_affinity(self):
+        self.second._images = []
+        container = yield self.start_container()
+        self.assertEqual(container.ip, "10.0.0.1")
+
+        self.first._images = []
+        self.manager._image_cache.clear()
+        with ExpectLog('tornado.application', ''), \
+                self.assertRaises(NotFound):
+            yield self.start_container()
+
+    @gen_test
+    def test_unknown_container_host(self):
+        container = yield self.start_container()
+
+        # Another manager, e.g. after a restart, finds where it is.
+        manager = create_multihost_container_manager(
+            [self.first, self.second])
+        with mock.patch.object(self.second, "stop",
+                               wraps=self.second.stop):
+            yield manager.stop_and_remove_container(container.docker_id)
+            self.assertTrue(self.second.stop.called)
+
+        self.assertEqual(self.second._containers, [])
+
+    @gen_test
+    def test_unreachable_host(self):
+        self.first.containers = mock.Mock(side_effect=Exception("Boom"))
+        self.first.info = mock.Mock(side_effect=Exception("Boom"))
+        self.second.ncpu = 1
+
+        with ExpectLog('tornado.application', 'Docker host'):
+            container = yield self.start_container()
+        self.assertEqual(container.ip, "10.0.0.2")
+
+        with ExpectLog('tornado.application', 'Docker host'):
+            result = yield self.manager.find_containers()
+        self.assertEqual([c.docker_id for c in result],
+                         [container.docker_id])
+
+        self.second.containers = mock.Mock(side_effect=Exception("Boom"))
+        with ExpectLog('tornado.application', 'Docker host'), \
+                self.assertRaises(Exception):
+            yield self.manager.find_containers()
+
+
+@gen.coroutine
+def wait_for(condition, timeout=5):
+    """Waits until condition() is true, or fails after timeout seconds"""
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        yield gen.sleep(0.01)
+
+    raise AssertionError("Condition not satisfied in time")
@@ -0,0 +1,42 @@
+from unittest import TestCase
+
+from remoteappmanager.docker.docker_host import (
+    DockerHost,
+    HostLoad,
+    host_load,
+    placement_key)
+
+
+class TestDockerHost(TestCase):
+    def test_ip(self):
+        for base_url, ip in [
+                ("", "127.0.0.1"),
+                ("unix://var/run/docker.sock", "127.0.0.1"),
+                ("http+unix://var/run/docker.sock", "127.0.0.1"),
+                ("tcp://192.168.99.100:2376", "192.168.99.100"),
+                ("https://10.0.0.2:2376", "10.0.0.2")]:
+            host = DockerHost({"base_url": base_url}, None)
+            self.assertEqual(host.ip, ip)
+
+        self.assertEqual(DockerHost({}, None).ip, "127.0.0.1")
+        self.assertEqual(DockerHost({}, None).name, "default")
+
+    def test_host_load(self):
+        self.assertEqual(
+            host_load({"ContainersRunning": 3,
+                       "NCPU": 8,
+                       "MemTotal": 1024}),
+            HostLoad(running=3, cpus=8, memory=1024))
+
+        # Old engines may not report the resources
+        self.assertEqual(host_load({}), HostLoad(running=0, cpus=1, memory=0))
+
+    def test_placement_key(self):
+        loads = [
+            HostLoad(running=3, cpus=4, memory=16),
+            HostLoad(running=1, cpus=4, memory=16),
+            HostLoad(running=1, cpus=1, memory=16),
+            HostLoad(running=1, cpus=4, memory=32),
+        ]
+        self.assertEqual(sorted(loads, key=placement_key),
+                         [loads[3], loads[1], loads[0], loads[2]])
@@ -52,3 +52,12 @@ class TestImage(TestCase):
 
         self.assertEqual(image.type, '')
         self.assertEqual(image.env, {})
+
+    def test_defaults(self):
+        image = Image(name="foo")
+
+        self.assertEqual(image.name, "foo")
+        self.assertEqual(image.env, {})
+        self.assertEqual(image.configurables, [])
+        self.assertIsNot(image.env, Image().env)
+        self.assertIn("name='foo'", repr(image))
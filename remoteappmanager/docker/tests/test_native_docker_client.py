@@ -0,0 +1,252 @@
+import os
+import ssl
+from unittest import mock
+
+from docker import errors
+from tornado import gen
+from tornado.concurrent import Future
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.docker.docker_labels import SIMPHONY_NS_RUNINFO
+from remoteappmanager.docker.native_docker_client import (
+    NativeDockerClient, _ssl_context_from_tls)
+from remoteappmanager.tests.mocking.virtual.docker_engine import (
+    VirtualDockerEngine)
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+IMAGE = "simphonyproject/simphony-mayavi:0.6.0"
+RUNNING_CONTAINER = "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30"  # noqa
+
+
+class TestNativeDockerClient(TempMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.socket_path = os.path.join(self.tempdir, "docker.sock")
+        self.base_url = "unix://" + self.socket_path
+        self.engine = VirtualDockerEngine()
+        self.server = self.engine.listen_unix(self.socket_path)
+
+    def tearDown(self):
+        self.server.stop()
+        self.io_loop.run_sync(self.server.close_all_connections)
+        super().tearDown()
+
+    def create_client(self, **kwargs):
+        client = NativeDockerClient(base_url=self.base_url, **kwargs)
+        self.addCleanup(client.close)
+        return client
+
+    @gen_test
+    def test_version(self):
+        client = self.create_client(version="auto")
+        response = yield client.version(api_version=False)
+        self.assertEqual(response["ApiVersion"], "1.26")
+
+        # The version is retrieved only once, and is shared by concurrent
+        # requests.
+        yield [client.info(), client.info()]
+        self.assertEqual(self.engine.requests,
+                         [("GET", "/version"),
+                          ("GET", "/version"),
+                          ("GET", "/v1.26/info"),
+                          ("GET", "/v1.26/info")])
+
+    @gen_test
+    def test_explicit_version(self):
+        client = self.create_client(version="1.24")
+        yield client.info()
+        self.assertEqual(self.engine.requests, [("GET", "/v1.24/info")])
+
+    @gen_test
+    def test_containers(self):
+        client = self.create_client()
+        containers = yield client.containers()
+        self.assertEqual([c["Id"] for c in containers], [RUNNING_CONTAINER])
+
+        containers = yield client.containers(all=True)
+        self.assertEqual(len(containers), 3)
+
+        containers = yield client.containers(
+            all=True,
+            filters={"label": [SIMPHONY_NS_RUNINFO.user + "=johndoe"]})
+        self.assertEqual(len(containers), 2)
+
+        containers = yield client.containers(quiet=True)
+        self.assertEqual(containers, [{"Id": RUNNING_CONTAINER}])
+
+    @gen_test
+    def test_inspect(self):
+        client = self.create_client()
+        image = yield client.inspect_image(IMAGE)
+        self.assertEqual(image["RepoTags"], [IMAGE])
+
+        container = yield client.inspect_container({"Id": RUNNING_CONTAINER})
+        self.assertEqual(container["Id"], RUNNING_CONTAINER)
+
+        with self.assertRaises(errors.ImageNotFound):
+            yield client.inspect_image("whatever")
+
+        with self.assertRaises(errors.NotFound) as cm:
+            yield client.inspect_container("whatever")
+
+        self.assertEqual(cm.exception.response.status_code, 404)
+
+        with self.assertRaises(errors.NullResource):
+            yield client.inspect_container(None)
+
+    @gen_test
+    def test_port(self):
+        client = self.create_client()
+        port = yield client.port(RUNNING_CONTAINER, 8888)
+        self.assertEqual(port, [{"HostIp": "0.0.0.0", "HostPort": "666"}])
+
+        port = yield client.port(RUNNING_CONTAINER, "8888/tcp")
+        self.assertEqual(port, [{"HostIp": "0.0.0.0", "HostPort": "666"}])
+
+        port = yield client.port(RUNNING_CONTAINER, 9999)
+        self.assertIsNone(port)
+
+    @gen_test
+    def test_container_lifecycle(self):
+        client = self.create_client()
+        host_config = yield client.create_host_config(
+            port_bindings={8888: None})
+        self.assertIn("PortBindings", host_config)
+
+        with self.assertRaises(TypeError):
+            yield client.create_host_config(version="1.26")
+
+        result = yield client.create_container(
+            image=IMAGE,
+            name="foo",
+            labels={"x": "y"},
+            environment={"USER": "foo"},
+            host_config=host_config)
+
+        container_id = result["Id"]
+        container = yield client.inspect_container("foo")
+        self.assertEqual(container["Id"], container_id)
+        self.assertEqual(container["Config"]["Labels"]["x"], "y")
+
+        yield client.start(container_id)
+        yield client.stop(container_id)
+        yield client.remove_container(container_id)
+
+        with self.assertRaises(errors.NotFound):
+            yield client.remove_container(container_id)
+
+        with self.assertRaises(errors.NotFound):
+            yield client.start(container_id)
+
+    @gen_test
+    def test_concurrent_requests_share_connections(self):
+        self.engine.latency = 0.05
+        client = self.create_client(max_connections=4)
+
+        results = yield [client.inspect_image(IMAGE) for _ in range(20)]
+
+        self.assertEqual(len(results), 20)
+        self.assertEqual(self.engine.max_in_flight, 4)
+        self.assertEqual(len(self.engine.streams), 4)
+        self.assertEqual(client.connection_stats()["opened"], 4)
+
+        # Following requests reuse the same connections.
+        yield client.containers()
+        self.assertEqual(len(self.engine.streams), 4)
+
+    @gen_test
+    def test_watch_events(self):
+        client = self.create_client()
+        events = []
+        cancel = Future()
+        watch = client.watch_events(
+            events.append,
+            filters={"type": "container"},
+            cancel=cancel)
+
+        while not self.engine.event_streams:
+            yield gen.sleep(0.01)
+
+        self.engine.docker_client.stop(RUNNING_CONTAINER)
+        while len(events) < 2:
+            yield gen.sleep(0.01)
+
+        self.assertEqual([e["Action"] for e in events], ["die", "stop"])
+        self.assertEqual(events[0]["id"], RUNNING_CONTAINER)
+        self.assertEqual(events[0]["Type"], "container")
+
+        cancel.set_result(None)
+        yield watch
+
+        # The engine ending the stream terminates the watch as well
+        watch = client.watch_events(events.append)
+        while not self.engine.event_streams:
+            yield gen.sleep(0.01)
+        self.engine.stop_events()
+        yield watch
+
+    @gen_test
+    def test_container_cache(self):
+        manager = ContainerManager(
+            docker_config={"base_url": self.base_url},
+            docker_native_client=True,
+            container_cache_enabled=True,
+            realm="myrealm")
+        self.addCleanup(manager._docker_client.close)
+
+        yield manager.start_container_cache()
+        try:
+            while not self.engine.event_streams:
+                yield gen.sleep(0.01)
+
+            found = yield manager.find_container(user_name="johndoe")
+            self.assertEqual(found.docker_id, RUNNING_CONTAINER)
+
+            self.engine.docker_client.remove_container(RUNNING_CONTAINER)
+            while manager._container_cache.get(RUNNING_CONTAINER):
+                yield gen.sleep(0.01)
+
+            found = yield manager.find_container(user_name="johndoe")
+            self.assertIsNone(found)
+            self.assertEqual(manager.container_cache_stats()["misses"], 0)
+        finally:
+            manager.stop_container_cache()
+
+    @gen_test
+    def test_engine_unavailable(self):
+        client = NativeDockerClient(
+            base_url="unix://" + os.path.join(self.tempdir, "nope.sock"))
+        with self.assertRaises(errors.DockerException):
+            yield client.info()
+
+    @gen_test
+    def test_container_manager(self):
+        manager = ContainerManager(
+            docker_config={"base_url": self.base_url},
+            docker_native_client=True,
+            realm="myrealm")
+        self.assertIsInstance(manager._docker_client, NativeDockerClient)
+        self.addCleanup(manager._docker_client.close)
+
+        container = yield manager.start_container(
+            "johndoe", IMAGE, "mapping", "/user/johndoe/", None)
+        self.assertEqual(container.ip, "127.0.0.1")
+        self.assertEqual(container.port, 666)
+
+        containers = yield manager.find_containers(user_name="johndoe")
+        self.assertIn(container.docker_id,
+                      [c.docker_id for c in containers])
+
+        yield manager.stop_and_remove_container(container.docker_id)
+        found = yield manager.find_container(mapping_id="mapping")
+        self.assertIsNone(found)
+
+    def test_ssl_context_from_tls(self):
+        self.assertIsNone(_ssl_context_from_tls(False))
+        self.assertIsInstance(_ssl_context_from_tls(True), ssl.SSLContext)
+
+        tls = mock.Mock(verify=False, ca_cert=None, cert=None)
+        context = _ssl_context_from_tls(tls)
+        self.assertEqual(context.verify_mode, ssl.CERT_NONE)
+        self.assertFalse(context.check_hostname)
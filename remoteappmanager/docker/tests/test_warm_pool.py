@@ -0,0 +1,143 @@
+from unittest import TestCase
+
+from remoteappmanager.docker.container import Container
+from remoteappmanager.docker.warm_pool import WarmKey, WarmPool
+
+
+def make_key(image_name, environment=(), mapping_id=None):
+    if mapping_id is None:
+        mapping_id = "mapping_" + image_name
+    return WarmKey("johndoe", image_name, mapping_id, "/user/johndoe/",
+                   environment, ())
+
+
+class TestWarmPool(TestCase):
+    def setUp(self):
+        self.pool = WarmPool(size=2)
+
+    def test_wanted_follows_demand(self):
+        self.assertEqual(self.pool.wanted(), [])
+
+        self.pool.record_demand(make_key("a"))
+        self.pool.record_demand(make_key("b"))
+        self.pool.record_demand(make_key("b"))
+        self.pool.record_demand(make_key("c"))
+        self.assertEqual(self.pool.wanted(), [make_key("b"), make_key("a")])
+
+        self.pool.start_pending(make_key("b"))
+        self.assertEqual(self.pool.wanted(), [make_key("a")])
+
+        self.pool.end_pending(make_key("b"))
+        self.pool.put(make_key("b"), Container(docker_id="1"))
+        self.assertEqual(self.pool.wanted(), [make_key("a")])
+        self.assertEqual(self.pool.stats()["idle"], 1)
+
+    def test_wanted_per_mapping(self):
+        self.pool.record_demand(make_key("a", (("FOO", "1"),)))
+        self.pool.record_demand(make_key("a", (("FOO", "1"),)))
+        self.pool.record_demand(make_key("a", (("FOO", "2"),)))
+        self.pool.record_demand(make_key("b"))
+
+        # The same mapping with other settings is another key, but a
+        # mapping gets one container
+        self.assertEqual(self.pool.wanted(),
+                         [make_key("a", (("FOO", "1"),)), make_key("b")])
+
+        # None for a mapping with a running container
+        self.pool.track(make_key("a", (("FOO", "2"),)), "1")
+        self.assertEqual(self.pool.wanted(), [make_key("b")])
+        self.pool.discard("1")
+
+        self.pool.put(make_key("a", (("FOO", "2"),)),
+                      Container(docker_id="2"))
+        self.assertEqual(self.pool.wanted(), [make_key("b")])
+        self.assertTrue(self.pool.has_idle(make_key("a", (("FOO", "2"),))))
+        self.assertFalse(self.pool.has_idle(make_key("b")))
+
+        # Removed when the mapping is started with other settings
+        idle = self.pool.remove_idle("johndoe", "mapping_a")
+        self.assertEqual([c.docker_id for c in idle], ["2"])
+        self.assertFalse(self.pool.is_hidden("2"))
+        self.assertEqual(self.pool.remove_idle("johndoe", "mapping_a"), [])
+
+        self.pool.close()
+        self.assertEqual(self.pool.wanted(), [])
+
+    def test_wanted_during_request(self):
+        key = make_key("a")
+        self.pool.record_demand(key)
+        self.pool.start_request(key)
+        self.assertEqual(self.pool.wanted(), [])
+
+        self.pool.track(key, "1")
+        self.pool.end_request(key)
+        self.assertEqual(self.pool.wanted(), [])
+
+        # Stopped: a container is wanted for the next request
+        self.pool.discard("1")
+        self.assertEqual(self.pool.wanted(), [key])
+
+    def test_put_while_running(self):
+        key = make_key("a")
+        self.pool.start_pending(key)
+        self.pool.hide("1")
+
+        # The mapping is started meanwhile, with other settings
+        self.pool.track(make_key("a", (("FOO", "1"),)), "2")
+        self.pool.end_pending(key)
+        self.assertFalse(self.pool.put(key, Container(docker_id="1")))
+        self.assertFalse(self.pool.is_hidden("1"))
+        self.assertEqual(len(self.pool), 0)
+
+        self.pool.discard("2")
+        self.assertTrue(self.pool.put(key, Container(docker_id="1")))
+        self.assertTrue(self.pool.is_hidden("1"))
+
+    def test_claim(self):
+        key = make_key("a")
+        self.pool.hide("1")
+        self.assertTrue(self.pool.is_hidden("1"))
+        self.pool.put(key, Container(docker_id="1"))
+
+        self.assertIsNone(self.pool.claim(make_key("b")))
+        container = self.pool.claim(key)
+        self.assertEqual(container.docker_id, "1")
+        self.assertFalse(self.pool.is_hidden("1"))
+        self.assertIsNone(self.pool.claim(key))
+
+        # The claimed container is running for the mapping
+        self.pool.record_demand(key)
+        self.assertEqual(self.pool.wanted(), [])
+
+        self.pool.discard("1")
+        self.assertEqual(self.pool.wanted(), [key])
+
+        stats = self.pool.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["filled"], 1)
+        self.assertEqual(stats["idle"], 0)
+
+    def test_discard(self):
+        self.pool.put(make_key("a"), Container(docker_id="1"))
+        self.pool.put(make_key("a"), Container(docker_id="2"))
+        self.pool.discard("1")
+
+        self.assertFalse(self.pool.is_hidden("1"))
+        self.assertEqual([c.docker_id for c in self.pool.idle_containers()],
+                         ["2"])
+        self.pool.discard("2")
+        self.assertEqual(len(self.pool), 0)
+        self.assertIsNone(self.pool.claim(make_key("a")))
+
+    def test_retain(self):
+        self.pool.put(make_key("a"), Container(docker_id="1"))
+        self.pool.put(make_key("b"), Container(docker_id="2"))
+        self.pool.track(make_key("c"), "4")
+        self.pool.record_demand(make_key("c"))
+
+        self.pool.retain(["2", "3"])
+        self.assertEqual([c.docker_id for c in self.pool.idle_containers()],
+                         ["2"])
+        self.assertFalse(self.pool.is_hidden("1"))
+        self.assertEqual(self.pool.wanted(), [make_key("c")])
@@ -0,0 +1,253 @@
+from collections import Counter, namedtuple
+
+#: Identifies the start requests that a pre-started container can serve:
+#: the image and the settings the container is created with. docker
+#: cannot change them once the container exists, and the container
+#: serves its application under the url path of the user, so the user
+#: and the base url path are among them. So is the mapping, which is in
+#: the labels of the container from its creation: every user process
+#: has its own pool, with at most one container per application of the
+#: user.
+#: environment and resource_limits are sorted tuples of (name, value)
+#: pairs.
+WarmKey = namedtuple("WarmKey", ["user_name",
+                                 "image_name",
+                                 "mapping_id",
+                                 "base_urlpath",
+                                 "environment",
+                                 "resource_limits"])
+
+
+class WarmPool:
+    """Bookkeeping of the pre-started containers waiting to be claimed.
+
+    The pool does not talk to docker. Its owner (the ContainerManager)
+    starts the containers, and asks the pool which ones are wanted and
+    which containers must be hidden from the queries until they are
+    claimed by a start request with the same WarmKey.
+
+    The wanted containers follow the demand: the keys that were
+    requested the most get an idle container first. A mapping gets at
+    most one container, and none while a container started for it is
+    running or being started, so that docker never holds two containers
+    labelled with the same mapping.
+    """
+
+    def __init__(self, size=0):
+        """Initializes the pool.
+
+        Parameters
+        ----------
+        size: int
+            The maximum number of containers idle or being started.
+        """
+        self.size = size
+
+        #: key -> list of idle Container objects
+        self._idle = {}
+
+        #: key -> number of containers being started
+        self._pending = Counter()
+
+        #: The docker ids of the containers that are not claimed yet
+        self._hidden = set()
+
+        #: docker id -> key, for the running containers started for a
+        #: key, claimed from the pool or not
+        self._active = {}
+
+        #: key -> number of start requests
+        self._demand = Counter()
+
+        #: key -> number of start requests in progress
+        self._requests = Counter()
+
+        #: If True, no more containers are wanted
+        self._closed = False
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.filled = 0
+
+    def __len__(self):
+        return sum(len(containers) for containers in self._idle.values())
+
+    def close(self):
+        """Stops wanting containers, e.g. before the pool is drained"""
+        self._closed = True
+
+    def has_idle(self, key):
+        """True if there is an idle container for the key"""
+        return bool(self._idle.get(key))
+
+    def record_demand(self, key):
+        """Records a start request for the key"""
+        self._demand[key] += 1
+
+    def start_request(self, key):
+        """Records that a start request for the key is in progress.
+        No container is wanted for the key until end_request."""
+        self._requests[key] += 1
+
+    def end_request(self, key):
+        """Records that a start request for the key is over, successfully
+        or not."""
+        self._requests[key] -= 1
+        if self._requests[key] <= 0:
+            del self._requests[key]
+
+    def claim(self, key):
+        """Removes and returns an idle container for the key, or None.
+        The container is no longer hidden."""
+        containers = self._idle.get(key)
+        if not containers:
+            self.misses += 1
+            return None
+
+        container = containers.pop(0)
+        if not containers:
+            del self._idle[key]
+
+        self._hidden.discard(container.docker_id)
+        self._active[container.docker_id] = key
+        self.hits += 1
+        return container
+
+    def track(self, key, docker_id):
+        """Records a container started for the key without the pool.
+        No container is wanted for its mapping while it runs."""
+        self._active[docker_id] = key
+
+    def remove_idle(self, user_name, mapping_id):
+        """Removes and returns the idle containers of the mapping,
+        whatever their key, e.g. because the mapping is started with
+        other settings. They are no longer hidden."""
+        mapping = (user_name, mapping_id)
+        result = []
+        for key in list(self._idle):
+            if _mapping(key) == mapping:
+                result.extend(self._idle.pop(key))
+
+        for container in result:
+            self._hidden.discard(container.docker_id)
+
+        return result
+
+    def start_pending(self, key):
+        """Records that a container is being started for the key"""
+        self._pending[key] += 1
+
+    def end_pending(self, key):
+        """Records that a container for the key is no longer being
+        started, successfully or not."""
+        self._pending[key] -= 1
+        if self._pending[key] <= 0:
+            del self._pending[key]
+
+    def hide(self, docker_id):
+        """Hides a container being started for the pool"""
+        self._hidden.add(docker_id)
+
+    def is_hidden(self, docker_id):
+        """True if the container belongs to the pool and is not claimed"""
+        return docker_id in self._hidden
+
+    def put(self, key, container):
+        """Adds a started container, ready to be claimed. Returns False,
+        and leaves the container out, if its mapping was started or
+        requested meanwhile."""
+        busy = set(map(_mapping, self._active.values()))
+        busy.update(map(_mapping, self._requests))
+        if _mapping(key) in busy:
+            self._hidden.discard(container.docker_id)
+            return False
+
+        self._hidden.add(container.docker_id)
+        self._idle.setdefault(key, []).append(container)
+        self.filled += 1
+        return True
+
+    def discard(self, docker_id):
+        """Forgets the container with the given docker id, if present"""
+        self._hidden.discard(docker_id)
+        self._active.pop(docker_id, None)
+        for key, containers in list(self._idle.items()):
+            containers[:] = [c for c in containers
+                             if c.docker_id != docker_id]
+            if not containers:
+                del self._idle[key]
+
+    def retain(self, docker_ids):
+        """Forgets the containers whose docker id is not among the given
+        ones, e.g. because they were stopped by somebody else"""
+        docker_ids = set(docker_ids)
+        known = set(self._active)
+        known.update(container.docker_id
+                     for container in self.idle_containers())
+        for docker_id in known - docker_ids:
+            self.discard(docker_id)
+
+    def idle_containers(self):
+        """Returns all the idle containers"""
+        return [container
+                for containers in self._idle.values()
+                for container in containers]
+
+    def wanted(self):
+        """Returns the keys that should get a new container, the most
+        requested first, within the size of the pool.
+
+        Each mapping gets at most one idle or pending container, and none
+        while a container started for it is running or being started.
+        """
+        if self._closed:
+            return []
+
+        available = self.size - len(self) - sum(self._pending.values())
+
+        taken = set(map(_mapping, self._active.values()))
+        taken.update(map(_mapping, self._idle))
+        taken.update(map(_mapping, self._pending))
+        taken.update(map(_mapping, self._requests))
+
+        result = []
+        for key, _ in self._demand.most_common():
+            if available <= 0:
+                break
+
+            if _mapping(key) in taken:
+                continue
+
+            result.append(key)
+            taken.add(_mapping(key))
+            available -= 1
+
+        return result
+
+    def stats(self):
+        """Returns the pool counters.
+
+        Returns
+        -------
+        dict
+            size: the maximum number of containers
+            idle: containers ready to be claimed
+            pending: containers being started
+            hits: start requests served by an idle container
+            misses: start requests that found no idle container
+            filled: containers added to the pool
+        """
+        return {
+            "size": self.size,
+            "idle": len(self),
+            "pending": sum(self._pending.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "filled": self.filled,
+        }
+
+
+def _mapping(key):
+    """Returns the (user name, mapping id) of a WarmKey"""
+    return key.user_name, key.mapping_id
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from remoteappmanager import metrics
+
+
+class InstrumentedExecutor:
+    """A thread pool executor that keeps track of its queue.
+
+    It behaves like a ThreadPoolExecutor, but it also records how many jobs
+    are waiting for a free worker, how many are running, and how long the
+    jobs had to wait before being picked up. The counters are updated
+    by the worker threads and can be retrieved at any time with stats().
+    They are also exported as metrics, labelled with the executor name.
+    """
+
+    def __init__(self, max_workers, name=""):
+        """Initializes the executor.
+
+        Parameters
+        ----------
+        max_workers: int
+            The number of worker threads.
+        name: str
+            A name for the executor, for reporting purposes.
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        self.name = name
+        self.max_workers = max_workers
+
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._lock = threading.Lock()
+
+        self._queued = 0
+        self._running = 0
+        self._completed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """Submits a callable for execution in a worker thread.
+
+        Returns
+        -------
+        A concurrent.futures.Future
+        """
+        with self._lock:
+            self._queued += 1
+        metrics.EXECUTOR_QUEUED.labels(executor=self.name).inc()
+
+        try:
+            return self._executor.submit(
+                self._run, time.monotonic(), fn, args, kwargs)
+        except Exception:
+            with self._lock:
+                self._queued -= 1
+            metrics.EXECUTOR_QUEUED.labels(executor=self.name).dec()
+            raise
+
+    def stats(self):
+        """Returns a snapshot of the executor counters.
+
+        Returns
+        -------
+        dict
+            queued: number of jobs waiting for a free worker
+            running: number of jobs currently executing
+            completed: number of jobs that have been executed
+            total_wait: cumulative time (seconds) jobs spent in the queue
+            max_wait: the longest time (seconds) a job spent in the queue
+            max_workers: the size of the pool
+        """
+        with self._lock:
+            return {
+                "queued": self._queued,
+                "running": self._running,
+                "completed": self._completed,
+                "total_wait": self._total_wait,
+                "max_wait": self._max_wait,
+                "max_workers": self.max_workers,
+            }
+
+    def shutdown(self, wait=True):
+        """Shuts down the underlying executor."""
+        self._executor.shutdown(wait=wait)
+
+    # Private
+
+    def _run(self, submitted_at, fn, args, kwargs):
+        """Executed in the worker thread. Updates the counters around
+        the execution of the actual job."""
+        wait = time.monotonic() - submitted_at
+
+        with self._lock:
+            self._queued -= 1
+            self._running += 1
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+
+        metrics.EXECUTOR_QUEUED.labels(executor=self.name).dec()
+        metrics.EXECUTOR_RUNNING.labels(executor=self.name).inc()
+        metrics.EXECUTOR_WAIT_SECONDS.labels(executor=self.name).observe(wait)
+
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+            metrics.EXECUTOR_RUNNING.labels(executor=self.name).dec()
@@ -2,9 +2,11 @@ import os
 
 import tornado.options
 from docker import tls
-from traitlets import HasTraits, Int, Unicode, Bool, Dict
+from traitlets import HasTraits, Int, Float, Unicode, Bool, Dict, List
 
 from remoteappmanager import paths
+from remoteappmanager.db.interfaces import (
+    RESOURCE_LIMITS, parse_resource_limits)
 from remoteappmanager.traitlets import set_traits_from_dict
 
 
@@ -30,6 +32,13 @@ class FileConfig(HasTraits):
 
     docker_host = Unicode("", help="The docker host to connect to")
 
+    #: The containers can be spread over multiple docker hosts. They are
+    #: all used with the tls configuration of docker_host. New containers
+    #: are placed on the least loaded host that has the image.
+    docker_additional_hosts = List(
+        Unicode(),
+        help="The other docker hosts where containers are started")
+
     #: Docker realm is a label added to containers started by this deployment
     #: of simphony-remote. You should change this to something unique only if
     #: your machine is already running other simphony-remote instances, all
@@ -41,13 +50,189 @@ class FileConfig(HasTraits):
         help="The docker realm. Identifies which containers belong to a "
              "specific instance of simphony-remote.")
 
+    #: Docker operations are executed in background threads. Lifecycle
+    #: operations (create, start, stop, remove) and queries (inspect,
+    #: list, port) have separate pools, each with this many threads.
+    docker_executor_workers = Int(
+        default_value=4,
+        help="The number of threads for each docker operation pool")
+
+    #: The native client talks to the docker engine HTTP API directly from
+    #: the event loop, with a pool of keep-alive connections, instead of
+    #: using threads.
+    docker_native_client = Bool(
+        default_value=False,
+        help="If True, use the native asynchronous docker client")
+
+    docker_max_connections = Int(
+        default_value=10,
+        help="The maximum number of simultaneous connections to docker "
+             "when using the native client")
+
+    #: The container cache keeps an in-memory view of the containers of
+    #: the realm, updated by the docker events, so that container lookups
+    #: don't need to query docker.
+    docker_container_cache = Bool(
+        default_value=False,
+        help="If True, cache the containers state, following the docker "
+             "events")
+
+    docker_container_cache_resync = Int(
+        default_value=60,
+        help="The interval (seconds) between full resyncs of the "
+             "container cache")
+
+    #: The image cache keeps the recently inspected images, so that the
+    #: application listings don't query docker for each entry.
+    docker_image_cache_size = Int(
+        default_value=128,
+        help="The maximum number of entries of the image cache. "
+             "0 disables the cache.")
+
+    docker_image_cache_ttl = Int(
+        default_value=300,
+        help="The time (seconds) an image is kept in the image cache")
+
+    #: Containers can declare how their readiness is established with the
+    #: eu.simphony-project.docker.readiness label. Those that don't, but
+    #: have a docker HEALTHCHECK, are ready when docker says so.
+    docker_honour_healthcheck = Bool(
+        default_value=True,
+        help="If True, wait for the containers with a docker HEALTHCHECK "
+             "to be healthy, instead of probing them over HTTP")
+
+    #: The warm pool keeps pre-started containers for the applications the
+    #: user starts the most, so that they are served without a cold start.
+    docker_warm_pool_size = Int(
+        default_value=0,
+        help="The maximum number of idle, pre-started containers. "
+             "0 disables the warm pool.")
+
+    docker_warm_pool_images = List(
+        Unicode(),
+        help="The images whose containers can be pre-started")
+
+    #: The default resource limits of the containers, for the application
+    #: policies that don't set their own. Sizes are in bytes, or with a
+    #: k, m or g suffix. 0 or empty means no limit.
+    docker_mem_limit = Unicode(
+        default_value="",
+        help="The default memory limit of a container (e.g. 2g)")
+
+    docker_cpu_shares = Int(
+        default_value=0,
+        help="The default CPU shares (relative weight) of a container")
+
+    docker_cpu_quota = Int(
+        default_value=0,
+        help="The default CPU time (microseconds) a container can use "
+             "every 100 milliseconds")
+
+    docker_pids_limit = Int(
+        default_value=0,
+        help="The default maximum number of processes in a container")
+
+    docker_shm_size = Unicode(
+        default_value="",
+        help="The default size of /dev/shm of a container (e.g. 256m)")
+
+    #: The reaper runs in the admin application. It stops the containers
+    #: of the realm without a proxy route or a matching accounting, and
+    #: those without traffic for a while.
+    reaper_interval = Float(
+        default_value=0.0,
+        help="The interval (seconds) between two passes of the reaper. "
+             "0 disables the reaper.")
+
+    reaper_idle_timeout = Float(
+        default_value=0.0,
+        help="The time (seconds) without traffic after which a container "
+             "is stopped. 0 disables the idle check.")
+
+    reaper_orphan_grace = Float(
+        default_value=600.0,
+        help="The time (seconds) a container without proxy route or "
+             "accounting is kept before being stopped")
+
+    reaper_warm_grace = Float(
+        default_value=3600.0,
+        help="The time (seconds) a container pre-started for a warm pool "
+             "is kept without proxy route before being stopped")
+
+    reaper_concurrency = Int(
+        default_value=4,
+        help="The maximum number of containers the reaper stops at the "
+             "same time")
+
+    reaper_dry_run = Bool(
+        default_value=False,
+        help="If True, the reaper only logs the containers it would stop")
+
+    #: The admission control limits the containers being started at the
+    #: same time on the host, across the remoteappmanager processes that
+    #: share admission_directory. The other starts are queued, and the
+    #: users are told their position in the queue.
+    admission_max_starts = Int(
+        default_value=0,
+        help="The maximum number of containers being started at the same "
+             "time on the host. 0 disables the admission control.")
+
+    admission_directory = Unicode(
+        default_value="",
+        help="The directory where the processes keep the admission "
+             "queue. Required if admission_max_starts is set. It must "
+             "belong to a group of all the users, with the setgid bit, "
+             "and not be writable by the other users (mode 2770).")
+
+    admission_wait = Float(
+        default_value=10.0,
+        help="The time (seconds) a start request waits in the admission "
+             "queue before being answered with its queue position")
+
+    #: The users identified by JupyterHub are remembered for a while, to
+    #: avoid asking the hub at every request.
+    hub_auth_cache_ttl = Int(
+        default_value=60,
+        help="The time (seconds) a user identified by the hub is "
+             "remembered. 0 disables the cache.")
+
+    hub_auth_cache_negative_ttl = Int(
+        default_value=5,
+        help="The time (seconds) a token rejected by the hub is "
+             "remembered")
+
     database_class = Unicode(
         default_value="remoteappmanager.db.orm.ORMDatabase",
         help="The import path to a subclass of ABCDatabase")
 
     database_kwargs = Dict(
         default_value={'url': 'sqlite:///remoteappmanager.db'},
-        help="The keyword arguments for initialising the Database instance")
+        help="The keyword arguments for initialising the Database "
+             "instance. For ORMDatabase, the keys other than url and "
+             "sqlite_pragmas are passed to sqlalchemy create_engine.")
+
+    #: Users and accountings read from the database can be kept in
+    #: memory. Changes made by other processes are detected through
+    #: the revision of the database, if the database has one.
+    database_cache_ttl = Int(
+        default_value=0,
+        help="The time (seconds) the database content is cached. "
+             "0 disables the cache.")
+
+    database_revision_interval = Float(
+        default_value=1.0,
+        help="The minimum time (seconds) between two checks for changes "
+             "to the database made by other processes")
+
+    database_executor_workers = Int(
+        default_value=2,
+        help="The number of threads performing the database requests "
+             "of the request handlers")
+
+    metrics_authenticate = Bool(
+        default_value=True,
+        help="If True, the metrics endpoint requires the request to be "
+             "authenticated as the user of the application")
 
     login_url = Unicode(default_value="/hub",
                         help=("The url to be redirected to if the user is not "
@@ -146,6 +331,16 @@ class FileConfig(HasTraits):
 
         set_traits_from_dict(self, file_line_parser.as_dict())
 
+        try:
+            self.default_resource_limits()
+        except ValueError as e:
+            raise tornado.options.Error(
+                "Invalid resource limit: {}".format(e))
+
+        if self.admission_max_starts > 0 and not self.admission_directory:
+            raise tornado.options.Error(
+                "admission_directory is required by admission_max_starts")
+
         if self.tls or self.tls_verify:
             self.docker_host = self.docker_host.replace('tcp://', 'https://')
 
@@ -175,3 +370,34 @@ class FileConfig(HasTraits):
         params["tls"] = tls.TLSConfig(**tls_kwargs)
 
         return params
+
+    def additional_docker_configs(self):
+        """Returns the docker configurations of the docker_additional_hosts,
+        as a list of dictionaries like the one of docker_config().
+        """
+        configs = []
+        for docker_host in self.docker_additional_hosts:
+            params = self.docker_config()
+            if self.tls or self.tls_verify:
+                docker_host = docker_host.replace('tcp://', 'https://')
+            params["base_url"] = docker_host
+            configs.append(params)
+
+        return configs
+
+    def default_resource_limits(self):
+        """Returns the default resource limits of the containers that are
+        set, as a dict name -> value (see db.interfaces.RESOURCE_LIMITS).
+
+        Raises
+        ------
+        ValueError
+            if a limit is invalid
+        """
+        limits = parse_resource_limits({
+            name: getattr(self, "docker_" + name)
+            for name in RESOURCE_LIMITS})
+
+        return {name: value
+                for name, value in limits.items()
+                if value is not None}
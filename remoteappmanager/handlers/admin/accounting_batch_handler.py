@@ -0,0 +1,96 @@
+import json
+
+from tornado import gen, web
+
+from remoteappmanager.db import exceptions as db_exceptions
+from remoteappmanager.db.interfaces import RESOURCE_LIMITS
+from remoteappmanager.handlers.base_handler import BaseHandler
+
+
+class AccountingBatchHandler(BaseHandler):
+    """Grants or revokes many accesses with one request, in one
+    database transaction.
+
+    The body is a JSON object with the action ("grant" or "revoke") and
+    the items. Each item is like an accounting of the web API, with the
+    user name instead of the user id:
+
+        {"action": "grant",
+         "items": [{"user_name": "johndoe",
+                    "image_name": "simphonyproject/simphony-mayavi",
+                    "app_license": null,
+                    "allow_home": true,
+                    "volume_source": "", "volume_target": "",
+                    "volume_mode": "",
+                    "allow_startup_data": false,
+                    "mem_limit": "2g", "cpu_shares": null,
+                    "cpu_quota": null, "pids_limit": null,
+                    "shm_size": null}]}
+
+    Only user_name and image_name are required. A grant replies with the
+    mapping ids, in the order of the items. Nothing is changed if an
+    item refers to an unknown user or application.
+    """
+
+    @gen.coroutine
+    def post(self):
+        if self.current_user is None:
+            raise web.HTTPError(404)
+
+        try:
+            payload = json.loads(self.request.body.decode("utf-8"))
+            action = payload["action"]
+            grants = [self._grant_from_item(item)
+                      for item in payload["items"]]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            raise web.HTTPError(400, reason="Invalid batch")
+
+        if action not in ("grant", "revoke"):
+            raise web.HTTPError(400, reason="Invalid action")
+
+        db = self.application.async_db
+        try:
+            if action == "grant":
+                ids = yield db.grant_access_bulk(grants)
+            else:
+                yield db.revoke_access_bulk(grants)
+        except db_exceptions.NotFound as e:
+            raise web.HTTPError(404, reason=str(e) or None)
+        except db_exceptions.UnsupportedOperation:
+            raise web.HTTPError(501)
+        except ValueError as e:
+            raise web.HTTPError(400, reason=str(e))
+
+        if action == "grant":
+            self.set_status(201)
+            self.write({"identifiers": ids})
+        else:
+            self.set_status(204)
+
+    def write_error(self, status_code, **kwargs):
+        """Reports the errors as JSON, rather than an html page"""
+        self.finish({"status_code": status_code,
+                     "message": self._reason})
+
+    # Private
+
+    def _grant_from_item(self, item):
+        """Converts an item of the request to the grant accepted by
+        ABCDatabase.grant_access_bulk"""
+        volume = None
+        if item.get("volume_source") and item.get("volume_target"):
+            volume = "{}:{}:{}".format(item["volume_source"],
+                                       item["volume_target"],
+                                       item.get("volume_mode"))
+
+        return {
+            "app_name": str(item["image_name"]),
+            "user_name": str(item["user_name"]),
+            "app_license": item.get("app_license"),
+            "allow_home": bool(item.get("allow_home", False)),
+            "allow_view": True,
+            "volume": volume,
+            "allow_startup_data": bool(item.get("allow_startup_data",
+                                                False)),
+            "limits": {name: item.get(name) for name in RESOURCE_LIMITS},
+        }
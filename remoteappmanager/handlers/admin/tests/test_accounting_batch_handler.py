@@ -0,0 +1,99 @@
+import json
+from unittest import mock
+
+from tornado.testing import AsyncHTTPTestCase, ExpectLog
+
+from remoteappmanager.db import exceptions
+from remoteappmanager.tests.mocking import dummy
+
+
+@mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+@mock.patch('jupyterhub.services.auth.HubOAuth.get_user')
+class TestAccountingBatchHandler(AsyncHTTPTestCase):
+    url = "/user/johndoe/api/v1/accounting/batch/"
+
+    def get_app(self):
+        app = dummy.create_admin_application()
+        app.hub.get_user.return_value = {
+            'pending': None,
+            'name': app.settings['user'],
+            'admin': False,
+            'server': app.settings['base_urlpath']}
+        return app
+
+    def post(self, payload):
+        return self.fetch(self.url,
+                          method="POST",
+                          body=json.dumps(payload),
+                          headers={
+                              "Cookie": "jupyter-hub-token-johndoe=foo"
+                          })
+
+    def test_grant(self, mock_get_user):
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.grant_access_bulk",
+                        return_value=["id1", "id2"]) as mock_grant:
+            res = self.post({
+                "action": "grant",
+                "items": [
+                    {"user_name": "johndoe", "image_name": "image1",
+                     "allow_home": True,
+                     "volume_source": "/foo", "volume_target": "/bar",
+                     "volume_mode": "ro"},
+                    {"user_name": "johndoe", "image_name": "image2",
+                     "mem_limit": "1g", "pids_limit": 100},
+                ]})
+
+        self.assertEqual(res.code, 201)
+        self.assertEqual(json.loads(res.body.decode("utf-8")),
+                         {"identifiers": ["id1", "id2"]})
+
+        grants = mock_grant.call_args[0][0]
+        self.assertEqual(grants[0]["app_name"], "image1")
+        self.assertEqual(grants[0]["volume"], "/foo:/bar:ro")
+        self.assertTrue(grants[0]["allow_home"])
+        self.assertIsNone(grants[1]["volume"])
+        self.assertFalse(grants[1]["allow_home"])
+        self.assertEqual(grants[1]["limits"]["mem_limit"], "1g")
+        self.assertEqual(grants[1]["limits"]["pids_limit"], 100)
+        self.assertIsNone(grants[0]["limits"]["mem_limit"])
+
+    def test_revoke(self, mock_get_user):
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.revoke_access_bulk") as mock_revoke:
+            res = self.post({
+                "action": "revoke",
+                "items": [{"user_name": "johndoe", "image_name": "image1"}]
+            })
+
+        self.assertEqual(res.code, 204)
+        self.assertEqual(mock_revoke.call_count, 1)
+
+    def test_not_found(self, mock_get_user):
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.grant_access_bulk",
+                        side_effect=exceptions.NotFound("Unknown users: x")):
+            with ExpectLog('tornado.access', ''):
+                res = self.post({
+                    "action": "grant",
+                    "items": [{"user_name": "x", "image_name": "image1"}]
+                })
+
+        self.assertEqual(res.code, 404)
+        self.assertIn("Unknown users: x",
+                      json.loads(res.body.decode("utf-8"))["message"])
+
+    def test_invalid_batch(self, mock_get_user):
+        for payload in [{"action": "grant"},
+                        {"action": "grant", "items": [{"user_name": "x"}]},
+                        {"action": "frobnicate", "items": []}]:
+            with ExpectLog('tornado.access', ''):
+                res = self.post(payload)
+            self.assertEqual(res.code, 400)
+
+    def test_failed_auth(self, mock_get_user):
+        self._app.hub.get_user.return_value = {}
+        with ExpectLog('tornado.access', ''):
+            res = self.post({"action": "revoke", "items": []})
+
+        self.assertGreaterEqual(res.code, 400)
@@ -1,4 +1,7 @@
 from .user_home_handler import UserHomeHandler  # noqa
 from .base_handler import BaseHandler  # noqa
 from .register_container_handler import RegisterContainerHandler  # noqa
+from .logout_handler import LogoutHandler  # noqa
+from .metrics_handler import MetricsHandler  # noqa
 from .admin.admin_home_handler import AdminHomeHandler  # noqa
+from .admin.accounting_batch_handler import AccountingBatchHandler  # noqa
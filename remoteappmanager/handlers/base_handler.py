@@ -7,6 +7,7 @@ from jupyterhub.services.auth import HubOAuthenticated
 
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.handlers.handler_authenticator import HubAuthenticator
+from remoteappmanager.utils import url_path_join
 
 
 class BaseHandler(HubOAuthenticated, web.RequestHandler, LoggingMixin):
@@ -16,16 +17,33 @@ class BaseHandler(HubOAuthenticated, web.RequestHandler, LoggingMixin):
     provider using the HubOAuthenticated mixin first before
     being independently validated against the application's user model.
     https://jupyterhub.readthedocs.io/en/0.8.1/api/services.auth.html
+
+    The hub user is identified through the application's Hub service,
+    and its cache, rather than with the blocking request of the mixin.
     """
 
     #: The authenticator that is used to recognize and load
     #: the internal user model.
     authenticator = HubAuthenticator
 
-    @web.authenticated
     @gen.coroutine
     def prepare(self):
         """Runs before any specific handler. """
+        self._hub_user = yield self.application.hub.get_user(self)
+        yield self._authenticate()
+
+    def get_current_user(self):
+        """Returns the model of the user identified by the hub in
+        prepare, or None. Used by web.authenticated."""
+        return getattr(self, "_hub_user", None) or None
+
+    @web.authenticated
+    @gen.coroutine
+    def _authenticate(self):
+        # From now on the current user is the internal user model, not
+        # the one of the hub, also if the authentication fails.
+        self.current_user = None
+
         # Authenticate the user against the hub
         self.current_user = yield self.authenticator.authenticate(self)
         if self.current_user is None:
@@ -42,7 +60,8 @@ class BaseHandler(HubOAuthenticated, web.RequestHandler, LoggingMixin):
         args = dict(
             user=self.current_user,
             base_url=command_line_config.base_urlpath,
-            logout_url=command_line_config.logout_url
+            logout_url=url_path_join(command_line_config.base_urlpath,
+                                     "logout")
         )
 
         args.update(kwargs)
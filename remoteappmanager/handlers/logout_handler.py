@@ -0,0 +1,11 @@
+from tornado import web
+
+
+class LogoutHandler(web.RequestHandler):
+    """Forgets the authenticated user session, then hands over to the
+    JupyterHub logout page."""
+
+    def get(self):
+        self.application.hub.forget_user(self)
+        self.clear_cookie(self.application.hub.cookie_name)
+        self.redirect(self.application.command_line_config.logout_url)
@@ -0,0 +1,32 @@
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from tornado import gen, web
+
+from remoteappmanager.handlers.base_handler import BaseHandler
+
+
+class MetricsHandler(BaseHandler):
+    """Exports the prometheus metrics of the application.
+
+    Unless metrics_authenticate is False in the configuration, the
+    request must be authenticated as the user of the application, e.g.
+    with one of its JupyterHub API tokens in the Authorization header.
+    """
+
+    @gen.coroutine
+    def prepare(self):
+        """Authenticates the request like BaseHandler, but a scraper is
+        answered 403 rather than redirected to the login page."""
+        if not self.application.file_config.metrics_authenticate:
+            return
+
+        self._hub_user = yield self.application.hub.get_user(self)
+        if self.current_user is not None:
+            self.current_user = yield self.authenticator.authenticate(self)
+
+    def get(self):
+        if (self.application.file_config.metrics_authenticate and
+                self.current_user is None):
+            raise web.HTTPError(403)
+
+        self.set_header("Content-Type", CONTENT_TYPE_LATEST)
+        self.write(generate_latest(REGISTRY))
@@ -23,10 +23,17 @@ class RegisterContainerHandler(BaseHandler):
             url_id=url_id)
 
         if container is not None:
+            reverse_proxy = self.application.reverse_proxy
             try:
-                yield self.application.reverse_proxy.register(
-                    container.urlpath,
-                    container.host_url)
+                if reverse_proxy.is_registered(container.urlpath,
+                                               container.host_url):
+                    # The route is known, yet the proxy sent the request
+                    # here: the proxy lost its routes, e.g. it restarted.
+                    yield self.application.reconcile_reverse_proxy()
+                else:
+                    yield reverse_proxy.register(
+                        container.urlpath,
+                        container.host_url)
             except Exception:
                 self.log.exception(
                     "Could not register reverse "
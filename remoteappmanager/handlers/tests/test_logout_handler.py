@@ -0,0 +1,25 @@
+from unittest import mock
+
+from tornado.testing import AsyncHTTPTestCase
+
+from remoteappmanager.tests.mocking import dummy
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+@mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+class TestLogoutHandler(TempMixin, AsyncHTTPTestCase):
+    def get_app(self):
+        app = dummy.create_application()
+        app.command_line_config.logout_url = "/hub/logout"
+        return app
+
+    def test_logout(self):
+        with mock.patch.object(self._app.hub, "forget_user") as forget_user:
+            res = self.fetch("/user/johndoe/logout",
+                             follow_redirects=False)
+
+            self.assertTrue(forget_user.called)
+
+        self.assertEqual(res.code, 302)
+        self.assertEqual(res.headers["Location"], "/hub/logout")
+        self.assertIn(self._app.hub.cookie_name, res.headers["Set-Cookie"])
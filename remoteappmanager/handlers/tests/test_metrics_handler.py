@@ -0,0 +1,55 @@
+from unittest import mock
+
+from tornado.testing import AsyncHTTPTestCase, ExpectLog
+
+from remoteappmanager.tests.mocking import dummy
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+@mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+@mock.patch('jupyterhub.services.auth.HubOAuth.get_user')
+class TestMetricsHandler(TempMixin, AsyncHTTPTestCase):
+    def get_app(self):
+        app = dummy.create_application()
+        app.hub.get_user.return_value = {
+            'pending': None,
+            'name': app.settings['user'],
+            'admin': False,
+            'server': app.settings['base_urlpath']}
+        return app
+
+    def test_authenticated(self, mock_get_user):
+        res = self.fetch("/user/johndoe/metrics",
+                         headers={"Cookie": "jupyter-hub-token-johndoe=foo"})
+
+        self.assertEqual(res.code, 200)
+        self.assertIn("text/plain", res.headers["Content-Type"])
+        self.assertIn(b"remoteappmanager_request_duration_seconds", res.body)
+
+    def test_unauthenticated(self, mock_get_user):
+        self._app.hub.get_user.return_value = {}
+        with ExpectLog('tornado.access', ''):
+            res = self.fetch("/user/johndoe/metrics", follow_redirects=False)
+
+        self.assertEqual(res.code, 403)
+
+    def test_failed_auth(self, mock_get_user):
+        self._app.hub.get_user.return_value = {
+            'pending': None,
+            'name': 'janedoe',
+            'admin': False,
+            'server': '/user/janedoe/'}
+        with ExpectLog('tornado.access', ''):
+            res = self.fetch("/user/johndoe/metrics",
+                             headers={
+                                 "Cookie": "jupyter-hub-token-johndoe=foo"},
+                             follow_redirects=False)
+
+        self.assertEqual(res.code, 403)
+
+    def test_no_authentication(self, mock_get_user):
+        self._app.hub.get_user.return_value = {}
+        self._app.file_config.metrics_authenticate = False
+        res = self.fetch("/user/johndoe/metrics")
+
+        self.assertEqual(res.code, 200)
@@ -40,6 +40,22 @@ class TestRegisterContainerHandler(TempMixin,
         self.assertEqual(res.code, 302)
         self.assertTrue(self._app.reverse_proxy.register.called)
 
+    def test_lost_routes_are_reconciled(self, mock_get_user):
+        self._app.reconcile_reverse_proxy = mock_coro_factory()
+        with mock.patch.object(self._app.reverse_proxy,
+                               "is_registered",
+                               return_value=True):
+            res = self.fetch("/user/johndoe/containers/20dcb84cdbea4b1899447246789093d0/",  # noqa
+                             headers={
+                                 "Cookie": "jupyter-hub-token-johndoe=foo"
+                             },
+                             follow_redirects=False
+                             )
+
+        self.assertEqual(res.code, 302)
+        self.assertFalse(self._app.reverse_proxy.register.called)
+        self.assertTrue(self._app.reconcile_reverse_proxy.called)
+
     def test_failed_auth(self, mock_get_user):
         self._app.hub.get_user.return_value = {}
         res = self.fetch("/user/johndoe/containers/url_id",
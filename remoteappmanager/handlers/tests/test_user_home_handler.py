@@ -28,6 +28,10 @@ class TestUserHomeHandler(TempMixin, AsyncHTTPTestCase):
         self.assertEqual(res.code, 200)
         self.assertIn("applist", str(res.body))
 
+        # The user is identified through the hub service only
+        self.assertTrue(self._app.hub.get_user.called)
+        self.assertFalse(mock_get_user.called)
+
     def test_failed_auth(self, mock_get_user):
         self._app.hub.get_user.return_value = {}
         with ExpectLog('tornado.access', ''):
@@ -0,0 +1,466 @@
+import json
+import select
+import socket
+from collections import deque
+from urllib.parse import urlencode, urlparse
+
+from tornado import gen, ioloop, locks
+from tornado.http1connection import (
+    HTTP1Connection,
+    HTTP1ConnectionParameters)
+from tornado.httputil import (
+    HTTPHeaders,
+    HTTPMessageDelegate,
+    RequestStartLine)
+from tornado.iostream import IOStream, StreamClosedError
+from tornado.tcpclient import TCPClient
+
+#: The methods that can be sent again when it is unknown whether the
+#: server received them. A repeated POST (e.g. a container create)
+#: would be performed twice.
+_IDEMPOTENT_METHODS = ("GET", "HEAD", "DELETE")
+
+
+class Response:
+    """The response to a request performed through the HTTPConnectionPool.
+    """
+    def __init__(self, url, code, reason, headers, body):
+        #: The requested url
+        self.url = url
+
+        #: The HTTP status code
+        self.code = code
+
+        #: The HTTP reason phrase
+        self.reason = reason
+
+        #: The response headers, as a tornado HTTPHeaders
+        self.headers = headers
+
+        #: The raw body, as bytes
+        self.body = body
+
+    def json(self):
+        """Decodes the body as json."""
+        return json.loads(self.body.decode("utf-8"))
+
+
+class HTTPConnectionPool:
+    """An asynchronous HTTP/1.1 client that keeps a pool of persistent
+    connections to a single server.
+
+    Every request borrows an idle connection (or opens a new one if none
+    is available), and gives it back once the response has been read, so
+    that following requests don't pay the connection setup cost.
+    At most max_connections requests are in flight at the same time.
+    Additional requests wait for a connection to be released.
+
+    The server is specified with a base url. Both tcp (http://, https://)
+    and unix socket (unix://, http+unix://) urls are supported.
+    """
+
+    def __init__(self, base_url, max_connections=10, ssl_options=None,
+                 request_timeout=60, max_idle_time=4):
+        """Initializes the pool. No connection is opened until the first
+        request is performed.
+
+        Parameters
+        ----------
+        base_url: str
+            The url of the server, e.g. unix:///var/run/docker.sock or
+            https://192.168.99.100:2376
+        max_connections: int
+            The maximum number of simultaneous connections to the server.
+        ssl_options: ssl.SSLContext or dict or None
+            The ssl options for https connections.
+        request_timeout: float
+            The default timeout (seconds) of a request, including the time
+            spent waiting for a free connection.
+        max_idle_time: float
+            The time (seconds) after which an idle connection is not
+            reused, as the server may be closing it. The default is below
+            the 5 seconds keep-alive of the node servers, such as
+            configurable-http-proxy.
+        """
+        if max_connections < 1:
+            raise ValueError("max_connections must be at least 1")
+
+        url = urlparse(base_url)
+
+        self._unix_path = None
+        self._host = None
+        self._port = None
+        self._ssl_options = None
+
+        if url.scheme in ("unix", "http+unix"):
+            # Both unix://var/run/docker.sock and unix:///var/run/docker.sock
+            # refer to the same absolute path.
+            path = url.netloc + url.path
+            if not path.startswith("/"):
+                path = "/" + path
+            self._unix_path = path
+            self._host_header = "localhost"
+        elif url.scheme in ("http", "https"):
+            self._host = url.hostname
+            self._port = url.port or (443 if url.scheme == "https" else 80)
+            self._host_header = url.netloc
+            if url.scheme == "https":
+                self._ssl_options = ssl_options or {}
+        else:
+            raise ValueError("Unsupported url scheme {}".format(base_url))
+
+        self.base_url = base_url
+        self.max_connections = max_connections
+        self.request_timeout = request_timeout
+        self.max_idle_time = max_idle_time
+
+        self._semaphore = locks.Semaphore(max_connections)
+
+        #: (stream, IOLoop time it was released) of the idle connections,
+        #: the most recently released last.
+        self._idle = deque()
+        self._streaming = set()
+        self._closed = False
+
+        self._opened = 0
+        self._requests = 0
+
+    @gen.coroutine
+    def fetch(self, method, path, params=None, body=None, headers=None,
+              timeout=None):
+        """Performs a request and returns its response.
+
+        Responses with an error status code are returned as well: it is
+        responsibility of the caller to check the code.
+
+        Parameters
+        ----------
+        method: str
+            The HTTP method
+        path: str
+            The path of the resource, starting with a slash.
+        params: dict or None
+            The query parameters. Entries with a None value are skipped.
+        body: bytes or None
+            The body of the request.
+        headers: dict or None
+            Additional request headers.
+        timeout: float or None
+            The timeout (seconds) of this request. If None, the pool
+            request_timeout is used.
+
+        Returns
+        -------
+        A Response.
+
+        Raises
+        ------
+        gen.TimeoutError:
+            If the request did not complete in time.
+        StreamClosedError, OSError:
+            If the connection with the server failed.
+        """
+        if self._closed:
+            raise RuntimeError("The connection pool is closed")
+
+        path = _path_with_query(path, params)
+
+        if timeout is None:
+            timeout = self.request_timeout
+
+        deadline = ioloop.IOLoop.current().time() + timeout
+
+        yield self._semaphore.acquire(timeout=deadline)
+        try:
+            response = yield self._fetch_with_retry(
+                method, path, body, headers, deadline)
+        finally:
+            self._semaphore.release()
+
+        return response
+
+    @gen.coroutine
+    def stream(self, method, path, streaming_callback, params=None,
+               headers=None, cancel=None):
+        """Performs a long-lived request, such as a stream of events.
+        The chunks of the response body are passed to streaming_callback
+        as soon as they arrive.
+
+        The request uses a dedicated connection, which does not count
+        against max_connections and is closed at the end.
+        The request ends when the server terminates the response, when the
+        cancel future is resolved, or when the pool is closed.
+
+        Parameters
+        ----------
+        method: str
+            The HTTP method
+        path: str
+            The path of the resource, starting with a slash.
+        streaming_callback: callable
+            Called with each chunk (bytes) of a successful response.
+        params: dict or None
+            The query parameters. Entries with a None value are skipped.
+        headers: dict or None
+            Additional request headers.
+        cancel: Future or None
+            A future that stops the request when it is resolved.
+
+        Returns
+        -------
+        A Response. The body is empty for successful responses, and
+        contains the error for error responses (status code >= 400).
+
+        Raises
+        ------
+        StreamClosedError, OSError:
+            If the connection failed before the response started.
+        """
+        if self._closed:
+            raise RuntimeError("The connection pool is closed")
+
+        path = _path_with_query(path, params)
+        deadline = ioloop.IOLoop.current().time() + self.request_timeout
+
+        stream = yield self._connect(deadline)
+        self._streaming.add(stream)
+        if cancel is not None:
+            ioloop.IOLoop.current().add_future(
+                cancel, lambda future: stream.close())
+
+        connection = HTTP1Connection(stream, True)
+        collector = _ResponseCollector(streaming_callback)
+        try:
+            yield self._write_request(connection, method, path, None, headers)
+            yield connection.read_response(collector)
+        except StreamClosedError:
+            # Closing the connection is the normal way to end a stream.
+            if collector.start_line is None:
+                raise
+        finally:
+            self._streaming.discard(stream)
+            stream.close()
+
+        if collector.start_line is None:
+            raise StreamClosedError()
+
+        return Response(url=self.base_url + path,
+                        code=collector.start_line.code,
+                        reason=collector.start_line.reason,
+                        headers=collector.headers,
+                        body=b"".join(collector.chunks))
+
+    def close(self):
+        """Closes all the idle and streaming connections, and prevents
+        further requests.
+        """
+        self._closed = True
+        while self._idle:
+            stream, _ = self._idle.popleft()
+            stream.close()
+
+        for stream in list(self._streaming):
+            stream.close()
+
+    def stats(self):
+        """Returns the pool counters.
+
+        Returns
+        -------
+        dict
+            idle: number of connections ready to be reused
+            opened: number of connections opened since the creation
+            requests: number of requests performed
+            max_connections: the size of the pool
+        """
+        return {
+            "idle": len(self._idle),
+            "opened": self._opened,
+            "requests": self._requests,
+            "max_connections": self.max_connections,
+        }
+
+    # Private
+
+    @gen.coroutine
+    def _fetch_with_retry(self, method, path, body, headers, deadline):
+        """Performs the request on a pooled connection. If the pooled
+        connection turns out to be closed by the server in the meantime,
+        the request is attempted again once on a new connection, provided
+        that it was not written or that the method is idempotent."""
+        stream = self._pop_idle()
+        if stream is not None:
+            try:
+                response = yield self._exchange(
+                    stream, method, path, body, headers, deadline)
+                return response
+            except _RequestNotSent:
+                # The server dropped the idle connection. Try again.
+                pass
+            except StreamClosedError:
+                # The server may have received the request.
+                if method not in _IDEMPOTENT_METHODS:
+                    raise
+
+        stream = yield self._connect(deadline)
+        response = yield self._exchange(
+            stream, method, path, body, headers, deadline)
+        return response
+
+    def _pop_idle(self):
+        """Returns an idle stream that is still open, or None.
+
+        Writing a request on a connection that the server has closed
+        usually succeeds, and the failure only appears when reading the
+        response, when a non idempotent request can not be sent again.
+        The connections that the server closed, or may be closing, are
+        discarded before reuse.
+        """
+        now = ioloop.IOLoop.current().time()
+        while self._idle:
+            stream, released = self._idle.pop()
+            if (stream.closed() or
+                    now - released > self.max_idle_time or
+                    _is_dropped(stream)):
+                stream.close()
+                continue
+            return stream
+        return None
+
+    @gen.coroutine
+    def _connect(self, deadline):
+        """Opens a new connection to the server and returns its stream"""
+        if self._unix_path is not None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            stream = IOStream(sock)
+            try:
+                yield gen.with_timeout(
+                    deadline,
+                    stream.connect(self._unix_path),
+                    quiet_exceptions=(StreamClosedError, OSError))
+            except BaseException:
+                stream.close()
+                raise
+        else:
+            # TCPClient takes a timeout relative to now, for the
+            # connection and the TLS handshake.
+            stream = yield TCPClient().connect(
+                self._host, self._port,
+                ssl_options=self._ssl_options,
+                timeout=max(deadline - ioloop.IOLoop.current().time(), 0))
+
+        stream.set_nodelay(True)
+        self._opened += 1
+        return stream
+
+    @gen.coroutine
+    def _exchange(self, stream, method, path, body, headers, deadline):
+        """Writes the request on the stream, and reads the response.
+        The stream is returned to the idle pool if it can be kept alive,
+        and closed otherwise."""
+        connection = HTTP1Connection(
+            stream, True, HTTP1ConnectionParameters(no_keep_alive=False))
+
+        collector = _ResponseCollector()
+        try:
+            try:
+                yield self._write_request(
+                    connection, method, path, body, headers)
+            except StreamClosedError:
+                raise _RequestNotSent()
+            yield gen.with_timeout(
+                deadline,
+                connection.read_response(collector),
+                quiet_exceptions=(StreamClosedError, OSError))
+        except BaseException:
+            # Whatever happened, the connection is in an unknown state
+            # and can't be reused.
+            stream.close()
+            raise
+
+        if collector.start_line is None:
+            # The connection was closed before a response arrived.
+            stream.close()
+            raise StreamClosedError()
+
+        if not stream.closed() and not self._closed:
+            self._idle.append((stream, ioloop.IOLoop.current().time()))
+        else:
+            stream.close()
+
+        return Response(url=self.base_url + path,
+                        code=collector.start_line.code,
+                        reason=collector.start_line.reason,
+                        headers=collector.headers,
+                        body=b"".join(collector.chunks))
+
+    @gen.coroutine
+    def _write_request(self, connection, method, path, body, headers):
+        """Writes the complete request on the connection"""
+        request_headers = HTTPHeaders({"Host": self._host_header})
+        if headers is not None:
+            request_headers.update(headers)
+
+        if body is not None or method in ("POST", "PUT", "PATCH"):
+            # Always send the length, otherwise tornado uses the
+            # chunked encoding.
+            request_headers["Content-Length"] = str(len(body or b""))
+
+        self._requests += 1
+        yield connection.write_headers(
+            RequestStartLine(method, path, "HTTP/1.1"),
+            request_headers,
+            body)
+        connection.finish()
+
+
+class _RequestNotSent(StreamClosedError):
+    """The connection was found closed while writing the request"""
+
+
+class _ResponseCollector(HTTPMessageDelegate):
+    """Accumulates the response data as it is read from the connection.
+    If a streaming callback is given, the data of successful responses
+    is passed to it instead."""
+    def __init__(self, streaming_callback=None):
+        self.streaming_callback = streaming_callback
+        self.start_line = None
+        self.headers = None
+        self.chunks = []
+
+    def headers_received(self, start_line, headers):
+        self.start_line = start_line
+        self.headers = headers
+
+    def data_received(self, chunk):
+        if self.streaming_callback is not None and self.start_line.code < 400:
+            self.streaming_callback(chunk)
+        else:
+            self.chunks.append(chunk)
+
+
+def _is_dropped(stream):
+    """True if the idle connection of the stream is readable: the server
+    closed it, or sent something nobody asked for. Either way, it can't be
+    reused. Does not block."""
+    try:
+        poller = select.poll()
+        poller.register(stream.socket, select.POLLIN)
+        return bool(poller.poll(0))
+    except (OSError, ValueError):
+        return True
+
+
+def _path_with_query(path, params):
+    """Appends the query parameters to the path, skipping the None values
+    """
+    if not params:
+        return path
+
+    query = urlencode([(key, value)
+                       for key, value in params.items()
+                       if value is not None])
+    if not query:
+        return path
+
+    return "{}?{}".format(path, query)
@@ -0,0 +1,89 @@
+"""The prometheus metrics of remoteappmanager and remoteappadmin.
+
+They are exported by the /metrics endpoint of the application (see
+handlers.metrics_handler.MetricsHandler). Durations are in seconds.
+"""
+import functools
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from tornado import gen
+
+REQUEST_DURATION_SECONDS = Histogram(
+    "remoteappmanager_request_duration_seconds",
+    "The time to serve a request",
+    ["handler", "resource", "method", "code"])
+
+DOCKER_REQUEST_DURATION_SECONDS = Histogram(
+    "remoteappmanager_docker_request_duration_seconds",
+    "The time of a call to the docker engine, by docker client method",
+    ["method"])
+
+EXECUTOR_QUEUED = Gauge(
+    "remoteappmanager_executor_queued",
+    "The jobs waiting for a free worker thread",
+    ["executor"])
+
+EXECUTOR_RUNNING = Gauge(
+    "remoteappmanager_executor_running",
+    "The jobs being executed by a worker thread",
+    ["executor"])
+
+EXECUTOR_WAIT_SECONDS = Histogram(
+    "remoteappmanager_executor_wait_seconds",
+    "The time a job waited for a free worker thread",
+    ["executor"])
+
+CONTAINER_START_PHASE_SECONDS = Histogram(
+    "remoteappmanager_container_start_phase_seconds",
+    "The time of each phase of a container start (see StartTrace), "
+    "and of the whole start (total)",
+    ["phase"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0,
+             float("inf")))
+
+PROXY_REQUEST_DURATION_SECONDS = Histogram(
+    "remoteappmanager_proxy_request_duration_seconds",
+    "The time of a request to the reverse proxy API",
+    ["method"])
+
+HUB_AUTH_DURATION_SECONDS = Histogram(
+    "remoteappmanager_hub_auth_duration_seconds",
+    "The time to identify a token with the hub (cache misses only)")
+
+DATABASE_QUERY_DURATION_SECONDS = Histogram(
+    "remoteappmanager_database_query_duration_seconds",
+    "The time of a database request performed for the request handlers, "
+    "by database method",
+    ["method"])
+
+ADMISSION_WAIT_SECONDS = Histogram(
+    "remoteappmanager_admission_wait_seconds",
+    "The time a container start was queued by the admission control",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+             float("inf")))
+
+REAPED_CONTAINERS = Counter(
+    "remoteappmanager_reaped_containers",
+    "The containers stopped by the reaper (or reported, in dry run mode)",
+    ["reason", "dry_run"])
+
+
+def timed(histogram, **labels):
+    """Decorates a coroutine function, so that the time until its future
+    is resolved is observed in the histogram, with the given labels.
+    Failures are observed as well.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        @gen.coroutine
+        def wrapper(*args, **kwargs):
+            start = time.monotonic()
+            try:
+                result = yield func(*args, **kwargs)
+            finally:
+                metric = histogram.labels(**labels) if labels else histogram
+                metric.observe(time.monotonic() - start)
+            return result
+        return wrapper
+    return decorator
@@ -1,19 +1,114 @@
+import random
 import socket
 import errno
+from urllib.parse import urlparse
 
 from tornado import gen, ioloop
 from tornado.httpclient import AsyncHTTPClient, HTTPError
+from tornado.iostream import StreamClosedError
 from tornado.log import app_log
+from tornado.tcpclient import TCPClient
+
+#: The errors we expect while a server is starting up, and don't log.
+_STARTUP_ERRNOS = {errno.ECONNABORTED,
+                   errno.ECONNREFUSED,
+                   errno.ECONNRESET}
+
+
+def backoff_delays(initial=0.05, maximum=1.0, factor=2.0, jitter=0.5,
+                   rand=random.random):
+    """Generates the delays between successive attempts: exponentially
+    growing from initial to maximum, each reduced by a random fraction
+    (up to jitter) so that concurrent waiters do not retry in lockstep.
+
+    Parameters
+    ----------
+    initial: float
+        The first delay (seconds), before jitter.
+    maximum: float
+        The largest delay (seconds), before jitter.
+    factor: float
+        The growth of the delay at every attempt.
+    jitter: float
+        The largest fraction of the delay that can be removed at random,
+        between 0 and 1.
+    rand: callable
+        Returns a random number in [0, 1).
+    """
+    delay = initial
+    while True:
+        yield delay * (1.0 - jitter * rand())
+        delay = min(delay * factor, maximum)
+
+
+def _is_startup_error(error):
+    """True if the connection error is expected while a server is starting
+    up. Tornado reports a refused connection as a StreamClosedError without
+    errno, and the OSError, if any, as its real_error."""
+    if isinstance(error, StreamClosedError):
+        if error.real_error is None:
+            return True
+        error = error.real_error
+
+    return getattr(error, "errno", None) in _STARTUP_ERRNOS
 
 
 @gen.coroutine
-def wait_for_http_server_2xx(url, timeout=10):
+def wait_for_tcp_port(host, port, timeout=10, max_delay=1.0):
+    """Waits for a TCP port to accept connections.
+    Raises TimeoutError if it doesn't within timeout seconds.
+    """
+    loop = ioloop.IOLoop.current()
+    deadline = loop.time() + timeout
+    delays = backoff_delays(maximum=max_delay)
+    client = TCPClient()
+
+    while True:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+
+        try:
+            stream = yield client.connect(host, port, timeout=remaining)
+        except (OSError, socket.error) as e:
+            if not _is_startup_error(e):
+                app_log.warning("Failed to connect to %s:%s (%s)",
+                                host, port, e)
+        except gen.TimeoutError:
+            break
+        else:
+            stream.close()
+            return
+
+        yield gen.sleep(min(next(delays), max(deadline - loop.time(), 0)))
+
+    raise TimeoutError("Port {}:{} didn't accept connections in {} "
+                       "seconds".format(host, port, timeout))
+
+
+@gen.coroutine
+def wait_for_http_server_2xx(url, timeout=10, trace=None, max_delay=1.0):
     """Wait for an HTTP Server to respond at url and respond with a 2xx code.
+
+    The server port is waited for first, so that no requests are issued
+    before anything is listening. The attempts are spaced with an
+    exponential backoff, up to max_delay seconds.
+
+    If a trace (StartTrace) is given, the "port-open" and "first-2xx"
+    phases are marked on it.
     """
     loop = ioloop.IOLoop.current()
     tic = loop.time()
     client = AsyncHTTPClient()
 
+    parsed = urlparse(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    yield wait_for_tcp_port(parsed.hostname, port, timeout, max_delay)
+    if trace is not None:
+        trace.mark("port-open")
+
+    delays = backoff_delays(maximum=max_delay)
+
     while loop.time() - tic < timeout:
         try:
             response = yield client.fetch(url, follow_redirects=True)
@@ -23,9 +118,7 @@ def wait_for_http_server_2xx(url, timeout=10):
             if e.code != 599:
                 app_log.warning("Server at %s responded with: %s", url, e.code)
         except (OSError, socket.error) as e:
-            if e.errno not in {errno.ECONNABORTED,
-                               errno.ECONNREFUSED,
-                               errno.ECONNRESET}:
+            if not _is_startup_error(e):
                 app_log.warning("Failed to connect to %s (%s)", url, e)
         except Exception as e:
             # In case of any unexpected exception, we just log it and keep
@@ -34,9 +127,11 @@ def wait_for_http_server_2xx(url, timeout=10):
                             "%s (%s)", url, e)
         else:
             app_log.info("Server at %s responded with: %s", url, response.code)
+            if trace is not None:
+                trace.mark("first-2xx")
             return
 
-        yield gen.sleep(0.1)
+        yield gen.sleep(next(delays))
 
     raise TimeoutError("Server at {} didn't respond in {} seconds".format(
         url, timeout))
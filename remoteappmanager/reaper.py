@@ -0,0 +1,264 @@
+import time
+from datetime import datetime, timezone
+
+from tornado import gen, ioloop, locks
+from traitlets import Any, Bool, Dict, Float, Instance, Int
+
+from remoteappmanager import metrics
+from remoteappmanager.cache import SingleFlight
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.docker.container_manager import (
+    ContainerManager, OperationInProgress)
+from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+
+#: The reasons why a container is stopped.
+NO_ROUTE = "no_route"
+NO_ACCOUNTING = "no_accounting"
+IDLE = "idle"
+
+REASONS = (NO_ROUTE, NO_ACCOUNTING, IDLE)
+
+
+class Reaper(LoggingMixin):
+    """Periodically stops the containers of the realm that nobody uses.
+
+    A container is stopped when:
+
+    - it has no route in the reverse proxy (no_route), or its mapping id
+      is not among the accountings of its user (no_accounting), for at
+      least orphan_grace seconds. The grace covers the containers being
+      started, whose route is registered once they are ready.
+    - it was pre-started for a warm pool and has no route (no_route)
+      for at least warm_grace seconds. The pools live in the user
+      processes, and only they know which containers are idle, so the
+      reaper cannot tell a pool container from one left behind by a
+      process that died. It gives them a longer grace. Their accounting
+      is checked like any other, as they have their mapping from the
+      start.
+    - the proxy reports no traffic through its route for idle_timeout
+      seconds (idle).
+
+    At most `concurrency` containers are stopped at the same time.
+    In dry run mode, the containers are only logged.
+    """
+
+    #: The containers of the realm
+    container_manager = Instance(ContainerManager)
+
+    #: The routes and their last activity
+    reverse_proxy = Instance(ReverseProxy)
+
+    #: The accountings of the users
+    async_db = Instance(AsyncDatabase)
+
+    #: The interval (seconds) between two passes
+    interval = Float(300.0)
+
+    #: The time (seconds) without traffic after which a container is
+    #: stopped. Zero disables the idle check.
+    idle_timeout = Float(0.0)
+
+    #: The time (seconds) a container without route or accounting is
+    #: left alone before being stopped.
+    orphan_grace = Float(600.0)
+
+    #: The time (seconds) a pre-started container without route is left
+    #: alone before being stopped.
+    warm_grace = Float(3600.0)
+
+    #: The maximum number of containers stopped at the same time
+    concurrency = Int(4)
+
+    #: If True, the containers are reported, but not stopped.
+    dry_run = Bool(False)
+
+    #: docker id -> (reason, monotonic time it was first found orphan)
+    _orphans = Dict()
+
+    #: The counters reported by stats()
+    _counters = Dict()
+
+    #: The periodic pass
+    _callback = Any()
+
+    #: Coalesces the concurrent passes
+    _passes = Instance(SingleFlight, args=())
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._counters = {
+            "passes": 0,
+            "errors": 0,
+            "stopped": {reason: 0 for reason in REASONS},
+            "dry_run": {reason: 0 for reason in REASONS},
+            "last_pass_duration": None,
+        }
+
+    def start(self):
+        """Starts the periodic passes. Does nothing if already started."""
+        if self._callback is not None:
+            return
+
+        self._callback = ioloop.PeriodicCallback(
+            self._periodic_reap, self.interval * 1000)
+        self._callback.start()
+
+    def stop(self):
+        """Stops the periodic passes."""
+        if self._callback is not None:
+            self._callback.stop()
+            self._callback = None
+
+    def reap(self):
+        """Performs a pass: finds the unused containers and stops them.
+        Concurrent invocations are coalesced.
+
+        Returns
+        -------
+        A Future resolved with a dict
+            docker id -> reason of the containers stopped (or that would
+            have been stopped, in dry run mode).
+        """
+        return self._passes.call("reap", self._reap)
+
+    def stats(self):
+        """Returns the counters.
+
+        Returns
+        -------
+        dict
+            passes: the passes performed
+            errors: the containers that could not be stopped
+            stopped: reason -> number of containers stopped
+            dry_run: reason -> number of containers reported in dry run
+            orphans: the containers currently waiting for their grace to
+                expire
+            last_pass_duration: the time (seconds) of the last pass
+        """
+        stats = dict(self._counters)
+        stats["stopped"] = dict(stats["stopped"])
+        stats["dry_run"] = dict(stats["dry_run"])
+        stats["orphans"] = len(self._orphans)
+        return stats
+
+    # Private
+
+    @gen.coroutine
+    def _periodic_reap(self):
+        try:
+            yield self.reap()
+        except Exception:
+            self.log.exception("Reaper pass failed")
+
+    @gen.coroutine
+    def _reap(self):
+        begin = time.monotonic()
+
+        containers = yield self.container_manager.find_containers()
+        activity = yield self.reverse_proxy.last_activity()
+
+        try:
+            mapping_ids = yield {
+                user_name: self._mapping_ids(user_name)
+                for user_name in {container.user
+                                  for container in containers}}
+        except Exception:
+            # Better not to stop anything for this reason than to stop
+            # everything.
+            self.log.exception("Unable to retrieve the accountings. "
+                               "Not checking them in this pass")
+            mapping_ids = None
+
+        now = datetime.now(timezone.utc)
+        now_monotonic = time.monotonic()
+
+        victims = {}
+        orphans = {}
+        for container in containers:
+            reason = self._orphan_reason(container, activity, mapping_ids)
+            if reason is not None:
+                _, since = self._orphans.get(
+                    container.docker_id, (reason, now_monotonic))
+                orphans[container.docker_id] = (reason, since)
+                grace = (self.warm_grace
+                         if container.warm and reason == NO_ROUTE
+                         else self.orphan_grace)
+                if now_monotonic - since >= grace:
+                    victims[container.docker_id] = reason
+                continue
+
+            last_activity = activity.get(container.urlpath)
+            if (self.idle_timeout > 0 and
+                    last_activity is not None and
+                    (now - last_activity).total_seconds() >=
+                    self.idle_timeout):
+                victims[container.docker_id] = IDLE
+
+        self._orphans = {docker_id: orphan
+                         for docker_id, orphan in orphans.items()
+                         if docker_id not in victims or self.dry_run}
+
+        by_id = {container.docker_id: container for container in containers}
+        semaphore = locks.Semaphore(self.concurrency)
+        yield [self._stop(by_id[docker_id], reason, activity, semaphore)
+               for docker_id, reason in victims.items()]
+
+        self._counters["passes"] += 1
+        self._counters["last_pass_duration"] = time.monotonic() - begin
+
+        if victims:
+            self.log.info("Reaper {}: {}".format(
+                "would stop" if self.dry_run else "stopping",
+                ", ".join("{} ({})".format(docker_id, reason)
+                          for docker_id, reason in sorted(victims.items()))))
+
+        return victims
+
+    def _orphan_reason(self, container, activity, mapping_ids):
+        """Returns why the container is orphan, or None if it is not"""
+        if container.urlpath not in activity:
+            return NO_ROUTE
+
+        if (mapping_ids is not None and
+                container.mapping_id not in mapping_ids[container.user]):
+            return NO_ACCOUNTING
+
+        return None
+
+    @gen.coroutine
+    def _mapping_ids(self, user_name):
+        """Returns the set of the accounting ids of the user"""
+        user = yield self.async_db.get_user(user_name=user_name)
+        if user is None:
+            return set()
+
+        accountings = yield self.async_db.get_accounting_for_user(user)
+        return {accounting.id for accounting in accountings}
+
+    @gen.coroutine
+    def _stop(self, container, reason, activity, semaphore):
+        """Stops the container and removes its route, if any"""
+        if self.dry_run:
+            self._counters["dry_run"][reason] += 1
+            metrics.REAPED_CONTAINERS.labels(
+                reason=reason, dry_run="true").inc()
+            return
+
+        with (yield semaphore.acquire()):
+            try:
+                yield self.container_manager.stop_and_remove_container(
+                    container.docker_id)
+                if container.urlpath in activity:
+                    yield self.reverse_proxy.unregister(container.urlpath)
+            except OperationInProgress:
+                # Somebody else is already stopping it.
+                return
+            except Exception:
+                self.log.exception("Reaper could not stop container "
+                                   "{}".format(container.docker_id))
+                self._counters["errors"] += 1
+                return
+
+        self._counters["stopped"][reason] += 1
+        metrics.REAPED_CONTAINERS.labels(reason=reason, dry_run="false").inc()
@@ -2,17 +2,27 @@ from urllib.parse import quote, urlparse
 
 from tornado import gen, escape
 from tornado.httpclient import AsyncHTTPClient
-from traitlets import HasTraits, Unicode
+from traitlets import HasTraits, Unicode, Float, Int, Instance, default
 
 from jupyterhub.services.auth import (
     HubOAuth, HubOAuthCallbackHandler)
 
+from remoteappmanager import metrics
+from remoteappmanager.cache import SingleFlight, TTLCache
 from remoteappmanager.logging.logging_mixin import LoggingMixin
 from remoteappmanager.utils import url_path_join
 
 
 class Hub(LoggingMixin, HasTraits):
-    """Provides access to JupyterHub authenticator services."""
+    """Provides access to JupyterHub authenticator services.
+
+    The users identified by the hub are remembered for auth_cache_ttl
+    seconds, and the tokens the hub rejected for auth_cache_negative_ttl
+    seconds, so that the burst of requests of a page load costs at most
+    one round trip to the hub. The entries are per token and per
+    JupyterHub session: a session that logged out of the hub is not
+    found in the cache.
+    """
 
     #: The url at which the JupyterHub can be reached
     endpoint_url = Unicode()
@@ -26,6 +36,24 @@ class Hub(LoggingMixin, HasTraits):
     #: The url prefix of the JupyterHub
     hub_prefix = Unicode()
 
+    #: The time (seconds) an identified user is remembered
+    auth_cache_ttl = Float(60.0)
+
+    #: The time (seconds) a token rejected by the hub is remembered
+    auth_cache_negative_ttl = Float(5.0)
+
+    #: The maximum number of tokens remembered
+    auth_cache_size = Int(256)
+
+    #: (session id, token) -> user data of the identified users
+    _users = Instance(TTLCache)
+
+    #: The (session id, token) pairs rejected by the hub
+    _rejected = Instance(TTLCache)
+
+    #: Coalesces the concurrent lookups of the same session and token
+    _user_requests = Instance(SingleFlight, args=())
+
     def __init__(self, *args, **kwargs):
         """Initializes the hub connection object."""
         super().__init__(*args, **kwargs)
@@ -94,6 +122,12 @@ class Hub(LoggingMixin, HasTraits):
         """Verify the authentication details present in the handler
         session
 
+        The token in the request (url parameter or Authorization header)
+        is checked first, then the one in the OAuth cookie. A cookie
+        whose token is rejected is cleared, and a request token that
+        identifies a user is stored in the cookie, as HubOAuthenticated
+        does. The answer is kept for the rest of the request.
+
         Parameters
         ----------
         handler : tornado.web.RequestHandler
@@ -107,7 +141,82 @@ class Hub(LoggingMixin, HasTraits):
             information from jupyterhub associated with the given encrypted
             cookie. Otherwise the dictionary is empty.
         """
-        return self._hub_auth.get_user(handler)
+        cached = getattr(handler, "_hub_user_data", None)
+        if cached is not None:
+            return dict(cached)
+
+        user_data = {}
+        session_id = self._hub_auth.get_session_id(handler)
+        for token, from_cookie in self._handler_tokens(handler):
+            user_data = yield self.user_for_token(token, session_id)
+            if user_data:
+                if not from_cookie:
+                    self._hub_auth.set_cookie(handler, token)
+                break
+
+            if from_cookie:
+                self.log.warning("Token stored in cookie may have expired")
+                handler.clear_cookie(self._hub_auth.cookie_name)
+
+        handler._hub_user_data = user_data
+        return dict(user_data)
+
+    @gen.coroutine
+    def user_for_token(self, token, session_id=""):
+        """Identifies the user owning the token. The hub is contacted
+        only if the token is not in the cache for the session, and only
+        once for concurrent lookups of the same session and token.
+
+        Parameters
+        ----------
+        token: str
+            The token to check
+        session_id: str
+            The JupyterHub session id of the request
+
+        Returns
+        -------
+        user_data : dict
+            The user's information from jupyterhub, or an empty dict if
+            the token is not valid.
+        """
+        key = (session_id, token)
+        user_data = self._users.get(key)
+        if user_data is not None:
+            return dict(user_data)
+
+        if self._rejected.get(key) is not None:
+            return {}
+
+        user_data = yield self._user_requests.call(
+            key, self._fetch_user_for_token, token, key)
+        return dict(user_data)
+
+    def forget_user(self, handler):
+        """Removes the tokens of the handler session from the cache,
+        e.g. on logout.
+
+        Parameters
+        ----------
+        handler : tornado.web.RequestHandler
+            Request handler whose tokens must be forgotten.
+        """
+        session_id = self._hub_auth.get_session_id(handler)
+        for token, _ in self._handler_tokens(handler):
+            self._users.pop((session_id, token))
+            self._rejected.pop((session_id, token))
+
+    def auth_cache_stats(self):
+        """Returns the counters of the cache of the identified users"""
+        stats = self._users.stats()
+        stats["rejected"] = len(self._rejected)
+        stats["shared"] = self._user_requests.shared
+        return stats
+
+    @property
+    def cookie_name(self):
+        """The name of the cookie storing the OAuth token"""
+        return self._hub_auth.cookie_name
 
     def callback_handlers(self):
         """Add callback url to enable OAuth with JupyterHub
@@ -116,3 +225,59 @@ class Hub(LoggingMixin, HasTraits):
             urlparse(self._hub_auth.oauth_redirect_uri).path,
             HubOAuthCallbackHandler
         )]
+
+    # Private
+
+    def _handler_tokens(self, handler):
+        """Returns the (token, from_cookie) pairs found in the handler
+        request, in the order they must be checked."""
+        tokens = []
+
+        token = self._hub_auth.get_token(handler)
+        if token:
+            tokens.append((token, False))
+
+        cookie = handler.get_secure_cookie(self._hub_auth.cookie_name)
+        if cookie:
+            tokens.append((cookie.decode('ascii', 'replace'), True))
+
+        return tokens
+
+    @metrics.timed(metrics.HUB_AUTH_DURATION_SECONDS)
+    @gen.coroutine
+    def _fetch_user_for_token(self, token, key):
+        """Asks the hub to identify the user owning the token, and
+        caches the answer under the key."""
+        request_url = url_path_join(self.endpoint_url,
+                                    "authorizations/token",
+                                    quote(token, safe=''))
+
+        client = AsyncHTTPClient()
+        r = yield client.fetch(
+                request_url,
+                headers={'Authorization': 'token %s' % self.api_token},
+                raise_error=False)
+
+        if r.code < 400:
+            user_data = escape.json_decode(r.body)
+            self._users.put(key, user_data)
+            return user_data
+
+        if r.code == 404:
+            self._rejected.put(key, True)
+        else:
+            # Not the token's fault. Don't remember the failure.
+            self.log.warning("Failed to check authorization with the hub:"
+                             " [{}] {}".format(r.code, r.reason))
+
+        return {}
+
+    @default("_users")
+    def _users_default(self):
+        return TTLCache(maxsize=self.auth_cache_size,
+                        ttl=self.auth_cache_ttl)
+
+    @default("_rejected")
+    def _rejected_default(self):
+        return TTLCache(maxsize=self.auth_cache_size,
+                        ttl=self.auth_cache_negative_ttl)
@@ -0,0 +1,148 @@
+import json
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlparse
+
+from tornado import gen, httpclient
+
+from remoteappmanager import metrics
+from remoteappmanager.http_connection_pool import HTTPConnectionPool
+from remoteappmanager.utils import url_path_join
+
+
+class ProxyClient:
+    """An asynchronous client for the configurable-http-proxy REST API.
+
+    Requests are performed over a pool of persistent connections, so
+    that registering and removing routes does not pay the connection
+    setup cost every time.
+    """
+
+    def __init__(self, endpoint_url, api_token, max_connections=4,
+                 request_timeout=20):
+        """Initializes the client. No connection is opened until the
+        first request is performed.
+
+        Parameters
+        ----------
+        endpoint_url: str
+            The url of the proxy API, e.g. http://127.0.0.1:8001
+        api_token: str
+            The authorization token of the proxy API.
+        max_connections: int
+            The maximum number of simultaneous connections to the proxy.
+        request_timeout: float
+            The timeout (seconds) of a request.
+        """
+        url = urlparse(endpoint_url)
+
+        self._pool = HTTPConnectionPool(
+            "{}://{}".format(url.scheme, url.netloc),
+            max_connections=max_connections,
+            request_timeout=request_timeout)
+
+        self._routes_path = url_path_join(url.path or "/", "api/routes")
+
+        self._headers = {
+            "Authorization": "token {}".format(api_token),
+        }
+
+    @gen.coroutine
+    def get_routes(self):
+        """Returns the routing table of the proxy.
+
+        Returns
+        -------
+        dict
+            urlpath -> target url
+        """
+        routes = yield self.get_route_table()
+        return {urlpath: route.get("target")
+                for urlpath, route in routes.items()}
+
+    @gen.coroutine
+    def get_route_table(self):
+        """Returns the routing table of the proxy, with all the data
+        of each route.
+
+        Returns
+        -------
+        dict
+            urlpath -> dict with the target url and the data of the
+            route, e.g. last_activity, as returned by the proxy.
+        """
+        response = yield self._request("GET", self._routes_path)
+        return json.loads(response.body.decode("utf-8") or "{}")
+
+    @gen.coroutine
+    def add_route(self, urlpath, target):
+        """Routes the urlpath to the target url, replacing the current
+        route, if any."""
+        body = json.dumps({"target": target}).encode("utf-8")
+        yield self._request("POST", self._route_path(urlpath), body=body)
+
+    @gen.coroutine
+    def delete_route(self, urlpath):
+        """Removes the route of the urlpath.
+
+        Raises
+        ------
+        tornado.httpclient.HTTPError
+            With code 404 if the route does not exist.
+        """
+        yield self._request("DELETE", self._route_path(urlpath))
+
+    def close(self):
+        """Closes the pooled connections"""
+        self._pool.close()
+
+    def stats(self):
+        """Returns the counters of the connection pool"""
+        return self._pool.stats()
+
+    # Private
+
+    def _route_path(self, urlpath):
+        return url_path_join(self._routes_path, urlpath)
+
+    @gen.coroutine
+    def _request(self, method, path, body=None):
+        """Performs the request, and raises HTTPError if the proxy
+        replies with an error status code."""
+        headers = dict(self._headers)
+        if body is not None:
+            headers["Content-Type"] = "application/json"
+
+        start = time.monotonic()
+        try:
+            response = yield self._pool.fetch(
+                method, path, body=body, headers=headers)
+        finally:
+            metrics.PROXY_REQUEST_DURATION_SECONDS.labels(
+                method=method).observe(time.monotonic() - start)
+
+        if response.code >= 400:
+            raise httpclient.HTTPError(response.code, response.reason)
+
+        return response
+
+
+def parse_timestamp(value):
+    """Parses a timestamp of the proxy (e.g. the last_activity of a
+    route, like 2016-06-16T09:21:53.123Z).
+
+    Returns
+    -------
+    datetime or None
+        The UTC time, or None if the value is missing or malformed.
+    """
+    if not value:
+        return None
+
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%fZ", "%Y-%m-%dT%H:%M:%SZ"):
+        try:
+            return datetime.strptime(value, fmt).replace(tzinfo=timezone.utc)
+        except (TypeError, ValueError):
+            pass
+
+    return None
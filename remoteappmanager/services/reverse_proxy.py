@@ -1,21 +1,35 @@
 from tornado import gen, httpclient
-from jupyterhub.proxy import Proxy, ConfigurableHTTPProxy
-from traitlets import HasTraits, Unicode, Instance
+from traitlets import HasTraits, Unicode, Instance, Dict
 
+from remoteappmanager.cache import SingleFlight
 from remoteappmanager.logging.logging_mixin import LoggingMixin
+from remoteappmanager.services.proxy_client import (
+    ProxyClient, parse_timestamp)
+from remoteappmanager.utils import without_end_slash
 
 
 class ReverseProxy(LoggingMixin, HasTraits):
     """Represents the remote reverse proxy. It is meant to have a high
-    level API."""
+    level API.
+
+    A local mirror of the proxy routing table is kept, so that the
+    registration of a route the proxy already has does not hit the
+    proxy API.
+    """
     #: The endpoint url at which the reverse proxy has its api
     endpoint_url = Unicode()
 
     #: The authorization API token to authenticate the request
     api_token = Unicode()
 
-    #: Internal instance of the reverse proxy API
-    _reverse_proxy = Instance(Proxy)
+    #: Internal client of the reverse proxy API
+    _client = Instance(ProxyClient)
+
+    #: The mirror of the proxy routing table. urlpath -> target url
+    _routes = Dict()
+
+    #: Coalesces the concurrent reconciliations
+    _reconciliations = Instance(SingleFlight, args=())
 
     def __init__(self, *args, **kwargs):
         """Initializes the reverse proxy connection object."""
@@ -33,11 +47,9 @@ class ReverseProxy(LoggingMixin, HasTraits):
             self.log.error(message)
             raise ValueError(message)
 
-        # Note: we just use the jupyterhub ConfigurableHTTPProxy for
-        # interface convenience
-        self._reverse_proxy = ConfigurableHTTPProxy(
-            auth_token=self.api_token,
-            api_url=self.endpoint_url
+        self._client = ProxyClient(
+            endpoint_url=self.endpoint_url,
+            api_token=self.api_token
         )
 
         self.log.info("Reverse proxy setup on {}".format(
@@ -47,7 +59,8 @@ class ReverseProxy(LoggingMixin, HasTraits):
     @gen.coroutine
     def register(self, urlpath, target_host_url):
         """Register a given urlpath to redirect to a different target host.
-        The operation is idempotent.
+        The operation is idempotent. If the route is already known to be
+        in the proxy, the proxy is not contacted.
 
         Parameters
         ----------
@@ -57,17 +70,17 @@ class ReverseProxy(LoggingMixin, HasTraits):
         target_host_url:
             The host to redirect to, e.g. http://127.0.0.1:31233/service/
         """
+        if self.is_registered(urlpath, target_host_url):
+            self.log.debug("Redirection of {} to {} already "
+                           "registered".format(urlpath, target_host_url))
+            return
+
         self.log.info("Registering {} redirection to {}".format(
             urlpath,
             target_host_url))
 
-        yield self._reverse_proxy.api_request(
-            urlpath,
-            method='POST',
-            body=dict(
-                target=target_host_url,
-            )
-        )
+        yield self._client.add_route(urlpath, target_host_url)
+        self._routes[_route_key(urlpath)] = target_host_url
 
     @gen.coroutine
     def unregister(self, urlpath):
@@ -83,7 +96,7 @@ class ReverseProxy(LoggingMixin, HasTraits):
         self.log.info("Deregistering {} redirection".format(urlpath))
 
         try:
-            yield self._reverse_proxy.api_request(urlpath, method='DELETE')
+            yield self._client.delete_route(urlpath)
         except httpclient.HTTPError as e:
             if e.code == 404:
                 self.log.warning("Could not find urlpath {} when removing"
@@ -92,3 +105,112 @@ class ReverseProxy(LoggingMixin, HasTraits):
                                      urlpath))
             else:
                 raise e
+        finally:
+            self._routes.pop(_route_key(urlpath), None)
+
+    def is_registered(self, urlpath, target_host_url):
+        """Returns True if the mirror of the routing table maps the
+        urlpath to the target host url.
+
+        Parameters
+        ----------
+        urlpath: str
+            The absolute path of the url
+
+        target_host_url:
+            The host the urlpath redirects to
+        """
+        return self._routes.get(_route_key(urlpath)) == target_host_url
+
+    @gen.coroutine
+    def refresh_routes(self):
+        """Replaces the mirror of the routing table with the one
+        currently in the proxy."""
+        routes = yield self._client.get_routes()
+        self._routes = {_route_key(urlpath): target
+                        for urlpath, target in routes.items()}
+
+    @gen.coroutine
+    def last_activity(self):
+        """Returns the time of the last traffic through each route of
+        the proxy. The mirror of the routing table is refreshed too.
+
+        Returns
+        -------
+        dict
+            urlpath (without end slash) -> datetime (UTC) of the last
+            activity, or None if the proxy does not tell.
+        """
+        table = yield self._client.get_route_table()
+        self._routes = {_route_key(urlpath): route.get("target")
+                        for urlpath, route in table.items()}
+        return {_route_key(urlpath): parse_timestamp(
+                    route.get("last_activity"))
+                for urlpath, route in table.items()}
+
+    def reconcile(self, targets, prune_prefix=None):
+        """Brings the proxy in sync with the given routes, e.g. after a
+        restart of the proxy. The routing table is retrieved once, and
+        only the missing or outdated routes are registered.
+        Concurrent invocations are coalesced.
+
+        Parameters
+        ----------
+        targets: dict
+            urlpath -> target host url of the routes that must be present
+        prune_prefix: str or None
+            If given, the routes below this urlpath that are not in
+            targets are removed from the proxy.
+
+        Returns
+        -------
+        A Future resolved with a dict of counters
+            added: routes registered
+            removed: routes removed
+            unchanged: routes already present
+        """
+        return self._reconciliations.call(
+            "reconcile", self._reconcile, targets, prune_prefix)
+
+    def close(self):
+        """Closes the connections to the proxy"""
+        self._client.close()
+
+    # Private
+
+    @gen.coroutine
+    def _reconcile(self, targets, prune_prefix):
+        yield self.refresh_routes()
+
+        targets = {_route_key(urlpath): target
+                   for urlpath, target in targets.items()}
+
+        missing = {urlpath: target
+                   for urlpath, target in targets.items()
+                   if self._routes.get(urlpath) != target}
+
+        stale = []
+        if prune_prefix is not None:
+            prefix = _route_key(prune_prefix) + "/"
+            stale = [urlpath for urlpath in self._routes
+                     if urlpath.startswith(prefix) and
+                     urlpath not in targets]
+
+        yield [self.register(urlpath, target)
+               for urlpath, target in missing.items()]
+        yield [self.unregister(urlpath) for urlpath in stale]
+
+        result = {
+            "added": len(missing),
+            "removed": len(stale),
+            "unchanged": len(targets) - len(missing),
+        }
+
+        self.log.info("Reverse proxy reconciled: {}".format(result))
+        return result
+
+
+def _route_key(urlpath):
+    """Normalises the urlpath the way the proxy stores it, without the
+    end slash."""
+    return without_end_slash(urlpath) or "/"
@@ -1,3 +1,5 @@
+from unittest import mock
+
 from tornado import web, gen
 from tornado.testing import gen_test, ExpectLog, AsyncHTTPTestCase
 from tornado.web import HTTPError
@@ -21,11 +23,40 @@ class AuthHandler(web.RequestHandler):
         self.flush()
 
 
+class TokenHandler(web.RequestHandler):
+    requests = []
+
+    @gen.coroutine
+    def get(self, token):
+        self.requests.append(token)
+        yield gen.sleep(0.05)
+        if token == "invalid":
+            raise HTTPError(404)
+        if token == "broken":
+            raise HTTPError(502)
+
+        self.write({"name": token, "admin": False})
+
+
+def mock_handler(token="", cookie=None, session_id=""):
+    handler = mock.Mock(spec=web.RequestHandler)
+    handler.get_argument.return_value = token
+    handler.request = mock.Mock(headers={}, protocol="http")
+    handler.get_cookie.return_value = session_id
+    handler.get_secure_cookie.return_value = cookie
+    return handler
+
+
 class TestHub(AsyncHTTPTestCase):
+    def setUp(self):
+        super().setUp()
+        TokenHandler.requests = []
+
     def get_app(self):
         self.handler = AuthHandler
         handlers = [
             ("/hub/authorizations/cookie/(.*)", self.handler),
+            ("/hub/authorizations/token/(.*)", TokenHandler),
         ]
         app = web.Application(handlers)
         return app
@@ -68,3 +99,128 @@ class TestHub(AsyncHTTPTestCase):
         res = yield hub.verify_token("foo", "bar")
         self.assertNotEqual(res, {})
         self.assertEqual(res["name"], "username")
+
+    def create_hub(self, **kwargs):
+        return Hub(endpoint_url=self.get_url("/hub"),
+                   api_token="whatever",
+                   **kwargs)
+
+    @gen_test
+    def test_user_for_token_is_cached(self):
+        hub = self.create_hub()
+
+        for _ in range(3):
+            user_data = yield hub.user_for_token("johndoe")
+            self.assertEqual(user_data["name"], "johndoe")
+
+        self.assertEqual(TokenHandler.requests, ["johndoe"])
+        self.assertEqual(hub.auth_cache_stats()["hits"], 2)
+
+        # The cached data can't be altered by the caller.
+        user_data["name"] = "janedoe"
+        user_data = yield hub.user_for_token("johndoe")
+        self.assertEqual(user_data["name"], "johndoe")
+
+    @gen_test
+    def test_rejected_tokens_are_cached(self):
+        hub = self.create_hub()
+
+        with ExpectLog('tornado.access', ''):
+            self.assertEqual((yield hub.user_for_token("invalid")), {})
+        self.assertEqual((yield hub.user_for_token("invalid")), {})
+
+        self.assertEqual(TokenHandler.requests, ["invalid"])
+        self.assertEqual(hub.auth_cache_stats()["rejected"], 1)
+
+    @gen_test
+    def test_hub_failures_are_not_cached(self):
+        hub = self.create_hub()
+
+        for _ in range(2):
+            with ExpectLog('tornado.access', ''):
+                self.assertEqual((yield hub.user_for_token("broken")), {})
+
+        self.assertEqual(TokenHandler.requests, ["broken", "broken"])
+
+    @gen_test
+    def test_cache_expiration(self):
+        hub = self.create_hub(auth_cache_ttl=0)
+
+        yield hub.user_for_token("johndoe")
+        yield hub.user_for_token("johndoe")
+
+        self.assertEqual(TokenHandler.requests, ["johndoe", "johndoe"])
+
+    @gen_test
+    def test_concurrent_lookups_are_shared(self):
+        hub = self.create_hub()
+
+        results = yield [hub.user_for_token("johndoe") for _ in range(5)]
+
+        self.assertEqual([r["name"] for r in results], ["johndoe"] * 5)
+        self.assertEqual(TokenHandler.requests, ["johndoe"])
+        self.assertEqual(hub.auth_cache_stats()["shared"], 4)
+
+    @mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+    @gen_test
+    def test_get_user(self):
+        hub = self.create_hub()
+
+        user_data = yield hub.get_user(mock_handler(token="johndoe"))
+        self.assertEqual(user_data["name"], "johndoe")
+
+        user_data = yield hub.get_user(mock_handler(cookie=b"janedoe"))
+        self.assertEqual(user_data["name"], "janedoe")
+
+        self.assertEqual((yield hub.get_user(mock_handler())), {})
+
+        # An invalid cookie token is cleared.
+        handler = mock_handler(cookie=b"invalid")
+        with ExpectLog('tornado.access', ''):
+            self.assertEqual((yield hub.get_user(handler)), {})
+        handler.clear_cookie.assert_called_with(hub.cookie_name)
+
+    @mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+    @gen_test
+    def test_forget_user(self):
+        hub = self.create_hub()
+        handler = mock_handler(cookie=b"johndoe")
+
+        yield hub.get_user(handler)
+        hub.forget_user(handler)
+        yield hub.get_user(mock_handler(cookie=b"johndoe"))
+
+        self.assertEqual(TokenHandler.requests, ["johndoe", "johndoe"])
+
+    @mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+    @gen_test
+    def test_get_user_per_session(self):
+        hub = self.create_hub()
+
+        handler = mock_handler(cookie=b"johndoe", session_id="1")
+        user_data = yield hub.get_user(handler)
+        self.assertEqual(user_data["name"], "johndoe")
+
+        # Once per request
+        yield hub.get_user(handler)
+        # Once per session
+        yield hub.get_user(mock_handler(cookie=b"johndoe", session_id="1"))
+        self.assertEqual(TokenHandler.requests, ["johndoe"])
+
+        # A new session, e.g. after a logout from the hub
+        yield hub.get_user(mock_handler(cookie=b"johndoe", session_id="2"))
+        self.assertEqual(TokenHandler.requests, ["johndoe", "johndoe"])
+
+    @mock.patch.dict('os.environ', {"JUPYTERHUB_CLIENT_ID": 'client-id'})
+    @gen_test
+    def test_get_user_stores_request_token(self):
+        hub = self.create_hub()
+
+        handler = mock_handler(token="johndoe")
+        yield hub.get_user(handler)
+        self.assertEqual(handler.set_secure_cookie.call_args[0],
+                         (hub.cookie_name, "johndoe"))
+
+        handler = mock_handler(cookie=b"johndoe")
+        yield hub.get_user(handler)
+        self.assertFalse(handler.set_secure_cookie.called)
@@ -1,37 +1,245 @@
-from unittest.mock import Mock
+import datetime
+import json
 
-from jupyterhub import proxy
+from tornado import httpclient, web
+from tornado.httpserver import HTTPServer
+from tornado.testing import gen_test, AsyncTestCase, ExpectLog, \
+    bind_unused_port
+
+from remoteappmanager.services.proxy_client import (
+    ProxyClient, parse_timestamp)
 from remoteappmanager.services.reverse_proxy import ReverseProxy
-from tornado import gen
-from tornado.testing import gen_test, AsyncTestCase, ExpectLog
 
 
-class TestReverseProxy(AsyncTestCase):
+class RoutesHandler(web.RequestHandler):
+    """Mimics the routes API of configurable-http-proxy"""
+    def prepare(self):
+        self.application.requests.append(
+            (self.request.method, self.request.path))
+        if (self.request.headers.get("Authorization") !=
+                "token {}".format(self.application.token)):
+            raise web.HTTPError(403)
+
+    def get(self, path):
+        table = {urlpath: {"target": target}
+                 for urlpath, target in self.application.routes.items()}
+        for urlpath, last_activity in self.application.activity.items():
+            table[urlpath]["last_activity"] = last_activity
+        self.write(table)
+
+    def post(self, path):
+        body = json.loads(self.request.body.decode("utf-8"))
+        self.application.routes[path.rstrip("/")] = body["target"]
+        self.set_status(201)
+
+    def delete(self, path):
+        try:
+            del self.application.routes[path.rstrip("/")]
+        except KeyError:
+            raise web.HTTPError(404)
+        self.set_status(204)
+
+
+class ProxyAPIApplication(web.Application):
+    def __init__(self, token):
+        self.token = token
+        self.routes = {}
+        self.activity = {}
+        self.requests = []
+        super().__init__([(r"/api/routes(/.*)?", RoutesHandler)])
 
+
+class ProxyServerMixin:
+    def setUp(self):
+        super().setUp()
+        self.proxy_app = ProxyAPIApplication("token")
+        self.server = HTTPServer(self.proxy_app)
+        sock, port = bind_unused_port()
+        self.server.add_socket(sock)
+        self.endpoint_url = "http://127.0.0.1:{}/".format(port)
+
+    def tearDown(self):
+        self.server.stop()
+        self.io_loop.run_sync(self.server.close_all_connections)
+        super().tearDown()
+
+
+class TestProxyClient(ProxyServerMixin, AsyncTestCase):
     @gen_test
-    def test_reverse_proxy_operations(self):
-        coroutine_out = None
+    def test_routes(self):
+        client = ProxyClient(self.endpoint_url, "token")
+        try:
+            yield client.add_route("/user/foo/containers/1/",
+                                   "http://127.0.0.1:666")
+            routes = yield client.get_routes()
+            self.assertEqual(routes,
+                             {"/user/foo/containers/1":
+                              "http://127.0.0.1:666"})
+
+            yield client.delete_route("/user/foo/containers/1/")
+            with self.assertRaises(httpclient.HTTPError) as cm:
+                yield client.delete_route("/user/foo/containers/1/")
+            self.assertEqual(cm.exception.code, 404)
 
-        @gen.coroutine
-        def mock_api_request(self, *args, **kwargs):
-            nonlocal coroutine_out
-            yield gen.sleep(0.1)
-            coroutine_out = dict(args=args, kwargs=kwargs)
+            # All the requests went through the same connection.
+            self.assertEqual(client.stats()["opened"], 1)
+            self.assertEqual(client.stats()["requests"], 4)
+        finally:
+            client.close()
 
-        reverse_proxy = ReverseProxy(
-            endpoint_url="http://fake/api",
+    @gen_test
+    def test_invalid_token(self):
+        client = ProxyClient(self.endpoint_url, "wrong")
+        try:
+            with ExpectLog('tornado.access', ''):
+                with self.assertRaises(httpclient.HTTPError) as cm:
+                    yield client.get_routes()
+            self.assertEqual(cm.exception.code, 403)
+        finally:
+            client.close()
+
+
+class TestReverseProxy(ProxyServerMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.reverse_proxy = ReverseProxy(
+            endpoint_url=self.endpoint_url,
             api_token="token")
-        reverse_proxy._reverse_proxy = Mock(spec=proxy.Proxy)
-        reverse_proxy._reverse_proxy.api_request = mock_api_request
+
+    def tearDown(self):
+        self.reverse_proxy.close()
+        super().tearDown()
+
+    @gen_test
+    def test_reverse_proxy_operations(self):
+        reverse_proxy = self.reverse_proxy
 
         yield reverse_proxy.register("/hello/from/me/",
                                      "http://localhost:12312/")
 
-        self.assertEqual(coroutine_out["kwargs"]["method"], "POST")
+        self.assertEqual(self.proxy_app.routes,
+                         {"/hello/from/me": "http://localhost:12312/"})
+        self.assertEqual(self.proxy_app.requests[-1][0], "POST")
+        self.assertTrue(reverse_proxy.is_registered(
+            "/hello/from/me", "http://localhost:12312/"))
 
         yield reverse_proxy.unregister("/hello/from/me/")
 
-        self.assertEqual(coroutine_out["kwargs"]["method"], "DELETE")
+        self.assertEqual(self.proxy_app.routes, {})
+        self.assertEqual(self.proxy_app.requests[-1][0], "DELETE")
+        self.assertFalse(reverse_proxy.is_registered(
+            "/hello/from/me/", "http://localhost:12312/"))
+
+    @gen_test
+    def test_redundant_register_is_a_noop(self):
+        reverse_proxy = self.reverse_proxy
+
+        for _ in range(3):
+            yield reverse_proxy.register("/hello/", "http://localhost:1/")
+        self.assertEqual(len(self.proxy_app.requests), 1)
+
+        # A different target is registered again.
+        yield reverse_proxy.register("/hello/", "http://localhost:2/")
+        self.assertEqual(len(self.proxy_app.requests), 2)
+        self.assertEqual(self.proxy_app.routes,
+                         {"/hello": "http://localhost:2/"})
+
+    @gen_test
+    def test_unregister_missing_route(self):
+        with ExpectLog('tornado.access', ''):
+            yield self.reverse_proxy.unregister("/not/there/")
+
+        self.assertEqual(self.proxy_app.requests, [
+            ("DELETE", "/api/routes/not/there/")])
+
+    @gen_test
+    def test_refresh_routes(self):
+        self.proxy_app.routes["/hello"] = "http://localhost:1/"
+
+        self.assertFalse(self.reverse_proxy.is_registered(
+            "/hello/", "http://localhost:1/"))
+        yield self.reverse_proxy.refresh_routes()
+        self.assertTrue(self.reverse_proxy.is_registered(
+            "/hello/", "http://localhost:1/"))
+
+    @gen_test
+    def test_reconcile(self):
+        reverse_proxy = self.reverse_proxy
+        yield reverse_proxy.register("/user/foo/containers/1/",
+                                     "http://localhost:1/")
+        yield reverse_proxy.register("/user/foo/containers/2/",
+                                     "http://localhost:2/")
+
+        # The proxy restarts, with an old route and the hub route.
+        self.proxy_app.routes = {
+            "/": "http://localhost:8081/",
+            "/user/foo/containers/3": "http://localhost:3/",
+        }
+        self.proxy_app.requests.clear()
+
+        targets = {
+            "/user/foo/containers/1/": "http://localhost:1/",
+            "/user/foo/containers/2/": "http://localhost:2/",
+        }
+
+        with self.assertLogs("tornado.application", "INFO"):
+            result = yield reverse_proxy.reconcile(
+                targets, prune_prefix="/user/foo/containers/")
+
+        self.assertEqual(result, {"added": 2, "removed": 1, "unchanged": 0})
+        self.assertEqual(self.proxy_app.routes, {
+            "/": "http://localhost:8081/",
+            "/user/foo/containers/1": "http://localhost:1/",
+            "/user/foo/containers/2": "http://localhost:2/",
+        })
+        self.assertEqual(self.proxy_app.requests[0],
+                         ("GET", "/api/routes"))
+
+        # Nothing left to do.
+        result = yield reverse_proxy.reconcile(targets)
+        self.assertEqual(result, {"added": 0, "removed": 0, "unchanged": 2})
+
+    @gen_test
+    def test_concurrent_reconcile_is_shared(self):
+        targets = {"/hello/": "http://localhost:1/"}
+
+        results = yield [self.reverse_proxy.reconcile(targets),
+                         self.reverse_proxy.reconcile(targets)]
+
+        self.assertEqual(results[0], results[1])
+        self.assertEqual(
+            [request for request in self.proxy_app.requests
+             if request[0] == "GET"],
+            [("GET", "/api/routes")])
+
+    @gen_test
+    def test_last_activity(self):
+        self.proxy_app.routes = {
+            "/user/foo/containers/1": "http://localhost:1/",
+            "/user/foo/containers/2": "http://localhost:2/",
+        }
+        self.proxy_app.activity = {
+            "/user/foo/containers/1": "2016-06-16T09:21:53.123Z",
+        }
+
+        activity = yield self.reverse_proxy.last_activity()
+
+        self.assertEqual(activity, {
+            "/user/foo/containers/1": datetime.datetime(
+                2016, 6, 16, 9, 21, 53, 123000,
+                tzinfo=datetime.timezone.utc),
+            "/user/foo/containers/2": None,
+        })
+        self.assertTrue(self.reverse_proxy.is_registered(
+            "/user/foo/containers/2/", "http://localhost:2/"))
+
+    def test_parse_timestamp(self):
+        self.assertEqual(
+            parse_timestamp("2016-06-16T09:21:53Z"),
+            datetime.datetime(2016, 6, 16, 9, 21, 53,
+                              tzinfo=datetime.timezone.utc))
+        for value in [None, "", "yesterday", 12]:
+            self.assertIsNone(parse_timestamp(value))
 
     def test_incorrect_init(self):
         log_msg = ("invalid proxy API Token to initialise the "
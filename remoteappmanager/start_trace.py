@@ -0,0 +1,65 @@
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class StartTrace:
+    """Records how long each phase of a container start took.
+
+    A phase ends when it is marked, and the next one begins. The
+    typical sequence is prepare, create, start, port-open, first-2xx.
+    The phases that run concurrently with the others (e.g. the eviction
+    of a stale container) are recorded apart, with overlap().
+    """
+
+    def __init__(self, timer=time.monotonic):
+        """Initializes the trace. The first phase begins now.
+
+        Parameters
+        ----------
+        timer: callable
+            Returns the current time, in seconds.
+        """
+        self._timer = timer
+        self._started = self._last = timer()
+
+        #: phase name -> duration (seconds), in the order of completion
+        self.phases = OrderedDict()
+
+        #: overlapped phase name -> duration (seconds), in the order of
+        #: completion
+        self.overlapped = OrderedDict()
+
+    def mark(self, phase):
+        """Ends the current phase, giving it a name"""
+        now = self._timer()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    @contextmanager
+    def overlap(self, phase):
+        """Records the time spent in the with block as an overlapped
+        phase. It does not end the current phase."""
+        begin = self._timer()
+        try:
+            yield
+        finally:
+            self.overlapped[phase] = self._timer() - begin
+
+    @property
+    def total(self):
+        """The time (seconds) from the beginning of the trace to the
+        last mark"""
+        return self._last - self._started
+
+    def as_dict(self):
+        """Returns the phase durations, the overlapped phase durations,
+        and the total"""
+        result = OrderedDict(self.phases)
+        result.update(self.overlapped)
+        result["total"] = self.total
+        return result
+
+    def __str__(self):
+        return " ".join("{}={:.3f}s".format(phase, duration)
+                        for phase, duration in self.as_dict().items())
@@ -129,7 +129,8 @@ class DummyDB(interfaces.ABCDatabase):
         return self.applications.values()
 
     def grant_access(self, app_name, user_name, app_license,
-                     allow_home, allow_view, volume, allow_startup_data):
+                     allow_home, allow_view, volume, allow_startup_data,
+                     limits=None):
         app = self._get_application_id_by_name(app_name)
         user = self._get_user_id_by_name(user_name)
         app_license = app_license if app_license else None
@@ -146,7 +147,8 @@ class DummyDB(interfaces.ABCDatabase):
         return id
 
     def revoke_access(self, app_name, user_name, app_license,
-                      allow_home, allow_view, volume, allow_startup_data):
+                      allow_home, allow_view, volume, allow_startup_data,
+                      limits=None):
         pass
 
     def revoke_access_by_id(self, mapping_id):
@@ -237,13 +239,45 @@ def create_container_manager(params=None):
     manager : remoteappmanager.docker.container_manager.ContainerManager
     '''
     if params is None:
-        params = {'docker_config': {}, "realm": "myrealm"}
+        params = {'docker_config': {},
+                  "realm": "myrealm"}
 
     manager = ContainerManager(**params)
     manager._docker_client._sync_client = VirtualDockerClient.with_containers()
     return manager
 
 
+def create_multihost_container_manager(docker_clients, params=None):
+    ''' Return a dummy ContainerManager object with a docker host for each
+    of the given virtual docker clients. The hosts are at
+    tcp://10.0.0.1:2375, tcp://10.0.0.2:2375 ...
+
+    Parameters
+    ----------
+    docker_clients : list of VirtualDockerClient
+        The docker engines of the hosts
+    params : dict
+        additional keyword arguments for initialising ContainerManager
+
+    Returns
+    -------
+    manager : remoteappmanager.docker.container_manager.ContainerManager
+    '''
+    docker_configs = [
+        {"base_url": "tcp://10.0.0.{}:2375".format(index + 1)}
+        for index in range(len(docker_clients))]
+
+    kwargs = {"realm": "myrealm"}
+    kwargs.update(params or {})
+
+    manager = ContainerManager(docker_config=docker_configs[0],
+                               additional_docker_configs=docker_configs[1:],
+                               **kwargs)
+    for host, docker_client in zip(manager._hosts, docker_clients):
+        host.client._sync_client = docker_client
+    return manager
+
+
 def create_application(command_line_config=None,
                        file_config=None,
                        environment_config=None):
@@ -1,6 +1,8 @@
 import json
 import logging
 import hashlib
+import queue
+import time
 import uuid
 import requests
 from collections import namedtuple
@@ -40,6 +42,15 @@ class VirtualDockerClient(object):
         # This one contains the containers that are currently present
         self._containers = []
 
+        # The callables that are notified of the docker events, and the
+        # queues of the events() generators.
+        self._event_listeners = []
+        self._event_queues = []
+
+        # The resources reported by info()
+        self.ncpu = 4
+        self.mem_total = 8 * 1024 ** 3
+
     @classmethod
     def with_containers(cls):
         """
@@ -162,6 +173,7 @@ class VirtualDockerClient(object):
             )
         )
 
+        self._emit_event("create", self._find_container(id))
         return {"Id": id, "Warnings": None}
 
     def containers(self, *args, **kwargs):
@@ -175,6 +187,16 @@ class VirtualDockerClient(object):
             all_labels = image.labels.copy()
             all_labels.update(container.labels)
 
+            # Apply filters for ids
+            if 'filters' in kwargs and 'id' in kwargs['filters']:
+                id_filters = kwargs['filters']['id']
+                if not isinstance(id_filters, (list, tuple)):
+                    id_filters = [id_filters]
+
+                if not any(container.id.startswith(id_filter)
+                           for id_filter in id_filters):
+                    continue
+
             # Apply filters for labels
             if 'filters' in kwargs and 'label' in kwargs['filters']:
                 label_filters = kwargs['filters']['label']
@@ -224,7 +246,12 @@ class VirtualDockerClient(object):
                     {'HostIp': str(host_ip),
                      'HostPort': str(host_port)}]
 
-        return {'State': container.state,
+        state = container.state
+        if not isinstance(state, dict):
+            # The listing reports a string, the inspection a dictionary.
+            state = {'Status': state, 'Running': state == 'running'}
+
+        return {'State': state,
                 'Name': '/'+container.name,
                 'Image': image.id,
                 'Config': {
@@ -248,14 +275,54 @@ class VirtualDockerClient(object):
             return None
 
     def start(self, *args, **kwargs):
-        log.info("VirtualDockerClient.start called with ", args, kwargs)
+        log.info("VirtualDockerClient.start called with %s %s", args, kwargs)
+        if args:
+            container = self._set_container_state(args[0], "running")
+            self._emit_event("start", container)
 
     def stop(self, *args, **kwargs):
-        log.info("VirtualDockerClient.stop called with ", args, kwargs)
+        log.info("VirtualDockerClient.stop called with %s %s", args, kwargs)
+        if args:
+            container = self._set_container_state(args[0], "exited")
+            self._emit_event("die", container)
+            self._emit_event("stop", container)
 
     def remove_container(self, container, *args, **kwargs):
         container = self._find_container(container)
         self._containers.remove(container)
+        self._emit_event("destroy", container)
+
+    def tag(self, image, repository, tag=None, **kwargs):
+        image = self._find_image(image)
+        name = repository if tag is None else repository + ":" + tag
+        self._images.append(image._replace(name=name))
+        self._emit_image_event("tag", image.id, name)
+        return True
+
+    def remove_image(self, image, *args, **kwargs):
+        image = self._find_image(image)
+        self._images = [i for i in self._images if i.id != image.id]
+        self._emit_image_event("delete", image.id, image.name)
+
+    def events(self, since=None, until=None, filters=None, decode=None):
+        """Returns a generator of the events happening from now on.
+        The generator blocks waiting for events, and ends when
+        stop_events() is called."""
+        events_queue = queue.Queue()
+        self._event_queues.append(events_queue)
+
+        def generator():
+            try:
+                while True:
+                    event = events_queue.get()
+                    if event is None:
+                        return
+                    if event_matches(event, filters):
+                        yield event if decode else json.dumps(event)
+            finally:
+                self._event_queues.remove(events_queue)
+
+        return generator()
 
     def info(self, *args, **kwargs):
         return {
@@ -267,6 +334,8 @@ class VirtualDockerClient(object):
                                       if x.state == "running"]),
             'ContainersStopped': len([x for x in self._containers
                                       if x.state == "stopped"]),
+            'NCPU': self.ncpu,
+            'MemTotal': self.mem_total,
 
         }
 
@@ -281,6 +350,68 @@ class VirtualDockerClient(object):
             _Container(id, name, image, labels, ports, state)
         )
 
+    def add_event_listener(self, listener):
+        """Adds a callable that is invoked with every event"""
+        self._event_listeners.append(listener)
+
+    def remove_event_listener(self, listener):
+        self._event_listeners.remove(listener)
+
+    def stop_events(self):
+        """Terminates the generators returned by events()"""
+        for events_queue in list(self._event_queues):
+            events_queue.put(None)
+
+    def _emit_event(self, action, container):
+        all_labels = container.image.labels.copy()
+        all_labels.update(container.labels)
+        attributes = dict(all_labels,
+                          image=container.image.name,
+                          name=container.name)
+        now = time.time()
+        self._dispatch_event({
+            "status": action,
+            "id": container.id,
+            "from": container.image.name,
+            "Type": "container",
+            "Action": action,
+            "Actor": {
+                "ID": container.id,
+                "Attributes": attributes
+            },
+            "time": int(now),
+            "timeNano": int(now * 1e9),
+        })
+
+    def _emit_image_event(self, action, image_id, name):
+        now = time.time()
+        self._dispatch_event({
+            "status": action,
+            "id": image_id,
+            "Type": "image",
+            "Action": action,
+            "Actor": {
+                "ID": image_id,
+                "Attributes": {"name": name}
+            },
+            "time": int(now),
+            "timeNano": int(now * 1e9),
+        })
+
+    def _dispatch_event(self, event):
+        for listener in list(self._event_listeners):
+            listener(event)
+
+        for events_queue in list(self._event_queues):
+            events_queue.put(event)
+
+    def _set_container_state(self, container_name_or_id, state):
+        container = self._find_container(container_name_or_id)
+        index = self._containers.index(container)
+        container = container._replace(state=state)
+        self._containers[index] = container
+        return container
+
     def _find_image(self, image_name_or_id):
         image_ids = {image.id: image for image in self._images}
         image_names = {image.name: image for image in self._images}
@@ -369,3 +500,28 @@ class VirtualDockerClient(object):
                 exposed_ports=["8888/tcp"]
             )
         ]
+
+
+def event_matches(event, filters):
+    """Checks if the event satisfies the type and label filters,
+    in the same format of the dockerpy events filters."""
+    if not filters:
+        return True
+
+    types = filters.get("type", [])
+    if not isinstance(types, (list, tuple)):
+        types = [types]
+    if types and event["Type"] not in types:
+        return False
+
+    labels = filters.get("label", [])
+    if not isinstance(labels, (list, tuple)):
+        labels = [labels]
+
+    attributes = event["Actor"]["Attributes"]
+    for label in labels:
+        name, sep, value = label.partition("=")
+        if name not in attributes or (sep and attributes[name] != value):
+            return False
+
+    return True
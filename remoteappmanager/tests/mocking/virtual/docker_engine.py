@@ -0,0 +1,212 @@
+import json
+
+import docker
+from tornado import gen, web
+from tornado.concurrent import Future
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_unix_socket
+
+from remoteappmanager.tests.mocking.virtual.docker_client import (
+    VirtualDockerClient,
+    event_matches)
+
+# Optional API version prefix of the engine urls, e.g. /v1.26
+_V = r"(?:/v[0-9.]+)?"
+
+
+class VirtualDockerEngine(web.Application):
+    """A tornado application that serves the subset of the docker engine
+    HTTP API used by simphony-remote. It is backed by a VirtualDockerClient,
+    so it behaves like the real thing but does nothing on docker.
+
+    It keeps track of the connections and requests it receives, so that
+    tests can check how the clients use it.
+    """
+
+    def __init__(self, docker_client=None, api_version="1.26", latency=0):
+        """Initializes the engine.
+
+        Parameters
+        ----------
+        docker_client: VirtualDockerClient or None
+            The backend. If None, a client with the default containers
+            is created.
+        api_version: str
+            The API version reported by /version
+        latency: float
+            The time (seconds) every request takes to be served.
+        """
+        if docker_client is None:
+            docker_client = VirtualDockerClient.with_containers()
+
+        self.docker_client = docker_client
+        self.api_version = api_version
+        self.latency = latency
+
+        #: The client streams that performed at least one request
+        self.streams = set()
+
+        #: The (method, path) of the received requests
+        self.requests = []
+
+        #: The number of requests currently being served, and its maximum
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+        #: The futures that keep the event streams open
+        self.event_streams = set()
+
+        super().__init__([
+            (_V + r"/version", VersionHandler),
+            (_V + r"/events", EventsHandler),
+            (_V + r"/info", InfoHandler),
+            (_V + r"/containers/json", ContainersHandler),
+            (_V + r"/containers/create", CreateContainerHandler),
+            (_V + r"/containers/([^/]+)/json", InspectContainerHandler),
+            (_V + r"/containers/([^/]+)/start", StartContainerHandler),
+            (_V + r"/containers/([^/]+)/stop", StopContainerHandler),
+            (_V + r"/containers/([^/]+)", RemoveContainerHandler),
+            (_V + r"/images/(.+)/json", InspectImageHandler),
+        ])
+
+    def listen_unix(self, path):
+        """Serves the engine on a unix socket at the given path.
+        Returns the HTTPServer."""
+        server = HTTPServer(self)
+        server.add_socket(bind_unix_socket(path))
+        return server
+
+    def stop_events(self):
+        """Terminates the event streams currently open"""
+        for stream_end in list(self.event_streams):
+            if not stream_end.done():
+                stream_end.set_result(None)
+
+
+class _EngineHandler(web.RequestHandler):
+    """Base handler. Translates the VirtualDockerClient exceptions into
+    the engine error responses."""
+
+    @property
+    def docker_client(self):
+        return self.application.docker_client
+
+    @gen.coroutine
+    def prepare(self):
+        engine = self.application
+        engine.streams.add(self.request.connection.stream)
+        engine.requests.append((self.request.method, self.request.path))
+        engine.in_flight += 1
+        engine.max_in_flight = max(engine.max_in_flight, engine.in_flight)
+        if engine.latency:
+            yield gen.sleep(engine.latency)
+
+    def on_finish(self):
+        self.application.in_flight -= 1
+
+    def write_json(self, data, status=200):
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(data))
+
+    def write_error(self, status_code, **kwargs):
+        message = self._reason
+        exc_info = kwargs.get("exc_info")
+        if exc_info is not None and isinstance(exc_info[1], web.HTTPError):
+            message = exc_info[1].log_message or message
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"message": message}))
+
+    def call(self, method, *args, **kwargs):
+        """Calls the virtual client, converting NotFound into a 404"""
+        try:
+            return getattr(self.docker_client, method)(*args, **kwargs)
+        except docker.errors.NotFound as e:
+            raise web.HTTPError(404, str(e.explanation or e.args[0]))
+
+
+class VersionHandler(_EngineHandler):
+    def get(self):
+        self.write_json({"ApiVersion": self.application.api_version,
+                         "Version": "17.03.0-ce"})
+
+
+class EventsHandler(_EngineHandler):
+    @gen.coroutine
+    def get(self):
+        filters = json.loads(self.get_argument("filters", "{}"))
+        self._stream_end = Future()
+        self.application.event_streams.add(self._stream_end)
+
+        def listener(event):
+            if event_matches(event, filters):
+                self.write(json.dumps(event) + "\n")
+                self.flush()
+
+        self.docker_client.add_event_listener(listener)
+        try:
+            self.set_header("Content-Type", "application/json")
+            self.flush()
+            yield self._stream_end
+        finally:
+            self.docker_client.remove_event_listener(listener)
+            self.application.event_streams.discard(self._stream_end)
+
+    def on_connection_close(self):
+        stream_end = getattr(self, "_stream_end", None)
+        if stream_end is not None and not stream_end.done():
+            stream_end.set_result(None)
+
+
+class InfoHandler(_EngineHandler):
+    def get(self):
+        self.write_json(self.call("info"))
+
+
+class ContainersHandler(_EngineHandler):
+    def get(self):
+        kwargs = {"all": self.get_argument("all", "0") not in ("", "0")}
+        filters = self.get_argument("filters", None)
+        if filters is not None:
+            kwargs["filters"] = json.loads(filters)
+        self.write_json(self.call("containers", **kwargs))
+
+
+class CreateContainerHandler(_EngineHandler):
+    def post(self):
+        config = json.loads(self.request.body.decode("utf-8"))
+        result = self.call("create_container",
+                           image=config["Image"],
+                           name=self.get_argument("name", ""),
+                           labels=config.get("Labels") or {})
+        self.write_json(result, status=201)
+
+
+class InspectContainerHandler(_EngineHandler):
+    def get(self, container_id):
+        self.write_json(self.call("inspect_container", container_id))
+
+
+class StartContainerHandler(_EngineHandler):
+    def post(self, container_id):
+        self.call("inspect_container", container_id)
+        self.call("start", container_id)
+        self.set_status(204)
+
+
+class StopContainerHandler(_EngineHandler):
+    def post(self, container_id):
+        self.call("inspect_container", container_id)
+        self.call("stop", container_id)
+        self.set_status(204)
+
+
+class RemoveContainerHandler(_EngineHandler):
+    def delete(self, container_id):
+        self.call("remove_container", container_id)
+        self.set_status(204)
+
+
+class InspectImageHandler(_EngineHandler):
+    def get(self, image):
+        self.write_json(self.call("inspect_image", image))
@@ -0,0 +1,156 @@
+import os
+import stat
+
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.admission import AdmissionController, Queued
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class TestAdmissionController(TempMixin, AsyncTestCase):
+    def controller(self, **kwargs):
+        """Returns a controller sharing the directory with the others,
+        as the one of another process would."""
+        kwargs.setdefault("max_starts", 1)
+        kwargs.setdefault("poll_interval", 0.01)
+        return AdmissionController(
+            directory=os.path.join(self.tempdir, "admission"), **kwargs)
+
+    def test_directory(self):
+        with self.assertRaises(ValueError):
+            AdmissionController(directory="")
+
+        self.controller()
+        directory = os.path.join(self.tempdir, "admission")
+        for path in (directory, os.path.join(directory, "slots")):
+            mode = os.stat(path).st_mode
+            self.assertEqual(stat.S_IMODE(mode), 0o2770)
+
+        # Writable by all the users: anybody could stall the starts
+        os.chmod(directory, 0o777)
+        with self.assertRaises(PermissionError):
+            self.controller()
+
+        link = os.path.join(self.tempdir, "link")
+        os.chmod(directory, 0o2770)
+        os.symlink(directory, link)
+        with self.assertRaises(PermissionError):
+            AdmissionController(directory=link)
+
+    @gen_test
+    def test_no_symlinks(self):
+        controller = self.controller()
+        target = os.path.join(self.tempdir, "target")
+        with open(target, "w") as f:
+            f.write("content")
+        os.symlink(target, os.path.join(self.tempdir, "admission",
+                                        "counter"))
+
+        with self.assertRaises(OSError):
+            yield controller.admit("mapping", 1.0)
+
+        with open(target) as f:
+            self.assertEqual(f.read(), "content")
+
+    @gen_test
+    def test_admit_release(self):
+        controller = self.controller()
+        ticket = yield controller.admit("mapping", 1.0)
+        self.assertTrue(ticket.claimed)
+        self.assertEqual(controller.stats()["admitted"], 1)
+
+        controller.release(ticket)
+        controller.release(ticket)
+
+        ticket = yield controller.admit("mapping", 1.0)
+        controller.release(ticket)
+        self.assertEqual(controller.stats()["admitted"], 2)
+        self.assertEqual(controller.stats()["queued"], 0)
+
+    @gen_test
+    def test_queue_across_processes(self):
+        first = self.controller()
+        second = self.controller()
+        third = self.controller()
+
+        ticket = yield first.admit("mapping", 1.0)
+
+        with self.assertRaises(Queued) as cm:
+            yield second.admit("mapping", 0.05)
+        self.assertEqual(cm.exception.position, 0)
+
+        with self.assertRaises(Queued) as cm:
+            yield third.admit("mapping", 0.05)
+        self.assertEqual(cm.exception.position, 1)
+        self.assertEqual(third.stats()["queued"], 1)
+
+        # The third waits, but the second is ahead in the queue.
+        third_future = third.admit("mapping", 1.0)
+        yield gen.sleep(0.05)
+        first.release(ticket)
+
+        second_ticket = yield second.admit("mapping", 1.0)
+        self.assertFalse(third_future.done())
+
+        second.release(second_ticket)
+        third_ticket = yield third_future
+        third.release(third_ticket)
+
+    @gen_test
+    def test_concurrent_starts(self):
+        first = self.controller(max_starts=2)
+        second = self.controller(max_starts=2)
+
+        tickets = yield [first.admit("mapping", 1.0),
+                         second.admit("mapping", 1.0)]
+        with self.assertRaises(Queued):
+            yield first.admit("other", 0.05)
+
+        for ticket in tickets:
+            first.release(ticket)
+
+    @gen_test
+    def test_same_key(self):
+        controller = self.controller(max_starts=2)
+        tickets = yield [controller.admit("mapping", 1.0),
+                         controller.admit("mapping", 1.0)]
+
+        # A double request does not share the slot of the first one.
+        self.assertIsNot(tickets[0], tickets[1])
+        for ticket in tickets:
+            controller.release(ticket)
+
+    @gen_test
+    def test_dead_process(self):
+        controller = self.controller()
+        queue_dir = os.path.join(self.tempdir, "admission", "queue")
+
+        # A queue file left behind by a dead process is not locked.
+        with open(os.path.join(queue_dir, "000000000000"), "w"):
+            pass
+        with open(os.path.join(self.tempdir, "admission", "counter"),
+                  "w") as f:
+            f.write("1")
+
+        ticket = yield controller.admit("mapping", 1.0)
+        controller.release(ticket)
+        self.assertEqual(os.listdir(queue_dir), [])
+
+    @gen_test
+    def test_expired_ticket(self):
+        holder = self.controller()
+        controller = self.controller(ticket_ttl=0.0)
+
+        ticket = yield holder.admit("mapping", 1.0)
+        with self.assertRaises(Queued):
+            yield controller.admit("mapping", 0.05)
+
+        yield gen.sleep(0.05)
+        self.assertEqual(controller.stats()["expired"], 1)
+        self.assertEqual(controller.stats()["queued"], 0)
+        self.assertEqual(
+            os.listdir(os.path.join(self.tempdir, "admission", "queue")),
+            [])
+
+        holder.release(ticket)
@@ -6,6 +6,8 @@ from tornado import testing
 from traitlets.traitlets import TraitError
 
 from remoteappmanager.application import Application
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.db.cached_db import CachedDatabase
 from remoteappmanager.db.tests import test_csv_db
 from remoteappmanager.tests import utils
 from remoteappmanager.tests.temp_mixin import TempMixin
@@ -95,6 +97,51 @@ class TestApplication(TempMixin,
         self.assertEqual(app.user.name, "johndoe")
         self.assertIsInstance(app.user.account, test_csv_db.CSVUser)
 
+    def test_initialization_with_database_cache(self):
+        self.file_config.database_class = (
+            "remoteappmanager.db.csv_db.CSVDatabase")
+
+        csv_file = os.path.join(self.tempdir, 'testing.csv')
+        self.file_config.database_kwargs = {"csv_file_path": csv_file}
+        self.file_config.database_cache_ttl = 60
+
+        test_csv_db.write_csv_file(csv_file,
+                                   test_csv_db.GoodTable.headers,
+                                   test_csv_db.GoodTable.records)
+
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+
+        self.assertIsInstance(app.db, CachedDatabase)
+        self.assertIsInstance(app.db.database, test_csv_db.CSVDatabase)
+        self.assertIsInstance(app.user.account, test_csv_db.CSVUser)
+
+    @testing.gen_test
+    def test_async_db(self):
+        self.file_config.database_class = (
+            "remoteappmanager.db.csv_db.CSVDatabase")
+
+        csv_file = os.path.join(self.tempdir, 'testing.csv')
+        self.file_config.database_kwargs = {"csv_file_path": csv_file}
+        self.file_config.database_executor_workers = 3
+
+        test_csv_db.write_csv_file(csv_file,
+                                   test_csv_db.GoodTable.headers,
+                                   test_csv_db.GoodTable.records)
+
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+        try:
+            self.assertIs(app.async_db.database, app.db)
+            self.assertEqual(app.async_db.executor_stats()["max_workers"], 3)
+
+            user = yield app.async_db.get_user(user_name="johndoe")
+            self.assertIsInstance(user, test_csv_db.CSVUser)
+        finally:
+            app.async_db.shutdown()
+
     def test_initialization_with_demo_applications(self):
         # Initialise database
         sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
@@ -138,11 +185,71 @@ class TestApplication(TempMixin,
         self.assertFalse(
             app_account.application_policy.allow_startup_data)
 
+    def test_admission(self):
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+        self.assertIsNone(app.admission)
+
+        self.file_config.admission_max_starts = 2
+        self.file_config.admission_directory = os.path.join(self.tempdir,
+                                                            "admission")
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+        self.assertEqual(app.admission.max_starts, 2)
+        self.assertTrue(os.path.isdir(self.file_config.admission_directory))
+
+    def test_webapi_resource_name(self):
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+
+        base = self.command_line_config.base_urlpath
+        self.assertEqual(
+            app._webapi_resource_name(base + "api/v1/containers/"),
+            "containers")
+        self.assertEqual(
+            app._webapi_resource_name(base + "api/v1/applications/abc/"),
+            "applications")
+        self.assertEqual(
+            app._webapi_resource_name(base + "api/v1/unknown/"), "")
+        self.assertEqual(app._webapi_resource_name(base + "logout"), "")
+        self.assertEqual(app._webapi_resource_name("/hub/api/v1/users"), "")
+
+    @testing.gen_test
+    def test_reconcile_reverse_proxy(self):
+        sqlite_file_path = os.path.join(self.tempdir, "sqlite.db")
+        utils.init_sqlite_db(sqlite_file_path)
+        self.file_config.database_kwargs = {
+            "url": "sqlite:///"+sqlite_file_path}
+
+        app = Application(self.command_line_config,
+                          self.file_config,
+                          self.environment_config)
+
+        container = mock.Mock(urlpath="/user/johndoe/containers/1",
+                              host_url="http://127.0.0.1:666")
+        with patch.object(app.container_manager, "find_containers",
+                          utils.mock_coro_factory([container])), \
+                patch.object(app.reverse_proxy, "reconcile",
+                             utils.mock_coro_factory()):
+            yield app.reconcile_reverse_proxy()
+
+            self.assertEqual(app.container_manager.find_containers.call_args,
+                             ((), {"user_name": app.user.name}))
+            self.assertEqual(
+                app.reverse_proxy.reconcile.call_args[0][0],
+                {"/user/johndoe/containers/1": "http://127.0.0.1:666"})
+
     def test_start(self):
         with patch(
                 "remoteappmanager.application.Application.listen"
         ) as listen, \
-             patch("tornado.ioloop.IOLoop.current") as current:
+             patch("tornado.ioloop.IOLoop.current") as current, \
+             patch.object(AsyncDatabase, "__init__",
+                          return_value=None) as async_db_init, \
+             patch.object(AsyncDatabase, "shutdown") as shutdown:
 
             current_io = mock.Mock()
             current.return_value = current_io
@@ -155,3 +262,16 @@ class TestApplication(TempMixin,
 
             self.assertTrue(listen.called)
             self.assertTrue(current_io.start.called)
+            # The database executor was never used, so shutting down
+            # must not create it.
+            self.assertFalse(async_db_init.called)
+            self.assertFalse(shutdown.called)
+
+            # Once used, it is shut down
+            app = Application(self.command_line_config,
+                              self.file_config,
+                              self.environment_config)
+            self.assertIsInstance(app.async_db, AsyncDatabase)
+            self.assertTrue(async_db_init.called)
+            app.start()
+            self.assertEqual(shutdown.call_args, ((), {"wait": False}))
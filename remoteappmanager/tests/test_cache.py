@@ -0,0 +1,146 @@
+from unittest import TestCase
+
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.cache import SingleFlight, TTLCache
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTTLCache(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.timer = FakeTimer()
+        self.cache = TTLCache(maxsize=2, ttl=10, timer=self.timer)
+
+    def test_get_and_put(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(self.cache.get("a", 0), 0)
+
+        self.cache.put("a", 1)
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+
+        self.cache.put("a", 2)
+        self.assertEqual(self.cache.get("a"), 2)
+        self.assertEqual(len(self.cache), 1)
+
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["size"], 1)
+        self.assertEqual(stats["maxsize"], 2)
+
+    def test_expiration(self):
+        self.cache.put("a", 1)
+        self.timer.now = 9
+        self.assertEqual(self.cache.get("a"), 1)
+
+        self.timer.now = 10
+        self.assertNotIn("a", self.cache)
+        self.assertIsNone(self.cache.get("a"))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats()["expirations"], 1)
+
+    def test_lru_eviction(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+
+        # a becomes the most recently used
+        self.cache.get("a")
+        self.cache.put("c", 3)
+
+        self.assertIsNone(self.cache.get("b"))
+        self.assertEqual(self.cache.get("a"), 1)
+        self.assertEqual(self.cache.get("c"), 3)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+    def test_pop_and_clear(self):
+        self.cache.put("a", 1)
+        self.cache.put("b", 2)
+        self.assertEqual(self.cache.pop("a"), 1)
+        self.assertIsNone(self.cache.pop("a"))
+
+        self.cache.clear()
+        self.assertEqual(len(self.cache), 0)
+
+    def test_items(self):
+        self.cache.put("a", 1)
+        self.timer.now = 5
+        self.cache.put("b", 2)
+        self.timer.now = 12
+
+        self.assertEqual(self.cache.items(), [("b", 2)])
+        self.assertEqual(self.cache.stats()["hits"], 0)
+
+    def test_disabled(self):
+        cache = TTLCache(maxsize=0)
+        cache.put("a", 1)
+        self.assertIsNone(cache.get("a"))
+
+        with self.assertRaises(ValueError):
+            TTLCache(maxsize=-1)
+
+
+class TestSingleFlight(AsyncTestCase):
+    @gen_test
+    def test_concurrent_calls_are_shared(self):
+        flight = SingleFlight()
+        calls = []
+
+        @gen.coroutine
+        def work(value):
+            calls.append(value)
+            yield gen.sleep(0.01)
+            return value * 2
+
+        results = yield [flight.call("a", work, 1),
+                         flight.call("a", work, 1),
+                         flight.call("b", work, 2)]
+
+        self.assertEqual(results, [2, 2, 4])
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual(flight.shared, 1)
+        self.assertEqual(len(flight), 0)
+
+        # Once completed, a new call starts over.
+        result = yield flight.call("a", work, 1)
+        self.assertEqual(result, 2)
+        self.assertEqual(calls, [1, 2, 1])
+
+    @gen_test
+    def test_exceptions_are_shared(self):
+        flight = SingleFlight()
+
+        @gen.coroutine
+        def fail():
+            yield gen.sleep(0.01)
+            raise ValueError("Boom!")
+
+        first = flight.call("a", fail)
+        second = flight.call("a", fail)
+        for future in (first, second):
+            with self.assertRaises(ValueError):
+                yield future
+
+        self.assertEqual(len(flight), 0)
+
+    @gen_test
+    def test_synchronous_completion(self):
+        flight = SingleFlight()
+
+        @gen.coroutine
+        def work():
+            return 42
+
+        result = yield flight.call("a", work)
+        self.assertEqual(result, 42)
+        self.assertEqual(len(flight), 0)
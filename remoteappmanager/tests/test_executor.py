@@ -0,0 +1,68 @@
+import threading
+from unittest import TestCase
+
+from remoteappmanager import metrics
+from remoteappmanager.executor import InstrumentedExecutor
+
+
+class TestInstrumentedExecutor(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.executor = InstrumentedExecutor(1, name="test")
+        self.addCleanup(self.executor.shutdown)
+
+    def test_initial_stats(self):
+        stats = self.executor.stats()
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["completed"], 0)
+        self.assertEqual(stats["total_wait"], 0.0)
+        self.assertEqual(stats["max_workers"], 1)
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError):
+            InstrumentedExecutor(0)
+
+    def test_queue_depth(self):
+        release = threading.Event()
+        started = threading.Event()
+
+        def blocking():
+            started.set()
+            release.wait(5)
+            return "blocking"
+
+        f1 = self.executor.submit(blocking)
+        started.wait(5)
+        f2 = self.executor.submit(lambda x: x * 2, 21)
+
+        stats = self.executor.stats()
+        self.assertEqual(stats["running"], 1)
+        self.assertEqual(stats["queued"], 1)
+
+        release.set()
+        self.assertEqual(f1.result(5), "blocking")
+        self.assertEqual(f2.result(5), 42)
+
+        stats = self.executor.stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["queued"], 0)
+        self.assertEqual(stats["completed"], 2)
+        self.assertEqual(
+            metrics.EXECUTOR_QUEUED.labels(executor="test")._value.get(), 0)
+        self.assertEqual(
+            metrics.EXECUTOR_RUNNING.labels(executor="test")._value.get(), 0)
+        self.assertGreater(stats["max_wait"], 0.0)
+        self.assertGreaterEqual(stats["total_wait"], stats["max_wait"])
+
+    def test_exception(self):
+        def raiser():
+            raise ValueError("Boom!")
+
+        future = self.executor.submit(raiser)
+        with self.assertRaises(ValueError):
+            future.result(5)
+
+        stats = self.executor.stats()
+        self.assertEqual(stats["running"], 0)
+        self.assertEqual(stats["completed"], 1)
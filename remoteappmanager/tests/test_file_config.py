@@ -4,6 +4,7 @@ import unittest
 import textwrap
 
 import docker
+import tornado.options
 
 from remoteappmanager.file_config import FileConfig
 
@@ -170,6 +171,138 @@ class TestFileConfig(TempMixin, unittest.TestCase):
 
         self.assertEqual(config.ga_tracking_id, 'UA-12345-6')
 
+    def test_docker_executor_workers(self):
+        config = FileConfig()
+        self.assertEqual(config.docker_executor_workers, 4)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_executor_workers = 8", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.docker_executor_workers, 8)
+
+    def test_docker_native_client(self):
+        config = FileConfig()
+        self.assertFalse(config.docker_native_client)
+        self.assertEqual(config.docker_max_connections, 10)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_native_client = True", file=fhandle)
+            print("docker_max_connections = 3", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertTrue(config.docker_native_client)
+        self.assertEqual(config.docker_max_connections, 3)
+
+    def test_docker_container_cache(self):
+        config = FileConfig()
+        self.assertFalse(config.docker_container_cache)
+        self.assertEqual(config.docker_container_cache_resync, 60)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_container_cache = True", file=fhandle)
+            print("docker_container_cache_resync = 10", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertTrue(config.docker_container_cache)
+        self.assertEqual(config.docker_container_cache_resync, 10)
+
+    def test_docker_image_cache(self):
+        config = FileConfig()
+        self.assertEqual(config.docker_image_cache_size, 128)
+        self.assertEqual(config.docker_image_cache_ttl, 300)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_image_cache_size = 0", file=fhandle)
+            print("docker_image_cache_ttl = 10", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.docker_image_cache_size, 0)
+        self.assertEqual(config.docker_image_cache_ttl, 10)
+
+    def test_docker_honour_healthcheck(self):
+        config = FileConfig()
+        self.assertTrue(config.docker_honour_healthcheck)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_honour_healthcheck = False", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertFalse(config.docker_honour_healthcheck)
+
+    def test_docker_warm_pool(self):
+        config = FileConfig()
+        self.assertEqual(config.docker_warm_pool_size, 0)
+        self.assertEqual(config.docker_warm_pool_images, [])
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_warm_pool_size = 2", file=fhandle)
+            print("docker_warm_pool_images = ['image:latest']", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.docker_warm_pool_size, 2)
+        self.assertEqual(config.docker_warm_pool_images, ['image:latest'])
+
+    def test_docker_additional_hosts(self):
+        config = FileConfig()
+        self.assertEqual(config.additional_docker_configs(), [])
+
+        with open(self.config_file, 'w') as fhandle:
+            print("tls = False", file=fhandle)
+            print("tls_verify = False", file=fhandle)
+            print("docker_host = 'tcp://192.168.99.100:2376'", file=fhandle)
+            print("docker_additional_hosts = ['tcp://192.168.99.101:2376']",
+                  file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.additional_docker_configs(),
+                         [{"base_url": "tcp://192.168.99.101:2376",
+                           "version": "auto"}])
+
+    def test_resource_limits(self):
+        config = FileConfig()
+        self.assertEqual(config.default_resource_limits(), {})
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_mem_limit = '2g'", file=fhandle)
+            print("docker_cpu_shares = 512", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.default_resource_limits(),
+                         {"mem_limit": 2 * 1024 ** 3, "cpu_shares": 512})
+
+        with open(self.config_file, 'w') as fhandle:
+            print("docker_shm_size = 'lots'", file=fhandle)
+
+        with self.assertRaises(tornado.options.Error):
+            config.parse_config(self.config_file)
+
+    def test_hub_auth_cache(self):
+        config = FileConfig()
+        self.assertEqual(config.hub_auth_cache_ttl, 60)
+        self.assertEqual(config.hub_auth_cache_negative_ttl, 5)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("hub_auth_cache_ttl = 0", file=fhandle)
+            print("hub_auth_cache_negative_ttl = 1", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.hub_auth_cache_ttl, 0)
+        self.assertEqual(config.hub_auth_cache_negative_ttl, 1)
+
+    def test_database_cache(self):
+        config = FileConfig()
+        self.assertEqual(config.database_cache_ttl, 0)
+        self.assertEqual(config.database_revision_interval, 1.0)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("database_cache_ttl = 60", file=fhandle)
+            print("database_revision_interval = 0.5", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.database_cache_ttl, 60)
+        self.assertEqual(config.database_revision_interval, 0.5)
+
     def test_file_parsing_not_overriding_bug_131(self):
         docker_config = textwrap.dedent('''
             tls = True
@@ -188,3 +321,54 @@ class TestFileConfig(TempMixin, unittest.TestCase):
 
         with contextlib.closing(docker.APIClient(**docker_config)) as client:
             self.assertIsNotNone(client.info())
+
+    def test_reaper(self):
+        config = FileConfig()
+        self.assertEqual(config.reaper_interval, 0)
+        self.assertFalse(config.reaper_dry_run)
+        self.assertEqual(config.reaper_warm_grace, 3600)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("reaper_interval = 60.0", file=fhandle)
+            print("reaper_idle_timeout = 3600.0", file=fhandle)
+            print("reaper_dry_run = True", file=fhandle)
+            print("reaper_warm_grace = 600.0", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.reaper_interval, 60)
+        self.assertEqual(config.reaper_idle_timeout, 3600)
+        self.assertTrue(config.reaper_dry_run)
+        self.assertEqual(config.reaper_warm_grace, 600)
+
+    def test_admission(self):
+        config = FileConfig()
+        self.assertEqual(config.admission_max_starts, 0)
+        self.assertEqual(config.admission_directory, "")
+
+        # The directory must be configured explicitly
+        with open(self.config_file, 'w') as fhandle:
+            print("admission_max_starts = 8", file=fhandle)
+
+        with self.assertRaises(tornado.options.Error):
+            config.parse_config(self.config_file)
+
+        config = FileConfig()
+        with open(self.config_file, 'w') as fhandle:
+            print("admission_max_starts = 8", file=fhandle)
+            print("admission_directory = '/var/run/admission'", file=fhandle)
+            print("admission_wait = 5.0", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertEqual(config.admission_max_starts, 8)
+        self.assertEqual(config.admission_directory, "/var/run/admission")
+        self.assertEqual(config.admission_wait, 5.0)
+
+    def test_metrics_authenticate(self):
+        config = FileConfig()
+        self.assertTrue(config.metrics_authenticate)
+
+        with open(self.config_file, 'w') as fhandle:
+            print("metrics_authenticate = False", file=fhandle)
+
+        config.parse_config(self.config_file)
+        self.assertFalse(config.metrics_authenticate)
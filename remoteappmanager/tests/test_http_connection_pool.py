@@ -0,0 +1,241 @@
+import os
+import socket
+
+from tornado import gen, web
+from tornado.testing import AsyncTestCase, gen_test, bind_unused_port
+from tornado.httpserver import HTTPServer
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_unix_socket
+
+from remoteappmanager.http_connection_pool import HTTPConnectionPool
+from remoteappmanager.tests.temp_mixin import TempMixin
+
+
+class EchoHandler(web.RequestHandler):
+    @gen.coroutine
+    def get(self):
+        self.application.streams.add(self.request.connection.stream)
+        yield gen.sleep(float(self.get_argument("delay", "0")))
+        self.write({"path": self.request.path,
+                    "arg": self.get_argument("arg", None)})
+
+    def post(self):
+        self.application.streams.add(self.request.connection.stream)
+        self.set_status(201)
+        self.write(self.request.body)
+
+
+class CloseHandler(web.RequestHandler):
+    def get(self):
+        self.set_header("Connection", "close")
+        self.write("bye")
+
+
+class DropHandler(web.RequestHandler):
+    """Drops the connection after receiving the request"""
+    def get(self):
+        self.application.dropped += 1
+        self.request.connection.stream.close()
+
+    post = get
+
+
+class EchoApplication(web.Application):
+    def __init__(self):
+        self.streams = set()
+        self.dropped = 0
+        super().__init__([
+            (r"/close", CloseHandler),
+            (r"/drop", DropHandler),
+            (r"/.*", EchoHandler),
+        ])
+
+
+class TestHTTPConnectionPool(TempMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app = EchoApplication()
+        self.server = HTTPServer(self.app)
+        sock, port = bind_unused_port()
+        self.server.add_socket(sock)
+        self.base_url = "http://127.0.0.1:{}".format(port)
+
+    def tearDown(self):
+        self.server.stop()
+        self.io_loop.run_sync(self.server.close_all_connections)
+        super().tearDown()
+
+    def test_invalid_parameters(self):
+        with self.assertRaises(ValueError):
+            HTTPConnectionPool("ftp://foo")
+
+        with self.assertRaises(ValueError):
+            HTTPConnectionPool(self.base_url, max_connections=0)
+
+    @gen_test
+    def test_keep_alive(self):
+        pool = HTTPConnectionPool(self.base_url)
+
+        for i in range(5):
+            response = yield pool.fetch("GET", "/foo", params={"arg": i})
+            self.assertEqual(response.code, 200)
+            self.assertEqual(response.json(),
+                             {"path": "/foo", "arg": str(i)})
+
+        self.assertEqual(len(self.app.streams), 1)
+        self.assertEqual(pool.stats()["opened"], 1)
+        self.assertEqual(pool.stats()["requests"], 5)
+        self.assertEqual(pool.stats()["idle"], 1)
+        pool.close()
+
+    @gen_test
+    def test_post(self):
+        pool = HTTPConnectionPool(self.base_url)
+        response = yield pool.fetch("POST", "/foo", body=b"hello")
+        self.assertEqual(response.code, 201)
+        self.assertEqual(response.body, b"hello")
+
+        response = yield pool.fetch("POST", "/foo")
+        self.assertEqual(response.code, 201)
+        self.assertEqual(response.body, b"")
+        self.assertEqual(pool.stats()["opened"], 1)
+        pool.close()
+
+    @gen_test
+    def test_max_connections(self):
+        pool = HTTPConnectionPool(self.base_url, max_connections=3)
+
+        responses = yield [pool.fetch("GET", "/foo",
+                                      params={"delay": 0.05})
+                           for _ in range(10)]
+
+        self.assertTrue(all(r.code == 200 for r in responses))
+        self.assertEqual(len(self.app.streams), 3)
+        self.assertEqual(pool.stats()["opened"], 3)
+        pool.close()
+
+    @gen_test
+    def test_connection_close(self):
+        pool = HTTPConnectionPool(self.base_url)
+
+        response = yield pool.fetch("GET", "/close")
+        self.assertEqual(response.body, b"bye")
+        self.assertEqual(pool.stats()["idle"], 0)
+
+        yield pool.fetch("GET", "/foo")
+        self.assertEqual(pool.stats()["opened"], 2)
+        pool.close()
+
+    @gen_test
+    def test_server_dropped_idle_connection(self):
+        pool = HTTPConnectionPool(self.base_url)
+        yield pool.fetch("GET", "/foo")
+
+        for stream in self.app.streams:
+            stream.close()
+        yield gen.sleep(0.01)
+
+        response = yield pool.fetch("GET", "/foo")
+        self.assertEqual(response.code, 200)
+        self.assertEqual(pool.stats()["opened"], 2)
+
+        # Not idempotent: the dropped connection must be detected before
+        # the request is written.
+        for stream in self.app.streams:
+            stream.close()
+        yield gen.sleep(0.01)
+
+        response = yield pool.fetch("POST", "/foo", body=b"create")
+        self.assertEqual(response.code, 201)
+        self.assertEqual(response.body, b"create")
+        self.assertEqual(pool.stats()["opened"], 3)
+        pool.close()
+
+    @gen_test
+    def test_max_idle_time(self):
+        pool = HTTPConnectionPool(self.base_url, max_idle_time=0.05)
+        yield pool.fetch("POST", "/foo")
+        yield pool.fetch("POST", "/foo")
+        self.assertEqual(pool.stats()["opened"], 1)
+
+        # Idle for too long: the server may be closing it
+        yield gen.sleep(0.1)
+        yield pool.fetch("POST", "/foo")
+        self.assertEqual(pool.stats()["opened"], 2)
+        self.assertEqual(pool.stats()["idle"], 1)
+        pool.close()
+
+    @gen_test
+    def test_retry_idempotent_only(self):
+        pool = HTTPConnectionPool(self.base_url)
+
+        # The request was received: a GET is sent again on a new
+        # connection, a POST is not.
+        yield pool.fetch("GET", "/foo")
+        with self.assertRaises(StreamClosedError):
+            yield pool.fetch("POST", "/drop", body=b"create")
+        self.assertEqual(self.app.dropped, 1)
+
+        yield pool.fetch("GET", "/foo")
+        with self.assertRaises(StreamClosedError):
+            yield pool.fetch("GET", "/drop")
+        self.assertEqual(self.app.dropped, 3)
+        pool.close()
+
+    @gen_test
+    def test_timeout(self):
+        pool = HTTPConnectionPool(self.base_url, request_timeout=0.05)
+
+        with self.assertRaises(gen.TimeoutError):
+            yield pool.fetch("GET", "/foo", params={"delay": 1})
+
+        self.assertEqual(pool.stats()["idle"], 0)
+        response = yield pool.fetch("GET", "/foo", timeout=5)
+        self.assertEqual(response.code, 200)
+        pool.close()
+
+    @gen_test
+    def test_connect_timeout(self):
+        # A server that does not accept: once its backlog is full, the
+        # new connections are neither accepted nor refused.
+        sock, port = bind_unused_port()
+        sock.listen(0)
+        self.addCleanup(sock.close)
+        clients = []
+        for _ in range(4):
+            client = socket.socket()
+            client.setblocking(False)
+            client.connect_ex(("127.0.0.1", port))
+            clients.append(client)
+            self.addCleanup(client.close)
+
+        pool = HTTPConnectionPool("http://127.0.0.1:{}".format(port),
+                                  request_timeout=0.2)
+        start = self.io_loop.time()
+        with self.assertRaises(gen.TimeoutError):
+            yield pool.fetch("GET", "/foo")
+        self.assertLess(self.io_loop.time() - start, 2)
+        pool.close()
+
+    @gen_test
+    def test_closed_pool(self):
+        pool = HTTPConnectionPool(self.base_url)
+        pool.close()
+        with self.assertRaises(RuntimeError):
+            yield pool.fetch("GET", "/foo")
+
+    @gen_test
+    def test_unix_socket(self):
+        path = os.path.join(self.tempdir, "server.sock")
+        server = HTTPServer(self.app)
+        server.add_socket(bind_unix_socket(path))
+
+        try:
+            for base_url in ["unix://" + path, "http+unix://" + path]:
+                pool = HTTPConnectionPool(base_url)
+                response = yield pool.fetch("GET", "/foo")
+                self.assertEqual(response.json()["path"], "/foo")
+                pool.close()
+        finally:
+            server.stop()
+            yield server.close_all_connections()
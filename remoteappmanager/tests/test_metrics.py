@@ -0,0 +1,52 @@
+from prometheus_client import REGISTRY
+from tornado import gen
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager import metrics
+
+
+def _count(**labels):
+    return REGISTRY.get_sample_value(
+        "remoteappmanager_docker_request_duration_seconds_count",
+        labels) or 0
+
+
+class TestTimed(AsyncTestCase):
+    @gen_test
+    def test_timed(self):
+        @metrics.timed(metrics.DOCKER_REQUEST_DURATION_SECONDS,
+                       method="test_timed")
+        @gen.coroutine
+        def succeed(value):
+            yield gen.sleep(0.01)
+            return value
+
+        before = _count(method="test_timed")
+        result = yield succeed(42)
+        self.assertEqual(result, 42)
+        self.assertEqual(_count(method="test_timed"), before + 1)
+
+    @gen_test
+    def test_timed_failure(self):
+        @metrics.timed(metrics.DOCKER_REQUEST_DURATION_SECONDS,
+                       method="test_timed_failure")
+        @gen.coroutine
+        def fail():
+            raise ValueError("Boom!")
+
+        before = _count(method="test_timed_failure")
+        with self.assertRaises(ValueError):
+            yield fail()
+        self.assertEqual(_count(method="test_timed_failure"), before + 1)
+
+    def test_timed_without_labels(self):
+        name = "remoteappmanager_hub_auth_duration_seconds_count"
+        before = REGISTRY.get_sample_value(name) or 0
+
+        @metrics.timed(metrics.HUB_AUTH_DURATION_SECONDS)
+        @gen.coroutine
+        def identify():
+            return {"name": "johndoe"}
+
+        self.assertEqual(self.io_loop.run_sync(identify), {"name": "johndoe"})
+        self.assertEqual(REGISTRY.get_sample_value(name), before + 1)
@@ -1,9 +1,14 @@
-from unittest import mock
+from unittest import mock, TestCase
 from tornado import web
+from tornado.netutil import bind_sockets
 from tornado.testing import AsyncHTTPTestCase, gen_test, ExpectLog
 
+from remoteappmanager.start_trace import StartTrace
 from remoteappmanager.tests.utils import mock_coro_new_callable
-from remoteappmanager.netutils import wait_for_http_server_2xx
+from remoteappmanager.netutils import (
+    backoff_delays,
+    wait_for_http_server_2xx,
+    wait_for_tcp_port)
 
 FETCH_PATH = "remoteappmanager.netutils.AsyncHTTPClient.fetch"
 
@@ -25,11 +30,16 @@ class LongHandler(ShortHandler):
     error_count = 100000
 
 
+class OkHandler(ShortHandler):
+    error_count = 0
+
+
 class TestUtils(AsyncHTTPTestCase):
     def get_app(self):
 
         app = web.Application(handlers=[('/short', ShortHandler),
-                                        ('/long', LongHandler)])
+                                        ('/long', LongHandler),
+                                        ('/ok', OkHandler)])
         return app
 
     @gen_test
@@ -38,7 +48,7 @@ class TestUtils(AsyncHTTPTestCase):
                 ExpectLog('tornado.application', ''):
 
             yield wait_for_http_server_2xx(
-                self.get_url("/short"), timeout=2)
+                self.get_url("/short"), timeout=2, max_delay=0.1)
 
             with self.assertRaises(TimeoutError):
                 yield wait_for_http_server_2xx(
@@ -62,3 +72,48 @@ class TestUtils(AsyncHTTPTestCase):
 
                 yield wait_for_http_server_2xx(
                     self.get_url("/short"), timeout=1)
+
+    @gen_test
+    def test_trace(self):
+        trace = StartTrace()
+        yield wait_for_http_server_2xx(
+            self.get_url("/ok"), timeout=2, trace=trace)
+
+        self.assertEqual(list(trace.phases), ["port-open", "first-2xx"])
+
+    @gen_test
+    def test_wait_for_tcp_port(self):
+        yield wait_for_tcp_port("127.0.0.1", self.get_http_port(), timeout=1)
+
+        # Bound, but nobody accepts the connections.
+        sockets = bind_sockets(0, "127.0.0.1")
+        port = sockets[0].getsockname()[1]
+        sockets[0].close()
+
+        with self.assertRaises(TimeoutError):
+            yield wait_for_tcp_port("127.0.0.1", port, timeout=0.5)
+
+    @gen_test
+    def test_refused_connections_are_not_logged(self):
+        sockets = bind_sockets(0, "127.0.0.1")
+        port = sockets[0].getsockname()[1]
+        sockets[0].close()
+
+        with mock.patch("remoteappmanager.netutils.app_log") as log, \
+                self.assertRaises(TimeoutError):
+            yield wait_for_http_server_2xx(
+                "http://127.0.0.1:{}/".format(port), timeout=0.5)
+
+        self.assertEqual(log.warning.call_args_list, [])
+
+
+class TestBackoffDelays(TestCase):
+    def test_delays(self):
+        delays = backoff_delays(initial=0.1, maximum=0.5, rand=lambda: 0.0)
+        self.assertEqual([next(delays) for _ in range(5)],
+                         [0.1, 0.2, 0.4, 0.5, 0.5])
+
+        delays = backoff_delays(initial=0.1, maximum=0.5, jitter=0.5,
+                                rand=lambda: 1.0)
+        self.assertEqual([next(delays) for _ in range(3)],
+                         [0.05, 0.1, 0.2])
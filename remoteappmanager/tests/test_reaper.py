@@ -0,0 +1,195 @@
+import datetime
+from unittest import mock
+
+from tornado.testing import AsyncTestCase, gen_test
+
+from remoteappmanager.db.async_db import AsyncDatabase
+from remoteappmanager.docker.container_manager import ContainerManager
+from remoteappmanager.reaper import Reaper
+from remoteappmanager.services.reverse_proxy import ReverseProxy
+from remoteappmanager.services.tests.test_reverse_proxy import (
+    ProxyServerMixin)
+from remoteappmanager.tests.mocking.virtual.docker_client import (
+    VirtualDockerClient)
+
+DOCKER_ID = "d2b56bffb5655cb7668b685b80116041a20ee8662ebfa5b5cb68cfc423d9dc30"  # noqa
+MAPPING_ID = "5b34ce60d95742fa828cdced12b4c342"
+URLPATH = "/user/johndoe/containers/20dcb84cdbea4b1899447246789093d0"
+
+
+def timestamp(seconds_ago):
+    now = datetime.datetime.now(datetime.timezone.utc)
+    return (now - datetime.timedelta(seconds=seconds_ago)).strftime(
+        "%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+class TestReaper(ProxyServerMixin, AsyncTestCase):
+    def setUp(self):
+        super().setUp()
+        self.manager = ContainerManager(docker_config={},
+                                        realm="myrealm",
+                                        docker_executor_workers=1)
+        self.docker_client = VirtualDockerClient.with_containers()
+        self.manager._docker_client._sync_client = self.docker_client
+
+        self.reverse_proxy = ReverseProxy(endpoint_url=self.endpoint_url,
+                                          api_token="token")
+        self.addCleanup(self.reverse_proxy.close)
+
+        self.proxy_app.routes[URLPATH] = "http://0.0.0.0:666"
+
+        accounting = mock.Mock(id=MAPPING_ID)
+        self.database = mock.Mock()
+        self.database.get_user.return_value = mock.Mock()
+        self.database.get_accounting_for_user.return_value = [accounting]
+        self.async_db = AsyncDatabase(self.database)
+        self.addCleanup(self.async_db.shutdown)
+
+    def create_reaper(self, **kwargs):
+        return Reaper(container_manager=self.manager,
+                      reverse_proxy=self.reverse_proxy,
+                      async_db=self.async_db,
+                      **kwargs)
+
+    def running(self):
+        return [container["Id"] for container in
+                self.docker_client.containers()]
+
+    @gen_test
+    def test_active_container_is_kept(self):
+        self.proxy_app.activity[URLPATH] = timestamp(10)
+        reaper = self.create_reaper(idle_timeout=60, orphan_grace=0)
+
+        victims = yield reaper.reap()
+
+        self.assertEqual(victims, {})
+        self.assertIn(DOCKER_ID, self.running())
+        self.assertEqual(reaper.stats()["passes"], 1)
+
+    @gen_test
+    def test_idle_container(self):
+        self.proxy_app.activity[URLPATH] = timestamp(120)
+        reaper = self.create_reaper(idle_timeout=60)
+
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+
+        self.assertEqual(victims, {DOCKER_ID: "idle"})
+        self.assertNotIn(DOCKER_ID, self.running())
+        self.assertEqual(self.proxy_app.routes, {})
+        self.assertEqual(reaper.stats()["stopped"]["idle"], 1)
+
+    @gen_test
+    def test_orphan_grace(self):
+        self.proxy_app.routes.clear()
+        reaper = self.create_reaper(orphan_grace=3600)
+
+        victims = yield reaper.reap()
+        self.assertEqual(victims, {})
+        self.assertEqual(reaper.stats()["orphans"], 1)
+
+        reaper.orphan_grace = 0
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+        self.assertEqual(victims, {DOCKER_ID: "no_route"})
+        self.assertNotIn(DOCKER_ID, self.running())
+        self.assertEqual(reaper.stats()["orphans"], 0)
+
+    @gen_test
+    def test_no_accounting(self):
+        self.database.get_accounting_for_user.return_value = []
+        reaper = self.create_reaper(orphan_grace=0, dry_run=True)
+
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+
+        self.assertEqual(victims, {DOCKER_ID: "no_accounting"})
+        # Dry run
+        self.assertIn(DOCKER_ID, self.running())
+        self.assertEqual(reaper.stats()["dry_run"]["no_accounting"], 1)
+        self.assertEqual(reaper.stats()["stopped"]["no_accounting"], 0)
+
+    @gen_test
+    def test_warm_pool_container_is_kept(self):
+        # A user process pre-starts a container for its warm pool. It has
+        # no route until claimed.
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        user_manager = ContainerManager(docker_config={},
+                                        realm="myrealm",
+                                        docker_executor_workers=1,
+                                        warm_pool_size=1,
+                                        warm_pool_images=[image_name])
+        user_manager._docker_client._sync_client = self.docker_client
+
+        container = yield user_manager.start_container(
+            "johndoe", image_name, MAPPING_ID, "/user/johndoe/", None)
+        yield user_manager.stop_and_remove_container(container.docker_id)
+        yield user_manager.fill_warm_pool()
+
+        warm_id = user_manager._warm_pool.idle_containers()[0].docker_id
+        reaper = self.create_reaper(orphan_grace=0)
+
+        victims = yield reaper.reap()
+
+        self.assertEqual(victims, {})
+        self.assertIn(warm_id, self.running())
+
+        # Unclaimed past the grace, e.g. left by a dead process
+        reaper = self.create_reaper(orphan_grace=0, warm_grace=0)
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+        self.assertEqual(victims[warm_id], "no_route")
+        self.assertNotIn(warm_id, self.running())
+
+    @gen_test
+    def test_claimed_warm_container_is_reaped(self):
+        image_name = "simphonyproject/simphony-mayavi:0.6.0"
+        user_manager = ContainerManager(docker_config={},
+                                        realm="myrealm",
+                                        docker_executor_workers=1,
+                                        warm_pool_size=1,
+                                        warm_pool_images=[image_name])
+        user_manager._docker_client._sync_client = self.docker_client
+
+        container = yield user_manager.start_container(
+            "johndoe", image_name, MAPPING_ID, "/user/johndoe/", None)
+        yield user_manager.stop_and_remove_container(container.docker_id)
+        yield user_manager.fill_warm_pool()
+        container = yield user_manager.start_container(
+            "johndoe", image_name, MAPPING_ID, "/user/johndoe/", None)
+        self.assertTrue(container.warm)
+
+        # The reaper finds its mapping in docker, and checks it as any
+        # other container.
+        self.proxy_app.routes[container.urlpath] = "http://0.0.0.0:666"
+        self.database.get_accounting_for_user.return_value = []
+        reaper = self.create_reaper(orphan_grace=0, dry_run=True)
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+        self.assertEqual(victims[container.docker_id], "no_accounting")
+
+        # Its route is gone, e.g. the user process died. The reaper cannot
+        # tell it from an unclaimed one.
+        del self.proxy_app.routes[container.urlpath]
+        self.database.get_accounting_for_user.return_value = [
+            mock.Mock(id=MAPPING_ID)]
+        reaper = self.create_reaper(orphan_grace=0)
+        victims = yield reaper.reap()
+        self.assertNotIn(container.docker_id, victims)
+
+        reaper = self.create_reaper(orphan_grace=0, warm_grace=0)
+        with self.assertLogs("tornado.application", "INFO"):
+            victims = yield reaper.reap()
+
+        self.assertEqual(victims[container.docker_id], "no_route")
+
+    @gen_test
+    def test_database_failure(self):
+        self.database.get_user.side_effect = Exception("boom")
+        reaper = self.create_reaper(orphan_grace=0)
+
+        with self.assertLogs("tornado.application", "ERROR"):
+            victims = yield reaper.reap()
+
+        self.assertEqual(victims, {})
+        self.assertIn(DOCKER_ID, self.running())
@@ -0,0 +1,52 @@
+from unittest import TestCase
+
+from remoteappmanager.start_trace import StartTrace
+
+
+class TestStartTrace(TestCase):
+    def test_phases(self):
+        now = [10.0]
+        trace = StartTrace(timer=lambda: now[0])
+        self.assertEqual(trace.total, 0)
+
+        now[0] = 10.5
+        trace.mark("create")
+        now[0] = 12.0
+        trace.mark("start")
+
+        self.assertEqual(list(trace.phases.items()),
+                         [("create", 0.5), ("start", 1.5)])
+        self.assertEqual(trace.total, 2.0)
+        self.assertEqual(trace.as_dict()["total"], 2.0)
+        self.assertEqual(str(trace),
+                         "create=0.500s start=1.500s total=2.000s")
+
+    def test_overlap(self):
+        now = [10.0]
+        trace = StartTrace(timer=lambda: now[0])
+
+        with trace.overlap("evict"):
+            now[0] = 10.5
+            trace.mark("create")
+            now[0] = 13.0
+
+        now[0] = 14.0
+        trace.mark("start")
+
+        self.assertEqual(list(trace.phases.items()),
+                         [("create", 0.5), ("start", 3.5)])
+        self.assertEqual(list(trace.overlapped.items()), [("evict", 3.0)])
+        self.assertEqual(trace.total, 4.0)
+        self.assertEqual(list(trace.as_dict()),
+                         ["create", "start", "evict", "total"])
+
+    def test_overlap_failure(self):
+        now = [10.0]
+        trace = StartTrace(timer=lambda: now[0])
+
+        with self.assertRaises(ValueError):
+            with trace.overlap("lookup"):
+                now[0] = 11.0
+                raise ValueError()
+
+        self.assertEqual(trace.overlapped["lookup"], 1.0)
@@ -17,6 +17,18 @@ class TestUtils(TestCase):
         with self.assertRaises(ValueError):
             utils.parse_volume_string("/foo:/bar:xc")
 
+    def test_parse_size_string(self):
+        self.assertEqual(utils.parse_size_string(1024), 1024)
+        self.assertEqual(utils.parse_size_string("1024"), 1024)
+        self.assertEqual(utils.parse_size_string("512b"), 512)
+        self.assertEqual(utils.parse_size_string("2k"), 2048)
+        self.assertEqual(utils.parse_size_string("512M"), 512 * 1024 ** 2)
+        self.assertEqual(utils.parse_size_string("1g"), 1024 ** 3)
+
+        for size in ["", "lots", "1.5g", "-1", "1t", -1]:
+            with self.assertRaises(ValueError):
+                utils.parse_size_string(size)
+
     def test_mergedocs(self):
         class Base:
             def foo(self):
@@ -1,7 +1,11 @@
 import inspect
+import re
 from functools import wraps
 import warnings
 
+#: The multipliers of the size suffixes accepted by parse_size_string
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
 
 def url_path_join(*pieces):
     """Join components of url into a relative url path
@@ -51,6 +55,25 @@ def parse_volume_string(volume_string):
     return source, target, mode
 
 
+def parse_size_string(size):
+    """Parses a size in bytes, given as an int or as a string with an
+    optional b, k, m or g suffix (e.g. "512m"), as in the docker command
+    line. Raises ValueError if not according to format."""
+    if isinstance(size, int) and not isinstance(size, bool):
+        value = size
+    else:
+        match = re.match(r"^(\d+)([bkmg]?)$", str(size).strip().lower())
+        if match is None:
+            raise ValueError("Size must be a number of bytes, optionally "
+                             "followed by b, k, m or g")
+        value = int(match.group(1)) * _SIZE_UNITS[match.group(2)]
+
+    if value < 0:
+        raise ValueError("Size must not be negative")
+
+    return value
+
+
 def mergedoc(function, other):
     """ Merge the docstring from the other function to the decorated function.
 
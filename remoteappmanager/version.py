@@ -0,0 +1,2 @@
+# Autogenerated by setup.py
+__version__ = '2.2.0'
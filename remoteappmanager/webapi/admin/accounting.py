@@ -2,7 +2,7 @@ from tornado import gen
 from tornadowebapi.exceptions import NotFound, BadQueryArguments, \
     BadRepresentation
 from tornadowebapi.resource_handler import ResourceHandler
-from tornadowebapi.traitlets import Unicode, Bool
+from tornadowebapi.traitlets import Unicode, Bool, Int, Absent
 
 from tornadowebapi import exceptions
 from tornadowebapi.resource import Resource
@@ -10,6 +10,7 @@ from tornadowebapi.filtering import And, Eq
 
 from remoteappmanager.webapi.decorators import authenticated
 from remoteappmanager.db import exceptions as db_exceptions
+from remoteappmanager.db.interfaces import RESOURCE_LIMITS
 
 
 class Accounting(Resource):
@@ -22,6 +23,14 @@ class Accounting(Resource):
     volume_mode = Unicode(allow_none=True)
     allow_startup_data = Bool()
 
+    # The resource limits of the containers. Sizes are in bytes, or
+    # with a k, m or g suffix on input. None means the default.
+    mem_limit = Unicode(allow_none=True, optional=True)
+    cpu_shares = Int(allow_none=True, optional=True)
+    cpu_quota = Int(allow_none=True, optional=True)
+    pids_limit = Int(allow_none=True, optional=True)
+    shm_size = Unicode(allow_none=True, optional=True)
+
     @classmethod
     def collection_name(cls):
         return "accounting"
@@ -33,9 +42,9 @@ class AccountingHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def create(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
 
-        acc_user = db.get_user(id=int(resource.user_id))
+        acc_user = yield db.get_user(id=int(resource.user_id))
         if acc_user is None:
             raise BadRepresentation()
 
@@ -46,7 +55,7 @@ class AccountingHandler(ResourceHandler):
             volume = None
 
         try:
-            id = db.grant_access(
+            id = yield db.grant_access(
                 resource.image_name,
                 acc_user.name,
                 resource.app_license,
@@ -54,19 +63,22 @@ class AccountingHandler(ResourceHandler):
                 True,
                 volume,
                 resource.allow_startup_data,
+                _resource_limits(resource),
                 )
         except db_exceptions.NotFound:
             raise exceptions.NotFound()
+        except ValueError as e:
+            raise BadRepresentation(message=str(e))
 
         resource.identifier = id
 
     @gen.coroutine
     @authenticated
     def delete(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
 
         try:
-            db.revoke_access_by_id(resource.identifier)
+            yield db.revoke_access_by_id(resource.identifier)
         except db_exceptions.NotFound:
             raise exceptions.NotFound()
 
@@ -76,21 +88,26 @@ class AccountingHandler(ResourceHandler):
         if filter_ is None:
             raise BadQueryArguments("Filter is required")
 
-        db = self.application.db
+        db = self.application.async_db
         if (isinstance(filter_, And) and
                 len(filter_.filters) == 1 and
                 isinstance(filter_.filters[0], Eq) and
                 filter_.filters[0].key == "user_id"):
 
             user_id = int(filter_.filters[0].value)
-            acc_user = db.get_user(id=user_id)
+            acc_user = yield db.get_user(id=user_id)
             if acc_user is None:
                 raise NotFound()
 
-            accountings = db.get_accounting_for_user(acc_user)
+            accountings = yield db.get_accounting_for_user(acc_user)
 
             response = []
             for acc in accountings:
+                limits = acc.application_policy.resource_limits()
+                for name in ("mem_limit", "shm_size"):
+                    if name in limits:
+                        limits[name] = str(limits[name])
+
                 entry = Accounting(
                     identifier=str(acc.id),
                     user_id=str(acc_user.id),
@@ -101,8 +118,19 @@ class AccountingHandler(ResourceHandler):
                     volume_target=acc.application_policy.volume_target,
                     volume_mode=acc.application_policy.volume_mode,
                     allow_startup_data=acc.application_policy.allow_startup_data,  # noqa
+                    **limits
                 )
                 response.append(entry)
             item_response.set(response)
         else:
             raise BadQueryArguments("Empty filter specified")
+
+
+def _resource_limits(resource):
+    """Returns the resource limits given in the resource, as a dict"""
+    limits = {}
+    for name in RESOURCE_LIMITS:
+        value = getattr(resource, name, None)
+        if value is not None and value is not Absent:
+            limits[name] = value
+    return limits
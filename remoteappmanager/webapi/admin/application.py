@@ -20,14 +20,14 @@ class ApplicationHandler(ResourceHandler):
     @authenticated
     def delete(self, resource, **kwargs):
         """Removes the application."""
-        db = self.application.db
+        db = self.application.async_db
         try:
             id = int(resource.identifier)
         except ValueError:
             raise exceptions.NotFound()
 
         try:
-            db.remove_application(id=id)
+            yield db.remove_application(id=id)
             self.log.info("Removed application with id {}".format(id))
         except db_exceptions.NotFound:
             raise exceptions.NotFound()
@@ -37,9 +37,9 @@ class ApplicationHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def create(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
         try:
-            id = db.create_application(resource.image_name)
+            id = yield db.create_application(resource.image_name)
         except db_exceptions.Exists:
             raise exceptions.Exists()
         except db_exceptions.UnsupportedOperation:
@@ -57,8 +57,7 @@ class ApplicationHandler(ResourceHandler):
         items_response: ItemsResponse
             an object to be filled with the appropriate information
         """
-        db = self.application.db
-        apps = db.list_applications()
+        apps = yield self.application.async_db.list_applications()
 
         items = []
         for app in apps:
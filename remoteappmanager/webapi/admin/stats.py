@@ -29,10 +29,13 @@ class StatsHandler(ResourceHandler):
     def retrieve(self, resource, **kwargs):
         app = self.application
         manager = self.application.container_manager
-        containers = (yield manager.find_containers())
+        containers, users, applications = yield [
+            manager.find_containers(),
+            app.async_db.list_users(),
+            app.async_db.list_applications()]
 
         resource.realm = app.file_config.docker_realm
-        resource.num_total_users = len(app.db.list_users())
+        resource.num_total_users = len(users)
         resource.num_active_users = len(set([c.user for c in containers]))
-        resource.num_applications = len(app.db.list_applications())
+        resource.num_applications = len(applications)
         resource.num_running_containers = len(containers)
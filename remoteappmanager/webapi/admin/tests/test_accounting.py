@@ -67,6 +67,42 @@ class TestAccounting(WebAPITestCase):
                    },
                   httpstatus.CREATED)
 
+    def test_create_with_resource_limits(self):
+        with mock.patch("remoteappmanager.tests.mocking."
+                        "dummy.DummyDB.grant_access"
+                        ) as mock_grant_access:
+            mock_grant_access.return_value = "12345"
+            self.post("/user/johndoe/api/v1/accounting/",
+                      {"user_id": "0",
+                       "image_name": "image_id1",
+                       "app_license": "",
+                       "allow_home": True,
+                       "volume_source": "",
+                       "volume_target": "",
+                       "volume_mode": "",
+                       "allow_startup_data": False,
+                       "mem_limit": "512m",
+                       "pids_limit": 100,
+                       },
+                      httpstatus.CREATED)
+
+            self.assertEqual(mock_grant_access.call_args[0][-1],
+                             {"mem_limit": "512m", "pids_limit": 100})
+
+            mock_grant_access.side_effect = ValueError("Invalid size")
+            self.post("/user/johndoe/api/v1/accounting/",
+                      {"user_id": "0",
+                       "image_name": "image_id1",
+                       "app_license": "",
+                       "allow_home": True,
+                       "volume_source": "",
+                       "volume_target": "",
+                       "volume_mode": "",
+                       "allow_startup_data": False,
+                       "mem_limit": "lots",
+                       },
+                      httpstatus.BAD_REQUEST)
+
     def test_unable_to_create(self):
         with mock.patch("remoteappmanager.tests.mocking."
                         "dummy.DummyDB.grant_access"
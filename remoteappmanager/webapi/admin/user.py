@@ -19,14 +19,14 @@ class UserHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def delete(self, resource, **kwargs):
-        db = self.application.db
+        db = self.application.async_db
         try:
             identifier = int(resource.identifier)
         except ValueError:
             raise exceptions.NotFound()
 
         try:
-            db.remove_user(id=identifier)
+            yield db.remove_user(id=identifier)
             self.log.info("Removed user with id {}".format(identifier))
         except db_exceptions.NotFound:
             raise exceptions.NotFound()
@@ -38,14 +38,16 @@ class UserHandler(ResourceHandler):
     def create(self, resource, **kwargs):
         name = resource.name
 
-        db = self.application.db
+        db = self.application.async_db
         try:
-            resource.identifier = str(db.create_user(name))
+            id = yield db.create_user(name)
         except db_exceptions.Exists:
             raise exceptions.Exists()
         except db_exceptions.UnsupportedOperation:
             raise exceptions.Unable()
 
+        resource.identifier = str(id)
+
     @gen.coroutine
     @authenticated
     def items(self, items_response, **kwargs):
@@ -56,7 +58,7 @@ class UserHandler(ResourceHandler):
         items_response: ItemsResponse
             an object to be filled with the appropriate information
         """
-        users = self.application.db.list_users()
+        users = yield self.application.async_db.list_users()
 
         items_response.set([
             User(identifier=str(u.id), name=u.name)
@@ -45,7 +45,7 @@ class ApplicationHandler(ResourceHandler):
     @gen.coroutine
     @authenticated
     def retrieve(self, resource, **kwargs):
-        accs = self.application.db.get_accounting_for_user(
+        accs = yield self.application.async_db.get_accounting_for_user(
             self.current_user
         )
         identifier = resource.identifier
@@ -71,6 +71,57 @@ class ApplicationHandler(ResourceHandler):
             user_name=self.current_user.name,
             mapping_id=identifier)
 
+        self._fill_resource(resource, identifier, policy, image, containers)
+
+    @gen.coroutine
+    @authenticated
+    def items(self, items_response, **kwargs):
+        """Retrieves a dictionary containing the image and the associated
+        container, if active, as values."""
+        accs = yield self.application.async_db.get_accounting_for_user(
+            self.current_user)
+
+        container_manager = self.application.container_manager
+
+        # Many applications can share the same image. Each image is
+        # requested once, and all of them at the same time. The user
+        # containers are retrieved with a single query.
+        image_names = {acc.application.image for acc in accs}
+        images, containers = yield [
+            gen.multi({name: container_manager.image(name)
+                       for name in image_names}),
+            container_manager.find_containers(
+                user_name=self.current_user.name)
+        ]
+
+        containers_by_mapping_id = {}
+        for container in containers:
+            containers_by_mapping_id.setdefault(
+                container.mapping_id, []).append(container)
+
+        result = []
+        for acc in accs:
+            image = images[acc.application.image]
+            if image is None:
+                # The user has access to an application that is no longer
+                # available in docker.
+                continue
+
+            resource = self.resource_class(identifier=acc.id)
+            self._fill_resource(resource,
+                                acc.id,
+                                acc.application_policy,
+                                image,
+                                containers_by_mapping_id.get(acc.id, []))
+            result.append(resource)
+
+        items_response.set(result)
+
+    # Private
+
+    def _fill_resource(self, resource, identifier, policy, image, containers):
+        """Fills the resource with the representation of the
+        application, its policy and its running container, if any."""
         resource.mapping_id = identifier
         resource.image = Image()
         resource.image.fill({
@@ -89,23 +140,3 @@ class ApplicationHandler(ResourceHandler):
             # API considers a broader possibility for future extension.
             resource.container = Container()
             resource.container.fill(containers[0])
-
-    @gen.coroutine
-    @authenticated
-    def items(self, items_response, **kwargs):
-        """Retrieves a dictionary containing the image and the associated
-        container, if active, as values."""
-        accs = self.application.db.get_accounting_for_user(
-            self.current_user)
-
-        result = []
-        for entry in accs:
-            resource = self.resource_class(identifier=entry.id)
-            try:
-                yield self.retrieve(resource)
-            except NotFound:
-                continue
-
-            result.append(resource)
-
-        items_response.set(result)
@@ -1,3 +1,4 @@
+import http.client as httplib
 import os
 from datetime import timedelta
 
@@ -8,10 +9,38 @@ from tornadowebapi.resource import Resource
 from tornadowebapi.resource_handler import ResourceHandler
 from tornadowebapi.traitlets import Unicode, Dict, Absent
 
-from remoteappmanager.netutils import wait_for_http_server_2xx
+from remoteappmanager import metrics
+from remoteappmanager.admission import Queued
+from remoteappmanager.docker.container_manager import MultipleResultsFound
+from remoteappmanager.netutils import (
+    wait_for_http_server_2xx,
+    wait_for_tcp_port)
+from remoteappmanager.start_trace import StartTrace
 from remoteappmanager.webapi.decorators import authenticated
 
 
+class StartQueued(exceptions.WebAPIException):
+    """The start is queued by the admission control. The request keeps
+    its place in the queue, and should be repeated.
+
+    The representation reports the place in the queue (1 is next) as
+    queue_position.
+    """
+    http_code = httplib.SERVICE_UNAVAILABLE
+
+    def __init__(self, position):
+        super().__init__("Waiting for other applications to start")
+        self.position = position
+
+    def representation(self):
+        return {
+            "type": type(self).__name__,
+            "message": str(self),
+            "queue_position": (self.position + 1
+                               if self.position is not None else None),
+        }
+
+
 class Container(Resource):
     mapping_id = Unicode(allow_empty=False, strip=True)
     configurables = Dict(optional=True, scope="input")
@@ -30,7 +59,8 @@ class ContainerHandler(ResourceHandler):
         mapping_id = resource.mapping_id
 
         webapp = self.application
-        accountings = webapp.db.get_accounting_for_user(self.current_user)
+        accountings = yield webapp.async_db.get_accounting_for_user(
+            self.current_user)
         container_manager = webapp.container_manager
 
         choice = [(accounting.id,
@@ -57,32 +87,46 @@ class ContainerHandler(ResourceHandler):
             self.log.exception("Invalid configurables")
             raise exceptions.BadRepresentation(message="invalid configurables")
 
-        # Everything is fine. Start and wait for the container to come online.
+        # Everything is fine. Wait for the admission control, then start
+        # and wait for the container to come online.
+        ticket = yield self._admit(mapping_id)
         try:
-            container = yield self._start_container(
-                self.current_user.name,
-                app,
-                policy,
-                mapping_id,
-                self.application.command_line_config.base_urlpath,
-                environment=environment
-                )
-        except Exception as e:
-            raise exceptions.Unable(message=str(e))
-
-        try:
-            yield self._wait_for_container_ready(container)
-        except Exception as e:
-            self._remove_container_noexcept(container)
-            raise exceptions.Unable(message=str(e))
-
-        try:
-            yield self.application.reverse_proxy.register(
-                container.urlpath,
-                container.host_url)
-        except Exception as e:
-            self._remove_container_noexcept(container)
-            raise exceptions.Unable(message=str(e))
+            trace = StartTrace()
+            try:
+                container = yield self._start_container(
+                    self.current_user.name,
+                    app,
+                    policy,
+                    mapping_id,
+                    self.application.command_line_config.base_urlpath,
+                    environment=environment,
+                    trace=trace
+                    )
+            except Exception as e:
+                raise exceptions.Unable(message=str(e))
+
+            try:
+                yield self._wait_for_container_ready(container, trace)
+            except Exception as e:
+                self._remove_container_noexcept(container)
+                raise exceptions.Unable(message=str(e))
+
+            try:
+                yield self.application.reverse_proxy.register(
+                    container.urlpath,
+                    container.host_url)
+            except Exception as e:
+                self._remove_container_noexcept(container)
+                raise exceptions.Unable(message=str(e))
+
+            self.log.info("Container {} for mapping {} ready: {}".format(
+                container.url_id, mapping_id, trace))
+            for phase, duration in trace.as_dict().items():
+                metrics.CONTAINER_START_PHASE_SECONDS.labels(
+                    phase=phase).observe(duration)
+        finally:
+            if ticket is not None:
+                webapp.admission.release(ticket)
 
         resource.identifier = container.url_id
 
@@ -145,26 +189,48 @@ class ContainerHandler(ResourceHandler):
         """"Return the list of containers we are currently running."""
         container_manager = self.application.container_manager
 
-        accountings = self.application.db.get_accounting_for_user(
-            self.current_user)
+        # All the user containers in one query, matched to the accountings
+        # by mapping id. The database and docker are queried at the same
+        # time.
+        accountings, containers = yield [
+            self.application.async_db.get_accounting_for_user(
+                self.current_user),
+            container_manager.find_containers(
+                user_name=self.current_user.name)]
+
+        containers_by_mapping_id = {}
+        for container in containers:
+            containers_by_mapping_id.setdefault(
+                container.mapping_id, []).append(container)
+
+        accountings = [accounting for accounting in accountings
+                       if accounting.id in containers_by_mapping_id]
+
+        # Only the applications with a running container need their image
+        # checked. Each image is requested once, all at the same time.
+        images = yield gen.multi({
+            image_name: container_manager.image(image_name)
+            for image_name in {accounting.application.image
+                               for accounting in accountings}})
 
         running_containers = []
 
         for accounting in accountings:
-            image = yield container_manager.image(accounting.application.image)
-
-            if image is None:
+            if images[accounting.application.image] is None:
                 # The user has access to an application that is no longer
                 # available in docker. We just move on.
                 continue
 
-            container = yield container_manager.find_container(
-                user_name=self.current_user.name,
-                mapping_id=accounting.id)
-
-            if container is None:
-                continue
+            found = containers_by_mapping_id[accounting.id]
+            if len(found) > 1:
+                raise MultipleResultsFound(
+                    "Found {} results for request {}, {}, {}".format(
+                        len(found),
+                        None,
+                        accounting.id,
+                        self.current_user.name))
 
+            container = found[0]
             rest_container = Container(identifier=container.url_id)
             rest_container.fill(container)
             running_containers.append(rest_container)
@@ -192,6 +258,36 @@ class ContainerHandler(ResourceHandler):
                 "container".format(
                     container.docker_id))
 
+    @gen.coroutine
+    def _admit(self, mapping_id):
+        """Waits for the admission control to let the start go on.
+
+        Returns
+        -------
+        The admission Ticket, to be released when the container is
+        ready, or None if there is no admission control.
+
+        Raises
+        ------
+        StartQueued:
+            If the start is still queued after admission_wait seconds.
+        """
+        admission = self.application.admission
+        if admission is None:
+            return None
+
+        try:
+            ticket = yield admission.admit(
+                mapping_id, self.application.file_config.admission_wait)
+        except Queued as e:
+            raise StartQueued(e.position)
+        except Exception:
+            # Better to start than to refuse everything.
+            self.log.exception("Admission control failed. Starting anyway")
+            return None
+
+        return ticket
+
     @gen.coroutine
     def _start_container(self,
                          user_name,
@@ -199,7 +295,8 @@ class ContainerHandler(ResourceHandler):
                          policy,
                          mapping_id,
                          base_urlpath,
-                         environment):
+                         environment,
+                         trace=None):
         """Start the container. This method is a helper method that
         works with low level data and helps in issuing the request to the
         data container.
@@ -218,6 +315,9 @@ class ContainerHandler(ResourceHandler):
         environment: Dict
             A dictionary of envvars to pass to the container.
 
+        trace: StartTrace or None
+            Records the timings of the start phases.
+
         Returns
         -------
         remoteappmanager.docker.container.Container
@@ -248,13 +348,20 @@ class ContainerHandler(ResourceHandler):
             volumes[volume_source] = {'bind': volume_target,
                                       'mode': volume_mode}
 
+        # The limits of the policy override the configured defaults
+        resource_limits = dict(
+            self.application.file_config.default_resource_limits(),
+            **policy.resource_limits())
+
         try:
             f = manager.start_container(user_name,
                                         image_name,
                                         mapping_id,
                                         base_urlpath,
                                         volumes,
-                                        environment
+                                        environment,
+                                        trace=trace,
+                                        resource_limits=resource_limits
                                         )
             container = yield gen.with_timeout(
                 timedelta(
@@ -296,14 +403,34 @@ class ContainerHandler(ResourceHandler):
         return env
 
     @gen.coroutine
-    def _wait_for_container_ready(self, container):
-        """ Wait until the container is ready to be connected
+    def _wait_for_container_ready(self, container, trace):
+        """ Wait until the container is ready to be connected, according
+        to the readiness it declares
+        (see ContainerManager.container_readiness).
 
         Parameters
         ----------
         container: docker.Container
            The container to be connected
+        trace: StartTrace
+           Records the timings of the readiness phases.
         """
+        timeout = self.application.file_config.network_timeout
+        container_manager = self.application.container_manager
+        readiness = yield container_manager.container_readiness(
+            container.docker_id)
+
+        if readiness == "healthcheck":
+            yield container_manager.wait_for_healthy(container.docker_id,
+                                                     timeout)
+            trace.mark("healthy")
+            return
+
+        if readiness == "tcp":
+            yield wait_for_tcp_port(container.ip, container.port, timeout)
+            trace.mark("port-open")
+            return
+
         # Note, we use the jupyterhub ORM server, but we don't use it for
         # any database activity.
         # Note: the end / is important. We want to get a 200 from the actual
@@ -314,6 +441,4 @@ class ContainerHandler(ResourceHandler):
             container.port,
             container.urlpath)
 
-        yield wait_for_http_server_2xx(
-            server_url,
-            self.application.file_config.network_timeout)
+        yield wait_for_http_server_2xx(server_url, timeout, trace=trace)
@@ -7,6 +7,7 @@ from tornadowebapi import registry
 from tornadowebapi.authenticator import NullAuthenticator
 from tornadowebapi.http import httpstatus
 
+from remoteappmanager.db.async_db import AsyncDatabase
 from remoteappmanager.docker.container import Container
 from remoteappmanager.docker.image import Image
 from remoteappmanager.webapi import ApplicationHandler
@@ -34,6 +35,7 @@ class TestApplication(WebAPITestCase):
         handlers = self.reg.api_handlers('/')
         app = web.Application(handlers=handlers)
         app.db = Mock()
+        app.async_db = AsyncDatabase(app.db)
         app.hub = create_hub()
         app.container_manager = Mock()
         app.container_manager.image = mock_coro_factory(
@@ -195,3 +197,117 @@ class TestApplication(WebAPITestCase):
     def test_retrieve_no_user(self):
         self.reg.authenticator = NullAuthenticator
         self.get("/api/v1/applications/one/", httpstatus.NOT_FOUND)
+
+
+class RecordingContainerManager:
+    """A fake of the docker backend that records the calls, and the
+    maximum number of them in flight at the same time. Every operation
+    gives control back to the IOLoop once before completing, so that the
+    operations started together overlap, without any clock involved."""
+
+    def __init__(self, containers):
+        self.containers = containers
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    @gen.coroutine
+    def image(self, image_name):
+        self.calls.append(("image", image_name))
+        yield self._round_trip()
+        return Image(name=image_name, ui_name=image_name.upper())
+
+    @gen.coroutine
+    def find_containers(self, **kwargs):
+        self.calls.append(("find_containers", kwargs))
+        yield self._round_trip()
+        return [c for c in self.containers
+                if all(getattr(c, k) == v for k, v in kwargs.items())]
+
+    @gen.coroutine
+    def _round_trip(self):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            yield gen.moment
+        finally:
+            self.in_flight -= 1
+
+
+class JohnDoeAuthenticator:
+    @classmethod
+    @gen.coroutine
+    def authenticate(cls, handler):
+        user = Mock()
+        user.name = "johndoe"
+        return user
+
+
+class TestApplicationItemsRoundTrips(WebAPITestCase):
+    #: Number of applications granted to the user
+    NUM_APPS = 30
+
+    def get_app(self):
+        self.reg = registry.Registry()
+        self.reg.register(ApplicationHandler)
+        self.reg.authenticator = JohnDoeAuthenticator
+        handlers = self.reg.api_handlers('/')
+        app = web.Application(handlers=handlers)
+        app.hub = create_hub()
+
+        policy = Mock(
+            app_license='',
+            allow_home=True,
+            volume_source="foo",
+            volume_target="bar",
+            volume_mode="ro",
+            allow_startup_data=False,
+        )
+        accountings = []
+        for i in range(self.NUM_APPS):
+            application = Mock()
+            application.image = "image{}".format(i % 3)
+            accountings.append(Mock(id="mapping{}".format(i),
+                                    application=application,
+                                    application_policy=policy))
+
+        app.db = Mock()
+        app.db.get_accounting_for_user = Mock(return_value=accountings)
+        app.async_db = AsyncDatabase(app.db)
+
+        app.container_manager = RecordingContainerManager(
+            [Container(name="container",
+                       image_name="image1",
+                       url_id="url1",
+                       user="johndoe",
+                       mapping_id="mapping1"),
+             Container(name="other",
+                       image_name="image1",
+                       url_id="url2",
+                       user="janedoe",
+                       mapping_id="mapping1")])
+        return app
+
+    def test_items_single_round_trip(self):
+        _, data = self.get("/api/v1/applications/", httpstatus.OK)
+
+        self.assertEqual(data["total"], self.NUM_APPS)
+        self.assertEqual(data["items"]["mapping1"]["container"],
+                         {"name": "container",
+                          "image_name": "image1",
+                          "url_id": "url1"})
+        self.assertNotIn("container", data["items"]["mapping2"])
+        self.assertEqual(data["items"]["mapping2"]["image"]["ui_name"],
+                         "IMAGE2")
+
+        # One request per distinct image, and one container listing.
+        calls = self._app.container_manager.calls
+        self.assertEqual(sorted(c[1] for c in calls if c[0] == "image"),
+                         ["image0", "image1", "image2"])
+        self.assertEqual([c for c in calls if c[0] == "find_containers"],
+                         [("find_containers", {"user_name": "johndoe"})])
+
+        # The latency budget is a single backend round trip: all the
+        # lookups are in flight at the same time, not one after another.
+        self.assertEqual(self._app.container_manager.max_in_flight, 4)
+        self.assertEqual(self._app.container_manager.in_flight, 0)
@@ -1,9 +1,12 @@
+import http.client as httplib
+from unittest import mock
 from unittest.mock import patch
 
 from remoteappmanager.tests.webapi_test_case import WebAPITestCase
 from tornadowebapi.authenticator import NullAuthenticator
 from tornadowebapi.http import httpstatus
 
+from remoteappmanager.admission import AdmissionController, Queued
 from remoteappmanager.docker.image import Image
 from remoteappmanager.docker.container import Container as DockerContainer
 from remoteappmanager.tests.mocking import dummy
@@ -27,9 +30,14 @@ class TestContainer(WebAPITestCase):
         manager.image = mock_coro_factory(Image())
         manager.find_containers = mock_coro_factory([
                 DockerContainer(user="johndoe",
-                                mapping_id="whatever",
+                                mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c",
                                 url_id="12345",
                                 name="container",
+                                image_name="image"),
+                DockerContainer(user="johndoe",
+                                mapping_id="whatever",
+                                url_id="67890",
+                                name="stray",
                                 image_name="image")
                 ])
 
@@ -37,31 +45,39 @@ class TestContainer(WebAPITestCase):
             "/user/johndoe/api/v1/containers/",
             httpstatus.OK)
 
-        # We get two because we have two mapping ids, hence the find_containers
-        # gets called once per each mapping id.
-        # This is a kind of unusual case, because we only get one item
-        # in the items list, due to the nature of the test.
+        # The containers are retrieved with a single query, and only the
+        # ones of the user accountings are returned.
+        self.assertEqual(manager.find_containers.call_args,
+                         ((), {"user_name": "johndoe"}))
         self.assertEqual(
             data,
-            {'identifiers': ['12345', '12345'],
-             'total': 2,
+            {'identifiers': ['12345'],
+             'total': 1,
              'offset': 0,
              'items': {
                  '12345': {
                      'image_name': 'image',
                      'name': 'container',
-                     'mapping_id': 'whatever'
+                     'mapping_id': 'cbaee2e8ef414f9fb0f1c97416b8aa6c'
                  }
              }})
 
+        # Containers of images no longer available are not reported.
+        manager.image = mock_coro_factory(None)
+        code, data = self.get(
+            "/user/johndoe/api/v1/containers/",
+            httpstatus.OK)
+        self.assertEqual(data["total"], 0)
+
     def test_items_with_none_container(self):
         manager = self._app.container_manager
         manager.image = mock_coro_factory(Image())
-        manager.find_container = mock_coro_factory(None)
+        manager.find_containers = mock_coro_factory([])
 
         code, data = self.get("/user/johndoe/api/v1/containers/",
                               httpstatus.OK)
 
+        self.assertFalse(manager.image.called)
         self.assertEqual(
             data,
             {
@@ -96,6 +112,32 @@ class TestContainer(WebAPITestCase):
                 httpstatus.CREATED
             )
 
+    def test_create_resource_limits(self):
+        with patch("remoteappmanager"
+                   ".webapi"
+                   ".container"
+                   ".wait_for_http_server_2xx",
+                   new_callable=mock_coro_new_callable()):
+
+            self._app.file_config.docker_mem_limit = "1g"
+            self._app.file_config.docker_pids_limit = 100
+            self._app.db.policies[0].mem_limit = 512 * 1024 ** 2
+
+            manager = self._app.container_manager
+            manager.start_container = mock_coro_factory(
+                return_value=DockerContainer(url_id="3456")
+            )
+            self.post(
+                "/user/johndoe/api/v1/containers/",
+                dict(mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c"),
+                httpstatus.CREATED
+            )
+
+            # The policy overrides the configured defaults
+            self.assertEqual(
+                manager.start_container.call_args[1]["resource_limits"],
+                {"mem_limit": 512 * 1024 ** 2, "pids_limit": 100})
+
     def test_create_fails(self):
         with patch("remoteappmanager"
                    ".webapi"
@@ -183,6 +225,48 @@ class TestContainer(WebAPITestCase):
                 "type": "Unable",
                 "message": "Boom!"})
 
+    def test_create_admitted(self):
+        with patch("remoteappmanager"
+                   ".webapi"
+                   ".container"
+                   ".wait_for_http_server_2xx",
+                   new_callable=mock_coro_new_callable()):
+
+            ticket = object()
+            self._app.admission = mock.Mock(spec=AdmissionController)
+            self._app.admission.admit = mock_coro_factory(ticket)
+            manager = self._app.container_manager
+            manager.start_container = mock_coro_factory(
+                return_value=DockerContainer(url_id="3456")
+            )
+            self.post(
+                "/user/johndoe/api/v1/containers/",
+                dict(mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c"),
+                httpstatus.CREATED
+            )
+
+            self.assertEqual(
+                self._app.admission.admit.call_args[0][0],
+                "cbaee2e8ef414f9fb0f1c97416b8aa6c")
+            self._app.admission.release.assert_called_once_with(ticket)
+
+    def test_create_queued(self):
+        self._app.admission = mock.Mock(spec=AdmissionController)
+        self._app.admission.admit = mock_coro_factory(
+            side_effect=Queued(2))
+        manager = self._app.container_manager
+        manager.start_container = mock_coro_factory()
+
+        _, data = self.post(
+            "/user/johndoe/api/v1/containers/",
+            dict(mapping_id="cbaee2e8ef414f9fb0f1c97416b8aa6c"),
+            httplib.SERVICE_UNAVAILABLE)
+
+        self.assertFalse(manager.start_container.called)
+        self.assertFalse(self._app.admission.release.called)
+        self.assertEqual(data["type"], "StartQueued")
+        self.assertEqual(data["queue_position"], 3)
+
     def test_create_fails_for_incorrect_configurable(self):
         self.post(
             "/user/johndoe/api/v1/containers/",
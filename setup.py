@@ -42,6 +42,7 @@ if on_rtd:
         "tabulate>=0.7.5",
         "oauthenticator>=0.5",
         "sqlalchemy<1.4",
+        "prometheus_client>=0.0.21",
         # Pinning jinja2 requirements when building on RTD due to
         # regression when using old versions of sphinx<2
         # https://github.com/readthedocs/readthedocs.org/issues/9037